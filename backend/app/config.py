@@ -25,6 +25,12 @@ class Settings:
         # アクセストークンの有効期限（分）
         self.ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
         
+        # ストレージ設定
+        # 使用するストレージ（dynamodb: DynamoDB、memory: プロセス内のメモリ、sqlite: SQLite）
+        self.STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "dynamodb")
+        # SQLiteのデータベースファイルのパス（STORAGE_BACKEND=sqliteの場合）
+        self.SQLITE_PATH: str = os.getenv("SQLITE_PATH", "bulletin-board.db")
+        
         # DynamoDB設定
         # DynamoDBのエンドポイントURL（ローカル開発用）
         self.DYNAMODB_ENDPOINT: str = os.getenv("DYNAMODB_ENDPOINT", None)
@@ -32,12 +38,113 @@ class Settings:
         self.USERS_TABLE: str = os.getenv("USERS_TABLE", "bulletin-board-users")
         # 投稿テーブル名
         self.POSTS_TABLE: str = os.getenv("POSTS_TABLE", "bulletin-board-posts")
+        # アーカイブした投稿のテーブル名
+        self.ARCHIVE_TABLE: str = os.getenv("ARCHIVE_TABLE", "bulletin-board-posts-archive")
+        # 検索インデックスのテーブル名
+        self.SEARCH_TABLE: str = os.getenv("SEARCH_TABLE", "bulletin-board-search")
+        # 集計（投稿数のロールアップ）のテーブル名
+        self.STATS_TABLE: str = os.getenv("STATS_TABLE", "bulletin-board-stats")
+        # レート制限のカウンターのテーブル名
+        self.RATE_LIMIT_TABLE: str = os.getenv("RATE_LIMIT_TABLE", "bulletin-board-rate-limits")
         # AWSリージョン
         self.AWS_REGION: str = os.getenv("AWS_REGION", "ap-northeast-1")
         
         # CORS設定
         # 許可するオリジン
         self.CORS_ORIGINS: list = os.getenv("CORS_ORIGINS", "*").split(",")
+        
+        # ユーザー名伝播設定
+        # ユーザー名変更時に投稿を書き換える並列ワーカー数
+        self.USERNAME_PROPAGATION_WORKERS: int = int(os.getenv("USERNAME_PROPAGATION_WORKERS", "4"))
+        # 1ワーカーがまとめて処理する投稿件数
+        self.USERNAME_PROPAGATION_BATCH_SIZE: int = int(os.getenv("USERNAME_PROPAGATION_BATCH_SIZE", "25"))
+        # スロットリング時の最大リトライ回数
+        self.USERNAME_PROPAGATION_MAX_RETRIES: int = int(os.getenv("USERNAME_PROPAGATION_MAX_RETRIES", "5"))
+        
+        # フロントページスナップショット設定
+        # スナップショットに保持する最新投稿の件数
+        self.FRONT_PAGE_SIZE: int = int(os.getenv("FRONT_PAGE_SIZE", "100"))
+        # スナップショットアイテムの最大サイズ（バイト、DynamoDBの上限400KBより小さくする）
+        self.FRONT_PAGE_MAX_BYTES: int = int(os.getenv("FRONT_PAGE_MAX_BYTES", "350000"))
+        
+        # 投稿アイテムの保存形式設定
+        # 書き込む形式（standard: 標準、compact: 短い属性名・数値の更新日時・長い本文の圧縮）
+        self.POST_ENCODING: str = os.getenv("POST_ENCODING", "standard")
+        # compactの場合に本文を圧縮する最小のバイト数（UTF-8）
+        self.POST_COMPRESS_MIN_BYTES: int = int(os.getenv("POST_COMPRESS_MIN_BYTES", "256"))
+        
+        # アーカイブ設定
+        # 古い投稿をアーカイブのテーブルへ移動し、取得時にアーカイブも参照するかどうか
+        self.ARCHIVE_ENABLED: bool = os.getenv("ARCHIVE_ENABLED", "false").lower() == "true"
+        # 作成からこの日数を過ぎた投稿をアーカイブする
+        self.ARCHIVE_AFTER_DAYS: int = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+        # 1回のアーカイブ処理で移動する最大件数
+        self.ARCHIVE_BATCH_SIZE: int = int(os.getenv("ARCHIVE_BATCH_SIZE", "100"))
+        
+        # 検索設定
+        # 投稿の作成・更新・削除時に検索インデックスを更新し、検索APIを有効にするかどうか
+        self.SEARCH_ENABLED: bool = os.getenv("SEARCH_ENABLED", "false").lower() == "true"
+        # 検索語ごとに読み取るポスティングの最大件数（スコアの高い順、検索の読み取りを投稿数に依存させない）
+        self.SEARCH_MAX_POSTINGS: int = int(os.getenv("SEARCH_MAX_POSTINGS", "1000"))
+        
+        # 集計設定
+        # 投稿の作成・削除時に日別・ユーザー別・全体の投稿数の集計を更新するかどうか
+        self.STATS_ENABLED: bool = os.getenv("STATS_ENABLED", "true").lower() == "true"
+        # 集計の再構築で並列にスキャンする区分の数
+        self.STATS_REBUILD_SEGMENTS: int = int(os.getenv("STATS_REBUILD_SEGMENTS", "4"))
+        # 全件スキャンを伴う保守処理を非同期に依頼するLambda関数名（空の場合は管理APIのリクエスト内で実行する）
+        self.MAINTENANCE_FUNCTION: str = os.getenv("MAINTENANCE_FUNCTION", "")
+        
+        # 投稿のレート制限設定
+        # 投稿の作成回数を制限するかどうか
+        self.RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+        # ユーザーごとの1分あたりの投稿の作成回数の上限（"権限=回数"のカンマ区切り、0は無制限）
+        self.RATE_LIMIT_POSTS_PER_MINUTE: dict = {
+            role.strip(): int(limit)
+            for role, limit in (entry.split("=") for entry in os.getenv("RATE_LIMIT_POSTS_PER_MINUTE", "user=10,admin=60").split(","))
+        }
+        # IPアドレスごとの1分あたりの投稿の作成回数の上限（0は無制限）
+        self.RATE_LIMIT_IP_POSTS_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_IP_POSTS_PER_MINUTE", "30"))
+        # コンテナ内の制限に加えて、全コンテナで共有するカウンター（1分ごと）でも制限するかどうか
+        self.RATE_LIMIT_SHARED: bool = os.getenv("RATE_LIMIT_SHARED", "true").lower() == "true"
+        
+        # 一覧取得設定
+        # 一覧APIが1回のリクエストで返す最大件数（limitの指定に関わらずこの件数に制限する）
+        self.MAX_PAGE_SIZE: int = int(os.getenv("MAX_PAGE_SIZE", "100"))
+        
+        # 計測設定
+        # Server-Timingヘッダー・計測ログを出力するリクエストの割合（0.0〜1.0）
+        self.TIMING_SAMPLE_RATE: float = float(os.getenv("TIMING_SAMPLE_RATE", "1.0"))
+        
+        # メトリクス設定
+        # Embedded Metric Format（EMF）のメトリクスを出力するかどうか
+        self.METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+        # CloudWatchメトリクスの名前空間
+        self.METRICS_NAMESPACE: str = os.getenv("METRICS_NAMESPACE", "BulletinBoard")
+        # メトリクスのService次元の値
+        self.METRICS_SERVICE: str = os.getenv("METRICS_SERVICE", "bulletin-board-api")
+        
+        # サーバー設定（Lambda以外でpython -m app.serverで起動する場合）
+        # 待ち受けるアドレス
+        self.SERVER_HOST: str = os.getenv("SERVER_HOST", "0.0.0.0")
+        # 待ち受けるポート
+        self.SERVER_PORT: int = int(os.getenv("SERVER_PORT", "8000"))
+        # ワーカープロセス数（0の場合はCPU数から決定）
+        self.SERVER_WORKERS: int = int(os.getenv("SERVER_WORKERS", "0"))
+        # 終了時に処理中のリクエストの完了を待つ秒数
+        self.SERVER_GRACEFUL_TIMEOUT: int = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+        
+        # ウォームアップ設定
+        # Lambdaのコンテナ初期化時に事前初期化（ストレージ・bcrypt・JWT・OpenAPIスキーマ）するかどうか
+        self.WARMUP_ON_INIT: bool = os.getenv("WARMUP_ON_INIT", "true").lower() == "true"
+        
+        # プロファイリング設定
+        # 管理者によるリクエストのプロファイリングを許可するかどうか
+        self.PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "true").lower() == "true"
+        # コンテナごとのプロファイリングの最小間隔（秒）
+        self.PROFILING_MIN_INTERVAL_SECONDS: float = float(os.getenv("PROFILING_MIN_INTERVAL_SECONDS", "60"))
+        # サンプリングプロファイラーのサンプリング間隔（ミリ秒）
+        self.PROFILING_SAMPLE_INTERVAL_MS: float = float(os.getenv("PROFILING_SAMPLE_INTERVAL_MS", "5"))
 
 
 @lru_cache()
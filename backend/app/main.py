@@ -5,12 +5,32 @@ FastAPIアプリケーションのエントリーポイント。
 AWS Lambda上でMangumを使用して実行される。
 """
 
+import time
+
+# モジュールの読み込み開始時刻（コールドスタートの初期化時間の計測用）
+_import_started = time.perf_counter()
+
+import json
+import logging
+import os
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from mangum import Mangum
 
 from app.config import get_settings
-from app.routers import auth_router, users_router, posts_router
+from app.routers import auth_router, users_router, posts_router, admin_router
+from app.services.capacity import ConsumedCapacityMiddleware
+from app.services.identity_map import IdentityMapMiddleware
+from app.services.metrics import MetricsMiddleware, flush_invocation_metrics
+from app.services.post_service import post_service
+from app.services.profiling import ProfilingMiddleware
+from app.services.responses import TimedJSONResponse
+from app.services.timing import ServerTimingMiddleware
+from app.services.warmup import is_warmup_event, warm_up
+
+# 呼び出しのログを出力するロガー
+logger = logging.getLogger("app.lambda")
 
 # 設定を取得
 settings = get_settings()
@@ -22,6 +42,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=TimedJSONResponse,
 )
 
 # CORSミドルウェアの設定
@@ -31,12 +52,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # ブラウザのJavaScriptから読み取るレスポンスヘッダー
+    expose_headers=["ETag", "X-Next-Cursor", "X-Total-Count", "Retry-After"],
 )
 
+# リクエスト単位のアイデンティティマップ（同一アイテムの重複読み取りを排除）
+app.add_middleware(IdentityMapMiddleware)
+
+# DynamoDBの消費キャパシティをルート別に集計
+app.add_middleware(ConsumedCapacityMiddleware)
+
+# レイテンシー・エラー件数のメトリクス
+app.add_middleware(MetricsMiddleware)
+
+# 管理者が指定したリクエストのプロファイリング
+app.add_middleware(ProfilingMiddleware)
+
+# 処理時間の計測（最後に追加し、全てのミドルウェアを含めて計測する）
+app.add_middleware(ServerTimingMiddleware)
+
 # ルーターの登録
 app.include_router(auth_router)
 app.include_router(users_router)
 app.include_router(posts_router)
+app.include_router(admin_router)
 
 
 @app.get("/", tags=["ヘルスチェック"], summary="ヘルスチェック", description="APIの稼働状態を確認する")
@@ -52,5 +91,131 @@ async def health_check():
     return {"status": "healthy", "message": "掲示板APIは正常に稼働しています"}
 
 
-# AWS Lambda用のハンドラー
-handler = Mangum(app)
+# ASGIアプリケーションをLambdaイベントに変換するアダプター
+mangum_handler = Mangum(app)
+
+# Lambda上ではコンテナの初期化時に事前初期化し、最初のリクエストを速くする
+if settings.WARMUP_ON_INIT and os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+    warm_up(app)
+
+# モジュールの読み込みにかかった時間（ミリ秒）
+INIT_DURATION_MS = round((time.perf_counter() - _import_started) * 1000, 3)
+
+# コンテナ（プロセス）の最初の呼び出しかどうか
+_cold_start = True
+
+# アーカイブ処理の呼び出しで、次のバッチを開始する残り時間の下限（ミリ秒）
+ARCHIVE_MIN_REMAINING_MS = 10000
+
+
+def run_archive(context) -> dict:
+    """
+    アーカイブ処理を、対象が無くなるかLambdaの残り時間が少なくなるまでバッチ単位で繰り返す
+    
+    Args:
+        context: Lambdaコンテキスト（Noneの場合は残り時間を確認しない）
+    
+    Returns:
+        dict: 移動件数・スキップ件数・失敗件数の合計と、続きがあるかどうか
+    """
+    totals = {"archived": 0, "skipped": 0, "failed": 0, "has_more": True}
+    # アーカイブが無効な場合は何もしない（スケジュールは常に設定されている）
+    if not get_settings().ARCHIVE_ENABLED:
+        totals["has_more"] = False
+        return totals
+    while totals["has_more"]:
+        result = post_service.archive_old_posts()
+        for name in ("archived", "skipped", "failed"):
+            totals[name] += result[name]
+        # 全件スキップ・失敗したバッチは繰り返しても進まないため次回の呼び出しに回す
+        totals["has_more"] = result["has_more"] and result["archived"] > 0
+        if context is not None and context.get_remaining_time_in_millis() < ARCHIVE_MIN_REMAINING_MS:
+            break
+    return totals
+
+
+def run_reconcile() -> dict:
+    """
+    一覧の総件数（全体の投稿数・ユーザー数）のずれを修正する
+    
+    Returns:
+        dict: 集計名 → 数えた件数と修正した差分（集計が無効な場合は空）
+    """
+    # 集計が無効な場合は何もしない（スケジュールは常に設定されている）
+    if not get_settings().STATS_ENABLED:
+        return {}
+    return post_service.reconcile_counts()
+
+
+def run_rebuild_stats() -> dict:
+    """
+    投稿数の集計を作り直す（管理APIから保守用の関数に依頼された場合）
+    
+    Returns:
+        dict: 読み取った投稿数と、書き込んだ・削除した集計のアイテム数（集計が無効な場合は空）
+    """
+    if not get_settings().STATS_ENABLED:
+        return {}
+    return post_service.rebuild_stats()
+
+
+def handler(event, context):
+    """
+    AWS Lambda用のハンドラー
+    
+    呼び出しごとに、コールドスタートかどうかを含む呼び出しログを出力し、
+    集計したメトリクスをEmbedded Metric Format（EMF）で標準出力に書き出す。
+    ウォームアップ呼び出しはASGIアプリケーションを経由せず、事前初期化のみを行って戻る。
+    {"archive": true}のスケジュール呼び出しは、古い投稿のアーカイブ処理を行って戻る。
+    {"reconcile": true}のスケジュール呼び出しは、一覧の総件数のずれを修正して戻る。
+    {"rebuild_stats": true}の呼び出し（管理APIからの依頼）は、投稿数の集計を作り直して戻る。
+    
+    Args:
+        event: Lambdaイベント
+        context: Lambdaコンテキスト
+    
+    Returns:
+        dict: Lambdaのレスポンス
+    """
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
+    
+    if isinstance(event, dict) and event.get("archive") is True:
+        result = run_archive(context)
+        logger.info(json.dumps({"event": "archive", "cold_start": cold_start, **result}, ensure_ascii=False))
+        flush_invocation_metrics(cold_start)
+        return result
+    
+    if isinstance(event, dict) and event.get("reconcile") is True:
+        result = run_reconcile()
+        logger.info(json.dumps({"event": "reconcile", "cold_start": cold_start, **result}, ensure_ascii=False))
+        flush_invocation_metrics(cold_start)
+        return result
+    
+    if isinstance(event, dict) and event.get("rebuild_stats") is True:
+        result = run_rebuild_stats()
+        logger.info(json.dumps({"event": "rebuild_stats", "cold_start": cold_start, **result}, ensure_ascii=False))
+        flush_invocation_metrics(cold_start)
+        return result
+    
+    if is_warmup_event(event):
+        steps = warm_up(app)
+        logger.info(json.dumps({"event": "warmup", "cold_start": cold_start, "steps_ms": steps}, ensure_ascii=False))
+        flush_invocation_metrics(cold_start)
+        return {"warmup": True, "cold_start": cold_start}
+    
+    start = time.perf_counter()
+    try:
+        return mangum_handler(event, context)
+    finally:
+        invocation_log = {
+            "event": "invocation",
+            "cold_start": cold_start,
+            "request_id": getattr(context, "aws_request_id", None),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+        # コールドスタートの場合はモジュールの読み込み時間を含める
+        if cold_start:
+            invocation_log["init_ms"] = INIT_DURATION_MS
+        logger.info(json.dumps(invocation_log, ensure_ascii=False))
+        flush_invocation_metrics(cold_start)
@@ -4,8 +4,8 @@
 全モデルをエクスポートする。
 """
 
-from .user import UserBase, UserCreate, UserUpdate, UserResponse, UserInDB, UserRole
-from .post import PostBase, PostCreate, PostUpdate, PostResponse, PostInDB
+from .user import UserBase, UserCreate, UserUpdate, UserResponse, UserInDB, UserRole, UsernamePropagationStatus
+from .post import PostBase, PostCreate, PostUpdate, PostResponse, PostSuggestion, PostInDB
 from .auth import LoginRequest, Token, TokenData
 
 __all__ = [
@@ -15,10 +15,12 @@ __all__ = [
     "UserResponse",
     "UserInDB",
     "UserRole",
+    "UsernamePropagationStatus",
     "PostBase",
     "PostCreate",
     "PostUpdate",
     "PostResponse",
+    "PostSuggestion",
     "PostInDB",
     "LoginRequest",
     "Token",
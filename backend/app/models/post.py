@@ -59,6 +59,20 @@ class PostResponse(PostBase):
     created_at: datetime = Field(..., description="作成日時")
     # 更新日時
     updated_at: datetime = Field(..., description="更新日時")
+    # 楽観的排他制御用のバージョン（ETagとしても返す）
+    version: int = Field(default=0, description="バージョン")
+
+
+class PostSuggestion(BaseModel):
+    """
+    投稿タイトル候補レスポンスモデル
+    
+    タイトルの前方一致による候補として返す投稿ID・タイトル。
+    """
+    # 投稿ID
+    post_id: str = Field(..., description="投稿ID")
+    # 投稿タイトル
+    title: str = Field(..., description="投稿タイトル")
 
 
 class PostInDB(PostResponse):
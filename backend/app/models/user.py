@@ -71,6 +71,8 @@ class UserResponse(UserBase):
     created_at: datetime = Field(..., description="作成日時")
     # 更新日時
     updated_at: datetime = Field(..., description="更新日時")
+    # 楽観的排他制御用のバージョン（ETagとしても返す）
+    version: int = Field(default=0, description="バージョン")
 
 
 class UserInDB(UserResponse):
@@ -81,3 +83,27 @@ class UserInDB(UserResponse):
     """
     # ハッシュ化されたパスワード
     hashed_password: str = Field(..., description="ハッシュ化されたパスワード")
+
+
+class UsernamePropagationStatus(BaseModel):
+    """
+    ユーザー名伝播状況モデル
+    
+    ユーザー名変更を投稿へ反映するバックグラウンド処理の進捗。
+    """
+    # 対象ユーザーID
+    user_id: str = Field(..., description="ユーザーID")
+    # 反映するユーザー名
+    username: str = Field(..., description="反映するユーザー名")
+    # 書き換え対象の投稿件数
+    total: int = Field(..., description="書き換え対象の投稿件数")
+    # 書き換えに成功した投稿件数
+    updated: int = Field(..., description="書き換えに成功した投稿件数")
+    # スキップした投稿件数
+    skipped: int = Field(..., description="削除済み等でスキップした投稿件数")
+    # 失敗した投稿件数
+    failed: int = Field(..., description="失敗した投稿件数")
+    # スロットリングによるリトライ回数
+    throttled: int = Field(..., description="スロットリングによるリトライ回数")
+    # 完了したかどうか
+    done: bool = Field(..., description="処理が完了したかどうか")
@@ -7,9 +7,11 @@
 from .auth import router as auth_router
 from .users import router as users_router
 from .posts import router as posts_router
+from .admin import router as admin_router
 
 __all__ = [
     "auth_router",
     "users_router",
     "posts_router",
+    "admin_router",
 ]
@@ -0,0 +1,298 @@
+"""
+管理ルーター
+
+運用監視・保守用のAPIエンドポイントを提供する。
+管理者のみがコンテナ内のメトリクスとプロファイル結果の参照、投稿の保存形式の移行、古い投稿のアーカイブ、検索インデックスの再構築、投稿数の集計の参照・再構築を行える。
+"""
+
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import PlainTextResponse
+
+from app.config import get_settings
+from app.models.auth import TokenData
+from app.services.auth import get_admin_user
+from app.services.capacity import capacity_accounting
+from app.services.maintenance import dispatch_job
+from app.services.post_service import get_singleflight_stats, post_service
+from app.services.profiling import profile_store
+from app.services.stats_service import stats_service
+
+# ルーターの作成
+router = APIRouter(prefix="/admin", tags=["管理"])
+
+
+@router.get("/metrics", response_model=Dict[str, Any], summary="メトリクス取得", description="コンテナ内の消費キャパシティ・読み取り合流などのメトリクスを取得する（管理者のみ）")
+async def get_metrics(
+    current_user: TokenData = Depends(get_admin_user)
+) -> Dict[str, Any]:
+    """
+    コンテナ内のメトリクスを取得する
+    
+    管理者権限が必要。
+    値はコンテナ（プロセス）起動からの累計。
+    
+    Args:
+        current_user: 現在の管理者ユーザー（自動注入）
+    
+    Returns:
+        Dict[str, Any]: メトリクス
+    """
+    return {
+        "consumed_capacity": capacity_accounting.snapshot(),
+        "singleflight": get_singleflight_stats(),
+    }
+
+
+@router.get("/profiles", response_model=List[Dict[str, Any]], summary="プロファイル結果一覧取得", description="コンテナ内に保持しているプロファイル結果の一覧を取得する（管理者のみ）")
+async def get_profiles(
+    current_user: TokenData = Depends(get_admin_user)
+) -> List[Dict[str, Any]]:
+    """
+    プロファイル結果の一覧を取得する
+    
+    管理者権限が必要。
+    プロファイル結果はX-Profileヘッダーを指定したリクエストを処理したコンテナにのみ保持される。
+    
+    Args:
+        current_user: 現在の管理者ユーザー（自動注入）
+    
+    Returns:
+        List[Dict[str, Any]]: プロファイル結果の概要リスト（新しい順）
+    """
+    return profile_store.summaries()
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse, summary="プロファイル結果取得", description="プロファイル結果を折りたたみスタック形式で取得する（管理者のみ）")
+async def get_profile(
+    profile_id: str,
+    current_user: TokenData = Depends(get_admin_user)
+) -> PlainTextResponse:
+    """
+    プロファイル結果を取得する
+    
+    管理者権限が必要。
+    結果は折りたたみスタック形式（flamegraph.pl・speedscopeで表示可能）のテキスト。
+    
+    Args:
+        profile_id: プロファイルID
+        current_user: 現在の管理者ユーザー（自動注入）
+    
+    Returns:
+        PlainTextResponse: 折りたたみスタック形式の結果
+    
+    Raises:
+        HTTPException: プロファイル結果が存在しない場合
+    """
+    result = profile_store.get(profile_id)
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="プロファイル結果が見つかりません"
+        )
+    return PlainTextResponse(result.collapsed)
+
+
+@router.post("/post-encoding/migrate", response_model=Dict[str, Any], summary="投稿の保存形式の移行", description="投稿アイテムを設定の保存形式（POST_ENCODING）に1ページ分書き換え、タイトルのソートキーを追加する（管理者のみ）")
+async def migrate_post_encoding(
+    limit: int = Query(100, ge=1, le=1000, description="1回に読み取るアイテム数"),
+    cursor: Optional[str] = Query(None, description="前回の実行で返されたnext_cursor"),
+    current_user: TokenData = Depends(get_admin_user)
+) -> Dict[str, Any]:
+    """
+    投稿アイテムを設定の保存形式に1ページ分書き換える
+    
+    管理者権限が必要。
+    Lambdaのタイムアウトに収まるよう1ページずつ処理する。
+    next_cursorがNoneになるまで、返されたnext_cursorを指定して繰り返し呼び出す。
+    
+    Args:
+        limit: 1回に読み取るアイテム数
+        cursor: 前回の実行で返されたnext_cursor
+        current_user: 現在の管理者ユーザー（自動注入）
+    
+    Returns:
+        Dict[str, Any]: 読み取り件数・移行件数・スキップ件数・失敗件数と、続きのカーソル
+    """
+    return post_service.migrate_encoding(limit, cursor)
+
+
+@router.post("/archive/run", response_model=Dict[str, Any], summary="古い投稿のアーカイブ", description="作成からARCHIVE_AFTER_DAYS日を過ぎた投稿をアーカイブのテーブルへ1バッチ分移動する（管理者のみ）")
+async def run_archive(
+    current_user: TokenData = Depends(get_admin_user)
+) -> Dict[str, Any]:
+    """
+    古い投稿をアーカイブのテーブルへ1バッチ分移動する
+    
+    管理者権限が必要。
+    通常はスケジュール呼び出しで実行される。has_moreがTrueの場合は続きの投稿が残っている。
+    
+    Args:
+        current_user: 現在の管理者ユーザー（自動注入）
+    
+    Returns:
+        Dict[str, Any]: 移動件数・スキップ件数・失敗件数・基準日時と、続きがあるかどうか
+    
+    Raises:
+        HTTPException: アーカイブが無効な場合
+    """
+    try:
+        return post_service.archive_old_posts()
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.post("/search/rebuild", response_model=Dict[str, Any], summary="検索インデックスの再構築", description="投稿を検索インデックスに1ページ分書き込む（管理者のみ）")
+async def rebuild_search_index(
+    limit: int = Query(100, ge=1, le=1000, description="1回に読み取るアイテム数"),
+    cursor: Optional[str] = Query(None, description="前回の実行で返されたnext_cursor"),
+    current_user: TokenData = Depends(get_admin_user)
+) -> Dict[str, Any]:
+    """
+    投稿を検索インデックスに1ページ分書き込む
+    
+    管理者権限が必要。
+    検索を有効にした後、next_cursorがNoneになるまで、返されたnext_cursorを指定して繰り返し呼び出す。
+    
+    Args:
+        limit: 1回に読み取るアイテム数
+        cursor: 前回の実行で返されたnext_cursor
+        current_user: 現在の管理者ユーザー（自動注入）
+    
+    Returns:
+        Dict[str, Any]: 読み取り件数・索引件数・失敗件数と、続きのカーソル
+    
+    Raises:
+        HTTPException: 検索が無効な場合
+    """
+    try:
+        return post_service.rebuild_search_index(limit, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.get("/stats/activity", response_model=Dict[str, Any], summary="投稿数の集計取得", description="全体の投稿数と、日別の投稿数・投稿ユーザー数を取得する（管理者のみ）")
+async def get_activity(
+    days: int = Query(30, ge=1, le=366, description="取得する日数（今日まで）"),
+    current_user: TokenData = Depends(get_admin_user)
+) -> Dict[str, Any]:
+    """
+    投稿数の集計を取得する
+    
+    管理者権限が必要。
+    投稿の作成・削除時に加算した集計のアイテムのみを読み取る（日数に比例し、投稿数に依存しない）。
+    
+    Args:
+        days: 取得する日数
+        current_user: 現在の管理者ユーザー（自動注入）
+    
+    Returns:
+        Dict[str, Any]: 全体の集計と、日付の昇順の日別の集計
+    """
+    return {"totals": stats_service.get_totals(), "days": stats_service.get_daily_activity(days)}
+
+
+@router.get("/stats/top-posters", response_model=List[Dict[str, Any]], summary="投稿数の多いユーザー取得", description="投稿数の多いユーザーを取得する（管理者のみ）")
+async def get_top_posters(
+    limit: int = Query(10, ge=1, le=100, description="取得する最大件数"),
+    current_user: TokenData = Depends(get_admin_user)
+) -> List[Dict[str, Any]]:
+    """
+    投稿数の多いユーザーを取得する
+    
+    管理者権限が必要。
+    
+    Args:
+        limit: 取得する最大件数
+        current_user: 現在の管理者ユーザー（自動注入）
+    
+    Returns:
+        List[Dict[str, Any]]: 投稿数の降順の、ユーザーID・ユーザー名・投稿数
+    """
+    return stats_service.get_top_posters(limit)
+
+
+@router.post("/stats/rebuild", response_model=Dict[str, Any], summary="投稿数の集計の再構築", description="投稿を並列スキャンして集計を作り直す（管理者のみ、保守用の関数が設定されている場合は非同期に実行する）")
+async def rebuild_stats(
+    response: Response,
+    current_user: TokenData = Depends(get_admin_user)
+) -> Dict[str, Any]:
+    """
+    投稿を並列スキャンして集計を作り直す
+    
+    管理者権限が必要。
+    集計を有効にした後や、合成データの投入後、集計の更新に失敗した場合に実行する。
+    保守用の関数（MAINTENANCE_FUNCTION）が設定されている場合は、全件スキャンがAPI Gatewayの応答時間の上限を
+    超えないよう保守用の関数に依頼し、202を返す。
+    
+    Args:
+        response: レスポンス（非同期に依頼した場合はステータスコードを202にする）
+        current_user: 現在の管理者ユーザー（自動注入）
+    
+    Returns:
+        Dict[str, Any]: 読み取った投稿数と、書き込んだ・削除した集計のアイテム数（非同期に依頼した場合は依頼した処理名）
+    
+    Raises:
+        HTTPException: 集計が無効な場合
+    """
+    if not get_settings().STATS_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="集計が無効です（STATS_ENABLED）"
+        )
+    if dispatch_job("rebuild_stats"):
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"accepted": "rebuild_stats"}
+    try:
+        return post_service.rebuild_stats()
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.post("/stats/reconcile", response_model=Dict[str, Any], summary="総件数の修正", description="投稿・ユーザーを並列スキャンして数え、一覧の総件数のずれを修正する（管理者のみ、保守用の関数が設定されている場合は非同期に実行する）")
+async def reconcile_counts(
+    response: Response,
+    current_user: TokenData = Depends(get_admin_user)
+) -> Dict[str, Any]:
+    """
+    投稿・ユーザーを数えて一覧の総件数のずれを修正する
+    
+    管理者権限が必要。
+    通常は1日ごとのスケジュール呼び出しで実行する。
+    保守用の関数（MAINTENANCE_FUNCTION）が設定されている場合は、全件スキャンがAPI Gatewayの応答時間の上限を
+    超えないよう保守用の関数に依頼し、202を返す。
+    
+    Args:
+        response: レスポンス（非同期に依頼した場合はステータスコードを202にする）
+        current_user: 現在の管理者ユーザー（自動注入）
+    
+    Returns:
+        Dict[str, Any]: 集計名 → 数えた件数と、修正した差分（非同期に依頼した場合は依頼した処理名）
+    
+    Raises:
+        HTTPException: 集計が無効な場合
+    """
+    if not get_settings().STATS_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="集計が無効です（STATS_ENABLED）"
+        )
+    if dispatch_job("reconcile"):
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"accepted": "reconcile"}
+    try:
+        return post_service.reconcile_counts()
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
@@ -88,4 +88,5 @@ async def get_me(current_user: TokenData = Depends(get_current_user)) -> UserRes
         role=user.role,
         created_at=user.created_at,
         updated_at=user.updated_at,
+        version=user.version,
     )
@@ -6,14 +6,24 @@
 投稿の変更・削除は投稿者本人または管理者のみ可能。
 """
 
-from typing import List
-from fastapi import APIRouter, HTTPException, status, Depends
+from typing import List, Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response, status, Depends
 
-from app.models.post import PostCreate, PostUpdate, PostResponse
+from app.models.post import PostCreate, PostUpdate, PostResponse, PostSuggestion
 from app.models.auth import TokenData
 from app.models.user import UserRole
 from app.services.auth import get_current_user
 from app.services.post_service import post_service
+from app.services.rate_limit import RateLimitExceededError, rate_limiter
+from app.services.responses import ModelListResponse, page_headers
+from app.services.stats_service import stats_service
+from app.services.user_service import user_service
+from app.services.versioning import (
+    PermissionDeniedError,
+    VersionConflictError,
+    format_etag,
+    parse_if_match,
+)
 
 # ルーターの作成
 router = APIRouter(prefix="/posts", tags=["投稿管理"])
@@ -43,64 +53,165 @@ def can_modify_post(post: PostResponse, current_user: TokenData) -> bool:
     return False
 
 
-@router.post("/", response_model=PostResponse, status_code=status.HTTP_201_CREATED, summary="投稿作成", description="新規投稿を作成する")
+@router.post("/", response_model=PostResponse, status_code=status.HTTP_201_CREATED, summary="投稿作成", description="新規投稿を作成する（ユーザー・IPアドレスごとの投稿の回数が上限を超えた場合は429とRetry-Afterヘッダーを返す）")
 async def create_post(
     post_data: PostCreate,
+    request: Request,
+    response: Response,
     current_user: TokenData = Depends(get_current_user)
 ) -> PostResponse:
     """
     新規投稿を作成する
     
     認証済みユーザーのみ使用可能。
+    ユーザー（権限ごとの上限）・接続元のIPアドレスごとに1分あたりの投稿の回数を制限する。
+    投稿者名はトークンではなくユーザーのテーブルから取得する
+    （ユーザー名の変更前に発行されたトークンで、古いユーザー名の投稿を作成しない）。
     
     Args:
         post_data: 投稿作成データ
+        request: リクエスト（接続元のIPアドレスの取得用）
+        response: レスポンス（ETagヘッダーの設定用）
         current_user: 現在の認証済みユーザー（自動注入）
     
     Returns:
         PostResponse: 作成された投稿情報
+    
+    Raises:
+        HTTPException: 投稿の回数が上限を超えた場合、ユーザーが削除されている場合
     """
+    # 同一リクエスト内の読み取りはアイデンティティマップにより1回のGetItemになる
+    author = user_service.get_user_by_id(current_user.user_id)
+    if author is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="ユーザーが見つかりません",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    # 本文の検証・投稿者の確認で拒否するリクエストは投稿の回数に含めない
+    try:
+        rate_limiter.check_post(current_user.user_id, current_user.role, request.client.host if request.client else None)
+    except RateLimitExceededError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    
     post = post_service.create_post(
         post_data=post_data,
-        user_id=current_user.user_id,
-        username=current_user.username,
+        user_id=author.user_id,
+        username=author.username,
     )
+    response.headers["ETag"] = format_etag(post.version)
     return post
 
 
-@router.get("/", response_model=List[PostResponse], summary="投稿一覧取得", description="全投稿の一覧を取得する（新しい順）")
+@router.get("/", response_model=List[PostResponse], summary="投稿一覧取得", description="投稿の一覧を1ページ分取得する（新しい順、続きがある場合はX-Next-Cursorヘッダー、最初のページで総件数をX-Total-Countヘッダーで返す）")
 async def get_posts(
-    limit: int = 100,
+    limit: int = Query(100, ge=1, description="取得する最大件数（MAX_PAGE_SIZEを超える場合はMAX_PAGE_SIZE件）"),
+    cursor: Optional[str] = Query(None, description="前のページのX-Next-Cursorヘッダーの値"),
     current_user: TokenData = Depends(get_current_user)
-) -> List[PostResponse]:
+) -> ModelListResponse:
     """
-    全投稿を取得する
+    投稿を1ページ分取得する
     
     認証済みユーザーのみ使用可能。
-    作成日時の降順（新しい順）で返す。
+    作成日時の降順（新しい順）で返す。アーカイブした投稿も続きのページに含まれる。
+    投稿は1件ずつJSONに変換して書き出す。
+    続きのページがある場合は、次のページのカーソルをX-Next-Cursorヘッダーで返す。
+    集計が有効な場合は、最初のページ（cursor無し）でアーカイブした投稿を含む総件数をX-Total-Countヘッダーで返す。
     
     Args:
-        limit: 取得する最大件数（デフォルト100）
+        limit: 取得する最大件数（デフォルト100、MAX_PAGE_SIZE件まで）
+        cursor: 前のページの続きのカーソル
         current_user: 現在の認証済みユーザー（自動注入）
     
     Returns:
-        List[PostResponse]: 投稿リスト
+        ModelListResponse: 投稿リストのJSONレスポンス
     """
-    return post_service.get_all_posts(limit=limit)
+    posts, next_cursor = await post_service.aiter_all_posts(limit=limit, cursor=cursor)
+    # 総件数は最初のページのみ返す（続きのページで集計のアイテムを読み取らない）
+    total = stats_service.get_total("posts") if cursor is None else None
+    return ModelListResponse(posts, headers=page_headers(next_cursor, total))
+
+
+@router.get("/search", response_model=List[PostResponse], summary="投稿検索", description="タイトル・本文に検索文字列を含む投稿を1ページ分検索する（関連度順、続きがある場合はX-Next-Cursorヘッダーを返す）")
+async def search_posts(
+    q: str = Query(..., min_length=1, description="検索文字列（空白で区切った語を全て含む投稿を検索する）"),
+    limit: int = Query(20, ge=1, description="取得する最大件数（MAX_PAGE_SIZEを超える場合はMAX_PAGE_SIZE件）"),
+    cursor: Optional[str] = Query(None, description="前のページのX-Next-Cursorヘッダーの値"),
+    current_user: TokenData = Depends(get_current_user)
+) -> ModelListResponse:
+    """
+    投稿を検索する
+    
+    認証済みユーザーのみ使用可能。
+    検索文字列を2文字ずつのN-gramに分割し、全てのN-gramを含む投稿をスコアの降順で返す。
+    1文字の語は、その文字を含む投稿に一致する。
+    続きのページがある場合は、次のページのカーソルをX-Next-Cursorヘッダーで返す。
+    
+    Args:
+        q: 検索文字列
+        limit: 取得する最大件数（デフォルト20、MAX_PAGE_SIZE件まで）
+        cursor: 前のページの続きのカーソル
+        current_user: 現在の認証済みユーザー（自動注入）
+    
+    Returns:
+        ModelListResponse: 投稿リストのJSONレスポンス
+    
+    Raises:
+        HTTPException: 検索が無効な場合、またはカーソルが不正な場合
+    """
+    try:
+        posts, next_cursor = post_service.search_posts(q, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return ModelListResponse(posts, headers=page_headers(next_cursor))
+
+
+@router.get("/suggest", response_model=List[PostSuggestion], summary="投稿タイトル候補取得", description="タイトルが接頭辞で始まる投稿のID・タイトルを取得する（入力補完用）")
+async def suggest_posts(
+    prefix: str = Query(..., min_length=1, description="タイトルの接頭辞（全角・半角、大文字・小文字は区別しない）"),
+    limit: int = Query(10, ge=1, description="取得する最大件数（MAX_PAGE_SIZEを超える場合はMAX_PAGE_SIZE件）"),
+    current_user: TokenData = Depends(get_current_user)
+) -> List[PostSuggestion]:
+    """
+    投稿タイトルの候補を取得する
+    
+    認証済みユーザーのみ使用可能。
+    正規化したタイトルの昇順で返す。
+    
+    Args:
+        prefix: タイトルの接頭辞
+        limit: 取得する最大件数（デフォルト10、MAX_PAGE_SIZE件まで）
+        current_user: 現在の認証済みユーザー（自動注入）
+    
+    Returns:
+        List[PostSuggestion]: タイトル候補リスト
+    """
+    return post_service.suggest_posts(prefix, limit=limit)
 
 
 @router.get("/{post_id}", response_model=PostResponse, summary="投稿詳細取得", description="指定した投稿の詳細情報を取得する")
 async def get_post(
     post_id: str,
+    response: Response,
     current_user: TokenData = Depends(get_current_user)
 ) -> PostResponse:
     """
     特定の投稿を取得する
     
     認証済みユーザーのみ使用可能。
+    更新時のIf-Matchヘッダーに使用するETagを返す。
     
     Args:
         post_id: 取得対象の投稿ID
+        response: レスポンス（ETagヘッダーの設定用）
         current_user: 現在の認証済みユーザー（自動注入）
     
     Returns:
@@ -109,7 +220,7 @@ async def get_post(
     Raises:
         HTTPException: 投稿が見つからない場合
     """
-    post = post_service.get_post_by_id(post_id)
+    post = await post_service.aget_post_by_id(post_id)
     
     if not post:
         raise HTTPException(
@@ -117,6 +228,7 @@ async def get_post(
             detail="投稿が見つかりません"
         )
     
+    response.headers["ETag"] = format_etag(post.version)
     return post
 
 
@@ -124,41 +236,58 @@ async def get_post(
 async def update_post(
     post_id: str,
     post_data: PostUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None, description="取得時のETag（指定した場合は他の更新との競合を検出する）"),
     current_user: TokenData = Depends(get_current_user)
 ) -> PostResponse:
     """
     投稿を更新する
     
     投稿者本人または管理者のみ使用可能。
+    存在・権限・バージョンの確認は条件付き更新で行うため、事前の読み取りは行わない。
     
     Args:
         post_id: 更新対象の投稿ID
         post_data: 更新データ
+        response: レスポンス（ETagヘッダーの設定用）
+        if_match: If-Matchヘッダー
         current_user: 現在の認証済みユーザー（自動注入）
     
     Returns:
         PostResponse: 更新後の投稿情報
     
     Raises:
-        HTTPException: 投稿が見つからない場合、または権限がない場合
+        HTTPException: 投稿が見つからない場合、権限がない場合、または他の更新と競合した場合
     """
-    # 既存投稿を取得
-    existing_post = post_service.get_post_by_id(post_id)
+    # 管理者以外は投稿者本人であることを更新条件にする
+    owner_id = None if current_user.role == UserRole.ADMIN else current_user.user_id
     
-    if not existing_post:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="投稿が見つかりません"
+    try:
+        updated_post = post_service.update_post(
+            post_id,
+            post_data,
+            expected_version=parse_if_match(if_match),
+            owner_id=owner_id,
         )
-    
-    # 権限チェック
-    if not can_modify_post(existing_post, current_user):
+    except PermissionDeniedError:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="この投稿を更新する権限がありません"
         )
+    except VersionConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=str(e),
+            headers={"ETag": format_etag(e.current_version)},
+        )
+    
+    if not updated_post:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="投稿が見つかりません"
+        )
     
-    updated_post = post_service.update_post(post_id, post_data)
+    response.headers["ETag"] = format_etag(updated_post.version)
     return updated_post
 
 
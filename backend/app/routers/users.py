@@ -5,13 +5,17 @@
 管理者のみがユーザーの追加・変更・削除を行える。
 """
 
-from typing import List
-from fastapi import APIRouter, HTTPException, status, Depends
+from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException, Query, Response, status, Depends
 
-from app.models.user import UserCreate, UserUpdate, UserResponse
+from app.models.user import UserCreate, UserUpdate, UserResponse, UsernamePropagationStatus
 from app.models.auth import TokenData
 from app.services.auth import get_admin_user
 from app.services.user_service import user_service
+from app.services.post_service import post_service, get_propagation_progress
+from app.services.responses import ModelListResponse, page_headers
+from app.services.stats_service import stats_service
+from app.services.versioning import VersionConflictError, format_etag, parse_if_match
 
 # ルーターの作成
 router = APIRouter(prefix="/users", tags=["ユーザー管理"])
@@ -47,36 +51,48 @@ async def create_user(
         )
 
 
-@router.get("/", response_model=List[UserResponse], summary="ユーザー一覧取得", description="全ユーザーの一覧を取得する（管理者のみ）")
+@router.get("/", response_model=List[UserResponse], summary="ユーザー一覧取得", description="ユーザーの一覧を1ページ分取得する（管理者のみ、続きがある場合はX-Next-Cursorヘッダー、最初のページで総件数をX-Total-Countヘッダーで返す）")
 async def get_users(
+    limit: int = Query(100, ge=1, description="取得する最大件数（MAX_PAGE_SIZEを超える場合はMAX_PAGE_SIZE件）"),
+    cursor: Optional[str] = Query(None, description="前のページのX-Next-Cursorヘッダーの値"),
     current_user: TokenData = Depends(get_admin_user)
-) -> List[UserResponse]:
+) -> ModelListResponse:
     """
-    全ユーザーを取得する
+    ユーザーを1ページ分取得する
     
     管理者権限が必要。
+    続きのページがある場合は、次のページのカーソルをX-Next-Cursorヘッダーで返す。
+    集計が有効な場合は、最初のページ（cursor無し）で総件数をX-Total-Countヘッダーで返す。
     
     Args:
+        limit: 取得する最大件数（デフォルト100、MAX_PAGE_SIZE件まで）
+        cursor: 前のページの続きのカーソル
         current_user: 現在の管理者ユーザー（自動注入）
     
     Returns:
-        List[UserResponse]: ユーザーリスト
+        ModelListResponse: ユーザーリストのJSONレスポンス
     """
-    return user_service.get_all_users()
+    users, next_cursor = user_service.get_users_page(limit, cursor)
+    # 総件数は最初のページのみ返す（続きのページで集計のアイテムを読み取らない）
+    total = stats_service.get_total("users") if cursor is None else None
+    return ModelListResponse(users, headers=page_headers(next_cursor, total))
 
 
 @router.get("/{user_id}", response_model=UserResponse, summary="ユーザー詳細取得", description="指定したユーザーの詳細情報を取得する（管理者のみ）")
 async def get_user(
     user_id: str,
+    response: Response,
     current_user: TokenData = Depends(get_admin_user)
 ) -> UserResponse:
     """
     特定のユーザーを取得する
     
     管理者権限が必要。
+    更新時のIf-Matchヘッダーに使用するETagを返す。
     
     Args:
         user_id: 取得対象のユーザーID
+        response: レスポンス（ETagヘッダーの設定用）
         current_user: 現在の管理者ユーザー（自動注入）
     
     Returns:
@@ -93,12 +109,14 @@ async def get_user(
             detail="ユーザーが見つかりません"
         )
     
+    response.headers["ETag"] = format_etag(user.version)
     return UserResponse(
         user_id=user.user_id,
         username=user.username,
         role=user.role,
         created_at=user.created_at,
         updated_at=user.updated_at,
+        version=user.version,
     )
 
 
@@ -106,26 +124,39 @@ async def get_user(
 async def update_user(
     user_id: str,
     user_data: UserUpdate,
+    background_tasks: BackgroundTasks,
+    response: Response,
+    if_match: Optional[str] = Header(None, description="取得時のETag（指定した場合は他の更新との競合を検出する）"),
     current_user: TokenData = Depends(get_admin_user)
 ) -> UserResponse:
     """
     ユーザー情報を更新する
     
     管理者権限が必要。
+    ユーザー名を変更した場合は、投稿に保持しているユーザー名を
+    レスポンス返却後にバックグラウンドで書き換える。
+    Lambda（Mangum）ではバックグラウンドタスクも呼び出しの中で実行されるため、レスポンスは書き換えの完了後に返る。
+    進捗は集計のテーブルに保存し、username-propagationでどのコンテナからも取得できる。
     
     Args:
         user_id: 更新対象のユーザーID
         user_data: 更新データ
+        background_tasks: バックグラウンドタスク（自動注入）
+        response: レスポンス（ETagヘッダーの設定用）
+        if_match: If-Matchヘッダー
         current_user: 現在の管理者ユーザー（自動注入）
     
     Returns:
         UserResponse: 更新後のユーザー情報
     
     Raises:
-        HTTPException: ユーザーが見つからない場合、またはユーザー名が既に使用されている場合
+        HTTPException: ユーザーが見つからない場合、ユーザー名が既に使用されている場合、
+            または他の更新と競合した場合
     """
     try:
-        user = user_service.update_user(user_id, user_data)
+        # ユーザー名が実際に変わる場合のみ投稿を書き換えるため、変更前のユーザー名を読み取る
+        previous = user_service.get_user_by_id(user_id) if user_data.username else None
+        user = user_service.update_user(user_id, user_data, expected_version=parse_if_match(if_match))
         
         if not user:
             raise HTTPException(
@@ -133,7 +164,18 @@ async def update_user(
                 detail="ユーザーが見つかりません"
             )
         
+        # 投稿の非正規化ユーザー名を書き換える
+        if user_data.username and (previous is None or previous.username != user.username):
+            background_tasks.add_task(post_service.propagate_username, user.user_id, user.username)
+        
+        response.headers["ETag"] = format_etag(user.version)
         return user
+    except VersionConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=str(e),
+            headers={"ETag": format_etag(e.current_version)},
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -141,6 +183,39 @@ async def update_user(
         )
 
 
+@router.get("/{user_id}/username-propagation", response_model=UsernamePropagationStatus, summary="ユーザー名伝播状況取得", description="ユーザー名変更を投稿へ反映する処理の進捗を取得する（管理者のみ）")
+async def get_username_propagation(
+    user_id: str,
+    current_user: TokenData = Depends(get_admin_user)
+) -> UsernamePropagationStatus:
+    """
+    ユーザー名伝播の進捗を取得する
+    
+    管理者権限が必要。
+    ユーザーの現在のユーザー名を反映する処理の進捗を返す。
+    
+    Args:
+        user_id: 対象のユーザーID
+        current_user: 現在の管理者ユーザー（自動注入）
+    
+    Returns:
+        UsernamePropagationStatus: 伝播処理の進捗
+    
+    Raises:
+        HTTPException: ユーザーが見つからない場合、または現在のユーザー名の伝播処理が実行されていない場合
+    """
+    user = user_service.get_user_by_id(user_id)
+    progress = get_propagation_progress(user_id, user.username) if user else None
+    
+    if not progress:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="ユーザー名の伝播処理は実行されていません"
+        )
+    
+    return UsernamePropagationStatus(**progress.to_dict())
+
+
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT, summary="ユーザー削除", description="指定したユーザーを削除する（管理者のみ）")
 async def delete_user(
     user_id: str,
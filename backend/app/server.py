@@ -0,0 +1,232 @@
+"""
+サーバー起動モジュール
+
+Lambda以外（VM・コンテナ）でAPIを提供するためのエントリーポイント。
+複数のワーカープロセスでapp.main:appを起動する。
+
+    python -m app.server --workers 8
+
+gunicornがインストールされている場合はgunicornのマスタープロセスで
+アプリケーションを事前読み込み（preload）してからワーカーをforkし、
+UvicornWorkerで処理する。gunicornが無い環境（Windowsなど）ではuvicornの
+マルチプロセスモードで起動する。どちらの場合もuvloop・httptoolsが
+インストールされていれば自動的に使用する（requirements-server.txt）。
+"""
+
+import argparse
+import importlib.util
+import os
+from typing import List, Optional
+
+from app.config import get_settings
+
+
+def default_workers() -> int:
+    """
+    CPU数からワーカープロセス数を決定する
+    
+    APIはDynamoDBの応答待ちが大半で、ブロッキング処理はワーカー内のスレッドプールで
+    実行されるため、利用可能なCPU数と同数のワーカーとする。
+    コンテナのCPU制限（アフィニティ）がある場合はそれに従う。
+    
+    Returns:
+        int: ワーカープロセス数
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    コマンドライン引数を解析する
+    
+    未指定の引数は設定（環境変数）の値を使用する。
+    
+    Args:
+        argv: コマンドライン引数（Noneの場合はsys.argv）
+    
+    Returns:
+        argparse.Namespace: 解析結果
+    """
+    settings = get_settings()
+    parser = argparse.ArgumentParser(prog="python -m app.server", description="掲示板APIサーバーを起動する")
+    parser.add_argument("--host", default=settings.SERVER_HOST, help="待ち受けるアドレス")
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT, help="待ち受けるポート")
+    parser.add_argument(
+        "--workers", type=int, default=settings.SERVER_WORKERS,
+        help="ワーカープロセス数（0の場合はCPU数から決定）",
+    )
+    parser.add_argument(
+        "--graceful-timeout", type=int, default=settings.SERVER_GRACEFUL_TIMEOUT,
+        help="終了時に処理中のリクエストの完了を待つ秒数",
+    )
+    parser.add_argument("--keep-alive", type=int, default=5, help="Keep-Alive接続を維持する秒数")
+    parser.add_argument(
+        "--server", choices=("auto", "gunicorn", "uvicorn"), default="auto",
+        help="使用するサーバー（autoの場合はgunicornがあればgunicorn）",
+    )
+    args = parser.parse_args(argv)
+    if args.workers <= 0:
+        args.workers = default_workers()
+    return args
+
+
+def select_server(preference: str) -> str:
+    """
+    使用するサーバーを決定する
+    
+    Args:
+        preference: 指定されたサーバー（auto・gunicorn・uvicorn）
+    
+    Returns:
+        str: 使用するサーバー（gunicornまたはuvicorn）
+    """
+    if preference != "auto":
+        return preference
+    return "gunicorn" if importlib.util.find_spec("gunicorn") is not None else "uvicorn"
+
+
+def build_gunicorn_options(args: argparse.Namespace) -> dict:
+    """
+    gunicornの設定を作成する
+    
+    Args:
+        args: コマンドライン引数の解析結果
+    
+    Returns:
+        dict: gunicornの設定
+    """
+    return {
+        "bind": f"{args.host}:{args.port}",
+        "workers": args.workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "graceful_timeout": args.graceful_timeout,
+        "timeout": args.graceful_timeout + 30,
+        "keepalive": args.keep_alive,
+        "post_fork": post_fork,
+    }
+
+
+def preload_app():
+    """
+    アプリケーションを読み込み、事前初期化する
+    
+    gunicornではマスタープロセスで1度だけ実行され、読み込んだモジュールと
+    boto3のサービスモデル・bcrypt・OpenAPIスキーマはfork後のワーカーで共有される。
+    スレッドプールの初期化は行わない（fork前のマスタープロセスにイベントループとワーカースレッドを作らない）。
+    
+    Returns:
+        FastAPI: アプリケーション
+    """
+    from app.main import app
+    from app.services.warmup import warm_up
+    
+    warm_up(app, threadpool=False)
+    return app
+
+
+def create_app():
+    """
+    uvicornのワーカープロセスでアプリケーションを作成する（ファクトリー）
+    
+    uvicornのワーカーはforkではなく新しいプロセスとして起動するため、
+    ワーカーごとにアプリケーションを読み込み、事前初期化する。
+    
+    Returns:
+        FastAPI: アプリケーション
+    """
+    return preload_app()
+
+
+def post_fork(server, worker) -> None:
+    """
+    gunicornのワーカーのfork直後の処理
+    
+    マスタープロセスで作成したDynamoDBリソース（HTTP接続プール）はプロセス間で共有できないため破棄し、
+    ワーカーで作り直させる。
+    
+    Args:
+        server: gunicornのアービター
+        worker: forkしたワーカー
+    """
+    from app.services.database import reset_dynamodb_resource
+    
+    reset_dynamodb_resource()
+
+
+def run_gunicorn(args: argparse.Namespace) -> None:
+    """
+    gunicornでサーバーを起動する
+    
+    Args:
+        args: コマンドライン引数の解析結果
+    """
+    from gunicorn.app.base import BaseApplication
+    
+    class StandaloneApplication(BaseApplication):
+        """設定ファイルを使わずにgunicornを起動するアプリケーション"""
+        
+        def __init__(self, options: dict):
+            """
+            初期化
+            
+            Args:
+                options: gunicornの設定
+            """
+            # gunicornの設定
+            self.options = options
+            super().__init__()
+        
+        def load_config(self):
+            """gunicornの設定を反映する"""
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+        
+        def load(self):
+            """マスタープロセスでアプリケーションを読み込む（preload_app）"""
+            return preload_app()
+    
+    StandaloneApplication(build_gunicorn_options(args)).run()
+
+
+def run_uvicorn(args: argparse.Namespace) -> None:
+    """
+    uvicornのマルチプロセスモードでサーバーを起動する
+    
+    Args:
+        args: コマンドライン引数の解析結果
+    """
+    import uvicorn
+    
+    uvicorn.run(
+        "app.server:create_app",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop="auto",
+        http="auto",
+        timeout_keep_alive=args.keep_alive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        access_log=False,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    サーバーを起動する
+    
+    Args:
+        argv: コマンドライン引数（Noneの場合はsys.argv）
+    """
+    args = parse_args(argv)
+    if select_server(args.server) == "gunicorn":
+        run_gunicorn(args)
+    else:
+        run_uvicorn(args)
+
+
+if __name__ == "__main__":
+    main()
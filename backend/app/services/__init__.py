@@ -13,8 +13,18 @@ from .auth import (
     get_admin_user,
 )
 from .database import get_dynamodb_resource, get_users_table, get_posts_table
+from .repository import (
+    get_users_repository,
+    get_posts_repository,
+    get_archive_repository,
+    get_search_repository,
+    get_stats_repository,
+    get_rate_limit_repository,
+    reset_repositories,
+)
+from .identity_map import IdentityMapMiddleware, identity_map_scope, get_identity_map
 from .user_service import user_service, UserService
-from .post_service import post_service, PostService
+from .post_service import post_service, PostService, get_propagation_progress, get_singleflight_stats
 
 __all__ = [
     "verify_password",
@@ -26,8 +36,20 @@ __all__ = [
     "get_dynamodb_resource",
     "get_users_table",
     "get_posts_table",
+    "get_users_repository",
+    "get_posts_repository",
+    "get_archive_repository",
+    "get_search_repository",
+    "get_stats_repository",
+    "get_rate_limit_repository",
+    "reset_repositories",
+    "IdentityMapMiddleware",
+    "identity_map_scope",
+    "get_identity_map",
     "user_service",
     "UserService",
     "post_service",
     "PostService",
+    "get_propagation_progress",
+    "get_singleflight_stats",
 ]
@@ -6,23 +6,35 @@ JWT認証とパスワードハッシュ化の機能を提供する。
 """
 
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from app.config import get_settings
 from app.models.auth import TokenData
 from app.models.user import UserRole
-
-# パスワードハッシュ化の設定（bcryptを使用）
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.services.timing import timed
 
 # Bearer認証スキーム
 security = HTTPBearer()
 
 
+@lru_cache()
+def get_pwd_context():
+    """
+    パスワードハッシュ化の設定（bcryptを使用）を取得する
+    
+    passlibの読み込みはコールドスタートの時間を延ばすため、初回の使用時に読み込む。
+    
+    Returns:
+        CryptContext: パスワードハッシュ化の設定
+    """
+    from passlib.context import CryptContext
+    
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     パスワードを検証する
@@ -36,7 +48,8 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Returns:
         bool: パスワードが一致する場合True
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    with timed("hash"):
+        return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
@@ -49,7 +62,8 @@ def get_password_hash(password: str) -> str:
     Returns:
         str: ハッシュ化されたパスワード
     """
-    return pwd_context.hash(password)
+    with timed("hash"):
+        return get_pwd_context().hash(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -63,6 +77,9 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     Returns:
         str: エンコードされたJWTトークン
     """
+    # python-joseはコールドスタートの時間を延ばすため、初回の使用時に読み込む
+    from jose import jwt
+    
     settings = get_settings()
     to_encode = data.copy()
     
@@ -89,6 +106,8 @@ def decode_access_token(token: str) -> Optional[TokenData]:
     Returns:
         TokenData: デコードされたトークンデータ、無効な場合はNone
     """
+    from jose import JWTError, jwt
+    
     settings = get_settings()
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
@@ -98,7 +117,7 @@ def decode_access_token(token: str) -> Optional[TokenData]:
         
         if user_id is None or username is None or role is None:
             return None
-            
+        
         return TokenData(user_id=user_id, username=username, role=role)
     except JWTError:
         return None
@@ -0,0 +1,270 @@
+"""
+消費キャパシティ集計サービス
+
+DynamoDBの各呼び出しで返される消費キャパシティ（RCU/WCU）を
+エンドポイント（ルート）別・テーブル/インデックス別に集計する。
+オンデマンド課金の内訳把握と、消費量の退行の検知に使用する。
+"""
+
+import json
+import logging
+import threading
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+# 集計結果を出力するロガー
+logger = logging.getLogger("app.capacity")
+
+# 書き込み系のDynamoDB操作（それ以外は読み取りとして扱う）
+WRITE_OPERATIONS = {"PutItem", "UpdateItem", "DeleteItem", "BatchWriteItem", "TransactWriteItems"}
+
+# ReturnConsumedCapacityを指定できるDynamoDB操作
+CAPACITY_OPERATIONS = WRITE_OPERATIONS | {"GetItem", "Query", "Scan", "BatchGetItem", "TransactGetItems"}
+
+# リクエスト外（バックグラウンドのスレッドなど）の呼び出しのルート名
+NO_ROUTE_LABEL = "(no request)"
+
+
+def route_label(scope: dict) -> str:
+    """
+    ASGIスコープからルート名を作成する
+    
+    パスパラメータを含まないルートのパス（例: GET /posts/{post_id}）を返す。
+    ルーティング前やルートに一致しなかった場合は実際のパスを返す。
+    
+    Args:
+        scope: ASGIスコープ
+    
+    Returns:
+        str: ルート名
+    """
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope.get("path")
+    return f"{scope.get('method')} {path}"
+
+
+class CapacityUsage:
+    """
+    消費キャパシティの集計値クラス
+    
+    読み取り・書き込みのキャパシティユニットと呼び出し回数を保持する。
+    """
+    
+    def __init__(self):
+        """集計値の初期化"""
+        # 消費した読み込みキャパシティユニット
+        self.rcu = 0.0
+        # 消費した書き込みキャパシティユニット
+        self.wcu = 0.0
+        # 呼び出し回数
+        self.calls = 0
+    
+    def add(self, rcu: float, wcu: float) -> None:
+        """
+        消費キャパシティを加算する
+        
+        Args:
+            rcu: 読み込みキャパシティユニット
+            wcu: 書き込みキャパシティユニット
+        """
+        self.rcu += rcu
+        self.wcu += wcu
+        self.calls += 1
+    
+    def to_dict(self) -> dict:
+        """
+        集計値を辞書形式で返す
+        
+        Returns:
+            dict: 集計値
+        """
+        return {"rcu": round(self.rcu, 3), "wcu": round(self.wcu, 3), "calls": self.calls}
+
+
+class CapacityAccounting:
+    """
+    消費キャパシティ集計クラス
+    
+    コンテナ（プロセス）内のルート別・テーブル/インデックス別の累計を保持する。
+    """
+    
+    def __init__(self):
+        """集計の初期化"""
+        # ルート名 → 集計値
+        self.routes: Dict[str, CapacityUsage] = {}
+        # テーブル名またはテーブル名/インデックス名 → 集計値
+        self.indexes: Dict[str, CapacityUsage] = {}
+        # 集計用のロック
+        self._lock = threading.Lock()
+    
+    def record(self, route: str, usages: List[Tuple[str, float, float]]) -> None:
+        """
+        1回の呼び出しの消費キャパシティを記録する
+        
+        Args:
+            route: ルート名
+            usages: (テーブル/インデックス名, RCU, WCU)のリスト
+        """
+        with self._lock:
+            route_usage = self.routes.setdefault(route, CapacityUsage())
+            route_usage.add(sum(usage[1] for usage in usages), sum(usage[2] for usage in usages))
+            for name, rcu, wcu in usages:
+                self.indexes.setdefault(name, CapacityUsage()).add(rcu, wcu)
+    
+    def snapshot(self) -> dict:
+        """
+        現在の累計を返す
+        
+        Returns:
+            dict: ルート別・テーブル/インデックス別の集計値
+        """
+        with self._lock:
+            return {
+                "routes": {name: usage.to_dict() for name, usage in sorted(self.routes.items())},
+                "indexes": {name: usage.to_dict() for name, usage in sorted(self.indexes.items())},
+            }
+    
+    def reset(self) -> None:
+        """累計を破棄する"""
+        with self._lock:
+            self.routes.clear()
+            self.indexes.clear()
+
+
+# コンテナ内の消費キャパシティの累計
+capacity_accounting = CapacityAccounting()
+
+
+class RequestCapacity:
+    """
+    リクエスト単位の消費キャパシティクラス
+    
+    リクエストのASGIスコープと、そのリクエストでの消費量を保持する。
+    """
+    
+    def __init__(self, scope: dict):
+        """
+        初期化
+        
+        Args:
+            scope: ASGIスコープ（ルーティング後にルート情報が設定される）
+        """
+        # ASGIスコープ
+        self.scope = scope
+        # リクエスト内の消費量
+        self.usage = CapacityUsage()
+        # リクエスト内のテーブル/インデックス別の消費量
+        self.indexes: Dict[str, CapacityUsage] = {}
+        # 記録用のロック（スレッドプールからも記録されるため）
+        self._lock = threading.Lock()
+
+
+# 現在のリクエストの消費キャパシティ（リクエスト外ではNone）
+_current_request: ContextVar[Optional[RequestCapacity]] = ContextVar("request_capacity", default=None)
+
+
+def parse_consumed_capacity(operation_name: str, consumed) -> List[Tuple[str, float, float]]:
+    """
+    DynamoDBのレスポンスのConsumedCapacityを解析する
+    
+    Args:
+        operation_name: DynamoDBの操作名（例: Query）
+        consumed: ConsumedCapacity（バッチ・トランザクション操作ではリスト）
+    
+    Returns:
+        List[Tuple[str, float, float]]: (テーブル/インデックス名, RCU, WCU)のリスト
+    """
+    if not consumed:
+        return []
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    
+    is_write = operation_name in WRITE_OPERATIONS
+    usages = []
+    for entry in consumed:
+        table_name = entry.get("TableName", "")
+        parts = []
+        if "Table" in entry:
+            parts.append((table_name, entry["Table"]))
+        for index_name, capacity in entry.get("GlobalSecondaryIndexes", {}).items():
+            parts.append((f"{table_name}/{index_name}", capacity))
+        for index_name, capacity in entry.get("LocalSecondaryIndexes", {}).items():
+            parts.append((f"{table_name}/{index_name}", capacity))
+        # インデックス別の内訳が無い場合は合計をテーブルに計上する
+        if not parts:
+            parts.append((table_name, entry))
+        
+        for name, capacity in parts:
+            units = float(capacity.get("CapacityUnits", 0))
+            rcu = float(capacity.get("ReadCapacityUnits", 0 if is_write else units))
+            wcu = float(capacity.get("WriteCapacityUnits", units if is_write else 0))
+            usages.append((name, rcu, wcu))
+    return usages
+
+
+def record_consumed_capacity(operation_name: str, consumed) -> None:
+    """
+    DynamoDB呼び出しの消費キャパシティを記録する
+    
+    Args:
+        operation_name: DynamoDBの操作名
+        consumed: レスポンスのConsumedCapacity
+    """
+    usages = parse_consumed_capacity(operation_name, consumed)
+    if not usages:
+        return
+    
+    request = _current_request.get()
+    route = route_label(request.scope) if request is not None else NO_ROUTE_LABEL
+    capacity_accounting.record(route, usages)
+    
+    if request is not None:
+        with request._lock:
+            request.usage.add(sum(usage[1] for usage in usages), sum(usage[2] for usage in usages))
+            for name, rcu, wcu in usages:
+                request.indexes.setdefault(name, CapacityUsage()).add(rcu, wcu)
+
+
+class ConsumedCapacityMiddleware:
+    """
+    消費キャパシティ集計ミドルウェア
+    
+    リクエスト中のDynamoDB呼び出しをルートに紐付け、
+    リクエスト終了時に消費量を構造化ログとして出力するASGIミドルウェア。
+    """
+    
+    def __init__(self, app):
+        """
+        ミドルウェアの初期化
+        
+        Args:
+            app: ラップするASGIアプリケーション
+        """
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        """
+        ASGIリクエストを処理する
+        
+        Args:
+            scope: ASGIスコープ
+            receive: 受信関数
+            send: 送信関数
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        request = RequestCapacity(scope)
+        token = _current_request.set(request)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_request.reset(token)
+            if request.usage.calls:
+                logger.info(json.dumps({
+                    "event": "consumed_capacity",
+                    "route": route_label(scope),
+                    **request.usage.to_dict(),
+                    "indexes": {name: usage.to_dict() for name, usage in request.indexes.items()},
+                }, ensure_ascii=False))
@@ -5,21 +5,101 @@ DynamoDBとの接続・操作を提供するサービス。
 テーブルの初期化と接続管理を行う。
 """
 
-import boto3
-from botocore.config import Config
+import threading
+import time
+
 from app.config import get_settings
+from app.services.capacity import CAPACITY_OPERATIONS, record_consumed_capacity
+from app.services.metrics import metrics
+from app.services.timing import record_timing
 
+# スレッドごとのDynamoDBリソース（boto3のリソースはスレッド間で共有できないため）
+_thread_local = threading.local()
 
-def get_dynamodb_resource():
+
+def _on_provide_client_params(params, model, **kwargs):
     """
-    DynamoDBリソースを取得する
+    DynamoDB呼び出しのパラメーターを補完するイベントハンドラー
+    
+    全ての読み書きで消費キャパシティ（インデックス別の内訳を含む）を返させる。
+    
+    Args:
+        params: 呼び出しパラメーター
+        model: 操作モデル
+    """
+    if model.name in CAPACITY_OPERATIONS:
+        params.setdefault("ReturnConsumedCapacity", "INDEXES")
+
+
+def _on_before_call(context, **kwargs):
+    """
+    DynamoDB呼び出し開始時のイベントハンドラー
+    
+    Args:
+        context: リクエストコンテキスト（呼び出し終了時のハンドラーと共有される）
+    """
+    context["timing_start"] = time.perf_counter()
+
+
+def _on_after_call(context, **kwargs):
+    """
+    DynamoDB呼び出し終了時のイベントハンドラー
+    
+    リトライを含む呼び出し全体の経過時間を現在のリクエストに記録する。
+    
+    Args:
+        context: リクエストコンテキスト
+    """
+    start = context.pop("timing_start", None)
+    if start is not None:
+        record_timing("db", time.perf_counter() - start)
+
+
+def _on_after_call_success(parsed, model, **kwargs):
+    """
+    DynamoDB呼び出し成功時のイベントハンドラー
+    
+    レスポンスの消費キャパシティと、SDKによるリトライ（スロットリングを含む）の回数を集計する。
+    
+    Args:
+        parsed: 解析済みのレスポンス
+        model: 操作モデル
+    """
+    record_consumed_capacity(model.name, parsed.get("ConsumedCapacity"))
+    retry_attempts = parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+    if retry_attempts:
+        metrics.increment("DynamoDBRetries", retry_attempts, dimensions={"Operation": model.name})
+
+
+def _register_event_handlers(resource) -> None:
+    """
+    DynamoDBクライアントに計測・消費キャパシティ集計用のイベントハンドラーを登録する
+    
+    Args:
+        resource: DynamoDBリソース
+    """
+    events = resource.meta.client.meta.events
+    events.register("provide-client-params.dynamodb", _on_provide_client_params)
+    events.register("before-call.dynamodb", _on_before_call)
+    events.register("after-call.dynamodb", _on_after_call)
+    events.register("after-call.dynamodb", _on_after_call_success)
+    events.register("after-call-error.dynamodb", _on_after_call)
+
+
+def _create_dynamodb_resource():
+    """
+    DynamoDBリソースを作成する
     
     設定に基づいてDynamoDBリソースを作成し返す。
     ローカル開発時はエンドポイントURLを指定可能。
+    boto3の読み込みはコールドスタートの時間を延ばすため、初回のリソース作成時に読み込む。
     
     Returns:
         boto3.resource: DynamoDBリソースオブジェクト
     """
+    import boto3
+    from botocore.config import Config
+    
     settings = get_settings()
     # リトライ設定
     config = Config(
@@ -46,6 +126,32 @@ def get_dynamodb_resource():
     )
 
 
+def get_dynamodb_resource():
+    """
+    DynamoDBリソースを取得する
+    
+    リソースの作成はサービスモデルの読み込みを伴い重いため、スレッドごとに1度だけ作成して再利用する。
+    
+    Returns:
+        boto3.resource: DynamoDBリソースオブジェクト
+    """
+    resource = getattr(_thread_local, "resource", None)
+    if resource is None:
+        resource = _create_dynamodb_resource()
+        _register_event_handlers(resource)
+        _thread_local.resource = resource
+    return resource
+
+
+def reset_dynamodb_resource() -> None:
+    """
+    現在のスレッドのDynamoDBリソースを破棄する
+    
+    設定の変更後やプロセスのfork後に、リソースを作り直すために使用する。
+    """
+    _thread_local.resource = None
+
+
 def get_users_table():
     """
     ユーザーテーブルを取得する
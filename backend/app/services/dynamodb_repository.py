@@ -0,0 +1,460 @@
+"""
+DynamoDBリポジトリ
+
+DynamoDBのテーブルを使用するリポジトリの実装。
+条件付きの書き込みはConditionExpressionで行い、DynamoDBのエラーはストレージ例外に変換する。
+"""
+
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from botocore.exceptions import ClientError
+
+from app.services.database import get_dynamodb_resource
+from app.services.repository import ConditionFailedError, Repository, StorageError, ThrottledError
+from app.services.versioning import build_version_condition
+
+# スロットリングとして扱うDynamoDBのエラーコード
+THROTTLING_ERROR_CODES = {
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+}
+
+
+def _to_storage_error(error: ClientError) -> StorageError:
+    """
+    DynamoDBのエラーをストレージ例外に変換する
+    
+    Args:
+        error: DynamoDBのエラー
+    
+    Returns:
+        StorageError: ストレージ例外
+    """
+    code = error.response.get("Error", {}).get("Code")
+    if code == "ConditionalCheckFailedException":
+        return ConditionFailedError("条件を満たさないため書き込めませんでした", code)
+    if code in THROTTLING_ERROR_CODES:
+        return ThrottledError("DynamoDBの処理能力を超えました", code)
+    return StorageError(str(error), code)
+
+
+class DynamoDBRepository(Repository):
+    """
+    DynamoDBリポジトリクラス
+    
+    boto3のリソースはスレッド間で共有できないため、操作ごとに現在のスレッドのテーブルを取得する。
+    """
+    
+    def _table(self):
+        """
+        現在のスレッドのテーブルを取得する
+        
+        Returns:
+            boto3.Table: テーブル
+        """
+        return get_dynamodb_resource().Table(self.name)
+    
+    def get(self, key: str, consistent: bool = False) -> Optional[dict]:
+        """
+        キーでアイテムを取得する
+        
+        Args:
+            key: キーの値
+            consistent: 強い整合性の読み取りを行うかどうか
+        
+        Returns:
+            dict: アイテム、存在しない場合はNone
+        """
+        params = {"Key": {self.key_name: key}}
+        if consistent:
+            params["ConsistentRead"] = True
+        try:
+            return self._table().get_item(**params).get("Item")
+        except ClientError as e:
+            raise _to_storage_error(e) from e
+    
+    def put(self, item: dict, if_not_exists: bool = False, expected_version: Optional[int] = None) -> None:
+        """
+        アイテムを書き込む（同じキーのアイテムは置き換える）
+        
+        Args:
+            item: アイテム
+            if_not_exists: 同じキーのアイテムが存在しない場合のみ書き込むかどうか
+            expected_version: 既存アイテムのversion属性がこの値の場合のみ書き込む
+        
+        Raises:
+            ConditionFailedError: 条件を満たさなかった場合
+        """
+        params = {"Item": item}
+        expression_attribute_values = {}
+        conditions = []
+        if if_not_exists:
+            conditions.append(f"attribute_not_exists({self.key_name})")
+        version_condition = build_version_condition(expected_version, expression_attribute_values)
+        if version_condition:
+            conditions.append(version_condition)
+        if conditions:
+            params["ConditionExpression"] = " AND ".join(conditions)
+        if expression_attribute_values:
+            params["ExpressionAttributeValues"] = expression_attribute_values
+        
+        try:
+            self._table().put_item(**params)
+        except ClientError as e:
+            raise _to_storage_error(e) from e
+    
+    def put_many(self, items: Iterable[dict]) -> int:
+        """
+        複数のアイテムをBatchWriteItemでまとめて書き込む
+        
+        batch_writerが25件ずつの送信と未処理アイテムの再送を行う。
+        
+        Args:
+            items: アイテム
+        
+        Returns:
+            int: 書き込んだ件数
+        """
+        count = 0
+        try:
+            with self._table().batch_writer() as batch:
+                for item in items:
+                    batch.put_item(Item=item)
+                    count += 1
+        except ClientError as e:
+            raise _to_storage_error(e) from e
+        return count
+    
+    def delete_many(self, keys: Iterable[str]) -> int:
+        """
+        複数のアイテムをBatchWriteItemでまとめて削除する（存在しないキーは無視する）
+        
+        Args:
+            keys: キーの値
+        
+        Returns:
+            int: 削除を要求した件数
+        """
+        count = 0
+        try:
+            with self._table().batch_writer() as batch:
+                for key in keys:
+                    batch.delete_item(Key={self.key_name: key})
+                    count += 1
+        except ClientError as e:
+            raise _to_storage_error(e) from e
+        return count
+    
+    def update(
+        self,
+        key: str,
+        changes: dict,
+        expected: Optional[dict] = None,
+        expected_version: Optional[int] = None,
+        increment_version: bool = True,
+        remove: Sequence[str] = (),
+    ) -> dict:
+        """
+        既存アイテムの属性を更新する
+        
+        存在確認・条件の確認はConditionExpressionで行うため、更新前の読み取りを行わない。
+        
+        Args:
+            key: キーの値
+            changes: 更新する属性名 → 値
+            expected: 更新の条件とする属性名 → 値
+            expected_version: version属性がこの値の場合のみ更新する
+            increment_version: version属性を1進めるかどうか
+            remove: 削除する属性名
+        
+        Returns:
+            dict: 更新後のアイテム
+        
+        Raises:
+            ConditionFailedError: アイテムが存在しない、または条件を満たさなかった場合
+        """
+        # 予約語（username・roleなど）と衝突しないよう属性名は全てプレースホルダーにする
+        expression_attribute_names = {}
+        expression_attribute_values = {}
+        
+        update_expression_parts = []
+        for index, (name, value) in enumerate(changes.items()):
+            expression_attribute_names[f"#u{index}"] = name
+            expression_attribute_values[f":u{index}"] = value
+            update_expression_parts.append(f"#u{index} = :u{index}")
+        
+        # バージョンを進める（version属性を持たない既存アイテムは0として扱う）
+        if increment_version:
+            update_expression_parts.append("version = if_not_exists(version, :zero) + :one")
+            expression_attribute_values[":zero"] = 0
+            expression_attribute_values[":one"] = 1
+        
+        # 削除する属性
+        remove_expression_parts = []
+        for index, name in enumerate(remove):
+            expression_attribute_names[f"#r{index}"] = name
+            remove_expression_parts.append(f"#r{index}")
+        
+        # 更新条件を構築
+        conditions = [f"attribute_exists({self.key_name})"]
+        for index, (name, value) in enumerate((expected or {}).items()):
+            expression_attribute_names[f"#c{index}"] = name
+            expression_attribute_values[f":c{index}"] = value
+            conditions.append(f"#c{index} = :c{index}")
+        version_condition = build_version_condition(expected_version, expression_attribute_values)
+        if version_condition:
+            conditions.append(version_condition)
+        
+        # 更新する属性が無い場合（削除のみ）はSET句を含めない
+        clauses = []
+        if update_expression_parts:
+            clauses.append("SET " + ", ".join(update_expression_parts))
+        if remove_expression_parts:
+            clauses.append("REMOVE " + ", ".join(remove_expression_parts))
+        update_expression = " ".join(clauses)
+        
+        params = {
+            "Key": {self.key_name: key},
+            "UpdateExpression": update_expression,
+            "ConditionExpression": " AND ".join(conditions),
+            "ExpressionAttributeValues": expression_attribute_values,
+            "ReturnValues": "ALL_NEW",
+        }
+        if expression_attribute_names:
+            params["ExpressionAttributeNames"] = expression_attribute_names
+        
+        try:
+            return self._table().update_item(**params)["Attributes"]
+        except ClientError as e:
+            raise _to_storage_error(e) from e
+    
+    def increment(self, key: str, counters: Dict[str, int], changes: Optional[dict] = None) -> dict:
+        """
+        アイテムの数値の属性にUpdateItemのADDで値を加算する（アイテム・属性が無い場合は0から加算する）
+        
+        Args:
+            key: キーの値
+            counters: 加算する属性名 → 加算する値
+            changes: 同時に設定する属性名 → 値
+        
+        Returns:
+            dict: 更新後のアイテム
+        """
+        expression_attribute_names = {}
+        expression_attribute_values = {}
+        
+        add_expression_parts = []
+        for index, (name, value) in enumerate(counters.items()):
+            expression_attribute_names[f"#a{index}"] = name
+            expression_attribute_values[f":a{index}"] = value
+            add_expression_parts.append(f"#a{index} :a{index}")
+        
+        set_expression_parts = []
+        for index, (name, value) in enumerate((changes or {}).items()):
+            expression_attribute_names[f"#u{index}"] = name
+            expression_attribute_values[f":u{index}"] = value
+            set_expression_parts.append(f"#u{index} = :u{index}")
+        
+        update_expression = "ADD " + ", ".join(add_expression_parts)
+        if set_expression_parts:
+            update_expression += " SET " + ", ".join(set_expression_parts)
+        
+        try:
+            return self._table().update_item(
+                Key={self.key_name: key},
+                UpdateExpression=update_expression,
+                ExpressionAttributeNames=expression_attribute_names,
+                ExpressionAttributeValues=expression_attribute_values,
+                ReturnValues="ALL_NEW",
+            )["Attributes"]
+        except ClientError as e:
+            raise _to_storage_error(e) from e
+    
+    def delete(self, key: str, expected_version: Optional[int] = None) -> None:
+        """
+        アイテムを削除する
+        
+        Args:
+            key: キーの値
+            expected_version: アイテムが存在し、version属性がこの値の場合のみ削除する
+        
+        Raises:
+            ConditionFailedError: アイテムが存在しない、またはバージョンが一致しない場合
+        """
+        params = {"Key": {self.key_name: key}}
+        if expected_version is not None:
+            expression_attribute_values = {}
+            version_condition = build_version_condition(expected_version, expression_attribute_values)
+            params["ConditionExpression"] = f"attribute_exists({self.key_name}) AND {version_condition}"
+            if expression_attribute_values:
+                params["ExpressionAttributeValues"] = expression_attribute_values
+        try:
+            self._table().delete_item(**params)
+        except ClientError as e:
+            raise _to_storage_error(e) from e
+    
+    def query(
+        self,
+        index_name: str,
+        value: str,
+        descending: bool = False,
+        limit: Optional[int] = None,
+        attributes: Optional[Sequence[str]] = None,
+        before: Optional[str] = None,
+        prefix: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        GSIのパーティションキーが一致するアイテムを全ページ分取得する
+        
+        Args:
+            index_name: インデックス名
+            value: パーティションキーの値
+            descending: ソートキーの降順で返すかどうか
+            limit: 取得する最大件数（Noneの場合は全件）
+            attributes: 取得する属性名（Noneの場合は全属性）
+            before: ソートキーがこの値より小さいアイテムのみを取得する（ソートキーを持つインデックスのみ）
+            prefix: ソートキーがこの文字列で始まるアイテムのみを取得する（ソートキーを持つインデックスのみ、beforeとは同時に指定できない）
+        
+        Returns:
+            List[dict]: アイテムリスト
+        """
+        from boto3.dynamodb.conditions import Key
+        
+        partition_key, sort_key = self.indexes[index_name]
+        key_condition = Key(partition_key).eq(value)
+        if before is not None and sort_key is not None:
+            key_condition = key_condition & Key(sort_key).lt(before)
+        elif prefix is not None and sort_key is not None:
+            key_condition = key_condition & Key(sort_key).begins_with(prefix)
+        params = {
+            "IndexName": index_name,
+            "KeyConditionExpression": key_condition,
+            "ScanIndexForward": not descending,
+        }
+        if attributes:
+            params["ProjectionExpression"] = ", ".join(f"#p{index}" for index in range(len(attributes)))
+            params["ExpressionAttributeNames"] = {f"#p{index}": name for index, name in enumerate(attributes)}
+        
+        return self._paginate("query", params, limit)
+    
+    def scan(self) -> List[dict]:
+        """
+        全アイテムを全ページ分取得する
+        
+        Returns:
+            List[dict]: アイテムリスト
+        """
+        return self._paginate("scan", {}, None)
+    
+    def scan_page(self, limit: int, start_key: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        アイテムを最大limit件ずつ取得する（ExclusiveStartKeyで続きから読み取る）
+        
+        Args:
+            limit: 取得する最大件数
+            start_key: 前のページの続きのキー（Noneの場合は最初から）
+        
+        Returns:
+            Tuple[List[dict], Optional[str]]: (アイテムリスト, 続きのキー（最後のページの場合はNone）)
+        """
+        params = {} if start_key is None else {"ExclusiveStartKey": {self.key_name: start_key}}
+        items = self._paginate("scan", params, limit)[:limit]
+        return items, (items[-1][self.key_name] if len(items) == limit else None)
+    
+    def scan_segment(
+        self,
+        segment: int,
+        total_segments: int,
+        attributes: Optional[Sequence[str]] = None,
+    ) -> Iterator[dict]:
+        """
+        ScanのSegment・TotalSegmentsで、アイテムをtotal_segments個に分けたうちのsegment番目をページごとに読み取る
+        
+        Args:
+            segment: 取得する区分の番号（0からtotal_segments-1）
+            total_segments: 区分の数
+            attributes: 取得する属性名（Noneの場合は全属性、ProjectionExpressionで読み取る属性を絞る）
+        
+        Returns:
+            Iterator[dict]: アイテム
+        """
+        params = {"Segment": segment, "TotalSegments": total_segments}
+        if attributes:
+            params["ProjectionExpression"] = ", ".join(f"#p{index}" for index in range(len(attributes)))
+            params["ExpressionAttributeNames"] = {f"#p{index}": name for index, name in enumerate(attributes)}
+        for response in self._pages("scan", params):
+            yield from response.get("Items", [])
+    
+    def count_segment(self, segment: int, total_segments: int, exclude_prefix: Optional[str] = None) -> int:
+        """
+        ScanのSelect=COUNTで、total_segments個に分けたうちのsegment番目のアイテム数をページごとに合計する
+        
+        アイテムは転送されず、除外する接頭辞はFilterExpressionで判定する。
+        
+        Args:
+            segment: 数える区分の番号（0からtotal_segments-1）
+            total_segments: 区分の数
+            exclude_prefix: キーがこの文字列で始まるアイテムは数えない（Noneの場合は全て数える）
+        
+        Returns:
+            int: アイテム数
+        """
+        from boto3.dynamodb.conditions import Attr
+        
+        params = {"Segment": segment, "TotalSegments": total_segments, "Select": "COUNT"}
+        if exclude_prefix is not None:
+            params["FilterExpression"] = ~Attr(self.key_name).begins_with(exclude_prefix)
+        return sum(response.get("Count", 0) for response in self._pages("scan", params))
+    
+    def warm_up(self) -> None:
+        """DynamoDBリソース（サービスモデル・認証情報の読み込み）とテーブルを作成する"""
+        self._table()
+    
+    def _paginate(self, operation: str, params: dict, limit: Optional[int]) -> List[dict]:
+        """
+        QueryまたはScanを全ページ分（または最大件数まで）実行する
+        
+        Args:
+            operation: 操作名（query・scan）
+            params: 操作のパラメーター
+            limit: 取得する最大件数（Noneの場合は全件）
+        
+        Returns:
+            List[dict]: アイテムリスト
+        """
+        items = []
+        if limit is not None:
+            params["Limit"] = limit
+        for response in self._pages(operation, params):
+            items.extend(response.get("Items", []))
+            if limit is not None:
+                if len(items) >= limit:
+                    break
+                params["Limit"] = limit - len(items)
+        return items
+    
+    def _pages(self, operation: str, params: dict) -> Iterator[dict]:
+        """
+        QueryまたはScanをLastEvaluatedKeyで続きから実行し、ページごとの応答を返す
+        
+        paramsは次のページの要求に使用する（呼び出し側が途中でLimitを変更できる）。
+        
+        Args:
+            operation: 操作名（query・scan）
+            params: 操作のパラメーター
+        
+        Returns:
+            Iterator[dict]: ページごとの応答
+        """
+        table = self._table()
+        while True:
+            try:
+                response = getattr(table, operation)(**params)
+            except ClientError as e:
+                raise _to_storage_error(e) from e
+            yield response
+            last_key = response.get("LastEvaluatedKey")
+            if not last_key:
+                return
+            params["ExclusiveStartKey"] = last_key
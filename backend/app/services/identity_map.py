@@ -0,0 +1,230 @@
+"""
+アイデンティティマップ
+
+リクエスト単位でリポジトリのアイテムの読み取り結果を保持するサービス。
+同一リクエスト内で同じアイテムを繰り返し読み取る場合に、
+2回目以降のGetItemを省略する。
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from app.services.metrics import metrics
+
+
+class IdentityMap:
+    """
+    アイデンティティマップクラス
+    
+    テーブル名とキーの組み合わせごとにアイテムを保持する。
+    ルーターでの存在確認とサービス内での再取得のように、
+    1リクエスト内で同じアイテムを読み直す処理の重複を排除するために作成。
+    """
+    
+    def __init__(self):
+        """アイデンティティマップの初期化"""
+        # (テーブル名, キー) → アイテム（存在しない場合はNone）
+        self._items: Dict[Tuple[str, Tuple], Optional[dict]] = {}
+        # キャッシュヒット件数
+        self.hits = 0
+        # キャッシュミス件数
+        self.misses = 0
+    
+    @staticmethod
+    def _make_key(table_name: str, key: dict) -> Tuple[str, Tuple]:
+        """
+        内部で使用するキーを作成する
+        
+        Args:
+            table_name: テーブル名
+            key: アイテムのキー
+        
+        Returns:
+            Tuple: マップのキー
+        """
+        return (table_name, tuple(sorted(key.items())))
+    
+    def lookup(self, table_name: str, key: dict) -> Tuple[bool, Optional[dict]]:
+        """
+        保持しているアイテムを検索する
+        
+        Args:
+            table_name: テーブル名
+            key: アイテムのキー
+        
+        Returns:
+            Tuple[bool, Optional[dict]]: (保持しているかどうか, アイテム)
+        """
+        map_key = self._make_key(table_name, key)
+        if map_key in self._items:
+            self.hits += 1
+            return True, self._items[map_key]
+        self.misses += 1
+        return False, None
+    
+    def store(self, table_name: str, key: dict, item: Optional[dict]) -> None:
+        """
+        読み取ったアイテムを保持する
+        
+        存在しないアイテムもNoneとして保持し、繰り返しの404判定を省略する。
+        
+        Args:
+            table_name: テーブル名
+            key: アイテムのキー
+            item: アイテム（存在しない場合はNone）
+        """
+        self._items[self._make_key(table_name, key)] = item
+    
+    def invalidate(self, table_name: str, key: dict) -> None:
+        """
+        保持しているアイテムを破棄する（書き込み時に使用）
+        
+        Args:
+            table_name: テーブル名
+            key: アイテムのキー
+        """
+        self._items.pop(self._make_key(table_name, key), None)
+
+
+# 現在のリクエストのアイデンティティマップ（リクエスト外ではNone）
+_current_identity_map: ContextVar[Optional[IdentityMap]] = ContextVar("identity_map", default=None)
+
+
+def get_identity_map() -> Optional[IdentityMap]:
+    """
+    現在のリクエストのアイデンティティマップを取得する
+    
+    Returns:
+        IdentityMap: アイデンティティマップ、リクエスト外の場合はNone
+    """
+    return _current_identity_map.get()
+
+
+@contextmanager
+def identity_map_scope() -> Iterator[IdentityMap]:
+    """
+    アイデンティティマップの有効範囲を開始する
+    
+    with文の範囲内の読み取りが同じアイデンティティマップを共有する。
+    
+    Yields:
+        IdentityMap: 新しいアイデンティティマップ
+    """
+    identity_map = IdentityMap()
+    token = _current_identity_map.set(identity_map)
+    try:
+        yield identity_map
+    finally:
+        _current_identity_map.reset(token)
+
+
+def lookup_item(table: Any, key: dict) -> Tuple[bool, Optional[dict]]:
+    """
+    現在のリクエストで読み取り済みのアイテムを検索する
+    
+    Args:
+        table: リポジトリ
+        key: アイテムのキー
+    
+    Returns:
+        Tuple[bool, Optional[dict]]: (読み取り済みかどうか, アイテム)
+    """
+    identity_map = get_identity_map()
+    if identity_map is None:
+        return False, None
+    return identity_map.lookup(table.name, key)
+
+
+def store_item(table: Any, key: dict, item: Optional[dict]) -> None:
+    """
+    読み取ったアイテムを現在のリクエストのアイデンティティマップに保持する
+    
+    Args:
+        table: リポジトリ
+        key: アイテムのキー
+        item: アイテム（存在しない場合はNone）
+    """
+    identity_map = get_identity_map()
+    if identity_map is not None:
+        identity_map.store(table.name, key, item)
+
+
+def get_item_cached(table: Any, key: dict, fetch: Optional[Callable[[], Optional[dict]]] = None) -> Optional[dict]:
+    """
+    アイデンティティマップを経由してアイテムを取得する
+    
+    リクエスト内で既に読み取ったアイテムはGetItemを発行せずに返す。
+    リクエスト外で呼ばれた場合は常にGetItemを発行する。
+    
+    Args:
+        table: リポジトリ
+        key: アイテムのキー
+        fetch: アイテムを読み取る関数（省略時はキーの値でリポジトリから読み取る）
+    
+    Returns:
+        dict: アイテム、存在しない場合はNone
+    """
+    if fetch is None:
+        fetch = lambda: table.get(key[table.key_name])
+    
+    found, item = lookup_item(table, key)
+    if found:
+        return item
+    
+    item = fetch()
+    store_item(table, key, item)
+    return item
+
+
+def invalidate_item(table: Any, key: dict) -> None:
+    """
+    書き込み対象のアイテムをアイデンティティマップから破棄する
+    
+    Args:
+        table: リポジトリ
+        key: アイテムのキー
+    """
+    identity_map = get_identity_map()
+    if identity_map is not None:
+        identity_map.invalidate(table.name, key)
+
+
+class IdentityMapMiddleware:
+    """
+    アイデンティティマップミドルウェア
+    
+    HTTPリクエストごとにアイデンティティマップの有効範囲を開始するASGIミドルウェア。
+    サービスの呼び出し側を変更せずにリクエスト内の読み取りを重複排除するために作成。
+    """
+    
+    def __init__(self, app):
+        """
+        ミドルウェアの初期化
+        
+        Args:
+            app: ラップするASGIアプリケーション
+        """
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        """
+        ASGIリクエストを処理する
+        
+        Args:
+            scope: ASGIスコープ
+            receive: 受信関数
+            send: 送信関数
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        with identity_map_scope() as identity_map:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                # キャッシュヒット率を算出するための件数を記録する
+                if identity_map.hits or identity_map.misses:
+                    metrics.increment("IdentityMapHits", identity_map.hits)
+                    metrics.increment("IdentityMapMisses", identity_map.misses)
@@ -0,0 +1,55 @@
+"""
+保守処理サービス
+
+全件スキャンを伴う保守処理（一覧の総件数の修正・投稿数の集計の再構築）を、タイムアウトの長い保守用のLambda関数へ非同期に依頼する。
+API Gatewayの応答時間の上限（29秒）とAPI用の関数のタイムアウトに縛られずに、テーブルの大きさに応じた時間で実行する。
+保守用の関数（MAINTENANCE_FUNCTION）が設定されていない場合（ローカル開発・サーバー環境）は依頼しない。
+"""
+
+import json
+
+from app.config import get_settings
+
+# 保守用の関数に依頼できる処理（処理名 → 保守用の関数のイベント）
+MAINTENANCE_JOBS = {
+    "reconcile": {"reconcile": True},
+    "rebuild_stats": {"rebuild_stats": True},
+}
+
+
+def _create_lambda_client():
+    """
+    Lambdaクライアントを作成する（boto3は依頼時に読み込む）
+    
+    Returns:
+        boto3.client: Lambdaクライアント
+    """
+    import boto3
+    
+    return boto3.client("lambda", region_name=get_settings().AWS_REGION)
+
+
+def dispatch_job(job: str) -> bool:
+    """
+    保守処理を保守用のLambda関数へ非同期（InvocationType=Event）に依頼する
+    
+    Args:
+        job: 処理名（MAINTENANCE_JOBSのキー）
+    
+    Returns:
+        bool: 依頼した場合はTrue（保守用の関数が設定されていない場合はFalse、呼び出し側で実行する）
+    
+    Raises:
+        ValueError: 不明な処理名の場合
+    """
+    if job not in MAINTENANCE_JOBS:
+        raise ValueError(f"不明な保守処理です: {job}")
+    function_name = get_settings().MAINTENANCE_FUNCTION
+    if not function_name:
+        return False
+    _create_lambda_client().invoke(
+        FunctionName=function_name,
+        InvocationType="Event",
+        Payload=json.dumps(MAINTENANCE_JOBS[job]).encode("utf-8"),
+    )
+    return True
@@ -0,0 +1,279 @@
+"""
+メモリリポジトリ
+
+プロセス内のメモリにアイテムを保持するリポジトリの実装。
+DynamoDBと同じアクセスパターン（キー・インデックスによる問い合わせ、条件付きの書き込み）を
+ネットワーク通信なしで提供し、テスト・負荷試験・ローカル開発に使用する。
+データはプロセス内でのみ共有され、再起動で消える。
+"""
+
+import copy
+import threading
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.services.repository import ConditionFailedError, Repository, version_matches
+
+
+class MemoryRepository(Repository):
+    """
+    メモリリポジトリクラス
+    
+    アイテムはロックで保護した辞書に保持し、読み書きの際に複製して
+    呼び出し元による変更がストレージに波及しないようにする。
+    """
+    
+    def __init__(self, name: str, key_name: str, indexes: Dict[str, Tuple[str, Optional[str]]]):
+        """
+        リポジトリの初期化
+        
+        Args:
+            name: テーブル名
+            key_name: キーの属性名
+            indexes: インデックス名 → (パーティションキー, ソートキー)
+        """
+        super().__init__(name, key_name, indexes)
+        # キーの値 → アイテム（挿入順を保持する）
+        self._items: Dict[str, dict] = {}
+        # アイテムを保護するロック
+        self._lock = threading.Lock()
+    
+    def get(self, key: str, consistent: bool = False) -> Optional[dict]:
+        """
+        キーでアイテムを取得する
+        
+        メモリ上のアイテムは常に最新のため、consistentに関わらず同じ結果を返す。
+        
+        Args:
+            key: キーの値
+            consistent: 強い整合性の読み取りを行うかどうか
+        
+        Returns:
+            dict: アイテム、存在しない場合はNone
+        """
+        with self._lock:
+            item = self._items.get(key)
+            return copy.deepcopy(item) if item is not None else None
+    
+    def put(self, item: dict, if_not_exists: bool = False, expected_version: Optional[int] = None) -> None:
+        """
+        アイテムを書き込む（同じキーのアイテムは置き換える）
+        
+        Args:
+            item: アイテム
+            if_not_exists: 同じキーのアイテムが存在しない場合のみ書き込むかどうか
+            expected_version: 既存アイテムのversion属性がこの値の場合のみ書き込む
+        
+        Raises:
+            ConditionFailedError: 条件を満たさなかった場合
+        """
+        key = item[self.key_name]
+        with self._lock:
+            current = self._items.get(key)
+            if if_not_exists and current is not None:
+                raise ConditionFailedError("同じキーのアイテムが存在します")
+            if expected_version is not None and not version_matches(current, expected_version):
+                raise ConditionFailedError("バージョンが一致しません")
+            self._items[key] = copy.deepcopy(item)
+    
+    def put_many(self, items: Iterable[dict]) -> int:
+        """
+        複数のアイテムをまとめて書き込む
+        
+        Args:
+            items: アイテム
+        
+        Returns:
+            int: 書き込んだ件数
+        """
+        copies = [copy.deepcopy(item) for item in items]
+        with self._lock:
+            for item in copies:
+                self._items[item[self.key_name]] = item
+        return len(copies)
+    
+    def update(
+        self,
+        key: str,
+        changes: dict,
+        expected: Optional[dict] = None,
+        expected_version: Optional[int] = None,
+        increment_version: bool = True,
+        remove: Sequence[str] = (),
+    ) -> dict:
+        """
+        既存アイテムの属性を更新する
+        
+        Args:
+            key: キーの値
+            changes: 更新する属性名 → 値
+            expected: 更新の条件とする属性名 → 値
+            expected_version: version属性がこの値の場合のみ更新する
+            increment_version: version属性を1進めるかどうか
+            remove: 削除する属性名
+        
+        Returns:
+            dict: 更新後のアイテム
+        
+        Raises:
+            ConditionFailedError: アイテムが存在しない、または条件を満たさなかった場合
+        """
+        with self._lock:
+            current = self._items.get(key)
+            if current is None:
+                raise ConditionFailedError("アイテムが存在しません")
+            if any(current.get(name) != value for name, value in (expected or {}).items()):
+                raise ConditionFailedError("アイテムが条件を満たしません")
+            if expected_version is not None and not version_matches(current, expected_version):
+                raise ConditionFailedError("バージョンが一致しません")
+            
+            current.update(copy.deepcopy(changes))
+            for name in remove:
+                current.pop(name, None)
+            if increment_version:
+                current["version"] = int(current.get("version", 0)) + 1
+            return copy.deepcopy(current)
+    
+    def increment(self, key: str, counters: Dict[str, int], changes: Optional[dict] = None) -> dict:
+        """
+        アイテムの数値の属性に値を加算する（アイテム・属性が無い場合は0から加算する）
+        
+        Args:
+            key: キーの値
+            counters: 加算する属性名 → 加算する値
+            changes: 同時に設定する属性名 → 値
+        
+        Returns:
+            dict: 更新後のアイテム
+        """
+        with self._lock:
+            current = self._items.setdefault(key, {self.key_name: key})
+            current.update(copy.deepcopy(changes or {}))
+            for name, value in counters.items():
+                current[name] = current.get(name, 0) + value
+            return copy.deepcopy(current)
+    
+    def delete(self, key: str, expected_version: Optional[int] = None) -> None:
+        """
+        アイテムを削除する
+        
+        Args:
+            key: キーの値
+            expected_version: アイテムが存在し、version属性がこの値の場合のみ削除する
+        
+        Raises:
+            ConditionFailedError: アイテムが存在しない、またはバージョンが一致しない場合
+        """
+        with self._lock:
+            if expected_version is not None:
+                current = self._items.get(key)
+                if current is None or not version_matches(current, expected_version):
+                    raise ConditionFailedError("アイテムが存在しない、またはバージョンが一致しません")
+            self._items.pop(key, None)
+    
+    def query(
+        self,
+        index_name: str,
+        value: str,
+        descending: bool = False,
+        limit: Optional[int] = None,
+        attributes: Optional[Sequence[str]] = None,
+        before: Optional[str] = None,
+        prefix: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        インデックスのパーティションキーが一致するアイテムを取得する
+        
+        インデックスのキーの属性を持たないアイテムは含めない（スパースインデックス）。
+        
+        Args:
+            index_name: インデックス名
+            value: パーティションキーの値
+            descending: ソートキーの降順で返すかどうか
+            limit: 取得する最大件数（Noneの場合は全件）
+            attributes: 取得する属性名（Noneの場合は全属性）
+            before: ソートキーがこの値より小さいアイテムのみを取得する（ソートキーを持つインデックスのみ）
+            prefix: ソートキーがこの文字列で始まるアイテムのみを取得する（ソートキーを持つインデックスのみ、beforeとは同時に指定できない）
+        
+        Returns:
+            List[dict]: アイテムリスト
+        """
+        partition_key, sort_key = self.indexes[index_name]
+        with self._lock:
+            items = [
+                item for item in self._items.values()
+                if item.get(partition_key) == value and (sort_key is None or sort_key in item)
+                and (before is None or sort_key is None or item[sort_key] < before)
+                and (prefix is None or sort_key is None or item[sort_key].startswith(prefix))
+            ]
+            if sort_key is not None:
+                items.sort(key=lambda item: item[sort_key], reverse=descending)
+            if limit is not None:
+                items = items[:limit]
+            return [_project(item, attributes) for item in items]
+    
+    def scan(self) -> List[dict]:
+        """
+        全アイテムを取得する
+        
+        Returns:
+            List[dict]: アイテムリスト
+        """
+        with self._lock:
+            return [copy.deepcopy(item) for item in self._items.values()]
+    
+    def scan_page(self, limit: int, start_key: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        アイテムをキーの昇順に最大limit件ずつ取得する
+        
+        Args:
+            limit: 取得する最大件数
+            start_key: 前のページの続きのキー（Noneの場合は最初から）
+        
+        Returns:
+            Tuple[List[dict], Optional[str]]: (アイテムリスト, 続きのキー（最後のページの場合はNone）)
+        """
+        with self._lock:
+            keys = sorted(key for key in self._items if start_key is None or key > start_key)[:limit]
+            items = [copy.deepcopy(self._items[key]) for key in keys]
+        return items, (keys[-1] if len(keys) == limit else None)
+    
+    def scan_segment(
+        self,
+        segment: int,
+        total_segments: int,
+        attributes: Optional[Sequence[str]] = None,
+    ) -> Iterator[dict]:
+        """
+        アイテムをtotal_segments個に分けたうちのsegment番目を取得する（キーのハッシュ値で分ける）
+        
+        Args:
+            segment: 取得する区分の番号（0からtotal_segments-1）
+            total_segments: 区分の数
+            attributes: 取得する属性名（Noneの場合は全属性）
+        
+        Returns:
+            Iterator[dict]: アイテム（順序は不定）
+        """
+        with self._lock:
+            items = [
+                _project(item, attributes) for key, item in self._items.items()
+                if zlib.crc32(str(key).encode("utf-8")) % total_segments == segment
+            ]
+        return iter(items)
+
+
+def _project(item: dict, attributes: Optional[Sequence[str]]) -> dict:
+    """
+    アイテムの複製から指定した属性のみを取り出す
+    
+    Args:
+        item: アイテム
+        attributes: 取得する属性名（Noneの場合は全属性）
+    
+    Returns:
+        dict: 属性を取り出したアイテムの複製
+    """
+    if attributes is None:
+        return copy.deepcopy(item)
+    return {name: copy.deepcopy(item[name]) for name in attributes if name in item}
@@ -0,0 +1,426 @@
+"""
+メトリクスサービス
+
+レイテンシー・キャッシュヒット・スロットリングのリトライ・コールドスタートなどの
+メトリクスをメモリ上に集計し、CloudWatch Embedded Metric Format（EMF）の
+JSON行として標準出力に書き出す。
+Lambdaでは標準出力がCloudWatch Logsに送られ、ログからメトリクスが抽出されるため、
+同期的なPutMetricData呼び出しを行わずにメトリクスを送信できる。
+"""
+
+import json
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.config import get_settings
+
+# レイテンシーのヒストグラムのバケット上限（ミリ秒）
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# EMFの1つのメトリクスに含められる値の最大数
+MAX_VALUES_PER_METRIC = 100
+
+# EMFの1つのドキュメントに含められるメトリクスの最大数
+MAX_METRICS_PER_DOCUMENT = 100
+
+# ルートに一致しなかったリクエストのルート名（パスをそのまま次元にしないため）
+UNMATCHED_ROUTE = "(unmatched)"
+
+# メトリクスの次元（次元名と値の組のタプル）
+Dimensions = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    固定バケットのヒストグラムクラス
+    
+    観測値をバケットごとの件数として保持するため、観測回数によらずメモリ使用量が一定。
+    """
+    
+    def __init__(self, buckets: Sequence[float]):
+        """
+        ヒストグラムの初期化
+        
+        Args:
+            buckets: 昇順のバケット上限
+        """
+        # バケット上限
+        self.buckets = tuple(buckets)
+        # バケットごとの件数（最後の要素は最大のバケット上限を超えた件数）
+        self.counts = [0] * (len(self.buckets) + 1)
+        # 観測値の合計
+        self.sum = 0.0
+        # 観測値の最大値
+        self.max = 0.0
+    
+    def observe(self, value: float) -> None:
+        """
+        観測値を記録する
+        
+        Args:
+            value: 観測値
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.max = max(self.max, value)
+    
+    @property
+    def count(self) -> int:
+        """観測回数"""
+        return sum(self.counts)
+    
+    def values(self) -> List[float]:
+        """
+        EMFに出力する値のリストを返す
+        
+        各観測値をそのバケットの上限に丸めて返す。
+        最大のバケット上限を超えた観測値は観測値の最大値として返す。
+        
+        Returns:
+            List[float]: 観測値のリスト
+        """
+        result = []
+        for index, count in enumerate(self.counts):
+            value = self.buckets[index] if index < len(self.buckets) else self.max
+            result.extend([value] * count)
+        return result
+    
+    def to_dict(self) -> dict:
+        """
+        ヒストグラムを辞書形式で返す
+        
+        Returns:
+            dict: バケットごとの件数・合計・最大値
+        """
+        labels = [f"le_{bucket}" for bucket in self.buckets] + ["inf"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "max": round(self.max, 3),
+        }
+
+
+class MetricsRegistry:
+    """
+    メトリクスレジストリクラス
+    
+    カウンター・ヒストグラム（タイマーを含む）を次元ごとに集計し、
+    flush()でEMFとして書き出して集計をリセットする。
+    Lambdaでは1回の呼び出しごとに1度flush()する。
+    """
+    
+    def __init__(self, namespace: str, service: str, stream=None):
+        """
+        レジストリの初期化
+        
+        Args:
+            namespace: CloudWatchメトリクスの名前空間
+            service: 全メトリクスに付与するService次元の値
+            stream: 書き出し先（Noneの場合は書き出し時点の標準出力）
+        """
+        # CloudWatchメトリクスの名前空間
+        self.namespace = namespace
+        # Service次元の値
+        self.service = service
+        # 書き出し先
+        self.stream = stream
+        # (メトリクス名, 次元) → カウンター値
+        self._counters: Dict[Tuple[str, Dimensions], float] = {}
+        # (メトリクス名, 次元) → ヒストグラム
+        self._histograms: Dict[Tuple[str, Dimensions], Histogram] = {}
+        # メトリクス名 → 単位
+        self._units: Dict[str, str] = {}
+        # 次回の書き出しに含める（メトリクスではない）プロパティ
+        self._properties: Dict[str, object] = {}
+        # 集計用のロック（スレッドプールからも記録されるため）
+        self._lock = threading.Lock()
+    
+    def increment(self, name: str, value: float = 1, unit: str = "Count",
+                  dimensions: Optional[Dict[str, str]] = None) -> None:
+        """
+        カウンターを加算する
+        
+        Args:
+            name: メトリクス名
+            value: 加算する値
+            unit: 単位
+            dimensions: 追加の次元
+        """
+        key = (name, _dimension_key(dimensions))
+        with self._lock:
+            self._units[name] = unit
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def observe(self, name: str, value: float, unit: str = "Milliseconds",
+                dimensions: Optional[Dict[str, str]] = None,
+                buckets: Sequence[float] = LATENCY_BUCKETS_MS) -> None:
+        """
+        ヒストグラムに観測値を記録する
+        
+        Args:
+            name: メトリクス名
+            value: 観測値
+            unit: 単位
+            dimensions: 追加の次元
+            buckets: バケット上限（メトリクスの初回の記録時のみ使用）
+        """
+        key = (name, _dimension_key(dimensions))
+        with self._lock:
+            self._units[name] = unit
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+    
+    @contextmanager
+    def timer(self, name: str, dimensions: Optional[Dict[str, str]] = None) -> Iterator[None]:
+        """
+        with文の範囲の経過時間（ミリ秒）をヒストグラムに記録する
+        
+        Args:
+            name: メトリクス名
+            dimensions: 追加の次元
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000, dimensions=dimensions)
+    
+    def set_property(self, name: str, value) -> None:
+        """
+        次回の書き出しに含めるプロパティを設定する
+        
+        プロパティはメトリクスにはならず、ログの検索（Logs Insights）に使用する。
+        
+        Args:
+            name: プロパティ名
+            value: 値（JSONに変換できる値）
+        """
+        with self._lock:
+            self._properties[name] = value
+    
+    def snapshot(self) -> dict:
+        """
+        現在の集計を返す
+        
+        Returns:
+            dict: カウンターとヒストグラムの集計値
+        """
+        with self._lock:
+            return {
+                "counters": {_format_key(key): value for key, value in sorted(self._counters.items())},
+                "histograms": {_format_key(key): h.to_dict() for key, h in sorted(self._histograms.items())},
+            }
+    
+    def reset(self) -> None:
+        """集計を破棄する"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._properties.clear()
+    
+    def build_documents(self, timestamp_ms: Optional[int] = None) -> List[dict]:
+        """
+        現在の集計からEMFドキュメントを作成し、集計をリセットする
+        
+        次元の組み合わせごとに1つ以上のドキュメントを作成する。
+        EMFの上限（メトリクス数・値の数）を超える場合は複数のドキュメントに分割する。
+        
+        Args:
+            timestamp_ms: タイムスタンプ（エポックミリ秒、Noneの場合は現在時刻）
+        
+        Returns:
+            List[dict]: EMFドキュメントのリスト
+        """
+        with self._lock:
+            # 次元 → {メトリクス名: 値のリスト}
+            groups: Dict[Dimensions, Dict[str, List[float]]] = {}
+            for (name, dimensions), value in self._counters.items():
+                groups.setdefault(dimensions, {})[name] = [value]
+            for (name, dimensions), histogram in self._histograms.items():
+                groups.setdefault(dimensions, {})[name] = histogram.values()
+            units = dict(self._units)
+            properties = dict(self._properties)
+            self._counters.clear()
+            self._histograms.clear()
+            self._properties.clear()
+        
+        if timestamp_ms is None:
+            timestamp_ms = int(time.time() * 1000)
+        
+        documents = []
+        for dimensions, metrics in sorted(groups.items()):
+            names = sorted(metrics)
+            for start in range(0, len(names), MAX_METRICS_PER_DOCUMENT):
+                chunk_names = names[start:start + MAX_METRICS_PER_DOCUMENT]
+                longest = max(len(metrics[name]) for name in chunk_names)
+                for offset in range(0, longest, MAX_VALUES_PER_METRIC):
+                    chunk = {}
+                    for name in chunk_names:
+                        values = metrics[name][offset:offset + MAX_VALUES_PER_METRIC]
+                        if values:
+                            chunk[name] = values[0] if len(values) == 1 else values
+                    documents.append(self._document(timestamp_ms, dimensions, chunk, units, properties))
+        return documents
+    
+    def flush(self) -> int:
+        """
+        集計をEMFのJSON行として書き出し、集計をリセットする
+        
+        Returns:
+            int: 書き出したドキュメント数
+        """
+        documents = self.build_documents()
+        if not documents:
+            return 0
+        
+        stream = self.stream or sys.stdout
+        stream.write("".join(json.dumps(document, ensure_ascii=False) + "\n" for document in documents))
+        stream.flush()
+        return len(documents)
+    
+    def _document(self, timestamp_ms: int, dimensions: Dimensions, metrics: Dict[str, object],
+                  units: Dict[str, str], properties: Dict[str, object]) -> dict:
+        """
+        EMFドキュメントを作成する
+        
+        Args:
+            timestamp_ms: タイムスタンプ（エポックミリ秒）
+            dimensions: 追加の次元
+            metrics: メトリクス名 → 値（数値または数値のリスト）
+            units: メトリクス名 → 単位
+            properties: プロパティ
+        
+        Returns:
+            dict: EMFドキュメント
+        """
+        dimension_names = ["Service"] + [name for name, _ in dimensions]
+        return {
+            "_aws": {
+                "Timestamp": timestamp_ms,
+                "CloudWatchMetrics": [{
+                    "Namespace": self.namespace,
+                    "Dimensions": [dimension_names],
+                    "Metrics": [{"Name": name, "Unit": units.get(name, "None")} for name in metrics],
+                }],
+            },
+            **properties,
+            "Service": self.service,
+            **dict(dimensions),
+            **metrics,
+        }
+
+
+def _dimension_key(dimensions: Optional[Dict[str, str]]) -> Dimensions:
+    """
+    次元の辞書を集計のキーに変換する
+    
+    Args:
+        dimensions: 次元（次元名 → 値）
+    
+    Returns:
+        Dimensions: 次元名でソートしたタプル
+    """
+    if not dimensions:
+        return ()
+    return tuple(sorted((name, str(value)) for name, value in dimensions.items()))
+
+
+def _format_key(key: Tuple[str, Dimensions]) -> str:
+    """
+    集計のキーを表示用の文字列に変換する
+    
+    Args:
+        key: (メトリクス名, 次元)
+    
+    Returns:
+        str: 表示用の文字列（例: RequestLatency{Route=GET /posts/}）
+    """
+    name, dimensions = key
+    if not dimensions:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in dimensions) + "}"
+
+
+# メトリクスレジストリのシングルトンインスタンス
+_settings = get_settings()
+metrics = MetricsRegistry(_settings.METRICS_NAMESPACE, _settings.METRICS_SERVICE)
+
+
+def flush_invocation_metrics(cold_start: bool) -> None:
+    """
+    1回の呼び出しのメトリクスを書き出す
+    
+    コールドスタートの呼び出しではColdStartメトリクスを付与する。
+    全ての呼び出しでコールドスタートかどうかをcold_startプロパティとして付与する。
+    METRICS_ENABLEDが無効の場合は集計を破棄する。
+    
+    Args:
+        cold_start: コンテナの最初の呼び出しかどうか
+    """
+    if not get_settings().METRICS_ENABLED:
+        metrics.reset()
+        return
+    
+    metrics.increment("Invocations")
+    if cold_start:
+        metrics.increment("ColdStart")
+    metrics.set_property("cold_start", cold_start)
+    metrics.flush()
+
+
+class MetricsMiddleware:
+    """
+    メトリクスミドルウェア
+    
+    リクエストのレイテンシーをルート別のヒストグラムに、
+    サーバーエラーの件数をカウンターに記録するASGIミドルウェア。
+    """
+    
+    def __init__(self, app):
+        """
+        ミドルウェアの初期化
+        
+        Args:
+            app: ラップするASGIアプリケーション
+        """
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        """
+        ASGIリクエストを処理する
+        
+        Args:
+            scope: ASGIスコープ
+            receive: 受信関数
+            send: 送信関数
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        # レスポンスのステータスコード（レスポンス前に例外が発生した場合は500）
+        status_code = 500
+        
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", None)
+            dimensions = {"Route": f"{scope.get('method')} {route or UNMATCHED_ROUTE}"}
+            metrics.observe("RequestLatency", (time.perf_counter() - start) * 1000, dimensions=dimensions)
+            metrics.increment("Requests")
+            if status_code >= 500:
+                metrics.increment("ServerErrors")
@@ -0,0 +1,262 @@
+"""
+投稿アイテムのエンコード
+
+投稿アイテムをストレージに保存する形式（標準・コンパクト）に変換する。
+コンパクト形式では、インデックスのキー以外の属性名を短縮し、更新日時をエポックミリ秒の数値、
+長い本文をzlibで圧縮したバイナリ値として保存する。
+読み取り時はどちらの形式のアイテムも標準の形式に戻すため、移行中は両方の形式が混在してよい。
+"""
+
+import zlib
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List, Sequence, Tuple
+
+from app.config import get_settings
+
+# 保存形式
+POST_ENCODINGS = ("standard", "compact")
+
+# 標準の属性名 → コンパクト形式の属性名
+# （post_id・user_id・pk・created_at・versionはキー・インデックスのキー・条件付き書き込みで使用するため短縮しない）
+COMPACT_ATTRIBUTES: Dict[str, str] = {
+    "username": "un",
+    "title": "t",
+    "message": "m",
+    "updated_at": "ua",
+}
+
+# コンパクト形式の属性名 → 標準の属性名
+STANDARD_ATTRIBUTES: Dict[str, str] = {short: name for name, short in COMPACT_ATTRIBUTES.items()}
+
+# エポックミリ秒の基準日時（日時はUTCの時差なしのISO 8601で保存している）
+EPOCH = datetime(1970, 1, 1)
+
+# zlibの圧縮レベル
+COMPRESSION_LEVEL = 6
+
+
+def to_epoch_millis(value: str) -> int:
+    """
+    ISO 8601の日時をエポックミリ秒に変換する（ミリ秒未満は切り捨てる）
+    
+    Args:
+        value: 日時（ISO 8601）
+    
+    Returns:
+        int: エポックミリ秒
+    """
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return (moment - EPOCH) // timedelta(milliseconds=1)
+
+
+def from_epoch_millis(value) -> str:
+    """
+    エポックミリ秒をISO 8601の日時に変換する
+    
+    Args:
+        value: エポックミリ秒（DynamoDBから読み取った場合はDecimal）
+    
+    Returns:
+        str: 日時（ISO 8601）
+    """
+    return (EPOCH + timedelta(milliseconds=int(value))).isoformat()
+
+
+def estimate_item_size(item: dict) -> int:
+    """
+    アイテムのサイズ（DynamoDBの課金・上限の計算に使用されるバイト数）を概算する
+    
+    属性名と値のUTF-8のバイト数の合計。数値は有効桁数の半分+1バイト、リスト・マップは要素の合計+3バイト。
+    
+    Args:
+        item: アイテム
+    
+    Returns:
+        int: 概算のバイト数
+    """
+    return sum(len(name.encode("utf-8")) + _value_size(value) for name, value in item.items())
+
+
+def _value_size(value) -> int:
+    """
+    属性値のサイズを概算する
+    
+    Args:
+        value: 属性値
+    
+    Returns:
+        int: 概算のバイト数
+    """
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, bool) or value is None:
+        return 1
+    if isinstance(value, (int, float, Decimal)):
+        return len(str(value).lstrip("-").replace(".", "")) // 2 + 2
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return 3 + estimate_item_size(value)
+    if isinstance(value, (list, tuple)):
+        return 3 + sum(_value_size(element) + 1 for element in value)
+    # boto3のBinaryなど
+    return len(bytes(getattr(value, "value", value)))
+
+
+class PostCodec:
+    """
+    投稿アイテムの変換クラス
+    
+    PostServiceがリポジトリへの書き込み前・読み取り後に使用する。
+    書き込みは設定の形式で行い、読み取りはどちらの形式も標準の形式に戻す。
+    """
+    
+    def __init__(self, compact: bool, compress_min_bytes: int):
+        """
+        変換の初期化
+        
+        Args:
+            compact: コンパクト形式で書き込むかどうか
+            compress_min_bytes: 本文を圧縮する最小のバイト数（UTF-8）
+        """
+        # コンパクト形式で書き込むかどうか
+        self.compact = compact
+        # 本文を圧縮する最小のバイト数
+        self.compress_min_bytes = compress_min_bytes
+    
+    def encode(self, item: dict) -> dict:
+        """
+        標準の形式の投稿アイテムを書き込む形式に変換する
+        
+        Args:
+            item: 投稿アイテム（標準の形式）
+        
+        Returns:
+            dict: 書き込むアイテム
+        """
+        if not self.compact:
+            return item
+        return {COMPACT_ATTRIBUTES.get(name, name): self._encode_value(name, value) for name, value in item.items()}
+    
+    def decode(self, item: dict) -> dict:
+        """
+        読み取ったアイテムを標準の形式に変換する（標準の形式のアイテムはそのまま返す）
+        
+        Args:
+            item: 読み取ったアイテム（どちらの形式でもよい）
+        
+        Returns:
+            dict: 投稿アイテム（標準の形式）
+        """
+        if not any(short in item for short in STANDARD_ATTRIBUTES):
+            return item
+        decoded = {}
+        for name, value in item.items():
+            standard = STANDARD_ATTRIBUTES.get(name)
+            if standard is None:
+                # 同じ属性がコンパクト形式でも存在する場合はそちらを優先する
+                decoded.setdefault(name, value)
+            else:
+                decoded[standard] = self._decode_value(standard, value)
+        return decoded
+    
+    def encode_changes(self, changes: dict) -> Tuple[dict, List[str]]:
+        """
+        更新する属性を書き込む形式に変換する
+        
+        もう一方の形式の同じ属性は削除し、1つのアイテムに同じ属性が2つの形式で残らないようにする。
+        
+        Args:
+            changes: 更新する属性名 → 値（標準の形式）
+        
+        Returns:
+            Tuple[dict, List[str]]: (更新する属性名 → 値, 削除する属性名リスト)
+        """
+        if not self.compact:
+            return changes, [COMPACT_ATTRIBUTES[name] for name in changes if name in COMPACT_ATTRIBUTES]
+        encoded = {COMPACT_ATTRIBUTES.get(name, name): self._encode_value(name, value) for name, value in changes.items()}
+        return encoded, [name for name in changes if name in COMPACT_ATTRIBUTES]
+    
+    def attribute_names(self, names: Sequence[str]) -> List[str]:
+        """
+        読み取る属性名に、両方の形式の属性名を含める（射影の指定用）
+        
+        Args:
+            names: 属性名リスト（標準の形式）
+        
+        Returns:
+            List[str]: 両方の形式の属性名リスト
+        """
+        return list(names) + [COMPACT_ATTRIBUTES[name] for name in names if name in COMPACT_ATTRIBUTES]
+    
+    def is_encoded(self, item: dict) -> bool:
+        """
+        アイテムが書き込む形式で保存されているか判定する
+        
+        Args:
+            item: 読み取ったアイテム
+        
+        Returns:
+            bool: 書き込む形式の場合True（移行が不要）
+        """
+        other = COMPACT_ATTRIBUTES if self.compact else STANDARD_ATTRIBUTES
+        return not any(name in item for name in other)
+    
+    def _encode_value(self, name: str, value):
+        """
+        属性値をコンパクト形式に変換する
+        
+        Args:
+            name: 属性名（標準の形式）
+            value: 属性値
+        
+        Returns:
+            属性値（更新日時はエポックミリ秒、長い本文は圧縮したバイナリ値）
+        """
+        if name == "updated_at":
+            return to_epoch_millis(value)
+        if name == "message":
+            data = value.encode("utf-8")
+            if len(data) >= self.compress_min_bytes:
+                compressed = zlib.compress(data, COMPRESSION_LEVEL)
+                # 圧縮しても小さくならない場合は文字列のまま保存する
+                if len(compressed) < len(data):
+                    return compressed
+        return value
+    
+    def _decode_value(self, name: str, value):
+        """
+        コンパクト形式の属性値を標準の形式に戻す
+        
+        Args:
+            name: 属性名（標準の形式）
+            value: 属性値
+        
+        Returns:
+            属性値（標準の形式）
+        """
+        if name == "updated_at" and not isinstance(value, str):
+            return from_epoch_millis(value)
+        if name == "message" and not isinstance(value, str):
+            # boto3はバイナリ値をBinaryで返す
+            return zlib.decompress(bytes(getattr(value, "value", value))).decode("utf-8")
+        return value
+
+
+def get_post_codec() -> PostCodec:
+    """
+    設定（POST_ENCODING・POST_COMPRESS_MIN_BYTES）に基づいて投稿アイテムの変換を作成する
+    
+    Returns:
+        PostCodec: 投稿アイテムの変換
+    
+    Raises:
+        ValueError: POST_ENCODINGが不正な場合
+    """
+    settings = get_settings()
+    if settings.POST_ENCODING not in POST_ENCODINGS:
+        raise ValueError(f"POST_ENCODINGが不正です: {settings.POST_ENCODING}（{', '.join(POST_ENCODINGS)}のいずれか）")
+    return PostCodec(settings.POST_ENCODING == "compact", settings.POST_COMPRESS_MIN_BYTES)
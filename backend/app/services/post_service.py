@@ -2,16 +2,259 @@
 投稿サービス
 
 投稿のCRUD操作を提供するサービス。
-DynamoDBを使用して投稿データを管理する。
+投稿のリポジトリ（DynamoDBまたはメモリ）を使用して投稿データを管理する。
+古い投稿はアーカイブのテーブルへ移動でき、取得時はアーカイブも参照する。
+検索が有効な場合は、投稿の作成・更新・削除時に検索インデックスを更新する。
+集計が有効な場合は、投稿の作成・削除時に日別・ユーザー別・全体の投稿数を加算する。
 """
 
+import random
+import threading
+import time
 import uuid
-from datetime import datetime
-from typing import Optional, List
-from boto3.dynamodb.conditions import Key
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
 
-from app.models.post import PostCreate, PostUpdate, PostResponse
-from app.services.database import get_posts_table
+from app.config import get_settings
+from app.models.post import PostCreate, PostUpdate, PostResponse, PostSuggestion
+from app.services.identity_map import get_item_cached, invalidate_item, lookup_item, store_item
+from app.services.metrics import metrics
+from app.services.post_codec import COMPACT_ATTRIBUTES, STANDARD_ATTRIBUTES, PostCodec, estimate_item_size, get_post_codec
+from app.services.repository import (
+    RESERVED_ID_PREFIX,
+    ConditionFailedError,
+    Repository,
+    StorageError,
+    ThrottledError,
+    delete_existing,
+    get_archive_repository,
+    get_posts_repository,
+    get_stats_repository,
+    get_users_repository,
+)
+from app.services.responses import clamp_page_size
+from app.services.search_index import search_index, title_key
+from app.services.stats_service import PROPAGATION_PREFIX, stats_service
+from app.services.singleflight import SingleFlight
+from app.services.versioning import VersionConflictError, PermissionDeniedError
+
+# フロントページスナップショットのアイテムのpost_id
+FRONT_PAGE_ID = "#FRONT_PAGE"
+
+# スナップショット更新の競合時の最大試行回数
+FRONT_PAGE_WRITE_ATTEMPTS = 3
+
+# スナップショットに保持する投稿の属性
+FRONT_PAGE_ATTRIBUTES = ("post_id", "user_id", "username", "title", "message", "created_at", "updated_at", "version")
+
+# 投稿一覧のカーソルで、作成日時と表示済みの投稿IDを区切る文字
+FEED_CURSOR_SEPARATOR = ","
+
+
+class UsernamePropagationProgress:
+    """
+    ユーザー名伝播の進捗クラス
+    
+    ユーザー名変更を投稿アイテムへ反映するバッチ処理の進捗を保持する。
+    複数ワーカーから更新されるため、ロックで保護する。
+    処理を実行したコンテナ以外からも参照できるよう、集計のテーブルに保存する。
+    続けて名前を変更した場合に、前の変更の処理が新しい変更の進捗を上書きしないよう、反映するユーザー名ごとに保存する。
+    """
+    
+    def __init__(self, user_id: str, username: str):
+        """
+        進捗の初期化
+        
+        Args:
+            user_id: 対象ユーザーID
+            username: 反映する新しいユーザー名
+        """
+        # 対象ユーザーID
+        self.user_id = user_id
+        # 反映する新しいユーザー名
+        self.username = username
+        # 書き換え対象の投稿件数
+        self.total = 0
+        # 書き換えに成功した投稿件数
+        self.updated = 0
+        # 削除済み等でスキップした投稿件数
+        self.skipped = 0
+        # リトライしても失敗した投稿件数
+        self.failed = 0
+        # スロットリングによるリトライ回数
+        self.throttled = 0
+        # 処理が完了したかどうか
+        self.done = False
+        # カウンター更新用のロック
+        self._lock = threading.Lock()
+        # 保存用のロック（古い進捗で新しい進捗を上書きしない）
+        self._save_lock = threading.Lock()
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> "UsernamePropagationProgress":
+        """
+        保存した進捗から作成する
+        
+        Args:
+            data: 進捗情報（to_dictの形式）
+        
+        Returns:
+            UsernamePropagationProgress: 進捗
+        """
+        progress = cls(data["user_id"], data["username"])
+        for field in ("total", "updated", "skipped", "failed", "throttled"):
+            setattr(progress, field, int(data.get(field, 0)))
+        progress.done = bool(data.get("done"))
+        return progress
+    
+    def increment(self, field: str, amount: int = 1) -> None:
+        """
+        カウンターをスレッドセーフに加算する
+        
+        Args:
+            field: 加算するフィールド名
+            amount: 加算量
+        """
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+    
+    def to_dict(self) -> dict:
+        """
+        進捗を辞書形式で返す
+        
+        Returns:
+            dict: 進捗情報
+        """
+        with self._lock:
+            return {
+                "user_id": self.user_id,
+                "username": self.username,
+                "total": self.total,
+                "updated": self.updated,
+                "skipped": self.skipped,
+                "failed": self.failed,
+                "throttled": self.throttled,
+                "done": self.done,
+            }
+    
+    def save(self) -> None:
+        """
+        進捗を集計のテーブルに保存する
+        
+        保存に失敗しても伝播処理は続けるため、エラーにせずメトリクスに記録する。
+        """
+        with self._save_lock:
+            try:
+                get_stats_repository().put({"stat_id": _propagation_key(self.user_id, self.username), **self.to_dict()})
+            except StorageError:
+                metrics.increment("PropagationProgressErrors")
+
+
+# 投稿IDによる同時読み取りを合流させるシングルフライト
+_post_reads = SingleFlight("posts.get_post_by_id")
+# 投稿一覧の同時読み取りを合流させるシングルフライト
+_feed_reads = SingleFlight("posts.get_all_posts")
+
+
+def get_singleflight_stats() -> dict:
+    """
+    投稿読み取りのシングルフライトの合流状況を取得する
+    
+    Returns:
+        dict: グループ名ごとのメトリクス
+    """
+    return {group.name: group.stats() for group in (_post_reads, _feed_reads)}
+
+
+def _propagation_key(user_id: str, username: str) -> str:
+    """
+    ユーザー名伝播の進捗のアイテムのstat_idを作成する（ユーザーIDはUUIDのため#を含まない）
+    
+    Args:
+        user_id: ユーザーID
+        username: 反映するユーザー名
+    
+    Returns:
+        str: stat_id
+    """
+    return f"{PROPAGATION_PREFIX}{user_id}#{username}"
+
+
+def _username_condition(item: dict) -> dict:
+    """
+    投稿アイテムの保存されている形式のユーザー名の属性を、書き換えの条件として取り出す
+    
+    Args:
+        item: 投稿アイテム（保存されている形式）
+    
+    Returns:
+        dict: 属性名 → ユーザー名
+    """
+    name = COMPACT_ATTRIBUTES["username"] if COMPACT_ATTRIBUTES["username"] in item else "username"
+    return {name: item.get(name)}
+
+
+def get_propagation_progress(user_id: str, username: str) -> Optional[UsernamePropagationProgress]:
+    """
+    ユーザー名伝播の進捗を取得する
+    
+    進捗は集計のテーブルから読み取るため、処理を実行したコンテナ以外でも取得できる。
+    
+    Args:
+        user_id: ユーザーID
+        username: 反映するユーザー名（最新の進捗を取得する場合はユーザーの現在のユーザー名）
+    
+    Returns:
+        UsernamePropagationProgress: 進捗、処理が行われていない場合はNone
+    """
+    item = get_stats_repository().get(_propagation_key(user_id, username), consistent=True)
+    if item is None:
+        return None
+    return UsernamePropagationProgress.from_dict(item)
+
+
+def parse_feed_cursor(cursor: Optional[str]) -> Tuple[Optional[str], List[str]]:
+    """
+    投稿一覧のカーソルを作成日時と表示済みの投稿IDに分ける
+    
+    作成日時のみのカーソル（以前の形式）は、表示済みの投稿ID無しとして扱う。
+    
+    Args:
+        cursor: 投稿一覧のカーソル（Noneの場合は最新から）
+    
+    Returns:
+        Tuple[Optional[str], List[str]]: (作成日時, その作成日時の投稿のうち表示済みの投稿ID)
+    """
+    if cursor is None:
+        return None, []
+    before, *shown = cursor.split(FEED_CURSOR_SEPARATOR)
+    return before, shown
+
+
+def build_feed_cursor(page: List[dict], following: Optional[dict], before: Optional[str], shown: List[str]) -> str:
+    """
+    投稿一覧の次のページのカーソルを作成する
+    
+    次の投稿の作成日時がページの最後の投稿と異なる場合は作成日時のみを返す。
+    同じ場合（または次の投稿を読み取っていない場合）は、最後の作成日時の表示済みの投稿IDを含める。
+    
+    Args:
+        page: ページの投稿アイテムリスト（作成日時の降順）
+        following: ページの次の投稿アイテム（読み取っていない場合はNone）
+        before: このページのカーソルの作成日時
+        shown: このページのカーソルの表示済みの投稿ID
+    
+    Returns:
+        str: 次のページのカーソル
+    """
+    last = page[-1]["created_at"]
+    if following is not None and following["created_at"] != last:
+        return last
+    # ページ全体がカーソルと同じ作成日時の場合は、前のページまでの表示済みの投稿IDも引き継ぐ
+    ids = (shown if last == before else []) + [item["post_id"] for item in page if item["created_at"] == last]
+    return FEED_CURSOR_SEPARATOR.join([last] + ids)
 
 
 class PostService:
@@ -25,103 +268,477 @@ class PostService:
         """サービスの初期化"""
         pass
     
-    def _get_table(self):
+    def _get_repository(self) -> Repository:
         """
-        投稿テーブルを取得する（遅延読み込み）
+        投稿のリポジトリを取得する（遅延読み込み）
         
         Returns:
-            boto3.Table: 投稿テーブル
+            Repository: 投稿のリポジトリ
         """
-        return get_posts_table()
+        return get_posts_repository()
     
-    def create_post(self, post_data: PostCreate, user_id: str, username: str) -> PostResponse:
+    def _get_archive_repository(self) -> Optional[Repository]:
         """
-        新規投稿を作成する
+        アーカイブした投稿のリポジトリを取得する（遅延読み込み）
+        
+        Returns:
+            Repository: アーカイブした投稿のリポジトリ、アーカイブが無効な場合はNone
+        """
+        if not get_settings().ARCHIVE_ENABLED:
+            return None
+        return get_archive_repository()
+    
+    def _get_codec(self) -> PostCodec:
+        """
+        投稿アイテムの変換を取得する（設定のPOST_ENCODINGの形式で書き込む）
+        
+        Returns:
+            PostCodec: 投稿アイテムの変換
+        """
+        return get_post_codec()
+    
+    def build_post_item(
+        self,
+        post_data: PostCreate,
+        user_id: str,
+        username: str,
+        created_at: Optional[str] = None,
+        post_id: Optional[str] = None,
+    ) -> dict:
+        """
+        リポジトリに保存する投稿アイテムを作成する
+        
+        create_postと、大量データの投入（perf.seed）で同じアイテムの形にするために使用する。
         
         Args:
             post_data: 投稿作成データ
             user_id: 投稿者のユーザーID
             username: 投稿者のユーザー名
+            created_at: 作成日時（ISO 8601、省略時は現在時刻）
+            post_id: 投稿ID（省略時は生成する）
         
         Returns:
-            PostResponse: 作成された投稿情報
+            dict: 投稿アイテム
         """
-        table = self._get_table()
-        
         # 現在時刻
-        now = datetime.utcnow().isoformat()
+        now = created_at or datetime.utcnow().isoformat()
         
-        # 投稿IDを生成
-        post_id = str(uuid.uuid4())
-        
-        # DynamoDBに保存するアイテム
-        item = {
-            "post_id": post_id,
+        return {
+            "post_id": post_id or str(uuid.uuid4()),
             "user_id": user_id,
             "username": username,
             "title": post_data.title,
+            # タイトルの前方一致の問い合わせ用のソートキー
+            "title_key": title_key(post_data.title),
             "message": post_data.message,
             "created_at": now,
             "updated_at": now,
+            # 楽観的排他制御用のバージョン
+            "version": 1,
             # ソート用のパーティションキー（全投稿を時系列で取得するため）
             "pk": "POST",
         }
+    
+    def create_post(self, post_data: PostCreate, user_id: str, username: str) -> PostResponse:
+        """
+        新規投稿を作成する
         
-        table.put_item(Item=item)
+        Args:
+            post_data: 投稿作成データ
+            user_id: 投稿者のユーザーID
+            username: 投稿者のユーザー名
         
-        return PostResponse(
-            post_id=post_id,
-            user_id=user_id,
-            username=username,
-            title=post_data.title,
-            message=post_data.message,
-            created_at=datetime.fromisoformat(now),
-            updated_at=datetime.fromisoformat(now),
-        )
+        Returns:
+            PostResponse: 作成された投稿情報
+        """
+        repository = self._get_repository()
+        
+        # リポジトリに保存するアイテム（設定の形式に変換する）
+        item = self._get_codec().encode(self.build_post_item(post_data, user_id, username))
+        
+        repository.put(item)
+        
+        # フロントページの先頭に追加する
+        self._update_front_page(repository, lambda entries: [item] + entries)
+        
+        self._index_post(item)
+        self._record_stats(stats_service.record_post_created, user_id, username, item["created_at"])
+        
+        # 保存した形式から変換し、以降の読み取りと同じ値（コンパクト形式ではミリ秒単位の更新日時）を返す
+        return self._item_to_post_response(item)
     
     def get_post_by_id(self, post_id: str) -> Optional[PostResponse]:
         """
         投稿IDで投稿を取得する
         
+        同じ投稿への同時読み取りは1回のGetItemにまとめられる。
+        
+        Args:
+            post_id: 投稿ID
+        
+        Returns:
+            PostResponse: 投稿情報、見つからない場合はNone
+        """
+        if post_id.startswith(RESERVED_ID_PREFIX):
+            return None
+        
+        repository = self._get_repository()
+        key = {"post_id": post_id}
+        
+        # 同一リクエスト内で読み取り済みの場合はGetItemを省略する
+        item = get_item_cached(
+            repository,
+            key,
+            fetch=lambda: _post_reads.do((repository.name, post_id), lambda: self._read_post(repository, post_id)),
+        )
+        if not item:
+            return None
+        
+        return self._item_to_post_response(item)
+    
+    async def aget_post_by_id(self, post_id: str) -> Optional[PostResponse]:
+        """
+        投稿IDで投稿を取得する（非同期版）
+        
+        GetItemはスレッドプールで実行し、同じ投稿への同時読み取りの
+        後続の呼び出し元はスレッドを占有せずに結果を待つ。
+        
         Args:
             post_id: 投稿ID
         
         Returns:
             PostResponse: 投稿情報、見つからない場合はNone
         """
-        table = self._get_table()
+        if post_id.startswith(RESERVED_ID_PREFIX):
+            return None
         
-        response = table.get_item(Key={"post_id": post_id})
+        repository = self._get_repository()
+        key = {"post_id": post_id}
         
-        item = response.get("Item")
+        found, item = lookup_item(repository, key)
+        if not found:
+            item = await _post_reads.do_async((repository.name, post_id), lambda: self._read_post(repository, post_id))
+            store_item(repository, key, item)
         if not item:
             return None
         
         return self._item_to_post_response(item)
     
+    def _read_post(self, repository: Repository, post_id: str, consistent: bool = False) -> Optional[dict]:
+        """
+        投稿アイテムを読み取る（投稿のテーブルに無い場合はアーカイブを参照する）
+        
+        Args:
+            repository: 投稿のリポジトリ
+            post_id: 投稿ID
+            consistent: 強い整合性の読み取りを行うかどうか
+        
+        Returns:
+            dict: 投稿アイテム、見つからない場合はNone
+        """
+        item = repository.get(post_id, consistent=consistent)
+        if item is None:
+            archive = self._get_archive_repository()
+            if archive is not None:
+                item = archive.get(post_id, consistent=consistent)
+        return item
+    
     def get_all_posts(self, limit: int = 100) -> List[PostResponse]:
         """
         全投稿を取得する（作成日時の降順）
         
+        件数がフロントページの件数以下の場合はスナップショットから返し、
+        同じ件数での同時読み取りは1回の読み取りにまとめられる。
+        件数はMAX_PAGE_SIZE件までに制限する。
+        
         Args:
             limit: 取得する最大件数
         
         Returns:
             List[PostResponse]: 投稿リスト
         """
-        table = self._get_table()
+        repository = self._get_repository()
+        limit = clamp_page_size(limit)
         
-        # GSI（グローバルセカンダリインデックス）を使用してクエリ
-        response = table.query(
-            IndexName="pk-created_at-index",
-            KeyConditionExpression=Key("pk").eq("POST"),
-            ScanIndexForward=False,  # 降順（新しい順）
-            Limit=limit
+        items, _ = _feed_reads.do((repository.name, limit, None), lambda: self._read_feed_page(repository, limit, None))
+        
+        return [self._item_to_post_response(item) for item in items]
+    
+    async def aget_all_posts(self, limit: int = 100) -> List[PostResponse]:
+        """
+        全投稿を取得する（作成日時の降順・非同期版）
+        
+        Args:
+            limit: 取得する最大件数
+        
+        Returns:
+            List[PostResponse]: 投稿リスト
+        """
+        posts, _ = await self.aiter_all_posts(limit)
+        return list(posts)
+    
+    async def aiter_all_posts(self, limit: int = 100, cursor: Optional[str] = None) -> Tuple[Iterator[PostResponse], Optional[str]]:
+        """
+        投稿を1ページ分、1件ずつPostResponseに変換するイテレーターを返す（作成日時の降順・非同期版）
+        
+        モデルは読み出すときに1件ずつ作成するため、モデルリストを保持せずにレスポンスへ書き出せる。
+        
+        Args:
+            limit: 取得する最大件数（MAX_PAGE_SIZE件までに制限する）
+            cursor: 前のページの続きのカーソル（Noneの場合は最新から）
+        
+        Returns:
+            Tuple[Iterator[PostResponse], Optional[str]]: (投稿のイテレーター, 次のページのカーソル（最後のページの場合はNone）)
+        """
+        repository = self._get_repository()
+        limit = clamp_page_size(limit)
+        
+        items, next_cursor = await _feed_reads.do_async(
+            (repository.name, limit, cursor), lambda: self._read_feed_page(repository, limit, cursor),
         )
         
-        items = response.get("Items", [])
+        return map(self._item_to_post_response, items), next_cursor
+    
+    def _read_feed_page(self, repository: Repository, limit: int, cursor: Optional[str]) -> Tuple[List[dict], Optional[str]]:
+        """
+        投稿一覧の1ページ分のアイテムと、次のページのカーソルを読み取る
         
-        return [self._item_to_post_response(item) for item in items]
+        カーソルは前のページの最後の投稿の作成日時で、それより前の投稿を返す。
+        作成日時が同じ投稿がページの境界をまたぐ可能性がある場合は、カーソルに表示済みの投稿IDを含め、
+        次のページで同じ作成日時の残りの投稿を先に返す（インデックスのLastEvaluatedKeyと同様に作成日時と投稿IDで位置を表す）。
+        続きのページは1件多く読み取り、次の投稿の作成日時で境界をまたぐかを判定する。
+        投稿のテーブルの投稿がlimit件に満たない場合（アーカイブ済みの期間に入った場合）は、
+        アーカイブから読み取った投稿と作成日時順に合わせる。
+        アーカイブ処理中の投稿が両方にある場合は投稿のテーブルのものを使用する。
+        
+        Args:
+            repository: 投稿のリポジトリ
+            limit: 取得する最大件数
+            cursor: 前のページの続きのカーソル（Noneの場合は最新から）
+        
+        Returns:
+            Tuple[List[dict], Optional[str]]: (投稿アイテムリスト（作成日時の降順）, 次のページのカーソル（最後のページの場合はNone）)
+        """
+        before, shown = parse_feed_cursor(cursor)
+        if cursor is None:
+            # 最初のページはスナップショットで賄える件数のみ読み取る（次の投稿が無い場合がある）
+            items = self._read_feed(repository, limit)
+            exhausted = False
+        else:
+            items = self._read_timeline(repository, limit + 1, before, shown)
+            exhausted = len(items) <= limit
+        
+        archive = self._get_archive_repository()
+        if archive is not None and (len(items) < limit or (cursor is not None and exhausted)):
+            post_ids = {item["post_id"] for item in items}
+            archived = [
+                item for item in self._read_timeline(archive, limit + 1, before, shown)
+                if item["post_id"] not in post_ids
+            ]
+            items = sorted(items + archived, key=lambda item: item["created_at"], reverse=True)
+            exhausted = len(items) <= limit
+        
+        page = items[:limit]
+        if len(page) < limit or (len(items) == limit and exhausted):
+            return page, None
+        return page, build_feed_cursor(page, items[limit] if len(items) > limit else None, before, shown)
+    
+    def _read_timeline(self, repository: Repository, limit: int, before: str, shown: List[str]) -> List[dict]:
+        """
+        カーソルの位置より後の投稿アイテムを作成日時の降順で読み取る
+        
+        表示済みの投稿IDがある場合は、カーソルの作成日時と同じ作成日時の残りの投稿を先頭に含める。
+        
+        Args:
+            repository: 投稿（またはアーカイブした投稿）のリポジトリ
+            limit: 作成日時がカーソルより前の投稿を読み取る最大件数
+            before: カーソルの作成日時
+            shown: カーソルの作成日時の投稿のうち、表示済みの投稿ID
+        
+        Returns:
+            List[dict]: 投稿アイテムリスト
+        """
+        items = []
+        if shown:
+            items = [
+                item for item in repository.query("pk-created_at-index", "POST", prefix=before)
+                if item["created_at"] == before and item["post_id"] not in shown
+            ]
+        return items + self._query_timeline(repository, limit, before=before)
+    
+    def _read_feed(self, repository: Repository, limit: int) -> List[dict]:
+        """
+        投稿一覧のアイテムを読み取る
+        
+        フロントページスナップショットで賄える件数の場合は1回の強い整合性の読み取りで返す。
+        スナップショットが存在しない・壊れている・件数が不足している場合は
+        インデックスから再構築する。
+        次の投稿の有無を判定するため、読み取れた場合はlimit+1件まで返す。
+        
+        Args:
+            repository: 投稿のリポジトリ
+            limit: 取得する最大件数
+        
+        Returns:
+            List[dict]: 投稿アイテムリスト（作成日時の降順、limit+1件まで）
+        """
+        settings = get_settings()
+        if limit > settings.FRONT_PAGE_SIZE:
+            return self._query_timeline(repository, limit + 1)
+        
+        snapshot = self._read_front_page(repository)
+        if snapshot is not None:
+            entries, exhaustive, _ = snapshot
+            if exhaustive or len(entries) >= limit:
+                metrics.increment("FrontPageHits")
+                return entries[:limit + 1]
+        
+        metrics.increment("FrontPageMisses")
+        items = self._rebuild_front_page(repository)
+        return items[:limit + 1]
+    
+    def _read_front_page(self, repository: Repository):
+        """
+        フロントページスナップショットを読み取る
+        
+        壊れたスナップショットは削除し、存在しないものとして扱う。
+        
+        Args:
+            repository: 投稿のリポジトリ
+        
+        Returns:
+            Tuple[List[dict], bool, int]: (投稿アイテムリスト, 全投稿を含むかどうか, バージョン)、
+                存在しない場合はNone
+        """
+        item = repository.get(FRONT_PAGE_ID, consistent=True)
+        if not item:
+            return None
+        
+        try:
+            codec = self._get_codec()
+            entries = [codec.decode(entry) for entry in item["entries"]]
+            for entry in entries:
+                # 変換できないエントリを含む場合は壊れているとみなす
+                self._item_to_post_response(entry)
+            return entries, bool(item["exhaustive"]), int(item["version"])
+        except (KeyError, TypeError, ValueError, zlib.error):
+            repository.delete(FRONT_PAGE_ID)
+            return None
+    
+    def _rebuild_front_page(self, repository: Repository) -> List[dict]:
+        """
+        インデックスからフロントページスナップショットを再構築する
+        
+        Args:
+            repository: 投稿のリポジトリ
+        
+        Returns:
+            List[dict]: インデックスから読み取った投稿アイテムリスト（切り詰め前）
+        """
+        settings = get_settings()
+        items = self._query_timeline(repository, settings.FRONT_PAGE_SIZE)
+        codec = self._get_codec()
+        entries, trimmed = self._fit_front_page([codec.encode(self._to_front_page_entry(item)) for item in items])
+        exhaustive = len(items) < settings.FRONT_PAGE_SIZE and not trimmed
+        
+        try:
+            # 他のリクエストが先に作成した場合はそちらを優先する
+            repository.put(
+                {"post_id": FRONT_PAGE_ID, "entries": entries, "exhaustive": exhaustive, "version": 1},
+                if_not_exists=True,
+            )
+        except ConditionFailedError:
+            pass
+        return items
+    
+    def _update_front_page(self, repository: Repository, mutate) -> None:
+        """
+        フロントページスナップショットを更新する
+        
+        バージョンを条件とした書き込みで、同時更新による取りこぼしを防ぐ。
+        競合が続いた場合はスナップショットを削除し、次回の読み取りで再構築させる。
+        スナップショットが存在しない場合は何もしない。
+        
+        Args:
+            repository: 投稿のリポジトリ
+            mutate: 投稿アイテムリストを受け取り、更新後のリストを返す関数
+        """
+        settings = get_settings()
+        codec = self._get_codec()
+        for _ in range(FRONT_PAGE_WRITE_ATTEMPTS):
+            snapshot = self._read_front_page(repository)
+            if snapshot is None:
+                return
+            entries, exhaustive, version = snapshot
+            
+            new_entries = [codec.encode(self._to_front_page_entry(entry)) for entry in mutate(entries)]
+            new_entries.sort(key=lambda entry: entry["created_at"], reverse=True)
+            if len(new_entries) > settings.FRONT_PAGE_SIZE:
+                new_entries = new_entries[:settings.FRONT_PAGE_SIZE]
+                exhaustive = False
+            new_entries, trimmed = self._fit_front_page(new_entries)
+            exhaustive = exhaustive and not trimmed
+            
+            try:
+                repository.put(
+                    {"post_id": FRONT_PAGE_ID, "entries": new_entries, "exhaustive": exhaustive, "version": version + 1},
+                    expected_version=version,
+                )
+                return
+            except ConditionFailedError:
+                continue
+        
+        repository.delete(FRONT_PAGE_ID)
+    
+    def _to_front_page_entry(self, item: dict) -> dict:
+        """
+        投稿アイテムからスナップショットに保持する属性のみを取り出す
+        
+        Args:
+            item: 投稿アイテム（どちらの形式でもよい）
+        
+        Returns:
+            dict: スナップショットのエントリ（標準の形式）
+        """
+        item = self._get_codec().decode(item)
+        entry = {name: item[name] for name in FRONT_PAGE_ATTRIBUTES if name in item}
+        # version属性を持たない既存アイテムは0として扱う
+        entry.setdefault("version", 0)
+        return entry
+    
+    def _fit_front_page(self, entries: List[dict]):
+        """
+        スナップショットがアイテムサイズの上限に収まるよう末尾のエントリを切り詰める
+        
+        Args:
+            entries: エントリリスト（作成日時の降順）
+        
+        Returns:
+            Tuple[List[dict], bool]: (切り詰め後のエントリリスト, 切り詰めたかどうか)
+        """
+        settings = get_settings()
+        # 属性名・エントリ自体のオーバーヘッドを含めた概算サイズ
+        size = 100
+        for index, entry in enumerate(entries):
+            size += 10 + estimate_item_size(entry)
+            if size > settings.FRONT_PAGE_MAX_BYTES:
+                return entries[:index], True
+        return entries, False
+    
+    def _query_timeline(self, repository: Repository, limit: int, before: Optional[str] = None) -> List[dict]:
+        """
+        投稿アイテムを作成日時の降順でインデックスから読み取る
+        
+        Args:
+            repository: 投稿（またはアーカイブした投稿）のリポジトリ
+            limit: 取得する最大件数
+            before: この作成日時より前の投稿のみを読み取る（Noneの場合は最新から）
+        
+        Returns:
+            List[dict]: 投稿アイテムリスト
+        """
+        # GSI（グローバルセカンダリインデックス）を使用してクエリ（降順・新しい順）
+        return repository.query("pk-created_at-index", "POST", descending=True, limit=limit, before=before)
     
     def get_posts_by_user(self, user_id: str) -> List[PostResponse]:
         """
@@ -133,74 +750,114 @@ class PostService:
         Returns:
             List[PostResponse]: 投稿リスト
         """
-        table = self._get_table()
-        
         # GSI（グローバルセカンダリインデックス）を使用してクエリ
-        response = table.query(
-            IndexName="user_id-index",
-            KeyConditionExpression=Key("user_id").eq(user_id)
-        )
-        
-        items = response.get("Items", [])
+        items = self._get_repository().query("user_id-index", user_id)
         
         return [self._item_to_post_response(item) for item in items]
     
-    def update_post(self, post_id: str, post_data: PostUpdate) -> Optional[PostResponse]:
+    def update_post(
+        self,
+        post_id: str,
+        post_data: PostUpdate,
+        expected_version: Optional[int] = None,
+        owner_id: Optional[str] = None,
+    ) -> Optional[PostResponse]:
         """
         投稿を更新する
         
+        存在確認・所有者確認・バージョン確認をConditionExpressionで行うため、
+        更新前の読み取りを行わない。条件を満たさなかった場合のみ読み取って原因を判別する。
+        
         Args:
             post_id: 更新対象の投稿ID
             post_data: 更新データ
+            expected_version: 期待するバージョン（Noneの場合は検査しない）
+            owner_id: 所有者であることを要求するユーザーID（Noneの場合は検査しない）
         
         Returns:
             PostResponse: 更新後の投稿情報、投稿が存在しない場合はNone
-        """
-        table = self._get_table()
         
-        # 既存投稿を確認
-        existing_post = self.get_post_by_id(post_id)
-        if not existing_post:
+        Raises:
+            PermissionDeniedError: 所有者でない場合
+            VersionConflictError: バージョンが一致しない場合
+        """
+        if post_id.startswith(RESERVED_ID_PREFIX):
             return None
         
-        # 更新式を構築
-        update_expression_parts = []
-        expression_attribute_values = {}
-        expression_attribute_names = {}
+        repository = self._get_repository()
+        
+        # 更新する属性を収集
+        changes = {}
         
         if post_data.title:
-            update_expression_parts.append("title = :title")
-            expression_attribute_values[":title"] = post_data.title
+            changes["title"] = post_data.title
+            changes["title_key"] = title_key(post_data.title)
         
         if post_data.message:
-            update_expression_parts.append("message = :message")
-            expression_attribute_values[":message"] = post_data.message
+            changes["message"] = post_data.message
         
-        # 更新がない場合は何もしない
-        if not update_expression_parts:
-            return existing_post
+        # 更新がない場合は条件のみ検査して現在の内容を返す
+        if not changes:
+            item = self._read_post(repository, post_id, consistent=True)
+            if not item:
+                return None
+            self._check_update_conditions(item, expected_version, owner_id)
+            return self._item_to_post_response(item)
         
         # 更新日時を設定
-        now = datetime.utcnow().isoformat()
-        update_expression_parts.append("updated_at = :updated_at")
-        expression_attribute_values[":updated_at"] = now
-        
-        update_expression = "SET " + ", ".join(update_expression_parts)
-        
-        # 更新実行
-        update_params = {
-            "Key": {"post_id": post_id},
-            "UpdateExpression": update_expression,
-            "ExpressionAttributeValues": expression_attribute_values,
-            "ReturnValues": "ALL_NEW"
-        }
+        changes["updated_at"] = datetime.utcnow().isoformat()
         
-        if expression_attribute_names:
-            update_params["ExpressionAttributeNames"] = expression_attribute_names
+        # 更新条件を構築
+        expected = {"user_id": owner_id} if owner_id is not None else None
         
-        response = table.update_item(**update_params)
+        # 設定の形式に変換する（もう一方の形式の同じ属性は削除する）
+        changes, remove = self._get_codec().encode_changes(changes)
+        
+        try:
+            updated_item = repository.update(
+                post_id, changes, expected=expected, expected_version=expected_version, remove=remove,
+            )
+        except ConditionFailedError:
+            # 条件を満たさなかった原因を判別する
+            item = repository.get(post_id, consistent=True)
+            if not item:
+                # アーカイブした投稿は投稿のテーブルに戻してから更新する
+                if self._restore_archived_post(repository, post_id):
+                    return self.update_post(post_id, post_data, expected_version, owner_id)
+                return None
+            self._check_update_conditions(item, expected_version, owner_id)
+            raise VersionConflictError(int(item.get("version", 0)))
+        finally:
+            invalidate_item(repository, {"post_id": post_id})
+        
+        self._update_front_page(
+            repository,
+            lambda entries: [updated_item if entry["post_id"] == post_id else entry for entry in entries],
+        )
         
-        return self._item_to_post_response(response["Attributes"])
+        self._index_post(updated_item)
+        
+        return self._item_to_post_response(updated_item)
+    
+    def _check_update_conditions(self, item: dict, expected_version: Optional[int], owner_id: Optional[str]) -> None:
+        """
+        投稿アイテムが更新条件を満たすか検査する
+        
+        Args:
+            item: 投稿アイテム
+            expected_version: 期待するバージョン（Noneの場合は検査しない）
+            owner_id: 所有者であることを要求するユーザーID（Noneの場合は検査しない）
+        
+        Raises:
+            PermissionDeniedError: 所有者でない場合
+            VersionConflictError: バージョンが一致しない場合
+        """
+        if owner_id is not None and item["user_id"] != owner_id:
+            raise PermissionDeniedError("この投稿を更新する権限がありません")
+        
+        current_version = int(item.get("version", 0))
+        if expected_version is not None and expected_version != current_version:
+            raise VersionConflictError(current_version)
     
     def delete_post(self, post_id: str) -> bool:
         """
@@ -210,27 +867,521 @@ class PostService:
             post_id: 削除対象の投稿ID
         
         Returns:
-            bool: 削除に成功した場合True
+            bool: 削除に成功した場合True（存在しない、または同時に他のリクエストが削除した場合False）
         """
-        table = self._get_table()
+        repository = self._get_repository()
         
         # 既存投稿を確認
-        if not self.get_post_by_id(post_id):
+        post = self.get_post_by_id(post_id)
+        if not post:
+            return False
+        
+        # 同時に削除された場合に集計を重ねて減算しないよう、この呼び出しで削除したかを確認する
+        removed = delete_existing(repository, post_id, post.version)
+        invalidate_item(repository, {"post_id": post_id})
+        archive = self._get_archive_repository()
+        if archive is not None:
+            if removed:
+                # アーカイブ中の投稿の複製を削除する
+                archive.delete(post_id)
+            else:
+                removed = delete_existing(archive, post_id)
+        if not removed:
+            return False
+        
+        self._update_front_page(repository, lambda entries: [entry for entry in entries if entry["post_id"] != post_id])
+        
+        if get_settings().SEARCH_ENABLED:
+            try:
+                search_index.remove_post(post_id)
+            except StorageError:
+                metrics.increment("SearchIndexErrors")
+        self._record_stats(stats_service.record_post_deleted, post.user_id, post.created_at.isoformat())
+        return True
+    
+    def propagate_username(self, user_id: str, username: str) -> UsernamePropagationProgress:
+        """
+        ユーザー名の変更を投稿アイテムへ反映する
+        
+        投稿アイテムは一覧表示のためにusernameを非正規化して保持している。
+        user_id-indexで対象投稿を取得し、バッチ単位で並列に更新する。
+        スロットリング時は指数バックオフでリトライする。
+        続けて名前を変更した場合（A→B→C）に、遅れて実行されたBの処理がCを上書きしないよう、
+        各投稿は読み取った時点のユーザー名を条件に書き換え、バッチごとにユーザーの現在のユーザー名を確認して、
+        変わっていれば新しい変更の処理に任せて中止する。
+        
+        Args:
+            user_id: ユーザーID
+            username: 新しいユーザー名
+        
+        Returns:
+            UsernamePropagationProgress: 処理結果の進捗
+        """
+        settings = get_settings()
+        codec = self._get_codec()
+        progress = UsernamePropagationProgress(user_id, username)
+        progress.save()
+        
+        # 書き換えが必要な投稿IDと、書き換えの条件にする読み取った時点のユーザー名
+        targets = [
+            (item["post_id"], _username_condition(item))
+            for item in self._query_user_post_keys(user_id)
+            if codec.decode(item).get("username") != username
+        ]
+        progress.total = len(targets)
+        progress.save()
+        
+        # バッチに分割して並列に書き換える
+        batch_size = max(1, settings.USERNAME_PROPAGATION_BATCH_SIZE)
+        batches = [targets[i:i + batch_size] for i in range(0, len(targets), batch_size)]
+        if batches:
+            workers = max(1, min(settings.USERNAME_PROPAGATION_WORKERS, len(batches)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(
+                    lambda batch: self._rewrite_username_batch(user_id, batch, username, progress),
+                    batches,
+                ))
+        
+        if not self._is_username_superseded(user_id, username):
+            # フロントページ上の該当ユーザーの投稿も書き換える
+            if progress.updated:
+                self._update_front_page(
+                    self._get_repository(),
+                    lambda entries: [
+                        {**entry, "username": username} if entry["user_id"] == user_id else entry
+                        for entry in entries
+                    ],
+                )
+            
+            # ユーザー別の集計のユーザー名も変更する
+            self._record_stats(stats_service.record_username, user_id, username)
+        
+        progress.done = True
+        progress.save()
+        return progress
+    
+    def _query_user_post_keys(self, user_id: str) -> List[dict]:
+        """
+        ユーザーの投稿のキーとユーザー名を全ページ分取得する
+        
+        Args:
+            user_id: ユーザーID
+        
+        Returns:
+            List[dict]: post_idとusernameのみを含むアイテムリスト（保存されている形式のまま）
+        """
+        codec = self._get_codec()
+        return self._get_repository().query(
+            "user_id-index", user_id, attributes=codec.attribute_names(["post_id", "username"]),
+        )
+    
+    def _is_username_superseded(self, user_id: str, username: str) -> bool:
+        """
+        反映中のユーザー名が、その後の変更で古くなったか判定する
+        
+        Args:
+            user_id: ユーザーID
+            username: 反映中のユーザー名
+        
+        Returns:
+            bool: ユーザーの現在のユーザー名が異なる場合True（ユーザーが存在しない場合はFalse）
+        """
+        user = get_users_repository().get(user_id, consistent=True)
+        return user is not None and user.get("username") != username
+    
+    def _rewrite_username_batch(
+        self,
+        user_id: str,
+        targets: List[Tuple[str, dict]],
+        username: str,
+        progress: UsernamePropagationProgress,
+    ) -> None:
+        """
+        投稿のバッチのユーザー名を書き換える（ワーカースレッドで実行）
+        
+        投稿のバージョンは進めない（ユーザー名の反映は投稿の内容の更新ではないため）。
+        読み取った時点のユーザー名から変わっていた投稿は読み直し、反映中のユーザー名が現在のユーザー名の場合のみ
+        新しい値を条件に書き換え直す（古い変更の処理による書き換えを、新しい変更の処理が上書きする）。
+        
+        Args:
+            user_id: ユーザーID
+            targets: 書き換える投稿IDと、書き換えの条件にするユーザー名の属性のリスト
+            username: 新しいユーザー名
+            progress: 進捗
+        """
+        # その後の変更で古くなった場合は、新しい変更の処理に任せて書き換えない
+        if self._is_username_superseded(user_id, username):
+            progress.increment("skipped", len(targets))
+            progress.save()
+            return
+        
+        settings = get_settings()
+        repository = self._get_repository()
+        changes, remove = self._get_codec().encode_changes({"username": username})
+        
+        for post_id, expected in targets:
+            for attempt in range(settings.USERNAME_PROPAGATION_MAX_RETRIES + 1):
+                try:
+                    # 削除済みの投稿を再作成しないよう存在を条件にする（更新は存在が条件）
+                    repository.update(post_id, changes, expected=expected, increment_version=False, remove=remove)
+                    invalidate_item(repository, {"post_id": post_id})
+                    progress.increment("updated")
+                    break
+                except ConditionFailedError:
+                    # 削除済み、または他の変更の処理が先に書き換えた投稿
+                    expected = self._reload_username_condition(user_id, post_id, username)
+                    if expected is None:
+                        progress.increment("skipped")
+                        break
+                    if attempt == settings.USERNAME_PROPAGATION_MAX_RETRIES:
+                        progress.increment("failed")
+                        break
+                except ThrottledError:
+                    if attempt == settings.USERNAME_PROPAGATION_MAX_RETRIES:
+                        progress.increment("failed")
+                        break
+                    # 指数バックオフ（ジッター付き）で待機してリトライ
+                    progress.increment("throttled")
+                    metrics.increment("ThrottlingRetries", dimensions={"Operation": "PropagateUsername"})
+                    time.sleep(random.uniform(0, 0.05 * (2 ** attempt)))
+                except StorageError:
+                    progress.increment("failed")
+                    break
+        progress.save()
+    
+    def _reload_username_condition(self, user_id: str, post_id: str, username: str) -> Optional[dict]:
+        """
+        条件を満たさず書き換えられなかった投稿を読み直し、書き換え直す場合の条件を返す
+        
+        Args:
+            user_id: ユーザーID
+            post_id: 投稿ID
+            username: 反映中のユーザー名
+        
+        Returns:
+            Optional[dict]: 書き換えの条件にするユーザー名の属性（削除済み・反映済み、
+                または反映中のユーザー名が古くなった場合はNone）
+        """
+        item = self._get_repository().get(post_id, consistent=True)
+        if item is None or self._get_codec().decode(item).get("username") == username:
+            return None
+        if self._is_username_superseded(user_id, username):
+            return None
+        return _username_condition(item)
+    
+    def migrate_encoding(self, limit: int = 100, cursor: Optional[str] = None) -> dict:
+        """
+        投稿アイテムを設定のPOST_ENCODINGの形式に書き換える（1ページ分）
+        
+        タイトルのソートキー（title_key）を持たない投稿には追加し、タイトルの候補に含める。
+        オンラインで実行できるよう、読み取った時点の属性値を条件に書き換え、
+        同時に更新・ユーザー名の反映が行われたアイテムは上書きせずにスキップする（次回の実行で移行する）。
+        投稿のバージョンは進めない（内容は変わらないため）。
+        最後のページの移行後はフロントページスナップショットを破棄し、設定の形式で作り直させる。
+        
+        Args:
+            limit: 読み取るアイテム数
+            cursor: 前回の実行で返されたnext_cursor（Noneの場合は最初から）
+        
+        Returns:
+            dict: 読み取り件数・移行件数・スキップ件数・失敗件数と、続きのカーソル（最後の場合はNone）
+        """
+        repository = self._get_repository()
+        codec = self._get_codec()
+        items, next_cursor = repository.scan_page(limit, cursor)
+        result = {"scanned": len(items), "migrated": 0, "skipped": 0, "failed": 0}
+        
+        for item in items:
+            if item["post_id"].startswith(RESERVED_ID_PREFIX) or (codec.is_encoded(item) and "title_key" in item):
+                continue
+            
+            standard = codec.decode(item)
+            changes, remove = codec.encode_changes(
+                {name: standard[name] for name in COMPACT_ATTRIBUTES if name in standard}
+            )
+            changes["title_key"] = title_key(standard["title"])
+            # 読み取った時点の値を条件にする
+            expected = {name: item[name] for name in (*COMPACT_ATTRIBUTES, *STANDARD_ATTRIBUTES) if name in item}
+            try:
+                repository.update(item["post_id"], changes, expected=expected, increment_version=False, remove=remove)
+                invalidate_item(repository, {"post_id": item["post_id"]})
+                result["migrated"] += 1
+            except ConditionFailedError:
+                result["skipped"] += 1
+            except StorageError:
+                result["failed"] += 1
+        
+        if next_cursor is None:
+            repository.delete(FRONT_PAGE_ID)
+        
+        result["next_cursor"] = next_cursor
+        return result
+    
+    def archive_old_posts(self, limit: Optional[int] = None, now: Optional[datetime] = None) -> dict:
+        """
+        作成からARCHIVE_AFTER_DAYS日を過ぎた投稿をアーカイブのテーブルへ移動する（古い順に最大limit件）
+        
+        アーカイブにはコンパクト形式で書き込み、投稿のテーブルからは読み取った時点のバージョンを条件に削除する。
+        同時に更新された投稿は移動せずにスキップする（アーカイブの複製は次回の実行で上書きされる）。
+        投稿を移動した場合はフロントページスナップショットを破棄し、次回の読み取りで作り直させる。
+        
+        Args:
+            limit: 移動する最大件数（Noneの場合はARCHIVE_BATCH_SIZE）
+            now: 現在日時（Noneの場合は現在のUTC日時）
+        
+        Returns:
+            dict: 移動件数・スキップ件数・失敗件数・基準日時と、続きがあるかどうか
+        """
+        settings = get_settings()
+        archive = self._get_archive_repository()
+        if archive is None:
+            raise ValueError("アーカイブが無効です（ARCHIVE_ENABLED）")
+        
+        repository = self._get_repository()
+        limit = limit or settings.ARCHIVE_BATCH_SIZE
+        cutoff = ((now or datetime.utcnow()) - timedelta(days=settings.ARCHIVE_AFTER_DAYS)).isoformat()
+        codec = self._get_codec()
+        # アーカイブは設定に関わらずコンパクト形式で書き込む
+        archive_codec = PostCodec(True, settings.POST_COMPRESS_MIN_BYTES)
+        
+        items = repository.query("pk-created_at-index", "POST", limit=limit, before=cutoff)
+        result = {"archived": 0, "skipped": 0, "failed": 0, "cutoff": cutoff, "has_more": len(items) == limit}
+        
+        for item in items:
+            post_id = item["post_id"]
+            try:
+                archive.put(archive_codec.encode(codec.decode(item)))
+                repository.delete(post_id, expected_version=int(item.get("version", 0)))
+                invalidate_item(repository, {"post_id": post_id})
+                result["archived"] += 1
+            except ConditionFailedError:
+                # 同時に削除された投稿はアーカイブからも削除する（更新された投稿はそのまま残す）
+                if repository.get(post_id, consistent=True) is None:
+                    archive.delete(post_id)
+                result["skipped"] += 1
+            except StorageError:
+                result["failed"] += 1
+        
+        if result["archived"]:
+            metrics.increment("PostsArchived", result["archived"])
+            repository.delete(FRONT_PAGE_ID)
+        return result
+    
+    def search_posts(self, query: str, limit: int = 20, cursor: Optional[str] = None) -> Tuple[List[PostResponse], Optional[str]]:
+        """
+        タイトル・本文に検索文字列の全ての検索語を含む投稿を検索する（1ページ分）
+        
+        スコア（検索語の出現回数、タイトルは重み付け）の降順、同じスコアの場合は新しい順に返す。
+        アーカイブした投稿も検索結果に含まれる。
+        
+        Args:
+            query: 検索文字列
+            limit: 取得する最大件数（MAX_PAGE_SIZE件まで）
+            cursor: 前のページの続きのカーソル
+        
+        Returns:
+            Tuple[List[PostResponse], Optional[str]]: (投稿リスト, 続きのカーソル（最後のページの場合はNone）)
+        
+        Raises:
+            ValueError: 検索が無効な場合、またはカーソルが不正な場合
+        """
+        if not get_settings().SEARCH_ENABLED:
+            raise ValueError("検索が無効です（SEARCH_ENABLED）")
+        if cursor is not None and not cursor.isdigit():
+            raise ValueError("カーソルが不正です")
+        
+        repository = self._get_repository()
+        post_ids, next_offset = search_index.search(query, clamp_page_size(limit), int(cursor or 0))
+        
+        posts = []
+        for post_id in post_ids:
+            item = get_item_cached(repository, {"post_id": post_id}, lambda: self._read_post(repository, post_id))
+            # 検索インデックスの更新前に削除された投稿は含めない
+            if item:
+                posts.append(self._item_to_post_response(item))
+        return posts, str(next_offset) if next_offset is not None else None
+    
+    def suggest_posts(self, prefix: str, limit: int = 10) -> List[PostSuggestion]:
+        """
+        タイトルが接頭辞で始まる投稿を取得する（入力補完用）
+        
+        正規化したタイトルのソートキーをインデックスの前方一致で問い合わせ、投稿ID・タイトルのみを読み取る。
+        正規化したタイトルの昇順で返す。アーカイブした投稿は含めない。
+        
+        Args:
+            prefix: タイトルの接頭辞
+            limit: 取得する最大件数（MAX_PAGE_SIZE件まで）
+        
+        Returns:
+            List[PostSuggestion]: タイトル候補リスト（接頭辞が空の場合は空）
+        """
+        key = title_key(prefix)
+        if not key:
+            return []
+        
+        codec = self._get_codec()
+        items = self._get_repository().query(
+            "pk-title_key-index",
+            "POST",
+            limit=clamp_page_size(limit),
+            attributes=codec.attribute_names(["post_id", "title"]),
+            prefix=key,
+        )
+        return [PostSuggestion(post_id=item["post_id"], title=item["title"]) for item in map(codec.decode, items)]
+    
+    def rebuild_search_index(self, limit: int = 100, cursor: Optional[str] = None) -> dict:
+        """
+        投稿のテーブルの投稿を検索インデックスに書き込む（1ページ分）
+        
+        検索を有効にする前に作成された投稿の索引や、索引の更新に失敗した投稿の修復に使用する。
+        
+        Args:
+            limit: 読み取るアイテム数
+            cursor: 前回の実行で返されたnext_cursor（Noneの場合は最初から）
+        
+        Returns:
+            dict: 読み取り件数・索引件数・失敗件数と、続きのカーソル（最後の場合はNone）
+        
+        Raises:
+            ValueError: 検索が無効な場合
+        """
+        if not get_settings().SEARCH_ENABLED:
+            raise ValueError("検索が無効です（SEARCH_ENABLED）")
+        
+        codec = self._get_codec()
+        items, next_cursor = self._get_repository().scan_page(limit, cursor)
+        result = {"scanned": len(items), "indexed": 0, "failed": 0}
+        
+        for item in items:
+            if item["post_id"].startswith(RESERVED_ID_PREFIX):
+                continue
+            post = codec.decode(item)
+            try:
+                search_index.index_post(post["post_id"], post["title"], post["message"], post["created_at"])
+                result["indexed"] += 1
+            except StorageError:
+                result["failed"] += 1
+        
+        result["next_cursor"] = next_cursor
+        return result
+    
+    def _index_post(self, item: dict) -> None:
+        """
+        投稿を検索インデックスに書き込む（検索が無効な場合は何もしない）
+        
+        投稿の書き込みは完了しているため、失敗してもエラーにせずメトリクスに記録する
+        （rebuild_search_indexで修復する）。
+        
+        Args:
+            item: 投稿アイテム（どちらの形式でもよい）
+        """
+        if not get_settings().SEARCH_ENABLED:
+            return
+        post = self._get_codec().decode(item)
+        try:
+            search_index.index_post(post["post_id"], post["title"], post["message"], post["created_at"])
+        except StorageError:
+            metrics.increment("SearchIndexErrors")
+    
+    def rebuild_stats(self) -> dict:
+        """
+        投稿のテーブル（アーカイブが有効な場合はアーカイブも）・ユーザーのテーブルを並列スキャンして集計を作り直す
+        
+        Returns:
+            dict: 読み取った投稿数と、書き込んだ・削除した集計のアイテム数
+        
+        Raises:
+            ValueError: 集計が無効な場合
+        """
+        if not get_settings().STATS_ENABLED:
+            raise ValueError("集計が無効です（STATS_ENABLED）")
+        return stats_service.rebuild(self._get_stats_sources(), get_users_repository())
+    
+    def reconcile_counts(self) -> dict:
+        """
+        投稿のテーブル（アーカイブが有効な場合はアーカイブも）・ユーザーのテーブルを並列スキャンして数え、
+        一覧の総件数（全体の投稿数・ユーザー数）のずれを修正する
+        
+        Returns:
+            dict: 集計名 → 数えた件数と、修正した差分
+        
+        Raises:
+            ValueError: 集計が無効な場合
+        """
+        if not get_settings().STATS_ENABLED:
+            raise ValueError("集計が無効です（STATS_ENABLED）")
+        return stats_service.reconcile_totals(self._get_stats_sources(), get_users_repository())
+    
+    def _get_stats_sources(self) -> List[Repository]:
+        """
+        集計の対象の投稿のリポジトリを取得する
+        
+        Returns:
+            List[Repository]: 投稿のテーブルと、アーカイブが有効な場合はアーカイブのリポジトリ
+        """
+        sources = [self._get_repository()]
+        archive = self._get_archive_repository()
+        if archive is not None:
+            sources.append(archive)
+        return sources
+    
+    def _record_stats(self, record, *args) -> None:
+        """
+        集計を更新する（集計が無効な場合は何もしない）
+        
+        投稿の書き込みは完了しているため、失敗してもエラーにせずメトリクスに記録する
+        （rebuild_statsで修復する）。
+        
+        Args:
+            record: 集計を更新するStatsServiceのメソッド
+            *args: メソッドの引数
+        """
+        if not get_settings().STATS_ENABLED:
+            return
+        try:
+            record(*args)
+        except StorageError:
+            metrics.increment("StatsErrors")
+    
+    def _restore_archived_post(self, repository: Repository, post_id: str) -> bool:
+        """
+        アーカイブした投稿を投稿のテーブルに戻す（更新の前に使用する）
+        
+        Args:
+            repository: 投稿のリポジトリ
+            post_id: 投稿ID
+        
+        Returns:
+            bool: 戻した（または他のリクエストが既に戻していた）場合True、アーカイブに無い場合False
+        """
+        archive = self._get_archive_repository()
+        if archive is None:
+            return False
+        
+        item = archive.get(post_id, consistent=True)
+        if item is None:
             return False
         
-        table.delete_item(Key={"post_id": post_id})
+        codec = self._get_codec()
+        try:
+            repository.put(codec.encode(codec.decode(item)), if_not_exists=True)
+        except ConditionFailedError:
+            pass
+        archive.delete(post_id)
+        invalidate_item(repository, {"post_id": post_id})
         return True
     
     def _item_to_post_response(self, item: dict) -> PostResponse:
         """
-        DynamoDBアイテムをPostResponseモデルに変換する
+        投稿アイテムをPostResponseモデルに変換する
         
         Args:
-            item: DynamoDBアイテム
+            item: 投稿アイテム（どちらの形式でもよい）
         
         Returns:
             PostResponse: 投稿レスポンスモデル
         """
+        item = self._get_codec().decode(item)
         return PostResponse(
             post_id=item["post_id"],
             user_id=item["user_id"],
@@ -239,6 +1390,7 @@ class PostService:
             message=item["message"],
             created_at=datetime.fromisoformat(item["created_at"]),
             updated_at=datetime.fromisoformat(item["updated_at"]),
+            version=int(item.get("version", 0)),
         )
 
 
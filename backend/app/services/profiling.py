@@ -0,0 +1,374 @@
+"""
+リクエストプロファイリングサービス
+
+管理者が指定したリクエストをサンプリングプロファイラーで計測し、
+折りたたみスタック形式（flamegraph.pl・speedscopeで表示可能）の結果を保持する。
+本番環境でのみ遅いエンドポイントの調査に使用する。
+コンテナ単位の厳格な回数制限を設け、有効にしたままでも負荷が増えないようにする。
+"""
+
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional
+from urllib.parse import parse_qs
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.security.utils import get_authorization_scheme_param
+
+from app.config import get_settings
+from app.services.auth import get_admin_user, get_current_user
+
+# プロファイリングを要求するリクエストヘッダー
+PROFILE_HEADER = b"x-profile"
+
+# プロファイリングを要求するクエリパラメーター
+PROFILE_QUERY_PARAM = "profile"
+
+# プロファイリングを要求する値として扱う文字列
+TRUTHY_VALUES = {"1", "true", "yes", "on"}
+
+# コンテナ内に保持するプロファイル結果の最大件数
+PROFILE_HISTORY = 10
+
+# 待機中とみなすスタック末尾のモジュール（アイドル状態のスレッドを除外するため）
+IDLE_MODULES = {"threading", "queue", "selectors"}
+
+
+class SamplingProfiler:
+    """
+    サンプリングプロファイラークラス
+    
+    別スレッドから一定間隔で全スレッドのスタックを採取し、同じスタックの出現回数を数える。
+    スレッドプールで実行される同期エンドポイントとイベントループの両方を計測できる。
+    コンテナ内の全スレッドが対象となるため、同時に処理中の他のリクエストも含まれる
+    （Lambdaでは1コンテナで同時に1リクエストのみを処理する）。
+    """
+    
+    def __init__(self, interval_seconds: float):
+        """
+        プロファイラーの初期化
+        
+        Args:
+            interval_seconds: サンプリング間隔（秒）
+        """
+        # サンプリング間隔（秒）
+        self.interval_seconds = interval_seconds
+        # 折りたたみスタック → 出現回数
+        self.stacks: Dict[str, int] = {}
+        # 採取したサンプル数
+        self.samples = 0
+        # 停止要求
+        self._stop = threading.Event()
+        # サンプリングスレッド
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> None:
+        """サンプリングを開始する"""
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """サンプリングを停止する"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+    
+    def _run(self) -> None:
+        """停止要求まで一定間隔でサンプリングする"""
+        while not self._stop.wait(self.interval_seconds):
+            self.sample()
+    
+    def sample(self) -> None:
+        """全スレッドのスタックを1回採取する"""
+        own_thread_id = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread_id:
+                continue
+            if frame.f_globals.get("__name__") in IDLE_MODULES:
+                continue
+            
+            names = []
+            while frame is not None:
+                names.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            stack = ";".join(reversed(names))
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            self.samples += 1
+    
+    def collapsed(self) -> str:
+        """
+        折りたたみスタック形式の結果を返す
+        
+        Returns:
+            str: 1行に「スタック 出現回数」を出現回数の降順で並べた文字列
+        """
+        lines = sorted(self.stacks.items(), key=lambda entry: entry[1], reverse=True)
+        return "\n".join(f"{stack} {count}" for stack, count in lines)
+
+
+class ProfileResult:
+    """
+    プロファイル結果クラス
+    
+    1リクエストのプロファイリング結果を保持する。
+    """
+    
+    def __init__(self, profile_id: str, method: str, path: str):
+        """
+        プロファイル結果の初期化
+        
+        Args:
+            profile_id: プロファイルID
+            method: HTTPメソッド
+            path: リクエストパス
+        """
+        # プロファイルID
+        self.profile_id = profile_id
+        # HTTPメソッド
+        self.method = method
+        # リクエストパス
+        self.path = path
+        # 開始日時
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        # 処理時間（ミリ秒）
+        self.duration_ms = 0.0
+        # レスポンスのステータスコード
+        self.status_code: Optional[int] = None
+        # 採取したサンプル数
+        self.samples = 0
+        # 折りたたみスタック形式の結果
+        self.collapsed = ""
+    
+    def to_dict(self) -> dict:
+        """
+        結果の概要を辞書形式で返す
+        
+        Returns:
+            dict: 結果の概要（折りたたみスタックを除く）
+        """
+        return {
+            "profile_id": self.profile_id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "status_code": self.status_code,
+            "samples": self.samples,
+        }
+
+
+class ProfileStore:
+    """
+    プロファイル結果の保持と回数制限クラス
+    
+    直近のプロファイル結果を保持し、コンテナ単位でプロファイリングの同時実行と頻度を制限する。
+    """
+    
+    def __init__(self, history: int = PROFILE_HISTORY):
+        """
+        初期化
+        
+        Args:
+            history: 保持するプロファイル結果の最大件数
+        """
+        # 直近のプロファイル結果（古いものから順に破棄）
+        self._results: Deque[ProfileResult] = deque(maxlen=history)
+        # プロファイリング中かどうか
+        self._active = False
+        # 最後にプロファイリングを開始した時刻（単調増加時計、未実行の場合はNone）
+        self._last_started: Optional[float] = None
+        # 状態を保護するロック
+        self._lock = threading.Lock()
+    
+    def try_acquire(self, min_interval_seconds: float) -> bool:
+        """
+        プロファイリングの実行枠を取得する
+        
+        同時に1リクエストのみ、かつ前回の開始から最小間隔が経過している場合のみ取得できる。
+        
+        Args:
+            min_interval_seconds: プロファイリングの最小間隔（秒）
+        
+        Returns:
+            bool: 取得できた場合True
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._active:
+                return False
+            if self._last_started is not None and now - self._last_started < min_interval_seconds:
+                return False
+            self._active = True
+            self._last_started = now
+            return True
+    
+    def release(self, result: ProfileResult) -> None:
+        """
+        プロファイリングの実行枠を返却し、結果を保持する
+        
+        Args:
+            result: プロファイル結果
+        """
+        with self._lock:
+            self._results.append(result)
+            self._active = False
+    
+    def summaries(self) -> List[dict]:
+        """
+        保持しているプロファイル結果の概要を返す
+        
+        Returns:
+            List[dict]: 結果の概要リスト（新しい順）
+        """
+        with self._lock:
+            return [result.to_dict() for result in reversed(self._results)]
+    
+    def get(self, profile_id: str) -> Optional[ProfileResult]:
+        """
+        プロファイル結果を取得する
+        
+        Args:
+            profile_id: プロファイルID
+        
+        Returns:
+            ProfileResult: プロファイル結果、存在しない場合はNone
+        """
+        with self._lock:
+            for result in self._results:
+                if result.profile_id == profile_id:
+                    return result
+        return None
+
+
+# プロファイル結果のシングルトンインスタンス
+profile_store = ProfileStore()
+
+
+def is_profile_requested(scope: dict) -> bool:
+    """
+    リクエストがプロファイリングを要求しているかを判定する
+    
+    Args:
+        scope: ASGIスコープ
+    
+    Returns:
+        bool: X-Profileヘッダーまたはprofileクエリパラメーターが指定されている場合True
+    """
+    for name, value in scope.get("headers", []):
+        if name == PROFILE_HEADER and value.decode("latin-1").strip().lower() in TRUTHY_VALUES:
+            return True
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return any(value.lower() in TRUTHY_VALUES for value in query.get(PROFILE_QUERY_PARAM, []))
+
+
+async def is_admin_request(scope: dict) -> bool:
+    """
+    リクエストが管理者のトークンを持つかを判定する
+    
+    エンドポイントと同じget_current_user・get_admin_userで検証する。
+    
+    Args:
+        scope: ASGIスコープ
+    
+    Returns:
+        bool: 管理者の場合True
+    """
+    authorization = ""
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            authorization = value.decode("latin-1")
+            break
+    scheme, token = get_authorization_scheme_param(authorization)
+    if scheme.lower() != "bearer" or not token:
+        return False
+    
+    try:
+        current_user = await get_current_user(HTTPAuthorizationCredentials(scheme=scheme, credentials=token))
+        await get_admin_user(current_user)
+    except HTTPException:
+        return False
+    return True
+
+
+class ProfilingMiddleware:
+    """
+    リクエストプロファイリングミドルウェア
+    
+    管理者がX-Profileヘッダーまたはprofileクエリパラメーターを指定したリクエストを
+    サンプリングプロファイラーで計測するASGIミドルウェア。
+    結果はコンテナ内に保持し、X-Profile-IdヘッダーのIDで管理APIから取得する。
+    管理者以外の指定は無視し、回数制限を超えた場合は計測せずに通常どおり処理する。
+    """
+    
+    def __init__(self, app):
+        """
+        ミドルウェアの初期化
+        
+        Args:
+            app: ラップするASGIアプリケーション
+        """
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        """
+        ASGIリクエストを処理する
+        
+        Args:
+            scope: ASGIスコープ
+            receive: 受信関数
+            send: 送信関数
+        """
+        settings = get_settings()
+        if (scope["type"] != "http" or not settings.PROFILING_ENABLED
+                or not is_profile_requested(scope) or not await is_admin_request(scope)):
+            await self.app(scope, receive, send)
+            return
+        
+        if not profile_store.try_acquire(settings.PROFILING_MIN_INTERVAL_SECONDS):
+            await self.app(scope, receive, _with_headers(send, [(b"x-profile-status", b"rate-limited")]))
+            return
+        
+        result = ProfileResult(uuid.uuid4().hex, scope.get("method"), scope.get("path"))
+        profiler = SamplingProfiler(settings.PROFILING_SAMPLE_INTERVAL_MS / 1000)
+        headers = [(b"x-profile-status", b"captured"), (b"x-profile-id", result.profile_id.encode("latin-1"))]
+        send_with_headers = _with_headers(send, headers)
+        
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                result.status_code = message["status"]
+            await send_with_headers(message)
+        
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            profiler.stop()
+            result.duration_ms = (time.perf_counter() - start) * 1000
+            result.samples = profiler.samples
+            result.collapsed = profiler.collapsed()
+            profile_store.release(result)
+
+
+def _with_headers(send, headers: list):
+    """
+    レスポンス開始時にヘッダーを追加する送信関数を作成する
+    
+    Args:
+        send: 送信関数
+        headers: 追加するヘッダー（名前と値のバイト列の組のリスト）
+    
+    Returns:
+        送信関数
+    """
+    async def send_with_headers(message):
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": list(message.get("headers", [])) + headers}
+        await send(message)
+    
+    return send_with_headers
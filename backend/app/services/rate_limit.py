@@ -0,0 +1,265 @@
+"""
+投稿のレート制限
+
+ユーザー・IPアドレスごとに投稿の作成回数を制限する。
+コンテナ内のトークンバケットで短時間の大量の投稿をI/O無しで拒否し、
+通過した投稿は1分ごとのカウンター（DynamoDBのADD）で全コンテナの合計の回数を制限する。
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from app.config import get_settings
+from app.services.metrics import metrics
+from app.services.repository import StorageError, get_rate_limit_repository
+
+# 共有するカウンターの期間（秒）、トークンバケットもこの期間で上限まで補充する
+WINDOW_SECONDS = 60
+
+# コンテナ内に保持するトークンバケットの最大数（使われていない順に破棄する）
+MAX_BUCKETS = 10000
+
+# ユーザーごとの制限のキーの接頭辞
+USER_PREFIX = "USER#"
+
+# IPアドレスごとの制限のキーの接頭辞
+IP_PREFIX = "IP#"
+
+
+class RateLimitExceededError(Exception):
+    """
+    レート制限超過例外
+    
+    投稿の作成回数が上限を超えた場合に発生する。
+    """
+    
+    def __init__(self, retry_after: float):
+        """
+        例外の初期化
+        
+        Args:
+            retry_after: 再度投稿できるまでの秒数
+        """
+        super().__init__("投稿の回数が上限を超えました。しばらく待ってから投稿してください")
+        # 再度投稿できるまでの秒数（Retry-Afterヘッダーの値、1秒以上の整数）
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    """
+    トークンバケット
+    
+    上限の数のトークンを持ち、WINDOW_SECONDSで上限まで一定の速さで補充する。
+    投稿ごとにトークンを1つ使用する。
+    """
+    
+    def __init__(self, capacity: int, now: float):
+        """
+        トークンバケットの初期化（満杯の状態）
+        
+        Args:
+            capacity: トークンの上限（1分あたりの回数）
+            now: 現在時刻（UNIX時間）
+        """
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = now
+    
+    def wait_time(self, now: float) -> float:
+        """
+        経過時間分のトークンを補充し、トークンを1つ使用できるまでの秒数を計算する
+        
+        Args:
+            now: 現在時刻（UNIX時間）
+        
+        Returns:
+            float: 秒数（すぐに使用できる場合は0）
+        """
+        rate = self.capacity / WINDOW_SECONDS
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated_at) * rate)
+        self.updated_at = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / rate
+
+
+class RateLimiter:
+    """
+    投稿のレート制限クラス
+    
+    投稿の作成前にcheck_postを呼び出し、上限を超えた場合はRateLimitExceededErrorを発生させる。
+    """
+    
+    def __init__(self):
+        """レート制限の初期化"""
+        # キー → トークンバケット（使われた順）
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def check_post(self, user_id: str, role: str, client_ip: Optional[str], now: Optional[float] = None) -> None:
+        """
+        投稿の作成回数を数え、上限を超えた場合はエラーにする
+        
+        コンテナ内のトークンバケットで拒否した投稿は、共有するカウンターを読み書きしない。
+        共有するカウンターで拒否した投稿は、使用したコンテナ内のトークンを戻す。
+        共有するカウンターの読み書きに失敗した場合は、投稿を拒否せずにメトリクスに記録する。
+        
+        Args:
+            user_id: 投稿者のユーザーID
+            role: 投稿者の権限（上限の選択に使用する）
+            client_ip: 接続元のIPアドレス（不明な場合はNone）
+            now: 現在時刻（UNIX時間、Noneの場合は現在時刻）
+        
+        Raises:
+            RateLimitExceededError: ユーザーまたはIPアドレスの投稿の回数が上限を超えた場合
+        """
+        settings = get_settings()
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        now = time.time() if now is None else now
+        
+        limits = self._get_limits(user_id, role, client_ip)
+        if not limits:
+            return
+        try:
+            self._take_tokens(limits, now)
+            if settings.RATE_LIMIT_SHARED:
+                try:
+                    self._count_shared(limits, now)
+                except RateLimitExceededError:
+                    # 拒否した投稿でコンテナ内のトークンを使用しない（再試行で二重に数えない）
+                    self._return_tokens(limits)
+                    raise
+        except RateLimitExceededError:
+            metrics.increment("RateLimited")
+            raise
+    
+    def reset(self) -> None:
+        """
+        コンテナ内のトークンバケットを破棄する
+        """
+        with self._lock:
+            self._buckets.clear()
+    
+    def _get_limits(self, user_id: str, role: str, client_ip: Optional[str]) -> List[Tuple[str, int]]:
+        """
+        制限のキーと1分あたりの上限を取得する
+        
+        権限の上限が設定されていない場合は一般ユーザー（user）の上限を使用する。
+        
+        Args:
+            user_id: 投稿者のユーザーID
+            role: 投稿者の権限
+            client_ip: 接続元のIPアドレス
+        
+        Returns:
+            List[Tuple[str, int]]: (キー, 上限)のリスト（上限が0の制限を除く）
+        """
+        settings = get_settings()
+        per_role = settings.RATE_LIMIT_POSTS_PER_MINUTE
+        limits = [(USER_PREFIX + user_id, per_role.get(role, per_role.get("user", 0)))]
+        if client_ip:
+            limits.append((IP_PREFIX + client_ip, settings.RATE_LIMIT_IP_POSTS_PER_MINUTE))
+        return [(key, limit) for key, limit in limits if limit > 0]
+    
+    def _take_tokens(self, limits: List[Tuple[str, int]], now: float) -> None:
+        """
+        全ての制限のトークンバケットからトークンを1つずつ使用する
+        
+        いずれかのトークンが足りない場合は、どのトークンも使用しない。
+        
+        Args:
+            limits: (キー, 上限)のリスト
+            now: 現在時刻（UNIX時間）
+        
+        Raises:
+            RateLimitExceededError: トークンが足りない場合
+        """
+        with self._lock:
+            buckets = [self._get_bucket(key, limit, now) for key, limit in limits]
+            wait = max(bucket.wait_time(now) for bucket in buckets)
+            if wait > 0:
+                raise RateLimitExceededError(wait)
+            for bucket in buckets:
+                bucket.tokens -= 1
+    
+    def _return_tokens(self, limits: List[Tuple[str, int]]) -> None:
+        """
+        _take_tokensで使用したトークンを1つずつ戻す（上限を超えない）
+        
+        Args:
+            limits: (キー, 上限)のリスト
+        """
+        with self._lock:
+            for key, limit in limits:
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.tokens = min(bucket.capacity, bucket.tokens + 1)
+    
+    def _get_bucket(self, key: str, limit: int, now: float) -> TokenBucket:
+        """
+        制限のトークンバケットを取得する（無い場合・上限が変わった場合は作成する）
+        
+        Args:
+            key: 制限のキー
+            limit: 1分あたりの上限
+            now: 現在時刻（UNIX時間）
+        
+        Returns:
+            TokenBucket: トークンバケット
+        """
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.capacity != limit:
+            bucket = self._buckets[key] = TokenBucket(limit, now)
+            # 大量のIPアドレスからの投稿でメモリを使い続けない
+            while len(self._buckets) > MAX_BUCKETS:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(key)
+        return bucket
+    
+    def _count_shared(self, limits: List[Tuple[str, int]], now: float) -> None:
+        """
+        全コンテナで共有する1分ごとのカウンターに加算し、上限を超えた場合はエラーにする
+        
+        全ての制限のカウンターに加算してから判定し、いずれかが上限を超えた場合は
+        加算した全てのカウンターを減算して戻す（拒否した投稿は回数に含めない）。
+        読み書きに失敗したカウンターはメトリクスに記録して判定から除き、残りの制限は判定する。
+        カウンターのアイテムはexpires_at（DynamoDBのTTL）を過ぎると削除される。
+        
+        Args:
+            limits: (キー, 上限)のリスト
+            now: 現在時刻（UNIX時間）
+        
+        Raises:
+            RateLimitExceededError: カウンターが上限を超えた場合
+        """
+        repository = get_rate_limit_repository()
+        window = int(now // WINDOW_SECONDS)
+        window_end = (window + 1) * WINDOW_SECONDS
+        
+        # 加算したカウンターのキー
+        counted = []
+        exceeded = False
+        for key, limit in limits:
+            counter_id = f"{key}#{window}"
+            try:
+                item = repository.increment(counter_id, {"count": 1}, {"expires_at": window_end + WINDOW_SECONDS})
+            except StorageError:
+                metrics.increment("RateLimitErrors")
+                continue
+            counted.append(counter_id)
+            exceeded = exceeded or int(item["count"]) > limit
+        
+        if not exceeded:
+            return
+        for counter_id in counted:
+            try:
+                repository.increment(counter_id, {"count": -1})
+            except StorageError:
+                metrics.increment("RateLimitErrors")
+        raise RateLimitExceededError(window_end - now)
+
+
+# シングルトンインスタンス
+rate_limiter = RateLimiter()
@@ -0,0 +1,536 @@
+"""
+リポジトリサービス
+
+サービスとストレージの間のリポジトリインターフェースを提供する。
+ユーザー・投稿・アーカイブした投稿・検索インデックス・集計のテーブルごとに、キーによる読み書きとインデックスによる問い合わせ
+（作成日時順のタイムライン・タイトル順・ユーザー別・ユーザー名別・検索語別・集計の種類別）を抽象化する。
+使用するストレージは設定（STORAGE_BACKEND）で選択する。
+- dynamodb: DynamoDB（本番環境）
+- memory: プロセス内のメモリ（テスト・負荷試験・ローカル開発用、再起動で消える）
+- sqlite: SQLiteのデータベースファイル（単一サーバー・オンプレミス環境用）
+"""
+
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.config import get_settings
+
+# 使用できるストレージ
+STORAGE_BACKENDS = ("dynamodb", "memory", "sqlite")
+
+# 投稿テーブルのインデックス（インデックス名 → (パーティションキー, ソートキー)）
+POSTS_INDEXES = {
+    "user_id-index": ("user_id", None),
+    "pk-created_at-index": ("pk", "created_at"),
+    "pk-title_key-index": ("pk", "title_key"),
+}
+
+# アーカイブした投稿のテーブルのインデックス（タイムラインのみ）
+ARCHIVE_INDEXES = {
+    "pk-created_at-index": ("pk", "created_at"),
+}
+
+# 検索インデックスのテーブルのインデックス（検索語 → 投稿のポスティングのスコア・作成日時の順）
+SEARCH_INDEXES = {
+    "term-rank-index": ("term", "rank"),
+}
+
+# 集計テーブルのインデックス（集計の種類 → 日付・ユーザーIDの順）
+STATS_INDEXES = {
+    "kind-sort_key-index": ("kind", "sort_key"),
+}
+
+# レート制限のカウンターのテーブルのインデックス（キーでのみ読み書きする）
+RATE_LIMIT_INDEXES = {}
+
+# ユーザーテーブルのインデックス（インデックス名 → (パーティションキー, ソートキー)）
+USERS_INDEXES = {
+    "username-index": ("username", None),
+}
+
+# 投稿・ユーザー以外の予約済みアイテムのキーの接頭辞（UUIDと衝突しない）
+RESERVED_ID_PREFIX = "#"
+
+# 区分ごとのスキャン（scan_segment）で1回に読み取るアイテム数
+SCAN_SEGMENT_PAGE_SIZE = 1000
+
+
+class StorageError(Exception):
+    """
+    ストレージ例外
+    
+    ストレージの操作に失敗した場合に発生する。
+    """
+    
+    def __init__(self, message: str, code: Optional[str] = None):
+        """
+        例外の初期化
+        
+        Args:
+            message: エラーメッセージ
+            code: ストレージ固有のエラーコード
+        """
+        super().__init__(message)
+        # ストレージ固有のエラーコード
+        self.code = code
+
+
+class ConditionFailedError(StorageError):
+    """
+    条件不成立例外
+    
+    条件付きの書き込みで、アイテムが条件を満たさなかった場合に発生する。
+    """
+    pass
+
+
+class ThrottledError(StorageError):
+    """
+    スロットリング例外
+    
+    ストレージの処理能力を超えたため、書き込みが拒否された場合に発生する。
+    時間をおいて再試行できる。
+    """
+    pass
+
+
+def version_matches(item: Optional[dict], expected_version: int) -> bool:
+    """
+    アイテムのバージョンが期待するバージョンと一致するかを判定する
+    
+    DynamoDB以外のストレージで、DynamoDBの条件式（build_version_condition）と同じ判定を行うために使用する。
+    version属性を持たないアイテムはバージョン0として扱う（存在しないアイテムは0のみ一致する）。
+    
+    Args:
+        item: アイテム（存在しない場合はNone）
+        expected_version: 期待するバージョン
+    
+    Returns:
+        bool: 一致する場合True
+    """
+    if expected_version == 0:
+        return item is None or "version" not in item
+    return item is not None and int(item.get("version", 0)) == expected_version
+
+
+def delete_existing(repository: "Repository", key: str, version: Optional[int] = None) -> bool:
+    """
+    アイテムが存在する場合に削除し、この呼び出しで削除したかどうかを返す
+    
+    バージョンを条件に削除するため、同じアイテムを同時に削除した場合も
+    Trueを返すのは1つの呼び出しのみになる（集計の減算を1回にするために使用する）。
+    条件が成立しなかった場合は、読み込み直して最新のバージョンで再度削除する。
+    
+    Args:
+        repository: リポジトリ
+        key: キーの値
+        version: 読み込み済みのアイテムのバージョン（Noneの場合は最初に読み込む）
+    
+    Returns:
+        bool: この呼び出しで削除した場合True（存在しない、または他の呼び出しが削除した場合False）
+    """
+    while True:
+        if version is None:
+            item = repository.get(key, consistent=True)
+            if item is None:
+                return False
+            version = int(item.get("version", 0))
+        try:
+            repository.delete(key, expected_version=version)
+            return True
+        except ConditionFailedError:
+            version = None
+
+
+class Repository(ABC):
+    """
+    リポジトリ基底クラス（抽象クラス）
+    
+    1つのテーブルに対する操作を定義する。アイテムは属性名 → 値の辞書。
+    ストレージごとのサブクラスは抽象メソッドを全て実装する。
+    インデックスはパーティションキーの属性を持つアイテムのみを含む（DynamoDBのスパースインデックスと同じ）。
+    """
+    
+    def __init__(self, name: str, key_name: str, indexes: Dict[str, Tuple[str, Optional[str]]]):
+        """
+        リポジトリの初期化
+        
+        Args:
+            name: テーブル名
+            key_name: キー（パーティションキー）の属性名
+            indexes: インデックス名 → (パーティションキー, ソートキー)
+        """
+        # テーブル名（アイデンティティマップ・シングルフライトのキーにも使用する）
+        self.name = name
+        # キーの属性名
+        self.key_name = key_name
+        # インデックスの定義
+        self.indexes = indexes
+    
+    @abstractmethod
+    def get(self, key: str, consistent: bool = False) -> Optional[dict]:
+        """
+        キーでアイテムを取得する
+        
+        Args:
+            key: キーの値
+            consistent: 強い整合性の読み取りを行うかどうか
+        
+        Returns:
+            dict: アイテム、存在しない場合はNone
+        """
+    
+    @abstractmethod
+    def put(self, item: dict, if_not_exists: bool = False, expected_version: Optional[int] = None) -> None:
+        """
+        アイテムを書き込む（同じキーのアイテムは置き換える）
+        
+        Args:
+            item: アイテム
+            if_not_exists: 同じキーのアイテムが存在しない場合のみ書き込むかどうか
+            expected_version: 既存アイテムのversion属性がこの値の場合のみ書き込む（Noneの場合は検査しない）
+        
+        Raises:
+            ConditionFailedError: 条件を満たさなかった場合
+        """
+    
+    def put_many(self, items: Iterable[dict]) -> int:
+        """
+        複数のアイテムをまとめて書き込む（条件なし、同じキーのアイテムは置き換える）
+        
+        大量データの投入に使用する。ストレージがまとめた書き込みに対応していない場合は1件ずつ書き込む。
+        
+        Args:
+            items: アイテム
+        
+        Returns:
+            int: 書き込んだ件数
+        """
+        count = 0
+        for item in items:
+            self.put(item)
+            count += 1
+        return count
+    
+    @abstractmethod
+    def update(
+        self,
+        key: str,
+        changes: dict,
+        expected: Optional[dict] = None,
+        expected_version: Optional[int] = None,
+        increment_version: bool = True,
+        remove: Sequence[str] = (),
+    ) -> dict:
+        """
+        既存アイテムの属性を更新する
+        
+        version属性を持たない既存アイテムはバージョン0として扱う。
+        
+        Args:
+            key: キーの値
+            changes: 更新する属性名 → 値
+            expected: 更新の条件とする属性名 → 値（全て一致する場合のみ更新する）
+            expected_version: version属性がこの値の場合のみ更新する（Noneの場合は検査しない）
+            increment_version: version属性を1進めるかどうか
+            remove: 削除する属性名
+        
+        Returns:
+            dict: 更新後のアイテム
+        
+        Raises:
+            ConditionFailedError: アイテムが存在しない、または条件を満たさなかった場合
+        """
+    
+    @abstractmethod
+    def increment(self, key: str, counters: Dict[str, int], changes: Optional[dict] = None) -> dict:
+        """
+        アイテムの数値の属性に値を加算する（DynamoDBのADDと同じく、アイテム・属性が無い場合は0から加算する）
+        
+        同じアイテムへの同時の加算は取りこぼさない。version属性は変更しない。
+        
+        Args:
+            key: キーの値
+            counters: 加算する属性名 → 加算する値（減算は負の値）
+            changes: 同時に設定する属性名 → 値
+        
+        Returns:
+            dict: 更新後のアイテム
+        """
+    
+    @abstractmethod
+    def delete(self, key: str, expected_version: Optional[int] = None) -> None:
+        """
+        アイテムを削除する（存在しない場合は何もしない）
+        
+        Args:
+            key: キーの値
+            expected_version: アイテムが存在し、version属性がこの値の場合のみ削除する（Noneの場合は検査しない）
+        
+        Raises:
+            ConditionFailedError: expected_versionを指定し、アイテムが存在しない、またはバージョンが一致しない場合
+        """
+    
+    @abstractmethod
+    def query(
+        self,
+        index_name: str,
+        value: str,
+        descending: bool = False,
+        limit: Optional[int] = None,
+        attributes: Optional[Sequence[str]] = None,
+        before: Optional[str] = None,
+        prefix: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        インデックスのパーティションキーが一致するアイテムを取得する
+        
+        Args:
+            index_name: インデックス名
+            value: パーティションキーの値
+            descending: ソートキーの降順で返すかどうか
+            limit: 取得する最大件数（Noneの場合は全件）
+            attributes: 取得する属性名（Noneの場合は全属性）
+            before: ソートキーがこの値より小さいアイテムのみを取得する（ソートキーを持つインデックスのみ）
+            prefix: ソートキーがこの文字列で始まるアイテムのみを取得する（ソートキーを持つインデックスのみ、beforeとは同時に指定できない）
+        
+        Returns:
+            List[dict]: アイテムリスト（ソートキーを持つインデックスではソートキー順）
+        """
+    
+    @abstractmethod
+    def scan(self) -> List[dict]:
+        """
+        全アイテムを取得する
+        
+        Returns:
+            List[dict]: アイテムリスト（順序は不定）
+        """
+    
+    @abstractmethod
+    def scan_page(self, limit: int, start_key: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        アイテムを最大limit件ずつ取得する
+        
+        全件を一度に読み込まずに、続きのキーを使って繰り返し取得する。
+        取得件数がlimit件の場合は、続きが無くても続きのキーを返すことがある（次のページは空になる）。
+        
+        Args:
+            limit: 取得する最大件数
+            start_key: 前のページの続きのキー（Noneの場合は最初から）
+        
+        Returns:
+            Tuple[List[dict], Optional[str]]: (アイテムリスト, 続きのキー（最後のページの場合はNone）)
+        """
+    
+    def scan_segment(
+        self,
+        segment: int,
+        total_segments: int,
+        attributes: Optional[Sequence[str]] = None,
+    ) -> Iterator[dict]:
+        """
+        アイテムをtotal_segments個に分けたうちのsegment番目を順に読み取る（並列スキャン用）
+        
+        全てのsegmentを合わせると全アイテムを重複なく取得できる。
+        全件を一度に読み込まずに、scan_pageでSCAN_SEGMENT_PAGE_SIZE件ずつ読み取りながら返す。
+        DynamoDB以外のストレージでは、キーのハッシュ値で分ける。
+        
+        Args:
+            segment: 取得する区分の番号（0からtotal_segments-1）
+            total_segments: 区分の数
+            attributes: 取得する属性名（Noneの場合は全属性）
+        
+        Returns:
+            Iterator[dict]: アイテム（順序は不定）
+        """
+        start_key = None
+        while True:
+            items, start_key = self.scan_page(SCAN_SEGMENT_PAGE_SIZE, start_key)
+            for item in items:
+                if zlib.crc32(str(item[self.key_name]).encode("utf-8")) % total_segments != segment:
+                    continue
+                yield item if attributes is None else {name: item[name] for name in attributes if name in item}
+            if start_key is None:
+                return
+    
+    def count_segment(self, segment: int, total_segments: int, exclude_prefix: Optional[str] = None) -> int:
+        """
+        アイテムをtotal_segments個に分けたうちのsegment番目のアイテム数を数える（並列スキャン用）
+        
+        アイテムの内容は保持せず、キーのみを読み取りながら数える。
+        
+        Args:
+            segment: 数える区分の番号（0からtotal_segments-1）
+            total_segments: 区分の数
+            exclude_prefix: キーがこの文字列で始まるアイテムは数えない（Noneの場合は全て数える）
+        
+        Returns:
+            int: アイテム数
+        """
+        return sum(
+            1 for item in self.scan_segment(segment, total_segments, [self.key_name])
+            if exclude_prefix is None or not str(item[self.key_name]).startswith(exclude_prefix)
+        )
+    
+    def delete_many(self, keys: Iterable[str]) -> int:
+        """
+        複数のアイテムをまとめて削除する（条件なし、存在しないキーは無視する）
+        
+        ストレージがまとめた削除に対応していない場合は1件ずつ削除する。
+        
+        Args:
+            keys: キーの値
+        
+        Returns:
+            int: 削除を要求した件数
+        """
+        count = 0
+        for key in keys:
+            self.delete(key)
+            count += 1
+        return count
+    
+    def warm_up(self) -> None:
+        """ストレージへの接続を事前に初期化する（初期化が不要なストレージでは何もしない）"""
+        pass
+
+
+# テーブルの種類 → リポジトリ
+_repositories: Dict[str, Repository] = {}
+
+# リポジトリ作成の排他用のロック
+_lock = threading.Lock()
+
+
+def _create_repository(kind: str) -> Repository:
+    """
+    設定に基づいてリポジトリを作成する
+    
+    使用しないストレージのライブラリ（boto3など）は読み込まない。
+    
+    Args:
+        kind: テーブルの種類（users・posts・archive・search・stats・ratelimit）
+    
+    Returns:
+        Repository: リポジトリ
+    
+    Raises:
+        ValueError: STORAGE_BACKENDが不正な場合
+    """
+    settings = get_settings()
+    if kind == "users":
+        name, key_name, indexes = settings.USERS_TABLE, "user_id", USERS_INDEXES
+    elif kind == "archive":
+        name, key_name, indexes = settings.ARCHIVE_TABLE, "post_id", ARCHIVE_INDEXES
+    elif kind == "search":
+        name, key_name, indexes = settings.SEARCH_TABLE, "entry_id", SEARCH_INDEXES
+    elif kind == "stats":
+        name, key_name, indexes = settings.STATS_TABLE, "stat_id", STATS_INDEXES
+    elif kind == "ratelimit":
+        name, key_name, indexes = settings.RATE_LIMIT_TABLE, "limit_id", RATE_LIMIT_INDEXES
+    else:
+        name, key_name, indexes = settings.POSTS_TABLE, "post_id", POSTS_INDEXES
+    
+    if settings.STORAGE_BACKEND == "dynamodb":
+        from app.services.dynamodb_repository import DynamoDBRepository
+        return DynamoDBRepository(name, key_name, indexes)
+    if settings.STORAGE_BACKEND == "memory":
+        from app.services.memory_repository import MemoryRepository
+        return MemoryRepository(name, key_name, indexes)
+    if settings.STORAGE_BACKEND == "sqlite":
+        from app.services.sqlite_repository import SQLiteRepository
+        return SQLiteRepository(name, key_name, indexes)
+    raise ValueError(f"STORAGE_BACKENDが不正です: {settings.STORAGE_BACKEND}（{', '.join(STORAGE_BACKENDS)}のいずれか）")
+
+
+def _get_repository(kind: str) -> Repository:
+    """
+    リポジトリのシングルトンインスタンスを取得する
+    
+    Args:
+        kind: テーブルの種類（users・posts・archive・search・stats・ratelimit）
+    
+    Returns:
+        Repository: リポジトリ
+    """
+    repository = _repositories.get(kind)
+    if repository is None:
+        with _lock:
+            repository = _repositories.get(kind)
+            if repository is None:
+                repository = _repositories[kind] = _create_repository(kind)
+    return repository
+
+
+def get_users_repository() -> Repository:
+    """
+    ユーザーのリポジトリを取得する
+    
+    Returns:
+        Repository: ユーザーのリポジトリ
+    """
+    return _get_repository("users")
+
+
+def get_posts_repository() -> Repository:
+    """
+    投稿のリポジトリを取得する
+    
+    Returns:
+        Repository: 投稿のリポジトリ
+    """
+    return _get_repository("posts")
+
+
+def get_archive_repository() -> Repository:
+    """
+    アーカイブした投稿のリポジトリを取得する
+    
+    Returns:
+        Repository: アーカイブした投稿のリポジトリ
+    """
+    return _get_repository("archive")
+
+
+def get_search_repository() -> Repository:
+    """
+    検索インデックスのリポジトリを取得する
+    
+    Returns:
+        Repository: 検索インデックスのリポジトリ
+    """
+    return _get_repository("search")
+
+
+def get_stats_repository() -> Repository:
+    """
+    集計のリポジトリを取得する
+    
+    Returns:
+        Repository: 集計のリポジトリ
+    """
+    return _get_repository("stats")
+
+
+def get_rate_limit_repository() -> Repository:
+    """
+    レート制限のカウンターのリポジトリを取得する
+    
+    Returns:
+        Repository: レート制限のカウンターのリポジトリ
+    """
+    return _get_repository("ratelimit")
+
+
+def reset_repositories() -> None:
+    """
+    リポジトリを破棄する
+    
+    設定（STORAGE_BACKEND・テーブル名）の変更後に、リポジトリを作り直すために使用する。
+    メモリのストレージではデータも破棄される。
+    """
+    with _lock:
+        _repositories.clear()
@@ -0,0 +1,97 @@
+"""
+レスポンスクラス
+
+APIレスポンスの共通クラスを提供する。
+"""
+
+from typing import Any, Dict, Iterable, Optional
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+from app.config import get_settings
+from app.services.timing import timed
+
+
+def clamp_page_size(limit: int) -> int:
+    """
+    一覧の取得件数を1件以上・MAX_PAGE_SIZE件以下に制限する
+    
+    Args:
+        limit: 要求された件数
+    
+    Returns:
+        int: 制限後の件数
+    """
+    return max(1, min(limit, get_settings().MAX_PAGE_SIZE))
+
+
+def page_headers(next_cursor: Optional[str], total: Optional[int] = None) -> Optional[Dict[str, str]]:
+    """
+    一覧の1ページ分のレスポンスヘッダーを作成する
+    
+    Args:
+        next_cursor: 次のページのカーソル（最後のページの場合はNone）
+        total: 一覧の総件数（不明な場合はNone）
+    
+    Returns:
+        Optional[Dict[str, str]]: X-Next-Cursor・X-Total-Countヘッダー（どちらも無い場合はNone）
+    """
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        headers["X-Total-Count"] = str(total)
+    return headers or None
+
+
+class TimedJSONResponse(JSONResponse):
+    """
+    計測付きJSONレスポンスクラス
+
+    JSONへのシリアライズ時間をリクエストの計測に記録するために作成。
+    """
+    
+    def render(self, content: Any) -> bytes:
+        """
+        レスポンスボディをJSONにシリアライズする
+        
+        Args:
+            content: レスポンスの内容
+        
+        Returns:
+            bytes: JSONのバイト列
+        """
+        with timed("serialize"):
+            return super().render(content)
+
+
+class ModelListResponse(Response):
+    """
+    モデル一覧のJSONレスポンスクラス
+    
+    モデルのイテラブルを1件ずつJSONに変換して連結する。
+    モデルリスト・辞書リスト（jsonable_encoder）・JSONの3つの複製を同時に保持せずに済むように作成。
+    """
+    
+    media_type = "application/json"
+    
+    def render(self, content: Iterable[BaseModel]) -> bytes:
+        """
+        モデルのイテラブルをJSON配列にシリアライズする
+        
+        Args:
+            content: モデルのイテラブル（ジェネレーターの場合は変換しながら書き出す）
+        
+        Returns:
+            bytes: JSONのバイト列
+        """
+        with timed("serialize"):
+            body = bytearray(b"[")
+            for index, model in enumerate(content):
+                if index:
+                    body += b","
+                body += to_json(model)
+            body += b"]"
+            return bytes(body)
@@ -0,0 +1,291 @@
+"""
+検索インデックス
+
+投稿のタイトル・本文の全文検索用の転置インデックスを提供する。
+日本語は単語の区切りが無いため、文字の連続をN文字ずつ区切ったN-gramを検索語とする。
+1文字の語（「猫」など）でも検索できるよう、各文字（ユニグラム）も検索語として索引する。
+タイトルの前方一致（入力補完）には、投稿アイテムに正規化したタイトル（title_key）を保持して
+投稿のテーブルのインデックスのソートキーとする。
+検索インデックスのテーブルには、検索語・投稿ごとのポスティング（スコア・作成日時）と、
+投稿ごとの索引済み検索語の一覧（更新・削除時に古いポスティングを削除するため）を保存する。
+ポスティングはスコア・作成日時の順のソートキー（rank）で索引し、検索時は検索語ごとに
+スコアの高い順にSEARCH_MAX_POSTINGS件までを読み取る（読み取りを投稿数に依存させない）。
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from app.config import get_settings
+from app.services.repository import Repository, get_search_repository
+
+# N-gramの文字数
+NGRAM_SIZE = 2
+
+# タイトルに含まれる検索語のスコアの重み（本文は1）
+TITLE_WEIGHT = 3
+
+# 1回の検索で使用する最大の検索語数（長い検索文字列による読み取りの増加を抑える）
+MAX_QUERY_TERMS = 16
+
+# ポスティングのソートキー（rank）のスコアの桁数（文字列の順序をスコアの順序と一致させる）
+RANK_SCORE_DIGITS = 8
+
+# 投稿ごとの索引済み検索語の一覧のアイテムのentry_idの接頭辞（検索語は記号を含まないため衝突しない）
+DOCUMENT_PREFIX = "#DOC#"
+
+# 検索語の区切り（文字・数字の連続を1つの区切りとする）
+_WORD_PATTERN = re.compile(r"\w+")
+
+# 空白の連続
+_SPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """
+    文字列を検索用に正規化する（NFKC正規化による全角英数字・半角カナの統一と小文字化）
+    
+    Args:
+        text: 文字列
+    
+    Returns:
+        str: 正規化した文字列
+    """
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def title_key(title: str) -> str:
+    """
+    タイトルの前方一致の問い合わせに使用するソートキーを作成する
+    
+    正規化し、前後の空白を除いて空白の連続を1つの空白にする。
+    
+    Args:
+        title: タイトル（または入力途中の接頭辞）
+    
+    Returns:
+        str: ソートキー
+    """
+    return _SPACE_PATTERN.sub(" ", normalize(title)).strip()
+
+
+def _word_terms(word: str) -> List[str]:
+    """
+    記号・空白で区切った1つの部分をNGRAM_SIZE文字ずつ1文字ずらして切り出す
+    
+    Args:
+        word: 正規化した文字・数字の連続
+    
+    Returns:
+        List[str]: N-gramのリスト（NGRAM_SIZE文字以下の部分はその部分のみ）
+    """
+    if len(word) <= NGRAM_SIZE:
+        return [word]
+    return [word[index:index + NGRAM_SIZE] for index in range(len(word) - NGRAM_SIZE + 1)]
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    文字列を索引する検索語に分割する
+    
+    NFKC正規化（全角英数字・半角カナの統一）と小文字化を行い、
+    記号・空白で区切った各部分をNGRAM_SIZE文字ずつ1文字ずらして切り出す。
+    NGRAM_SIZE文字未満の部分はそのまま検索語とする。
+    1文字の検索語がより長い部分の中の文字にも一致するよう、2文字以上の部分の各文字も検索語とする。
+    
+    Args:
+        text: 文字列
+    
+    Returns:
+        List[str]: 検索語リスト（部分ごとにN-gram・各文字の順、重複を含む）
+    """
+    terms = []
+    for word in _WORD_PATTERN.findall(normalize(text)):
+        terms.extend(_word_terms(word))
+        if len(word) > 1:
+            terms.extend(word)
+    return terms
+
+
+def query_terms(query: str) -> List[str]:
+    """
+    検索文字列を検索に使用する検索語に分割する
+    
+    各部分をN-gramに分割し、1文字の部分はその文字（索引済みのユニグラム）を検索語とする。
+    N-gramを含む部分の各文字は、N-gramで絞り込まれるため検索語にしない。
+    
+    Args:
+        query: 検索文字列
+    
+    Returns:
+        List[str]: 検索語リスト（重複を除いた出現順、MAX_QUERY_TERMS件まで、文字・数字を含まない場合は空）
+    """
+    terms = dict.fromkeys(
+        term for word in _WORD_PATTERN.findall(normalize(query)) for term in _word_terms(word)
+    )
+    return list(terms)[:MAX_QUERY_TERMS]
+
+
+def posting_rank(score: int, created_at: str) -> str:
+    """
+    ポスティングのソートキーを作成する（降順で読み取るとスコアの高い順、同じスコアは新しい順になる）
+    
+    Args:
+        score: 検索語のスコア
+        created_at: 投稿の作成日時
+    
+    Returns:
+        str: ソートキー
+    """
+    return f"{min(score, 10 ** RANK_SCORE_DIGITS - 1):0{RANK_SCORE_DIGITS}d}#{created_at}"
+
+
+def score_terms(title: str, message: str) -> Dict[str, int]:
+    """
+    投稿の検索語ごとのスコア（出現回数、タイトルはTITLE_WEIGHT倍）を計算する
+    
+    Args:
+        title: タイトル
+        message: 本文
+    
+    Returns:
+        Dict[str, int]: 検索語 → スコア
+    """
+    scores = Counter(tokenize(message))
+    for term, count in Counter(tokenize(title)).items():
+        scores[term] += count * TITLE_WEIGHT
+    return dict(scores)
+
+
+class SearchIndex:
+    """
+    検索インデックスクラス
+    
+    PostServiceが投稿の作成・更新・削除時に更新し、検索時に問い合わせる。
+    """
+    
+    def _get_repository(self) -> Repository:
+        """
+        検索インデックスのリポジトリを取得する（遅延読み込み）
+        
+        Returns:
+            Repository: 検索インデックスのリポジトリ
+        """
+        return get_search_repository()
+    
+    def index_post(self, post_id: str, title: str, message: str, created_at: str) -> None:
+        """
+        投稿のポスティングを書き込む（索引済みの場合は、含まれなくなった検索語のポスティングを削除する）
+        
+        Args:
+            post_id: 投稿ID
+            title: タイトル
+            message: 本文
+            created_at: 作成日時（同じスコアの検索結果を新しい順に並べるために使用する）
+        """
+        repository = self._get_repository()
+        scores = score_terms(title, message)
+        
+        for term in set(self._indexed_terms(repository, post_id)) - set(scores):
+            repository.delete(self._posting_id(term, post_id))
+        repository.put_many(
+            {
+                "entry_id": self._posting_id(term, post_id), "term": term, "post_id": post_id,
+                "score": score, "created_at": created_at, "rank": posting_rank(score, created_at),
+            }
+            for term, score in scores.items()
+        )
+        repository.put({"entry_id": DOCUMENT_PREFIX + post_id, "terms": sorted(scores)})
+    
+    def remove_post(self, post_id: str) -> None:
+        """
+        投稿のポスティングを削除する
+        
+        Args:
+            post_id: 投稿ID
+        """
+        repository = self._get_repository()
+        for term in self._indexed_terms(repository, post_id):
+            repository.delete(self._posting_id(term, post_id))
+        repository.delete(DOCUMENT_PREFIX + post_id)
+    
+    def search(self, query: str, limit: int, offset: int = 0) -> Tuple[List[str], Optional[int]]:
+        """
+        検索文字列の全ての検索語を含む投稿を検索する
+        
+        検索語ごとのスコアの合計の降順、同じスコアの場合は作成日時の降順に並べる。
+        検索語ごとにスコアの高い順にSEARCH_MAX_POSTINGS件までのポスティングを読み取り、
+        件数の少ない（珍しい）検索語から順に絞り込む。ポスティングがSEARCH_MAX_POSTINGS件を超える検索語では、
+        スコアの低い投稿は検索結果に含まれない。
+        
+        Args:
+            query: 検索文字列
+            limit: 取得する最大件数
+            offset: 先頭から読み飛ばす件数
+        
+        Returns:
+            Tuple[List[str], Optional[int]]: (投稿IDリスト, 続きのoffset（最後のページの場合はNone）)
+        """
+        repository = self._get_repository()
+        max_postings = get_settings().SEARCH_MAX_POSTINGS
+        
+        found = []
+        for term in query_terms(query):
+            postings = repository.query(
+                "term-rank-index", term, descending=True, limit=max_postings, attributes=["post_id", "score", "created_at"],
+            )
+            # 索引されていない検索語がある場合は残りの検索語を読み取らない
+            if not postings:
+                return [], None
+            found.append({posting["post_id"]: (int(posting["score"]), posting["created_at"]) for posting in postings})
+        
+        if not found:
+            return [], None
+        
+        found.sort(key=len)
+        matches = found[0]
+        for postings in found[1:]:
+            matches = {
+                post_id: (score + postings[post_id][0], created_at)
+                for post_id, (score, created_at) in matches.items()
+                if post_id in postings
+            }
+            # 一致する投稿が無くなった場合は残りの検索語で絞り込まない
+            if not matches:
+                return [], None
+        
+        ranked = sorted(matches, key=lambda post_id: matches[post_id], reverse=True)
+        next_offset = offset + limit if len(ranked) > offset + limit else None
+        return ranked[offset:offset + limit], next_offset
+    
+    def _indexed_terms(self, repository: Repository, post_id: str) -> List[str]:
+        """
+        投稿の索引済みの検索語を取得する
+        
+        Args:
+            repository: 検索インデックスのリポジトリ
+            post_id: 投稿ID
+        
+        Returns:
+            List[str]: 検索語リスト（索引されていない場合は空）
+        """
+        document = repository.get(DOCUMENT_PREFIX + post_id, consistent=True)
+        return list(document["terms"]) if document else []
+    
+    def _posting_id(self, term: str, post_id: str) -> str:
+        """
+        ポスティングのentry_idを作成する
+        
+        Args:
+            term: 検索語
+            post_id: 投稿ID
+        
+        Returns:
+            str: entry_id
+        """
+        return f"{term}#{post_id}"
+
+
+# シングルトンインスタンス
+search_index = SearchIndex()
@@ -0,0 +1,181 @@
+"""
+シングルフライトサービス
+
+同一キーに対する同時実行中の読み取りを1回のバックエンド呼び出しにまとめる。
+人気の投稿へのアクセスが集中した際に、DynamoDBへの同一リクエストの多重発行を防ぐ。
+"""
+
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Hashable, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+
+class _Call:
+    """
+    実行中の呼び出しクラス
+    
+    スレッド経由で呼び出しを共有するための結果の受け渡し領域。
+    """
+    
+    def __init__(self):
+        """呼び出しの初期化"""
+        # 完了通知用のイベント
+        self.event = threading.Event()
+        # 呼び出し結果
+        self.result: Any = None
+        # 呼び出しで発生した例外
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """
+    シングルフライトクラス
+    
+    同じキーの呼び出しが実行中であれば新たに実行せず、その結果を共有する。
+    スレッド（同期）と asyncio（非同期）のどちらの呼び出し元からも利用できる。
+    """
+    
+    def __init__(self, name: str):
+        """
+        シングルフライトの初期化
+        
+        Args:
+            name: メトリクスに表示するグループ名
+        """
+        # グループ名
+        self.name = name
+        # 呼び出し状態を保護するロック
+        self._lock = threading.Lock()
+        # スレッド経由で実行中の呼び出し（キー → 呼び出し）
+        self._calls: Dict[Hashable, _Call] = {}
+        # asyncio経由で実行中の呼び出し（(イベントループID, キー) → Future）
+        self._futures: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+        # 実行中の共有の呼び出しのタスク（呼び出し元が全てキャンセルされても完了まで参照を保持する）
+        self._tasks: Set[asyncio.Task] = set()
+        # 呼び出し回数
+        self.calls = 0
+        # 実際にバックエンドを呼び出した回数
+        self.executions = 0
+    
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        同期的に呼び出す
+        
+        同じキーの呼び出しが他のスレッドで実行中の場合は、その完了を待って結果を共有する。
+        
+        Args:
+            key: 呼び出しを識別するキー
+            fn: バックエンドを呼び出す関数
+        
+        Returns:
+            Any: fnの戻り値
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+        
+        if not is_leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+    
+    async def do_async(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        非同期に呼び出す
+        
+        先頭の呼び出し元が共有のタスクを開始してスレッドプールでfnを実行し、
+        全ての呼び出し元はスレッドを占有せずにその完了を待つ。
+        実行は呼び出し元から独立したタスクで行うため、先頭の呼び出し元がキャンセルされても
+        実行を続けて後続の呼び出し元に結果を渡す。
+        実行はdo()を経由するため、同期の呼び出し元とも結果を共有する。
+        
+        Args:
+            key: 呼び出しを識別するキー
+            fn: バックエンドを呼び出す関数（ブロッキング）
+        
+        Returns:
+            Any: fnの戻り値
+        """
+        loop = asyncio.get_running_loop()
+        future_key = (id(loop), key)
+        
+        future = self._futures.get(future_key)
+        if future is None:
+            future = loop.create_future()
+            self._futures[future_key] = future
+            task = loop.create_task(self._run_shared(future_key, future, key, fn))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            with self._lock:
+                self.calls += 1
+        # 呼び出し元のキャンセルが共有の呼び出しに波及しないようにする
+        return await asyncio.shield(future)
+    
+    async def _run_shared(
+        self,
+        future_key: Tuple[int, Hashable],
+        future: asyncio.Future,
+        key: Hashable,
+        fn: Callable[[], Any],
+    ) -> None:
+        """
+        共有の呼び出しをスレッドプールで実行し、結果をFutureに設定する
+        
+        Args:
+            future_key: Futureのキー（(イベントループID, キー)）
+            future: 呼び出し元が待つFuture
+            key: 呼び出しを識別するキー
+            fn: バックエンドを呼び出す関数（ブロッキング）
+        """
+        try:
+            result = await run_in_threadpool(self.do, key, fn)
+        except asyncio.CancelledError:
+            # イベントループの終了などでタスク自体がキャンセルされた場合
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 呼び出し元が全てキャンセルされた場合の未取得例外の警告を抑止する
+            future.exception()
+        else:
+            future.set_result(result)
+        finally:
+            del self._futures[future_key]
+    
+    def stats(self) -> dict:
+        """
+        合流状況のメトリクスを返す
+        
+        Returns:
+            dict: 呼び出し回数・実行回数・合流率
+        """
+        with self._lock:
+            calls = self.calls
+            executions = self.executions
+        shared = calls - executions
+        return {
+            "calls": calls,
+            "executions": executions,
+            "shared": shared,
+            "coalescing_ratio": shared / calls if calls else 0.0,
+        }
@@ -0,0 +1,612 @@
+"""
+SQLiteリポジトリ
+
+SQLiteのデータベースファイルを使用するリポジトリの実装。
+DynamoDBを使用できない単一サーバー・オンプレミス環境向け。
+
+- アイテムはJSONとして保持し、キーとインデックスのキーの属性は列にも保持して索引を作成する
+  （pk-created_at-index・user_id-index・username-indexなどに対応する。
+  既存のデータベースファイルに無いインデックスのキーの列は、初回接続時に追加してアイテムから値を設定する）
+- WALモードにより、書き込み中も他の接続からの読み取りを待たせない
+- 接続はスレッドごと（fork後のプロセスでは作り直す）に作成し、SQL文は接続のキャッシュで再利用する
+"""
+
+import base64
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.config import get_settings
+from app.services.repository import ConditionFailedError, Repository, StorageError, ThrottledError, version_matches
+
+# 接続ごとにキャッシュするSQL文の数
+STATEMENT_CACHE_SIZE = 128
+
+# ロックの解放を待つ秒数（超えた場合はThrottledError）
+BUSY_TIMEOUT_SECONDS = 5.0
+
+# 前方一致の問い合わせの上限（接頭辞の後に付けた文字列より小さい値を一致とする）
+PREFIX_UPPER_BOUND = "\U0010ffff"
+
+
+# バイナリ値をJSONで表すオブジェクトのキー
+BINARY_TAG = "$b"
+
+
+def _json_default(value):
+    """
+    JSONに変換できない値を変換する（DynamoDBから移行したアイテムのDecimal・バイナリ値など）
+    
+    Args:
+        value: 値
+    
+    Returns:
+        int | float | dict: 数値、またはバイナリ値を表すオブジェクト（Base64）
+    """
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (bytes, bytearray)):
+        return {BINARY_TAG: base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"JSONに変換できない値です: {type(value).__name__}")
+
+
+def _json_object_hook(value: dict):
+    """
+    JSONのオブジェクトのうち、バイナリ値を表すものをbytesに戻す
+    
+    Args:
+        value: JSONのオブジェクト
+    
+    Returns:
+        dict | bytes: オブジェクト、またはバイナリ値
+    """
+    if len(value) == 1 and BINARY_TAG in value:
+        return base64.b64decode(value[BINARY_TAG])
+    return value
+
+
+def _loads(text: str) -> dict:
+    """
+    JSONのアイテムを読み込む
+    
+    Args:
+        text: JSON
+    
+    Returns:
+        dict: アイテム
+    """
+    return json.loads(text, object_hook=_json_object_hook)
+
+
+def _to_storage_error(error: sqlite3.Error) -> StorageError:
+    """
+    SQLiteのエラーをストレージ例外に変換する
+    
+    Args:
+        error: SQLiteのエラー
+    
+    Returns:
+        StorageError: ストレージ例外
+    """
+    if isinstance(error, sqlite3.OperationalError) and "locked" in str(error):
+        return ThrottledError("データベースがロックされています", "SQLITE_BUSY")
+    return StorageError(str(error), type(error).__name__)
+
+
+@contextmanager
+def _transaction(connection: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """
+    書き込みトランザクションを開始する
+    
+    BEGIN IMMEDIATEで書き込みロックを先に取得し、確認から書き込みまでの間に
+    他の接続が書き込まないようにする。例外が発生した場合はロールバックする。
+    
+    Args:
+        connection: 接続
+    
+    Yields:
+        sqlite3.Connection: 接続
+    """
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield connection
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+
+def _quote(name: str) -> str:
+    """
+    識別子（テーブル名・列名）を引用符で囲む
+    
+    Args:
+        name: 識別子
+    
+    Returns:
+        str: 引用符で囲んだ識別子
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SQLiteRepository(Repository):
+    """
+    SQLiteリポジトリクラス
+    
+    1つのテーブルをSQLiteの1つのテーブルに対応させる。
+    条件付きの書き込みはトランザクション（BEGIN IMMEDIATE）内で現在のアイテムを確認してから行う。
+    """
+    
+    def __init__(self, name: str, key_name: str, indexes: Dict[str, Tuple[str, Optional[str]]], path: Optional[str] = None):
+        """
+        リポジトリの初期化
+        
+        Args:
+            name: テーブル名
+            key_name: キーの属性名
+            indexes: インデックス名 → (パーティションキー, ソートキー)
+            path: データベースファイルのパス（省略時は設定のSQLITE_PATH）
+        """
+        super().__init__(name, key_name, indexes)
+        # データベースファイルのパス
+        self.path = path or get_settings().SQLITE_PATH
+        # 列として保持する属性（キー・インデックスのキー）
+        self._columns: List[str] = [key_name]
+        for partition_key, sort_key in indexes.values():
+            for attribute in (partition_key, sort_key):
+                if attribute is not None and attribute not in self._columns:
+                    self._columns.append(attribute)
+        # スレッドごとの接続
+        self._local = threading.local()
+        # 接続を作成したプロセスID（fork後に接続を作り直すため）
+        self._pid = os.getpid()
+        # テーブル作成済みかどうか
+        self._schema_ready = False
+        # テーブル作成の排他用のロック
+        self._schema_lock = threading.Lock()
+        self._build_statements()
+    
+    def _build_statements(self) -> None:
+        """使用するSQL文を作成する（接続のSQL文キャッシュで再利用するため固定の文字列にする）"""
+        table = _quote(self.name)
+        key = _quote(self.key_name)
+        columns = ", ".join(_quote(column) for column in self._columns)
+        placeholders = ", ".join("?" for _ in range(len(self._columns) + 1))
+        
+        # SQL文の種類 → SQL文
+        self._sql = {
+            "get": f"SELECT item FROM {table} WHERE {key} = ?",
+            "insert": f"INSERT INTO {table} ({columns}, item) VALUES ({placeholders})",
+            "replace": f"INSERT OR REPLACE INTO {table} ({columns}, item) VALUES ({placeholders})",
+            "delete": f"DELETE FROM {table} WHERE {key} = ?",
+            "scan": f"SELECT item FROM {table}",
+            "scan_keys": f"SELECT {key} FROM {table}",
+            "scan_page": f"SELECT {key}, item FROM {table} WHERE {key} > ? ORDER BY {key} LIMIT ?",
+        }
+        # インデックス名 → (昇順のSQL文, 降順のSQL文)
+        self._query_sql: Dict[str, Tuple[str, str]] = {}
+        # インデックス名 → ソートキーの上限を指定した(昇順のSQL文, 降順のSQL文)
+        self._query_before_sql: Dict[str, Tuple[str, str]] = {}
+        # インデックス名 → ソートキーの範囲（前方一致）を指定した(昇順のSQL文, 降順のSQL文)
+        self._query_prefix_sql: Dict[str, Tuple[str, str]] = {}
+        for index_name, (partition_key, sort_key) in self.indexes.items():
+            where = f"WHERE {_quote(partition_key)} = ?"
+            if sort_key is None:
+                sql = f"SELECT item FROM {table} {where} LIMIT ?"
+                self._query_sql[index_name] = self._query_before_sql[index_name] = (sql, sql)
+                self._query_prefix_sql[index_name] = (sql, sql)
+            else:
+                where += f" AND {_quote(sort_key)} IS NOT NULL"
+                self._query_sql[index_name] = tuple(
+                    f"SELECT item FROM {table} {where} ORDER BY {_quote(sort_key)} {order} LIMIT ?"
+                    for order in ("ASC", "DESC")
+                )
+                self._query_before_sql[index_name] = tuple(
+                    f"SELECT item FROM {table} {where} AND {_quote(sort_key)} < ? ORDER BY {_quote(sort_key)} {order} LIMIT ?"
+                    for order in ("ASC", "DESC")
+                )
+                # 前方一致は索引を使用できるよう範囲の条件にする
+                self._query_prefix_sql[index_name] = tuple(
+                    f"SELECT item FROM {table} {where} AND {_quote(sort_key)} >= ? AND {_quote(sort_key)} < ? "
+                    f"ORDER BY {_quote(sort_key)} {order} LIMIT ?"
+                    for order in ("ASC", "DESC")
+                )
+    
+    def _schema_statements(self) -> List[str]:
+        """
+        テーブルと索引を作成するSQL文を作成する
+        
+        Returns:
+            List[str]: SQL文リスト（先頭はテーブルを作成するSQL文）
+        """
+        table = _quote(self.name)
+        column_definitions = ", ".join(
+            f"{_quote(column)} TEXT PRIMARY KEY" if column == self.key_name else f"{_quote(column)} TEXT"
+            for column in self._columns
+        )
+        statements = [f"CREATE TABLE IF NOT EXISTS {table} ({column_definitions}, item TEXT NOT NULL)"]
+        for index_name, (partition_key, sort_key) in self.indexes.items():
+            index_columns = ", ".join(_quote(column) for column in (partition_key, sort_key) if column is not None)
+            statements.append(
+                f"CREATE INDEX IF NOT EXISTS {_quote(self.name + '.' + index_name)} ON {table} ({index_columns})"
+            )
+        return statements
+    
+    def _add_missing_columns(self, connection: sqlite3.Connection) -> None:
+        """
+        既存のテーブルに無い列（後から追加したインデックスのキー）を追加し、アイテムの属性値を設定する
+        
+        Args:
+            connection: 接続
+        """
+        table = _quote(self.name)
+        # 他のプロセスが同時に追加しないよう、書き込みロックを取得してから確認する
+        with _transaction(connection):
+            existing = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+            for column in self._columns:
+                if column not in existing:
+                    connection.execute(f"ALTER TABLE {table} ADD COLUMN {_quote(column)} TEXT")
+                    connection.execute(f"UPDATE {table} SET {_quote(column)} = json_extract(item, ?)", (f'$."{column}"',))
+    
+    def _connection(self) -> sqlite3.Connection:
+        """
+        現在のスレッドの接続を取得する
+        
+        初回はWALモードを設定し、テーブルと索引が無ければ作成する。
+        
+        Returns:
+            sqlite3.Connection: 接続
+        """
+        if self._pid != os.getpid():
+            # fork前のプロセスの接続は使用できないため破棄する
+            self._local = threading.local()
+            self._pid = os.getpid()
+        
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            return connection
+        
+        try:
+            # 自動コミットモード（トランザクションは条件付きの書き込みでのみ明示的に開始する）
+            connection = sqlite3.connect(
+                self.path,
+                timeout=BUSY_TIMEOUT_SECONDS,
+                isolation_level=None,
+                cached_statements=STATEMENT_CACHE_SIZE,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            if not self._schema_ready:
+                with self._schema_lock:
+                    if not self._schema_ready:
+                        create_table, *create_indexes = self._schema_statements()
+                        connection.execute(create_table)
+                        self._add_missing_columns(connection)
+                        for statement in create_indexes:
+                            connection.execute(statement)
+                        self._schema_ready = True
+        except sqlite3.Error as e:
+            raise _to_storage_error(e) from e
+        
+        self._local.connection = connection
+        return connection
+    
+    def _row(self, item: dict) -> tuple:
+        """
+        アイテムを書き込む行の値に変換する
+        
+        インデックスのキーの属性を持たないアイテムはNULLとし、インデックスの問い合わせに含めない。
+        
+        Args:
+            item: アイテム
+        
+        Returns:
+            tuple: 列の値とJSONのアイテム
+        """
+        values = [item.get(column) for column in self._columns]
+        return (*values, json.dumps(item, ensure_ascii=False, default=_json_default))
+    
+    def _fetch_item(self, connection: sqlite3.Connection, key: str) -> Optional[dict]:
+        """
+        キーでアイテムを読み取る
+        
+        Args:
+            connection: 接続
+            key: キーの値
+        
+        Returns:
+            dict: アイテム、存在しない場合はNone
+        """
+        row = connection.execute(self._sql["get"], (key,)).fetchone()
+        return _loads(row[0]) if row else None
+    
+    def get(self, key: str, consistent: bool = False) -> Optional[dict]:
+        """
+        キーでアイテムを取得する
+        
+        SQLiteの読み取りは常に最新のため、consistentに関わらず同じ結果を返す。
+        
+        Args:
+            key: キーの値
+            consistent: 強い整合性の読み取りを行うかどうか
+        
+        Returns:
+            dict: アイテム、存在しない場合はNone
+        """
+        try:
+            return self._fetch_item(self._connection(), key)
+        except sqlite3.Error as e:
+            raise _to_storage_error(e) from e
+    
+    def put(self, item: dict, if_not_exists: bool = False, expected_version: Optional[int] = None) -> None:
+        """
+        アイテムを書き込む（同じキーのアイテムは置き換える）
+        
+        Args:
+            item: アイテム
+            if_not_exists: 同じキーのアイテムが存在しない場合のみ書き込むかどうか
+            expected_version: 既存アイテムのversion属性がこの値の場合のみ書き込む
+        
+        Raises:
+            ConditionFailedError: 条件を満たさなかった場合
+        """
+        connection = self._connection()
+        try:
+            if expected_version is None:
+                if if_not_exists:
+                    try:
+                        connection.execute(self._sql["insert"], self._row(item))
+                    except sqlite3.IntegrityError:
+                        raise ConditionFailedError("同じキーのアイテムが存在します") from None
+                else:
+                    connection.execute(self._sql["replace"], self._row(item))
+                return
+            
+            with _transaction(connection):
+                current = self._fetch_item(connection, item[self.key_name])
+                if if_not_exists and current is not None:
+                    raise ConditionFailedError("同じキーのアイテムが存在します")
+                if not version_matches(current, expected_version):
+                    raise ConditionFailedError("バージョンが一致しません")
+                connection.execute(self._sql["replace"], self._row(item))
+        except sqlite3.Error as e:
+            raise _to_storage_error(e) from e
+    
+    def put_many(self, items: Iterable[dict]) -> int:
+        """
+        複数のアイテムを1つのトランザクションでまとめて書き込む
+        
+        Args:
+            items: アイテム
+        
+        Returns:
+            int: 書き込んだ件数
+        """
+        rows = [self._row(item) for item in items]
+        connection = self._connection()
+        try:
+            with _transaction(connection):
+                connection.executemany(self._sql["replace"], rows)
+        except sqlite3.Error as e:
+            raise _to_storage_error(e) from e
+        return len(rows)
+    
+    def update(
+        self,
+        key: str,
+        changes: dict,
+        expected: Optional[dict] = None,
+        expected_version: Optional[int] = None,
+        increment_version: bool = True,
+        remove: Sequence[str] = (),
+    ) -> dict:
+        """
+        既存アイテムの属性を更新する
+        
+        Args:
+            key: キーの値
+            changes: 更新する属性名 → 値
+            expected: 更新の条件とする属性名 → 値
+            expected_version: version属性がこの値の場合のみ更新する
+            increment_version: version属性を1進めるかどうか
+            remove: 削除する属性名
+        
+        Returns:
+            dict: 更新後のアイテム
+        
+        Raises:
+            ConditionFailedError: アイテムが存在しない、または条件を満たさなかった場合
+        """
+        connection = self._connection()
+        try:
+            with _transaction(connection):
+                current = self._fetch_item(connection, key)
+                if current is None:
+                    raise ConditionFailedError("アイテムが存在しません")
+                if any(current.get(name) != value for name, value in (expected or {}).items()):
+                    raise ConditionFailedError("アイテムが条件を満たしません")
+                if expected_version is not None and not version_matches(current, expected_version):
+                    raise ConditionFailedError("バージョンが一致しません")
+                
+                current.update(changes)
+                for name in remove:
+                    current.pop(name, None)
+                if increment_version:
+                    current["version"] = int(current.get("version", 0)) + 1
+                connection.execute(self._sql["replace"], self._row(current))
+            return current
+        except sqlite3.Error as e:
+            raise _to_storage_error(e) from e
+    
+    def increment(self, key: str, counters: Dict[str, int], changes: Optional[dict] = None) -> dict:
+        """
+        アイテムの数値の属性に値を加算する（アイテム・属性が無い場合は0から加算する）
+        
+        Args:
+            key: キーの値
+            counters: 加算する属性名 → 加算する値
+            changes: 同時に設定する属性名 → 値
+        
+        Returns:
+            dict: 更新後のアイテム
+        """
+        connection = self._connection()
+        try:
+            with _transaction(connection):
+                current = self._fetch_item(connection, key) or {self.key_name: key}
+                current.update(changes or {})
+                for name, value in counters.items():
+                    current[name] = current.get(name, 0) + value
+                connection.execute(self._sql["replace"], self._row(current))
+            return current
+        except sqlite3.Error as e:
+            raise _to_storage_error(e) from e
+    
+    def delete(self, key: str, expected_version: Optional[int] = None) -> None:
+        """
+        アイテムを削除する
+        
+        Args:
+            key: キーの値
+            expected_version: アイテムが存在し、version属性がこの値の場合のみ削除する
+        
+        Raises:
+            ConditionFailedError: アイテムが存在しない、またはバージョンが一致しない場合
+        """
+        connection = self._connection()
+        try:
+            if expected_version is None:
+                connection.execute(self._sql["delete"], (key,))
+                return
+            
+            with _transaction(connection):
+                current = self._fetch_item(connection, key)
+                if current is None or not version_matches(current, expected_version):
+                    raise ConditionFailedError("アイテムが存在しない、またはバージョンが一致しません")
+                connection.execute(self._sql["delete"], (key,))
+        except sqlite3.Error as e:
+            raise _to_storage_error(e) from e
+    
+    def delete_many(self, keys: Iterable[str]) -> int:
+        """
+        複数のアイテムを1つのトランザクションでまとめて削除する（存在しないキーは無視する）
+        
+        Args:
+            keys: キーの値
+        
+        Returns:
+            int: 削除を要求した件数
+        """
+        rows = [(key,) for key in keys]
+        connection = self._connection()
+        try:
+            with _transaction(connection):
+                connection.executemany(self._sql["delete"], rows)
+        except sqlite3.Error as e:
+            raise _to_storage_error(e) from e
+        return len(rows)
+    
+    def query(
+        self,
+        index_name: str,
+        value: str,
+        descending: bool = False,
+        limit: Optional[int] = None,
+        attributes: Optional[Sequence[str]] = None,
+        before: Optional[str] = None,
+        prefix: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        索引のパーティションキーが一致するアイテムを取得する
+        
+        Args:
+            index_name: インデックス名
+            value: パーティションキーの値
+            descending: ソートキーの降順で返すかどうか
+            limit: 取得する最大件数（Noneの場合は全件）
+            attributes: 取得する属性名（Noneの場合は全属性）
+            before: ソートキーがこの値より小さいアイテムのみを取得する（ソートキーを持つインデックスのみ）
+            prefix: ソートキーがこの文字列で始まるアイテムのみを取得する（ソートキーを持つインデックスのみ、beforeとは同時に指定できない）
+        
+        Returns:
+            List[dict]: アイテムリスト
+        """
+        _, sort_key = self.indexes[index_name]
+        if before is not None and sort_key is not None:
+            sql = self._query_before_sql[index_name][1 if descending else 0]
+            parameters = (value, before, -1 if limit is None else limit)
+        elif prefix is not None and sort_key is not None:
+            sql = self._query_prefix_sql[index_name][1 if descending else 0]
+            parameters = (value, prefix, prefix + PREFIX_UPPER_BOUND, -1 if limit is None else limit)
+        else:
+            sql = self._query_sql[index_name][1 if descending else 0]
+            parameters = (value, -1 if limit is None else limit)
+        try:
+            rows = self._connection().execute(sql, parameters).fetchall()
+        except sqlite3.Error as e:
+            raise _to_storage_error(e) from e
+        
+        items = [_loads(row[0]) for row in rows]
+        if attributes is None:
+            return items
+        return [{name: item[name] for name in attributes if name in item} for item in items]
+    
+    def scan(self) -> List[dict]:
+        """
+        全アイテムを取得する
+        
+        Returns:
+            List[dict]: アイテムリスト
+        """
+        try:
+            rows = self._connection().execute(self._sql["scan"]).fetchall()
+        except sqlite3.Error as e:
+            raise _to_storage_error(e) from e
+        return [_loads(row[0]) for row in rows]
+    
+    def scan_page(self, limit: int, start_key: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        アイテムをキーの昇順に最大limit件ずつ取得する（キーの索引を使用する）
+        
+        Args:
+            limit: 取得する最大件数
+            start_key: 前のページの続きのキー（Noneの場合は最初から）
+        
+        Returns:
+            Tuple[List[dict], Optional[str]]: (アイテムリスト, 続きのキー（最後のページの場合はNone）)
+        """
+        try:
+            rows = self._connection().execute(self._sql["scan_page"], (start_key or "", limit)).fetchall()
+        except sqlite3.Error as e:
+            raise _to_storage_error(e) from e
+        return [_loads(row[1]) for row in rows], (rows[-1][0] if len(rows) == limit else None)
+    
+    def count_segment(self, segment: int, total_segments: int, exclude_prefix: Optional[str] = None) -> int:
+        """
+        キーのみを順に読み取り、total_segments個に分けたうちのsegment番目のアイテム数を数える
+        
+        Args:
+            segment: 数える区分の番号（0からtotal_segments-1）
+            total_segments: 区分の数
+            exclude_prefix: キーがこの文字列で始まるアイテムは数えない（Noneの場合は全て数える）
+        
+        Returns:
+            int: アイテム数
+        """
+        try:
+            return sum(
+                1 for (key,) in self._connection().execute(self._sql["scan_keys"])
+                if zlib.crc32(key.encode("utf-8")) % total_segments == segment
+                and (exclude_prefix is None or not key.startswith(exclude_prefix))
+            )
+        except sqlite3.Error as e:
+            raise _to_storage_error(e) from e
+    
+    def warm_up(self) -> None:
+        """現在のスレッドの接続を作成し、テーブルと索引が無ければ作成する"""
+        self._connection()
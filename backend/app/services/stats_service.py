@@ -0,0 +1,355 @@
+"""
+集計サービス
+
+管理者向けの投稿数の集計（日別・ユーザー別・全体）と、一覧の総件数（投稿数・ユーザー数）を提供するサービス。
+投稿・ユーザーの作成・削除時に集計のアイテムへ加算（DynamoDBのADD）し、
+参照時は投稿を読み取らずに集計のアイテムのみを読み取る（日数・ユーザー数に比例し、投稿数に依存しない）。
+日付は投稿の作成日時（UTC）の日付とする。
+"""
+
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from app.config import get_settings
+from app.services.metrics import metrics
+from app.services.post_codec import get_post_codec
+from app.services.repository import (
+    RESERVED_ID_PREFIX,
+    ConditionFailedError,
+    Repository,
+    StorageError,
+    get_stats_repository,
+)
+
+# 集計のずれを出力するロガー
+logger = logging.getLogger("app.stats")
+
+# 全体の集計アイテム（投稿数・ユーザー数）のstat_id
+TOTAL_ID = "TOTAL"
+
+# 全体の集計アイテムの集計名
+TOTAL_NAMES = ("posts", "users")
+
+# 日別の集計アイテムのstat_idの接頭辞（kind=day、sort_key=日付）
+DAY_PREFIX = "DAY#"
+
+# ユーザー別の集計アイテムのstat_idの接頭辞（kind=user、sort_key=ユーザーID）
+USER_PREFIX = "USER#"
+
+# 日別・ユーザー別の集計アイテムのstat_idの接頭辞（日別の投稿ユーザー数の判定用、インデックスに含めない）
+DAY_USER_PREFIX = "DAYUSER#"
+
+# 集計の種類別のインデックス
+KIND_INDEX = "kind-sort_key-index"
+
+# ユーザー名伝播の進捗のアイテムのstat_idの接頭辞（集計ではないため、集計の再構築で削除しない）
+PROPAGATION_PREFIX = "PROPAGATION#"
+
+# 集計の再構築で投稿から読み取る属性（標準の形式、本文などは読み取らない）
+AGGREGATE_ATTRIBUTES = ("post_id", "user_id", "created_at", "username")
+
+
+class StatsService:
+    """
+    集計サービスクラス
+    
+    PostService・UserServiceが投稿・ユーザーの作成・削除時に更新し、管理API・一覧APIが参照する。
+    """
+    
+    def _get_repository(self) -> Repository:
+        """
+        集計のリポジトリを取得する（遅延読み込み）
+        
+        Returns:
+            Repository: 集計のリポジトリ
+        """
+        return get_stats_repository()
+    
+    def record_post_created(self, user_id: str, username: str, created_at: str) -> None:
+        """
+        投稿の作成を集計に加算する
+        
+        日別・ユーザー別の投稿数が1になった場合（その日の最初の投稿）に、日別の投稿ユーザー数を加算する。
+        加算（総件数を含む）は投稿の保存とは別の書き込みで、同じトランザクションにはしない
+        （リポジトリにテーブルをまたぐトランザクションの操作がないため）。
+        加算に失敗した場合はStatsErrorsとして記録し、保守用の関数の日次の修正（reconcile_totals）で総件数を実際の件数に合わせる。
+        
+        Args:
+            user_id: 投稿者のユーザーID
+            username: 投稿者のユーザー名
+            created_at: 作成日時（ISO 8601）
+        """
+        repository = self._get_repository()
+        day = created_at[:10]
+        
+        day_user = repository.increment(f"{DAY_USER_PREFIX}{day}#{user_id}", {"posts": 1})
+        repository.increment(
+            DAY_PREFIX + day,
+            {"posts": 1, "active_users": 1 if int(day_user["posts"]) == 1 else 0},
+            {"kind": "day", "sort_key": day},
+        )
+        repository.increment(USER_PREFIX + user_id, {"posts": 1}, {"kind": "user", "sort_key": user_id, "username": username})
+        repository.increment(TOTAL_ID, {"posts": 1})
+    
+    def record_post_deleted(self, user_id: str, created_at: str) -> None:
+        """
+        投稿の削除を集計から減算する
+        
+        日別・ユーザー別の投稿数が0になった場合に、日別の投稿ユーザー数を減算する。
+        
+        Args:
+            user_id: 投稿者のユーザーID
+            created_at: 作成日時（ISO 8601）
+        """
+        repository = self._get_repository()
+        day = created_at[:10]
+        
+        day_user = repository.increment(f"{DAY_USER_PREFIX}{day}#{user_id}", {"posts": -1})
+        repository.increment(DAY_PREFIX + day, {"posts": -1, "active_users": -1 if int(day_user["posts"]) == 0 else 0})
+        repository.increment(USER_PREFIX + user_id, {"posts": -1})
+        repository.increment(TOTAL_ID, {"posts": -1})
+    
+    def record_user_created(self) -> None:
+        """
+        ユーザーの作成を全体のユーザー数に加算する
+        """
+        self._get_repository().increment(TOTAL_ID, {"users": 1})
+    
+    def record_user_deleted(self) -> None:
+        """
+        ユーザーの削除を全体のユーザー数から減算する
+        """
+        self._get_repository().increment(TOTAL_ID, {"users": -1})
+    
+    def record_username(self, user_id: str, username: str) -> None:
+        """
+        ユーザー別の集計のユーザー名を変更する（投稿の無いユーザーは何もしない）
+        
+        Args:
+            user_id: ユーザーID
+            username: 新しいユーザー名
+        """
+        try:
+            self._get_repository().update(USER_PREFIX + user_id, {"username": username}, increment_version=False)
+        except ConditionFailedError:
+            pass
+    
+    def get_totals(self, consistent: bool = False) -> Dict[str, int]:
+        """
+        全体の集計を取得する
+        
+        Args:
+            consistent: 強い整合性のある読み込みを行うかどうか
+        
+        Returns:
+            Dict[str, int]: 集計名 → 値（投稿数・ユーザー数）
+        """
+        item = self._get_repository().get(TOTAL_ID, consistent=consistent) or {}
+        return {name: int(item.get(name, 0)) for name in TOTAL_NAMES}
+    
+    def get_total(self, name: str) -> Optional[int]:
+        """
+        一覧の総件数を取得する（集計のアイテムを1件読み取る）
+        
+        集計の更新に失敗した場合などは実際の件数とずれる（reconcile_totalsで修正する）。
+        一覧の取得を失敗させないため、読み取りに失敗した場合はメトリクスに記録してNoneを返す。
+        負の値は集計がずれている証拠のため、0に丸めて隠さずにメトリクス（StatsDrift）に記録してNoneを返す。
+        
+        Args:
+            name: 集計名（posts・users）
+        
+        Returns:
+            Optional[int]: 総件数（集計が無効な場合、読み取りに失敗した場合、集計が負の値の場合はNone）
+        """
+        if not get_settings().STATS_ENABLED:
+            return None
+        try:
+            total = self.get_totals()[name]
+        except StorageError:
+            metrics.increment("StatsErrors")
+            return None
+        if total < 0:
+            logger.warning("集計 %s が負の値です（%d）。reconcileで修正してください", name, total)
+            metrics.increment("StatsDrift")
+            return None
+        return total
+    
+    def get_daily_activity(self, days: int, until: Optional[date] = None) -> List[dict]:
+        """
+        日別の投稿数・投稿ユーザー数を取得する（投稿の無い日は0）
+        
+        Args:
+            days: 取得する日数
+            until: 最後の日（Noneの場合は今日（UTC））
+        
+        Returns:
+            List[dict]: 日付の昇順の、日付・投稿数・投稿ユーザー数
+        """
+        until = until or datetime.utcnow().date()
+        since = until - timedelta(days=days - 1)
+        items = self._get_repository().query(
+            KIND_INDEX, "day", descending=True, limit=days, before=(until + timedelta(days=1)).isoformat(),
+        )
+        counts = {item["sort_key"]: item for item in items}
+        
+        activity = []
+        for offset in range(days):
+            day = (since + timedelta(days=offset)).isoformat()
+            item = counts.get(day, {})
+            activity.append({
+                "date": day,
+                "posts": int(item.get("posts", 0)),
+                "active_users": int(item.get("active_users", 0)),
+            })
+        return activity
+    
+    def get_top_posters(self, limit: int) -> List[dict]:
+        """
+        投稿数の多いユーザーを取得する
+        
+        ユーザー別の集計アイテムのみを読み取る（投稿したことのあるユーザー数に比例する）。
+        
+        Args:
+            limit: 取得する最大件数
+        
+        Returns:
+            List[dict]: 投稿数の降順の、ユーザーID・ユーザー名・投稿数
+        """
+        items = self._get_repository().query(KIND_INDEX, "user")
+        posters = [
+            {"user_id": item["sort_key"], "username": item.get("username"), "posts": int(item.get("posts", 0))}
+            for item in items
+            if int(item.get("posts", 0)) > 0
+        ]
+        posters.sort(key=lambda poster: (-poster["posts"], poster["user_id"]))
+        return posters[:limit]
+    
+    def rebuild(self, sources: Sequence[Repository], users: Repository) -> dict:
+        """
+        投稿・ユーザーを並列スキャンして集計を作り直す
+        
+        各リポジトリをSTATS_REBUILD_SEGMENTS個の区分に分けて並列に読み取り、集計のアイテムを置き換える。
+        投稿は集計に必要な属性のみを区分ごとにページ単位で読み取り、全件をメモリに保持しない。
+        再構築中に作成・削除された投稿は反映されない場合があるため、書き込みの少ない時間帯に実行する。
+        
+        Args:
+            sources: 投稿のリポジトリ（投稿のテーブル・アーカイブ）
+            users: ユーザーのリポジトリ
+        
+        Returns:
+            dict: 読み取った投稿数と、書き込んだ・削除した集計のアイテム数
+        """
+        segments = get_settings().STATS_REBUILD_SEGMENTS
+        attributes = get_post_codec().attribute_names(AGGREGATE_ATTRIBUTES)
+        tasks = [(source, segment) for source in sources for segment in range(segments)]
+        with ThreadPoolExecutor(max_workers=segments) as executor:
+            partials = list(executor.map(
+                lambda task: self._aggregate(task[0].scan_segment(task[1], segments, attributes)), tasks,
+            ))
+        
+        day_posts, day_users, user_posts, usernames = Counter(), Counter(), Counter(), {}
+        for partial in partials:
+            for (day, user_id), count in partial["day_users"].items():
+                day_users[(day, user_id)] += count
+                day_posts[day] += count
+                user_posts[user_id] += count
+            usernames.update(partial["usernames"])
+        
+        items = [{"stat_id": TOTAL_ID, "posts": sum(user_posts.values()), "users": self._count(users)}]
+        for (day, user_id), count in day_users.items():
+            items.append({"stat_id": f"{DAY_USER_PREFIX}{day}#{user_id}", "posts": count})
+        active_users = Counter(day for day, _ in day_users)
+        for day, count in day_posts.items():
+            items.append({
+                "stat_id": DAY_PREFIX + day, "kind": "day", "sort_key": day,
+                "posts": count, "active_users": active_users[day],
+            })
+        for user_id, count in user_posts.items():
+            items.append({
+                "stat_id": USER_PREFIX + user_id, "kind": "user", "sort_key": user_id,
+                "username": usernames.get(user_id), "posts": count,
+            })
+        
+        repository = self._get_repository()
+        keys = {item["stat_id"] for item in items}
+        # 集計のテーブルはキーのみを読み取り、不要になった集計のアイテムをまとめて削除する
+        deleted = repository.delete_many(
+            item["stat_id"] for item in repository.scan_segment(0, 1, [repository.key_name])
+            if item["stat_id"] not in keys and not item["stat_id"].startswith(PROPAGATION_PREFIX)
+        )
+        repository.put_many(items)
+        
+        return {"scanned": sum(partial["scanned"] for partial in partials), "written": len(items), "deleted": deleted}
+    
+    def reconcile_totals(self, sources: Sequence[Repository], users: Repository) -> dict:
+        """
+        投稿・ユーザーを並列スキャンして数え、全体の投稿数・ユーザー数のずれを修正する
+        
+        日別・ユーザー別の集計は作り直さず、全体の集計アイテムに差分を加算する
+        （スキャン中に加算・減算された件数を上書きで失わないため）。
+        差分はスキャン前に読み取った集計と数えた件数から求める。スキャン中の作成・削除のうち、
+        スキャンで数えたものはその件数だけずれが残る（スキャン中の書き込みの件数以下で、次回の実行で修正される）。
+        
+        Args:
+            sources: 投稿のリポジトリ（投稿のテーブル・アーカイブ）
+            users: ユーザーのリポジトリ
+        
+        Returns:
+            dict: 集計名 → 数えた件数と、修正した差分
+        """
+        # スキャン中の作成・削除による加算・減算を差分で打ち消さないよう、スキャン前の集計を基準にする
+        current = self.get_totals(consistent=True)
+        counted = {"posts": sum(self._count(source) for source in sources), "users": self._count(users)}
+        drift = {name: counted[name] - current[name] for name in TOTAL_NAMES}
+        
+        corrections = {name: value for name, value in drift.items() if value}
+        if corrections:
+            self._get_repository().increment(TOTAL_ID, corrections)
+        return {name: {"counted": counted[name], "drift": drift[name]} for name in TOTAL_NAMES}
+    
+    def _count(self, repository: Repository) -> int:
+        """
+        リポジトリをSTATS_REBUILD_SEGMENTS個の区分に分けて並列に数える（アイテムは読み込まない）
+        
+        Args:
+            repository: 投稿・ユーザーのリポジトリ
+        
+        Returns:
+            int: アイテム数（フロントページスナップショットなどの予約済みアイテムを除く）
+        """
+        segments = get_settings().STATS_REBUILD_SEGMENTS
+        with ThreadPoolExecutor(max_workers=segments) as executor:
+            counts = executor.map(
+                lambda segment: repository.count_segment(segment, segments, RESERVED_ID_PREFIX),
+                range(segments),
+            )
+            return sum(counts)
+    
+    def _aggregate(self, items: Iterable[dict]) -> dict:
+        """
+        1区分の投稿アイテムを読み取りながら日別・ユーザー別に数える
+        
+        Args:
+            items: 投稿のリポジトリのアイテム（集計に必要な属性のみ、投稿以外の予約済みアイテムを含む）
+        
+        Returns:
+            dict: 投稿数と、(日付, ユーザーID) → 投稿数、ユーザーID → ユーザー名
+        """
+        codec = get_post_codec()
+        day_users, usernames, scanned = Counter(), {}, 0
+        for item in items:
+            # フロントページスナップショットなどの予約済みアイテムは数えない
+            if item["post_id"].startswith(RESERVED_ID_PREFIX):
+                continue
+            post = codec.decode(item)
+            day_users[(post["created_at"][:10], post["user_id"])] += 1
+            usernames[post["user_id"]] = post["username"]
+            scanned += 1
+        return {"scanned": scanned, "day_users": day_users, "usernames": usernames}
+
+
+# シングルトンインスタンス
+stats_service = StatsService()
@@ -0,0 +1,190 @@
+"""
+リクエスト計測サービス
+
+リクエスト単位で処理時間の内訳（DynamoDB・パスワードハッシュ・シリアライズ）を計測する。
+計測結果はServer-Timingレスポンスヘッダーと構造化ログとして出力する。
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from app.config import get_settings
+
+# 計測結果を出力するロガー
+logger = logging.getLogger("app.timing")
+
+# Server-Timingヘッダーに出力する計測項目と説明
+TIMING_DESCRIPTIONS = {
+    "db": "DynamoDB",
+    "hash": "Password hashing",
+    "serialize": "JSON serialization",
+}
+
+
+class RequestTimings:
+    """
+    リクエスト計測クラス
+    
+    計測項目ごとの合計時間と回数を保持する。
+    DynamoDB呼び出しはスレッドプールからも記録されるため、ロックで保護する。
+    """
+    
+    def __init__(self):
+        """計測の初期化"""
+        # 計測項目 → 合計時間（秒）
+        self.durations: Dict[str, float] = {}
+        # 計測項目 → 回数
+        self.counts: Dict[str, int] = {}
+        # 記録用のロック
+        self._lock = threading.Lock()
+    
+    def record(self, name: str, seconds: float) -> None:
+        """
+        計測結果を記録する
+        
+        Args:
+            name: 計測項目名
+            seconds: 経過時間（秒）
+        """
+        with self._lock:
+            self.durations[name] = self.durations.get(name, 0.0) + seconds
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+
+# 現在のリクエストの計測（計測対象外のリクエストではNone）
+_current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def get_request_timings() -> Optional[RequestTimings]:
+    """
+    現在のリクエストの計測を取得する
+    
+    Returns:
+        RequestTimings: 計測、計測対象外の場合はNone
+    """
+    return _current_timings.get()
+
+
+def record_timing(name: str, seconds: float) -> None:
+    """
+    現在のリクエストに計測結果を記録する
+    
+    計測対象外のリクエストでは何もしない。
+    
+    Args:
+        name: 計測項目名
+        seconds: 経過時間（秒）
+    """
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.record(name, seconds)
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """
+    with文の範囲の経過時間を現在のリクエストに記録する
+    
+    Args:
+        name: 計測項目名
+    """
+    if _current_timings.get() is None:
+        yield
+        return
+    
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(name, time.perf_counter() - start)
+
+
+def format_server_timing(total_seconds: float, timings: RequestTimings) -> str:
+    """
+    Server-Timingヘッダーの値を作成する
+    
+    Args:
+        total_seconds: リクエスト全体の経過時間（秒）
+        timings: 計測結果
+    
+    Returns:
+        str: Server-Timingヘッダーの値
+    """
+    entries = [f"total;dur={total_seconds * 1000:.1f}"]
+    for name, description in TIMING_DESCRIPTIONS.items():
+        if name in timings.durations:
+            entries.append(
+                f'{name};dur={timings.durations[name] * 1000:.1f};desc="{description} x{timings.counts[name]}"'
+            )
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    Server-Timingミドルウェア
+    
+    リクエスト全体と内訳の処理時間を計測し、Server-Timingヘッダーと構造化ログを出力する
+    ASGIミドルウェア。本番環境でのオーバーヘッドを抑えるため、
+    TIMING_SAMPLE_RATEの割合のリクエストのみを計測する。
+    """
+    
+    def __init__(self, app):
+        """
+        ミドルウェアの初期化
+        
+        Args:
+            app: ラップするASGIアプリケーション
+        """
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        """
+        ASGIリクエストを処理する
+        
+        Args:
+            scope: ASGIスコープ
+            receive: 受信関数
+            send: 送信関数
+        """
+        settings = get_settings()
+        if scope["type"] != "http" or random.random() >= settings.TIMING_SAMPLE_RATE:
+            await self.app(scope, receive, send)
+            return
+        
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        start = time.perf_counter()
+        # レスポンスのステータスコード
+        status_code = None
+        
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                header = format_server_timing(time.perf_counter() - start, timings)
+                message = {
+                    **message,
+                    "headers": list(message.get("headers", [])) + [(b"server-timing", header.encode("latin-1"))],
+                }
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timings.reset(token)
+            total = time.perf_counter() - start
+            logger.info(json.dumps({
+                "event": "request_timing",
+                "method": scope.get("method"),
+                "path": scope.get("path"),
+                "status": status_code,
+                "total_ms": round(total * 1000, 3),
+                **{f"{name}_ms": round(seconds * 1000, 3) for name, seconds in timings.durations.items()},
+                **{f"{name}_count": count for name, count in timings.counts.items()},
+            }, ensure_ascii=False))
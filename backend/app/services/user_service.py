@@ -2,18 +2,22 @@
 ユーザーサービス
 
 ユーザーのCRUD操作を提供するサービス。
-DynamoDBを使用してユーザーデータを管理する。
+ユーザーのリポジトリ（DynamoDBまたはメモリ）を使用してユーザーデータを管理する。
 """
 
 import uuid
 from datetime import datetime
-from typing import Optional, List
-from boto3.dynamodb.conditions import Key, Attr
-from botocore.exceptions import ClientError
+from typing import Iterator, List, Optional, Tuple
 
 from app.models.user import UserCreate, UserUpdate, UserResponse, UserInDB, UserRole
-from app.services.database import get_users_table
+from app.services.identity_map import get_item_cached, invalidate_item
+from app.config import get_settings
 from app.services.auth import get_password_hash, verify_password
+from app.services.metrics import metrics
+from app.services.repository import ConditionFailedError, Repository, StorageError, delete_existing, get_users_repository
+from app.services.responses import clamp_page_size
+from app.services.stats_service import stats_service
+from app.services.versioning import VersionConflictError
 
 
 class UserService:
@@ -27,14 +31,51 @@ class UserService:
         """サービスの初期化"""
         pass
     
-    def _get_table(self):
+    def _get_repository(self) -> Repository:
         """
-        ユーザーテーブルを取得する（遅延読み込み）
+        ユーザーのリポジトリを取得する（遅延読み込み）
         
         Returns:
-            boto3.Table: ユーザーテーブル
+            Repository: ユーザーのリポジトリ
         """
-        return get_users_table()
+        return get_users_repository()
+    
+    def build_user_item(
+        self,
+        username: str,
+        hashed_password: str,
+        role: UserRole = UserRole.USER,
+        created_at: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> dict:
+        """
+        リポジトリに保存するユーザーアイテムを作成する
+        
+        create_userと、大量データの投入（perf.seed）で同じアイテムの形にするために使用する。
+        
+        Args:
+            username: ユーザー名
+            hashed_password: ハッシュ化済みのパスワード
+            role: ユーザー権限
+            created_at: 作成日時（ISO 8601、省略時は現在時刻）
+            user_id: ユーザーID（省略時は生成する）
+        
+        Returns:
+            dict: ユーザーアイテム
+        """
+        # 現在時刻
+        now = created_at or datetime.utcnow().isoformat()
+        
+        return {
+            "user_id": user_id or str(uuid.uuid4()),
+            "username": username,
+            "hashed_password": hashed_password,
+            "role": role.value,
+            "created_at": now,
+            "updated_at": now,
+            # 楽観的排他制御用のバージョン
+            "version": 1,
+        }
     
     def create_user(self, user_data: UserCreate) -> UserResponse:
         """
@@ -49,32 +90,22 @@ class UserService:
         Raises:
             ValueError: ユーザー名が既に存在する場合
         """
-        table = self._get_table()
+        repository = self._get_repository()
         
         # ユーザー名の重複チェック
         if self.get_user_by_username(user_data.username):
             raise ValueError("このユーザー名は既に使用されています")
         
-        # 現在時刻
-        now = datetime.utcnow().isoformat()
-        
-        # ユーザーIDを生成
-        user_id = str(uuid.uuid4())
-        
         # パスワードをハッシュ化
         hashed_password = get_password_hash(user_data.password)
         
-        # DynamoDBに保存するアイテム
-        item = {
-            "user_id": user_id,
-            "username": user_data.username,
-            "hashed_password": hashed_password,
-            "role": user_data.role.value,
-            "created_at": now,
-            "updated_at": now,
-        }
+        # リポジトリに保存するアイテム
+        item = self.build_user_item(user_data.username, hashed_password, user_data.role)
+        user_id = item["user_id"]
+        now = item["created_at"]
         
-        table.put_item(Item=item)
+        repository.put(item)
+        self._record_stats(stats_service.record_user_created)
         
         return UserResponse(
             user_id=user_id,
@@ -82,6 +113,7 @@ class UserService:
             role=user_data.role,
             created_at=datetime.fromisoformat(now),
             updated_at=datetime.fromisoformat(now),
+            version=1,
         )
     
     def get_user_by_id(self, user_id: str) -> Optional[UserInDB]:
@@ -94,11 +126,8 @@ class UserService:
         Returns:
             UserInDB: ユーザー情報、見つからない場合はNone
         """
-        table = self._get_table()
-        
-        response = table.get_item(Key={"user_id": user_id})
-        
-        item = response.get("Item")
+        # 同一リクエスト内で読み取り済みの場合はGetItemを省略する
+        item = get_item_cached(self._get_repository(), {"user_id": user_id})
         if not item:
             return None
         
@@ -114,15 +143,8 @@ class UserService:
         Returns:
             UserInDB: ユーザー情報、見つからない場合はNone
         """
-        table = self._get_table()
-        
         # GSI（グローバルセカンダリインデックス）を使用してクエリ
-        response = table.query(
-            IndexName="username-index",
-            KeyConditionExpression=Key("username").eq(username)
-        )
-        
-        items = response.get("Items", [])
+        items = self._get_repository().query("username-index", username, limit=1)
         if not items:
             return None
         
@@ -135,79 +157,87 @@ class UserService:
         Returns:
             List[UserResponse]: ユーザーリスト
         """
-        table = self._get_table()
-        
-        response = table.scan()
-        items = response.get("Items", [])
+        items = self._get_repository().scan()
         
         return [self._item_to_user_response(item) for item in items]
     
-    def update_user(self, user_id: str, user_data: UserUpdate) -> Optional[UserResponse]:
+    def get_users_page(self, limit: int = 100, cursor: Optional[str] = None) -> Tuple[Iterator[UserResponse], Optional[str]]:
+        """
+        ユーザーを1ページ分取得する（ユーザーIDの順）
+        
+        テーブル全体を読み込まずに、limit件（MAX_PAGE_SIZE件まで）ずつ読み取る。
+        ユーザーは読み出すときに1件ずつUserResponseに変換する。
+        
+        Args:
+            limit: 取得する最大件数
+            cursor: 前のページの続きのカーソル（Noneの場合は最初のページ）
+        
+        Returns:
+            Tuple[Iterator[UserResponse], Optional[str]]: (ユーザーのイテレーター, 次のページのカーソル（最後のページの場合はNone）)
+        """
+        items, next_cursor = self._get_repository().scan_page(clamp_page_size(limit), cursor)
+        
+        return map(self._item_to_user_response, items), next_cursor
+    
+    def update_user(
+        self,
+        user_id: str,
+        user_data: UserUpdate,
+        expected_version: Optional[int] = None,
+    ) -> Optional[UserResponse]:
         """
         ユーザー情報を更新する
         
+        存在確認・バージョン確認を条件付きの更新で行うため、
+        更新前の読み取りを行わない。
+        
         Args:
             user_id: 更新対象のユーザーID
             user_data: 更新データ
+            expected_version: 期待するバージョン（Noneの場合は検査しない）
         
         Returns:
             UserResponse: 更新後のユーザー情報、ユーザーが存在しない場合はNone
         
         Raises:
             ValueError: ユーザー名が既に使用されている場合
+            VersionConflictError: バージョンが一致しない場合
         """
-        table = self._get_table()
-        
-        # 既存ユーザーを取得
-        existing_user = self.get_user_by_id(user_id)
-        if not existing_user:
-            return None
+        repository = self._get_repository()
         
-        # ユーザー名の重複チェック（変更する場合）
-        if user_data.username and user_data.username != existing_user.username:
-            if self.get_user_by_username(user_data.username):
+        # ユーザー名の重複チェック（他のユーザーが使用している場合）
+        if user_data.username:
+            user_with_same_name = self.get_user_by_username(user_data.username)
+            if user_with_same_name and user_with_same_name.user_id != user_id:
                 raise ValueError("このユーザー名は既に使用されています")
         
-        # 更新式を構築
-        update_expression_parts = []
-        expression_attribute_values = {}
-        expression_attribute_names = {}
+        # 更新する属性を収集
+        changes = {}
         
         if user_data.username:
-            update_expression_parts.append("#username = :username")
-            expression_attribute_values[":username"] = user_data.username
-            expression_attribute_names["#username"] = "username"
+            changes["username"] = user_data.username
         
         if user_data.password:
-            update_expression_parts.append("hashed_password = :hashed_password")
-            expression_attribute_values[":hashed_password"] = get_password_hash(user_data.password)
+            changes["hashed_password"] = get_password_hash(user_data.password)
         
         if user_data.role:
-            update_expression_parts.append("#role = :role")
-            expression_attribute_values[":role"] = user_data.role.value
-            expression_attribute_names["#role"] = "role"
+            changes["role"] = user_data.role.value
         
         # 更新日時を設定
-        now = datetime.utcnow().isoformat()
-        update_expression_parts.append("updated_at = :updated_at")
-        expression_attribute_values[":updated_at"] = now
-        
-        update_expression = "SET " + ", ".join(update_expression_parts)
-        
-        # 更新実行
-        update_params = {
-            "Key": {"user_id": user_id},
-            "UpdateExpression": update_expression,
-            "ExpressionAttributeValues": expression_attribute_values,
-            "ReturnValues": "ALL_NEW"
-        }
-        
-        if expression_attribute_names:
-            update_params["ExpressionAttributeNames"] = expression_attribute_names
-        
-        response = table.update_item(**update_params)
-        
-        return self._item_to_user_response(response["Attributes"])
+        changes["updated_at"] = datetime.utcnow().isoformat()
+        
+        try:
+            item = repository.update(user_id, changes, expected_version=expected_version)
+        except ConditionFailedError:
+            # 条件を満たさなかった原因を判別する
+            item = repository.get(user_id, consistent=True)
+            if not item:
+                return None
+            raise VersionConflictError(int(item.get("version", 0)))
+        finally:
+            invalidate_item(repository, {"user_id": user_id})
+        
+        return self._item_to_user_response(item)
     
     def delete_user(self, user_id: str) -> bool:
         """
@@ -217,15 +247,21 @@ class UserService:
             user_id: 削除対象のユーザーID
         
         Returns:
-            bool: 削除に成功した場合True
+            bool: 削除に成功した場合True（存在しない、または同時に他のリクエストが削除した場合False）
         """
-        table = self._get_table()
+        repository = self._get_repository()
         
         # 既存ユーザーを確認
-        if not self.get_user_by_id(user_id):
+        user = self.get_user_by_id(user_id)
+        if not user:
             return False
         
-        table.delete_item(Key={"user_id": user_id})
+        # 同時に削除された場合に集計を重ねて減算しないよう、この呼び出しで削除したかを確認する
+        removed = delete_existing(repository, user_id, user.version)
+        invalidate_item(repository, {"user_id": user_id})
+        if not removed:
+            return False
+        self._record_stats(stats_service.record_user_deleted)
         return True
     
     def authenticate_user(self, username: str, password: str) -> Optional[UserInDB]:
@@ -248,12 +284,29 @@ class UserService:
         
         return user
     
+    def _record_stats(self, record) -> None:
+        """
+        全体のユーザー数を更新する（集計が無効な場合は何もしない）
+        
+        ユーザーの書き込みは完了しているため、失敗してもエラーにせずメトリクスに記録する
+        （reconcile_countsで修正する）。
+        
+        Args:
+            record: 集計を更新するStatsServiceのメソッド
+        """
+        if not get_settings().STATS_ENABLED:
+            return
+        try:
+            record()
+        except StorageError:
+            metrics.increment("StatsErrors")
+    
     def _item_to_user_in_db(self, item: dict) -> UserInDB:
         """
-        DynamoDBアイテムをUserInDBモデルに変換する
+        ユーザーアイテムをUserInDBモデルに変換する
         
         Args:
-            item: DynamoDBアイテム
+            item: ユーザーアイテム
         
         Returns:
             UserInDB: ユーザーモデル
@@ -265,14 +318,15 @@ class UserService:
             role=UserRole(item["role"]),
             created_at=datetime.fromisoformat(item["created_at"]),
             updated_at=datetime.fromisoformat(item["updated_at"]),
+            version=int(item.get("version", 0)),
         )
     
     def _item_to_user_response(self, item: dict) -> UserResponse:
         """
-        DynamoDBアイテムをUserResponseモデルに変換する
+        ユーザーアイテムをUserResponseモデルに変換する
         
         Args:
-            item: DynamoDBアイテム
+            item: ユーザーアイテム
         
         Returns:
             UserResponse: ユーザーレスポンスモデル
@@ -283,6 +337,7 @@ class UserService:
             role=UserRole(item["role"]),
             created_at=datetime.fromisoformat(item["created_at"]),
             updated_at=datetime.fromisoformat(item["updated_at"]),
+            version=int(item.get("version", 0)),
         )
 
 
@@ -0,0 +1,97 @@
+"""
+楽観的排他制御サービス
+
+投稿・ユーザーのversion属性による楽観的排他制御の共通処理を提供する。
+ETag / If-Match ヘッダーとバージョン番号の変換と、条件付き更新の例外を定義する。
+"""
+
+from typing import Optional
+
+
+class VersionConflictError(Exception):
+    """
+    バージョン競合例外
+    
+    条件付き更新で、クライアントが指定したバージョンと現在のバージョンが異なる場合に発生する。
+    """
+    
+    def __init__(self, current_version: int):
+        """
+        例外の初期化
+        
+        Args:
+            current_version: 現在のバージョン
+        """
+        super().__init__("他のユーザーによって更新されています。最新の内容を取得してください")
+        # 現在のバージョン
+        self.current_version = current_version
+
+
+class PermissionDeniedError(Exception):
+    """
+    権限エラー例外
+    
+    条件付き更新で、更新者が所有者でない場合に発生する。
+    """
+    pass
+
+
+def format_etag(version: int) -> str:
+    """
+    バージョン番号からETagを作成する
+    
+    Args:
+        version: バージョン番号
+    
+    Returns:
+        str: ETagヘッダーの値
+    """
+    return f'"{version}"'
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """
+    If-Matchヘッダーから期待するバージョンを取得する
+    
+    ヘッダーが無い場合や「*」の場合はバージョンを検査しない（None）。
+    弱いETag（W/"3"）も受け付ける。数値として解釈できない値はどのバージョンにも一致しない（-1）。
+    
+    Args:
+        if_match: If-Matchヘッダーの値
+    
+    Returns:
+        int: 期待するバージョン、検査しない場合はNone
+    """
+    if if_match is None:
+        return None
+    
+    value = if_match.split(",")[0].strip()
+    if value == "*":
+        return None
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        return -1
+
+
+def build_version_condition(expected_version: Optional[int], expression_attribute_values: dict) -> Optional[str]:
+    """
+    バージョンを検査する条件式を作成する
+    
+    version属性を持たない既存アイテムはバージョン0として扱う。
+    
+    Args:
+        expected_version: 期待するバージョン（Noneの場合は検査しない）
+        expression_attribute_values: 条件式の値を追加する辞書
+    
+    Returns:
+        str: 条件式、検査しない場合はNone
+    """
+    if expected_version is None:
+        return None
+    if expected_version == 0:
+        return "attribute_not_exists(version)"
+    expression_attribute_values[":expected_version"] = expected_version
+    return "version = :expected_version"
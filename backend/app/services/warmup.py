@@ -0,0 +1,140 @@
+"""
+ウォームアップサービス
+
+定期実行のウォームアップ呼び出しの判定と、コンテナの事前初期化を提供する。
+初回のユーザーリクエストで発生する重い初期化（ストレージへの接続・boto3のサービスモデルの読み込み、
+bcryptバックエンドの読み込み、JWTの暗号化処理の初期化、OpenAPIスキーマの生成）を
+ウォームアップ呼び出しまたはコンテナの初期化時に済ませる。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Dict
+
+import anyio
+
+from app.services.auth import create_access_token, decode_access_token, get_pwd_context
+from app.services.repository import get_posts_repository, get_users_repository
+
+# ウォームアップの失敗を出力するロガー
+logger = logging.getLogger("app.warmup")
+
+# serverless-plugin-warmupが送信するイベントのsource
+WARMUP_PLUGIN_SOURCE = "serverless-plugin-warmup"
+
+# ウォームアップ用のダミーのパスワード（ハッシュ化の処理の初期化のみに使用）
+WARMUP_PASSWORD = "warm-up"
+
+# 完了した事前初期化の手順（コンテナ内で各手順を1度だけ実行するため）
+_completed_steps = set()
+
+# 事前初期化の排他用のロック
+_lock = threading.Lock()
+
+
+def is_warmup_event(event) -> bool:
+    """
+    Lambdaイベントがウォームアップ呼び出しかを判定する
+    
+    以下のイベントをウォームアップ呼び出しとして扱う。
+    - {"warmup": true} を含むイベント（EventBridgeのスケジュールで入力を指定した場合）
+    - serverless-plugin-warmupのイベント
+    - 入力を指定していないEventBridgeのスケジュールイベント
+    
+    Args:
+        event: Lambdaイベント
+    
+    Returns:
+        bool: ウォームアップ呼び出しの場合True
+    """
+    if not isinstance(event, dict):
+        return False
+    if event.get("warmup") is True or event.get("source") == WARMUP_PLUGIN_SOURCE:
+        return True
+    return event.get("source") == "aws.events" and event.get("detail-type") == "Scheduled Event"
+
+
+def _warm_storage() -> None:
+    """
+    ユーザー・投稿のリポジトリを作成し、ストレージへの接続を事前に初期化する
+    
+    DynamoDBの場合、boto3のセッション・サービスモデル・認証情報はセッション単位でキャッシュされるため、
+    スレッドプールの各スレッドでのリソース作成も速くなる。
+    """
+    get_users_repository().warm_up()
+    get_posts_repository().warm_up()
+
+
+def _warm_threadpool() -> None:
+    """
+    シングルフライトの読み取りを実行するスレッドプールのスレッドで、ストレージへの接続を事前に初期化する
+    
+    エンドポイントは全てasync defのためイベントループのスレッドで実行されるが、投稿の読み取りは
+    シングルフライト（do_async）がrun_in_threadpool（anyioのワーカースレッド）で実行する。
+    DynamoDBのリソースはスレッドごとに作成するため、呼び出し元のスレッドの初期化だけでは
+    このワーカースレッドでの最初の読み取りが速くならない。
+    Mangumと同じイベントループでワーカースレッドを1つ使用して初期化する
+    （Lambdaでは1度に1リクエストのため、次のリクエストは同じワーカースレッドを再利用する）。
+    """
+    try:
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        # 現在のイベントループが無い場合は作成する（Mangumも以降の呼び出しでこのループを使用する）
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    loop.run_until_complete(anyio.to_thread.run_sync(_warm_storage))
+
+
+def _warm_password_hashing() -> None:
+    """bcryptバックエンドを読み込み、ハッシュ化と検証の処理を1度実行する"""
+    pwd_context = get_pwd_context()
+    pwd_context.verify(WARMUP_PASSWORD, pwd_context.hash(WARMUP_PASSWORD))
+
+
+def _warm_jwt() -> None:
+    """JWTの作成と検証の処理を1度実行する"""
+    token = create_access_token({"user_id": "warmup", "username": "warmup", "role": "user"})
+    decode_access_token(token)
+
+
+def warm_up(app, threadpool: bool = True) -> Dict[str, float]:
+    """
+    コンテナを事前初期化する
+    
+    各手順はコンテナ内で1度だけ実行し、2回目以降の呼び出しではすぐに戻る。
+    手順が失敗してもウォームアップ全体は失敗させず、次回の呼び出しで再試行する。
+    
+    Args:
+        app: FastAPIアプリケーション（OpenAPIスキーマの生成に使用）
+        threadpool: スレッドプールのワーカースレッドを初期化するかどうか
+            （サーバーの起動時は、リクエストを処理するイベントループとは別のループのスレッドになるためFalseにする）
+    
+    Returns:
+        Dict[str, float]: 今回実行した手順 → 処理時間（ミリ秒）
+    """
+    steps: Dict[str, Callable[[], None]] = {
+        "storage": _warm_storage,
+        "threadpool": _warm_threadpool,
+        "bcrypt": _warm_password_hashing,
+        "jwt": _warm_jwt,
+        "openapi": app.openapi,
+    }
+    if not threadpool:
+        del steps["threadpool"]
+    
+    durations = {}
+    with _lock:
+        for name, step in steps.items():
+            if name in _completed_steps:
+                continue
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception:
+                logger.exception("ウォームアップの手順 %s に失敗しました", name)
+                continue
+            durations[name] = round((time.perf_counter() - start) * 1000, 3)
+            _completed_steps.add(name)
+    return durations
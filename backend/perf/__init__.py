@@ -0,0 +1,10 @@
+"""
+性能計測パッケージ
+
+バックエンドの性能計測用のツールを提供する。
+backendディレクトリで python -m perf.<ツール名> として実行する。
+
+- bench: ホットパス（変換・JWT・パスワード・主要API）のベンチマークとベースラインとの比較
+- loadgen: 仮想ユーザーによる負荷試験（ルートごとのスループット・p50/p95/p99レイテンシ）
+- seed: 実運用に近い分布の合成データ（ユーザー・投稿）の大量投入
+"""
@@ -0,0 +1,446 @@
+"""
+ベンチマーク
+
+バックエンドのホットパスの処理時間を計測し、結果をJSONに保存する。
+保存済みのベースラインがある場合は中央値を比較し、閾値を超えて遅くなった項目を回帰として報告する。
+
+    python -m perf.bench                      # 計測してperf/results/bench.jsonに保存、ベースラインと比較
+    python -m perf.bench --save-baseline      # 計測結果をベースラインとして保存
+    python -m perf.bench --filter api --scale 0.2
+
+計測対象
+- convert.*: DynamoDBアイテムからレスポンスモデルへの変換（大量のアイテム）
+- jwt.*: アクセストークンの作成・検証
+- password.*: パスワードのハッシュ化・検証
+- api.*: ASGIアプリケーション経由のGET /posts・POST /posts・POST /auth/login
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+from perf.environment import STORAGES, storage_environment
+
+# 計測結果の保存先
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), "results", "bench.json")
+
+# ベースラインの保存先
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# 回帰とみなす中央値の増加率
+DEFAULT_THRESHOLD = 0.25
+
+# 変換のベンチマークで使用するアイテム数
+CONVERT_ITEM_COUNT = 1000
+
+# APIのベンチマークの前に作成しておく投稿件数
+SEED_POST_COUNT = 100
+
+# ベンチマークで使用するユーザーのパスワード
+BENCH_PASSWORD = "bench-password"
+
+
+class Benchmark:
+    """
+    ベンチマーククラス
+    
+    準備関数は計測コンテキストを受け取り、計測する処理（引数なしの関数）を返す。
+    """
+    
+    def __init__(self, name: str, setup: Callable[["BenchContext"], Callable[[], None]], iterations: int):
+        """
+        ベンチマークの初期化
+        
+        Args:
+            name: ベンチマーク名
+            setup: 準備関数
+            iterations: 計測回数
+        """
+        # ベンチマーク名
+        self.name = name
+        # 準備関数
+        self.setup = setup
+        # 計測回数
+        self.iterations = iterations
+
+
+# 登録済みのベンチマーク（登録順に実行する）
+BENCHMARKS: List[Benchmark] = []
+
+
+def benchmark(name: str, iterations: int):
+    """
+    ベンチマークを登録するデコレーター
+    
+    Args:
+        name: ベンチマーク名
+        iterations: 計測回数
+    
+    Returns:
+        Callable: デコレーター
+    """
+    def decorator(setup):
+        BENCHMARKS.append(Benchmark(name, setup, iterations))
+        return setup
+    return decorator
+
+
+class BenchContext:
+    """
+    計測コンテキストクラス
+    
+    計測用ストレージにユーザー・投稿を作成し、APIのベンチマークで使用するクライアントとトークンを保持する。
+    """
+    
+    def __init__(self):
+        """計測データを作成する"""
+        from fastapi.testclient import TestClient
+        
+        from app.main import app
+        from app.models.post import PostCreate
+        from app.models.user import UserCreate
+        from app.services.post_service import post_service
+        from app.services.user_service import user_service
+        
+        # ベンチマーク用のユーザー
+        self.user = user_service.create_user(UserCreate(username="bench-user", password=BENCH_PASSWORD))
+        for index in range(SEED_POST_COUNT):
+            post_service.create_post(
+                PostCreate(title=f"ベンチマーク投稿 {index}", message="本文" * 50),
+                self.user.user_id,
+                self.user.username,
+            )
+        # ASGIアプリケーションを直接呼び出すクライアント
+        self.client = TestClient(app)
+        response = self.client.post("/auth/login", json={"username": "bench-user", "password": BENCH_PASSWORD})
+        response.raise_for_status()
+        # 認証ヘッダー
+        self.auth_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    def post_items(self, count: int) -> List[dict]:
+        """
+        変換用の投稿アイテムを作成する
+        
+        Args:
+            count: アイテム数
+        
+        Returns:
+            List[dict]: 投稿アイテムリスト
+        """
+        now = datetime.utcnow().isoformat()
+        return [
+            {
+                "post_id": f"post-{index}",
+                "pk": "POST",
+                "user_id": self.user.user_id,
+                "username": self.user.username,
+                "title": f"タイトル {index}",
+                "message": "本文" * 50,
+                "created_at": now,
+                "updated_at": now,
+                "version": 1,
+            }
+            for index in range(count)
+        ]
+    
+    def user_items(self, count: int) -> List[dict]:
+        """
+        変換用のユーザーアイテムを作成する
+        
+        Args:
+            count: アイテム数
+        
+        Returns:
+            List[dict]: ユーザーアイテムリスト
+        """
+        now = datetime.utcnow().isoformat()
+        return [
+            {
+                "user_id": f"user-{index}",
+                "username": f"user{index}",
+                "hashed_password": "x" * 60,
+                "role": "user",
+                "created_at": now,
+                "updated_at": now,
+                "version": 1,
+            }
+            for index in range(count)
+        ]
+
+
+@benchmark("convert.post_response", iterations=20)
+def bench_convert_posts(context: BenchContext) -> Callable[[], None]:
+    """投稿アイテムをPostResponseに変換する"""
+    from app.services.post_service import post_service
+    
+    items = context.post_items(CONVERT_ITEM_COUNT)
+    return lambda: [post_service._item_to_post_response(item) for item in items]
+
+
+@benchmark("convert.user_response", iterations=20)
+def bench_convert_users(context: BenchContext) -> Callable[[], None]:
+    """ユーザーアイテムをUserResponseに変換する"""
+    from app.services.user_service import user_service
+    
+    items = context.user_items(CONVERT_ITEM_COUNT)
+    return lambda: [user_service._item_to_user_response(item) for item in items]
+
+
+@benchmark("jwt.create", iterations=2000)
+def bench_jwt_create(context: BenchContext) -> Callable[[], None]:
+    """アクセストークンを作成する"""
+    from app.services.auth import create_access_token
+    
+    claims = {"user_id": context.user.user_id, "username": context.user.username, "role": "user"}
+    return lambda: create_access_token(claims)
+
+
+@benchmark("jwt.decode", iterations=2000)
+def bench_jwt_decode(context: BenchContext) -> Callable[[], None]:
+    """アクセストークンを検証する"""
+    from app.services.auth import create_access_token, decode_access_token
+    
+    token = create_access_token({"user_id": context.user.user_id, "username": context.user.username, "role": "user"})
+    return lambda: decode_access_token(token)
+
+
+@benchmark("password.hash", iterations=5)
+def bench_password_hash(context: BenchContext) -> Callable[[], None]:
+    """パスワードをハッシュ化する"""
+    from app.services.auth import get_password_hash
+    
+    return lambda: get_password_hash(BENCH_PASSWORD)
+
+
+@benchmark("password.verify", iterations=5)
+def bench_password_verify(context: BenchContext) -> Callable[[], None]:
+    """パスワードを検証する"""
+    from app.services.auth import get_password_hash, verify_password
+    
+    hashed_password = get_password_hash(BENCH_PASSWORD)
+    return lambda: verify_password(BENCH_PASSWORD, hashed_password)
+
+
+@benchmark("api.get_posts", iterations=200)
+def bench_get_posts(context: BenchContext) -> Callable[[], None]:
+    """GET /posts で投稿一覧を取得する"""
+    return lambda: _expect(context.client.get("/posts/", headers=context.auth_headers), 200)
+
+
+@benchmark("api.create_post", iterations=200)
+def bench_create_post(context: BenchContext) -> Callable[[], None]:
+    """POST /posts で投稿を作成する"""
+    body = {"title": "ベンチマーク", "message": "本文" * 50}
+    return lambda: _expect(context.client.post("/posts/", json=body, headers=context.auth_headers), 201)
+
+
+@benchmark("api.login", iterations=5)
+def bench_login(context: BenchContext) -> Callable[[], None]:
+    """POST /auth/login でログインする"""
+    body = {"username": context.user.username, "password": BENCH_PASSWORD}
+    return lambda: _expect(context.client.post("/auth/login", json=body), 200)
+
+
+def _expect(response, status_code: int) -> None:
+    """
+    APIのレスポンスのステータスコードを確認する（エラー応答の計測を防ぐ）
+    
+    Args:
+        response: レスポンス
+        status_code: 期待するステータスコード
+    
+    Raises:
+        RuntimeError: ステータスコードが異なる場合
+    """
+    if response.status_code != status_code:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path}: {response.status_code} {response.text}")
+
+
+def measure(func: Callable[[], None], iterations: int, warmup: Optional[int] = None) -> dict:
+    """
+    処理時間を計測する
+    
+    Args:
+        func: 計測する処理
+        iterations: 計測回数
+        warmup: 計測前に実行する回数（Noneの場合は計測回数の1/10、最低1回）
+    
+    Returns:
+        dict: 計測結果（ミリ秒）
+    """
+    if warmup is None:
+        warmup = max(1, iterations // 10)
+    for _ in range(warmup):
+        func()
+    
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    
+    durations.sort()
+    return {
+        "iterations": iterations,
+        "mean_ms": round(statistics.fmean(durations), 4),
+        "median_ms": round(statistics.median(durations), 4),
+        "p95_ms": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))], 4),
+        "min_ms": round(durations[0], 4),
+        "max_ms": round(durations[-1], 4),
+    }
+
+
+def run_benchmarks(storage: str = "moto", filters: Optional[List[str]] = None, scale: float = 1.0) -> dict:
+    """
+    ベンチマークを実行する
+    
+    Args:
+        storage: 計測環境のストレージ
+        filters: ベンチマーク名に含まれる文字列（いずれかを含むものを実行、Noneの場合は全て）
+        scale: 計測回数の倍率
+    
+    Returns:
+        dict: 計測結果（環境情報とベンチマーク名 → 計測結果）
+    """
+    selected = [b for b in BENCHMARKS if not filters or any(f in b.name for f in filters)]
+    
+    results = {}
+    with storage_environment(storage):
+        context = BenchContext()
+        for bench in selected:
+            func = bench.setup(context)
+            results[bench.name] = measure(func, max(1, int(bench.iterations * scale)))
+    
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "storage": storage,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> List[dict]:
+    """
+    計測結果をベースラインと比較する
+    
+    中央値がベースラインから閾値を超えて増加した項目を回帰、減少した項目を改善とする。
+    
+    Args:
+        current: 今回の計測結果
+        baseline: ベースラインの計測結果
+        threshold: 回帰とみなす増加率
+    
+    Returns:
+        List[dict]: 比較結果（name・baseline_ms・current_ms・change・status）
+    """
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            rows.append({"name": name, "baseline_ms": None, "current_ms": result["median_ms"], "change": None, "status": "new"})
+            continue
+        change = (result["median_ms"] - base["median_ms"]) / base["median_ms"] if base["median_ms"] else 0.0
+        if change > threshold:
+            status = "regression"
+        elif change < -threshold:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append({
+            "name": name,
+            "baseline_ms": base["median_ms"],
+            "current_ms": result["median_ms"],
+            "change": round(change, 4),
+            "status": status,
+        })
+    return rows
+
+
+def format_report(current: dict, rows: Optional[List[dict]] = None) -> str:
+    """
+    計測結果（と比較結果）を表形式の文字列にする
+    
+    Args:
+        current: 今回の計測結果
+        rows: ベースラインとの比較結果（Noneの場合は比較しない）
+    
+    Returns:
+        str: 表形式の文字列
+    """
+    lines = [f"{'name':<24} {'median_ms':>11} {'p95_ms':>11} {'baseline':>11} {'change':>8}  status"]
+    comparisons = {row["name"]: row for row in rows or []}
+    for name, result in current["results"].items():
+        row = comparisons.get(name, {})
+        baseline = f"{row['baseline_ms']:.4f}" if row.get("baseline_ms") is not None else "-"
+        change = f"{row['change']:+.1%}" if row.get("change") is not None else "-"
+        lines.append(
+            f"{name:<24} {result['median_ms']:>11.4f} {result['p95_ms']:>11.4f} {baseline:>11} {change:>8}  {row.get('status', '')}"
+        )
+    return "\n".join(lines)
+
+
+def _write_json(path: str, data: dict) -> None:
+    """
+    JSONファイルに書き込む（ディレクトリが無ければ作成する）
+    
+    Args:
+        path: ファイルのパス
+        data: 書き込むデータ
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    ベンチマークを実行し、結果を保存・比較する
+    
+    Args:
+        argv: コマンドライン引数（Noneの場合はsys.argv）
+    
+    Returns:
+        int: 終了コード（回帰があった場合は1）
+    """
+    parser = argparse.ArgumentParser(prog="python -m perf.bench", description="バックエンドのベンチマークを実行する")
+    parser.add_argument("--storage", choices=STORAGES, default="moto", help="計測環境のストレージ")
+    parser.add_argument("--filter", action="append", dest="filters", help="実行するベンチマーク名に含まれる文字列（複数指定可）")
+    parser.add_argument("--scale", type=float, default=1.0, help="計測回数の倍率")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="計測結果の保存先")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="比較するベースライン")
+    parser.add_argument("--save-baseline", action="store_true", help="計測結果をベースラインとして保存する")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="回帰とみなす中央値の増加率")
+    args = parser.parse_args(argv)
+    
+    current = run_benchmarks(args.storage, args.filters, args.scale)
+    _write_json(args.output, current)
+    
+    rows = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            rows = compare(current, json.load(f), args.threshold)
+    print(format_report(current, rows))
+    
+    if args.save_baseline:
+        _write_json(args.baseline, current)
+        print(f"ベースラインを保存しました: {args.baseline}")
+    
+    regressions = [row["name"] for row in rows or [] if row["status"] == "regression"]
+    if regressions:
+        print(f"回帰を検出しました: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""
+計測環境
+
+性能計測で使用するストレージ（DynamoDBの代替）を準備する。
+
+- moto: motoでモック化したDynamoDB（DynamoDBのコードパスをネットワーク通信なしで計測する）
+- memory: プロセス内のメモリ
+- sqlite: 一時ディレクトリのSQLiteデータベース
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+
+from app.config import get_settings
+from app.services.database import reset_dynamodb_resource
+from app.services.repository import reset_repositories
+
+# 使用できる計測環境のストレージ
+STORAGES = ("moto", "memory", "sqlite")
+
+
+def create_dynamodb_tables(dynamodb) -> None:
+    """
+    ユーザー・投稿・アーカイブ・検索インデックス・集計・レート制限のテーブルを作成する（serverless.ymlと同じキー・インデックス）
+    
+    集計（STATS_ENABLED）などの設定が有効な場合に書き込みが失敗する経路を計測しないよう、全てのテーブルを作成する。
+    
+    Args:
+        dynamodb: boto3のDynamoDBリソース
+    """
+    settings = get_settings()
+    throughput = {"ReadCapacityUnits": 5, "WriteCapacityUnits": 5}
+    
+    dynamodb.create_table(
+        TableName=settings.USERS_TABLE,
+        KeySchema=[{"AttributeName": "user_id", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "user_id", "AttributeType": "S"},
+            {"AttributeName": "username", "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": "username-index",
+                "KeySchema": [{"AttributeName": "username", "KeyType": "HASH"}],
+                "Projection": {"ProjectionType": "ALL"},
+                "ProvisionedThroughput": throughput,
+            },
+        ],
+        ProvisionedThroughput=throughput,
+    )
+    
+    dynamodb.create_table(
+        TableName=settings.POSTS_TABLE,
+        KeySchema=[{"AttributeName": "post_id", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "post_id", "AttributeType": "S"},
+            {"AttributeName": "user_id", "AttributeType": "S"},
+            {"AttributeName": "pk", "AttributeType": "S"},
+            {"AttributeName": "created_at", "AttributeType": "S"},
+            {"AttributeName": "title_key", "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": "user_id-index",
+                "KeySchema": [{"AttributeName": "user_id", "KeyType": "HASH"}],
+                "Projection": {"ProjectionType": "ALL"},
+                "ProvisionedThroughput": throughput,
+            },
+            {
+                "IndexName": "pk-created_at-index",
+                "KeySchema": [
+                    {"AttributeName": "pk", "KeyType": "HASH"},
+                    {"AttributeName": "created_at", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+                "ProvisionedThroughput": throughput,
+            },
+            {
+                "IndexName": "pk-title_key-index",
+                "KeySchema": [
+                    {"AttributeName": "pk", "KeyType": "HASH"},
+                    {"AttributeName": "title_key", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+                "ProvisionedThroughput": throughput,
+            },
+        ],
+        ProvisionedThroughput=throughput,
+    )
+    
+    dynamodb.create_table(
+        TableName=settings.ARCHIVE_TABLE,
+        KeySchema=[{"AttributeName": "post_id", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "post_id", "AttributeType": "S"},
+            {"AttributeName": "pk", "AttributeType": "S"},
+            {"AttributeName": "created_at", "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": "pk-created_at-index",
+                "KeySchema": [
+                    {"AttributeName": "pk", "KeyType": "HASH"},
+                    {"AttributeName": "created_at", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+                "ProvisionedThroughput": throughput,
+            },
+        ],
+        ProvisionedThroughput=throughput,
+    )
+    
+    dynamodb.create_table(
+        TableName=settings.SEARCH_TABLE,
+        KeySchema=[{"AttributeName": "entry_id", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "entry_id", "AttributeType": "S"},
+            {"AttributeName": "term", "AttributeType": "S"},
+            {"AttributeName": "rank", "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": "term-rank-index",
+                "KeySchema": [
+                    {"AttributeName": "term", "KeyType": "HASH"},
+                    {"AttributeName": "rank", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+                "ProvisionedThroughput": throughput,
+            },
+        ],
+        ProvisionedThroughput=throughput,
+    )
+    
+    dynamodb.create_table(
+        TableName=settings.STATS_TABLE,
+        KeySchema=[{"AttributeName": "stat_id", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "stat_id", "AttributeType": "S"},
+            {"AttributeName": "kind", "AttributeType": "S"},
+            {"AttributeName": "sort_key", "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": "kind-sort_key-index",
+                "KeySchema": [
+                    {"AttributeName": "kind", "KeyType": "HASH"},
+                    {"AttributeName": "sort_key", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+                "ProvisionedThroughput": throughput,
+            },
+        ],
+        ProvisionedThroughput=throughput,
+    )
+    
+    dynamodb.create_table(
+        TableName=settings.RATE_LIMIT_TABLE,
+        KeySchema=[{"AttributeName": "limit_id", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "limit_id", "AttributeType": "S"}],
+        ProvisionedThroughput=throughput,
+    )
+
+
+@contextmanager
+def storage_environment(storage: str) -> Iterator[None]:
+    """
+    計測用のストレージを準備する
+    
+    with文の範囲内では全てのリポジトリが空の計測用ストレージを使用する。
+    仮想ユーザーは同じ接続元から大量に投稿するため、投稿のレート制限を無効にする。
+    範囲を抜けると設定を元に戻し、リポジトリを破棄する。
+    
+    Args:
+        storage: 計測環境のストレージ（moto・memory・sqlite）
+    
+    Raises:
+        ValueError: storageが不正な場合
+    """
+    if storage not in STORAGES:
+        raise ValueError(f"ストレージが不正です: {storage}（{', '.join(STORAGES)}のいずれか）")
+    
+    settings = get_settings()
+    original = (settings.STORAGE_BACKEND, settings.SQLITE_PATH, settings.DYNAMODB_ENDPOINT, settings.RATE_LIMIT_ENABLED)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        settings.STORAGE_BACKEND = "dynamodb" if storage == "moto" else storage
+        settings.SQLITE_PATH = os.path.join(directory, "perf.db")
+        settings.RATE_LIMIT_ENABLED = False
+        reset_repositories()
+        reset_dynamodb_resource()
+        try:
+            if storage == "moto":
+                import boto3
+                from moto import mock_dynamodb
+                
+                # motoはエンドポイント指定なし・ダミーの認証情報でのみモック化する
+                settings.DYNAMODB_ENDPOINT = None
+                for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+                    os.environ.setdefault(name, "testing")
+                with mock_dynamodb():
+                    create_dynamodb_tables(boto3.resource("dynamodb", region_name=settings.AWS_REGION))
+                    yield
+            else:
+                yield
+        finally:
+            settings.STORAGE_BACKEND, settings.SQLITE_PATH, settings.DYNAMODB_ENDPOINT, settings.RATE_LIMIT_ENABLED = original
+            reset_repositories()
+            reset_dynamodb_resource()
@@ -0,0 +1,646 @@
+"""
+負荷生成
+
+多数の仮想ユーザーが掲示板の典型的な操作（ログイン・一覧・詳細・作成・編集・削除）を
+設定した比率で繰り返し実行し、ルートごとのスループットとレイテンシ（p50・p95・p99）を報告する。
+
+    python -m perf.loadgen --users 50 --duration 60                    # プロセス内のASGIアプリケーション（moto）
+    python -m perf.loadgen --storage memory --stages 30:10,60:100,30:100
+    python -m perf.loadgen --url http://localhost:8000 --admin-username admin --admin-password ...
+
+--urlを指定しない場合はASGIアプリケーションをプロセス内で直接呼び出す（ネットワーク・サーバーを含まない）。
+--urlを指定した場合は起動済みのサーバー（python -m app.server、DYNAMODB_ENDPOINTでmoto serverを指定するなど）に
+HTTPで送信する。この場合、計測用アカウントは管理者アカウントでPOST /usersにより作成する。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from perf.environment import STORAGES, storage_environment
+
+# 操作 → 既定の比率
+DEFAULT_MIX = {
+    "login": 2,
+    "feed": 55,
+    "read": 25,
+    "create": 10,
+    "edit": 5,
+    "delete": 3,
+}
+
+# 計測用アカウントのユーザー名の接頭辞
+ACCOUNT_PREFIX = "loadgen-user-"
+
+# 計測用アカウントのパスワード
+ACCOUNT_PASSWORD = "loadgen-password"
+
+# 仮想ユーザーが記憶する投稿IDの最大件数（詳細の読み取り対象）
+KNOWN_POSTS_LIMIT = 200
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """
+    操作の比率を解析する（例: feed=60,read=20,create=10）
+    
+    指定しなかった操作は実行しない。
+    
+    Args:
+        value: 操作名=比率をカンマで区切った文字列
+    
+    Returns:
+        Dict[str, int]: 操作 → 比率
+    
+    Raises:
+        ValueError: 操作名・比率が不正な場合
+    """
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"操作名が不正です: {name}（{', '.join(DEFAULT_MIX)}のいずれか）")
+        mix[name] = int(weight)
+        if mix[name] < 0:
+            raise ValueError(f"比率が不正です: {part}")
+    if sum(mix.values()) <= 0:
+        raise ValueError("比率の合計は1以上にしてください")
+    return mix
+
+
+def parse_stages(value: str) -> List[Tuple[float, int]]:
+    """
+    負荷の段階を解析する（例: 30:10,60:50 は30秒で10ユーザーまで増やし、60秒で50ユーザーまで増やす）
+    
+    Args:
+        value: 秒数:仮想ユーザー数をカンマで区切った文字列
+    
+    Returns:
+        List[Tuple[float, int]]: (秒数, 段階の終わりの仮想ユーザー数)リスト
+    
+    Raises:
+        ValueError: 形式が不正な場合
+    """
+    stages = []
+    for part in value.split(","):
+        seconds, _, users = part.partition(":")
+        stages.append((float(seconds), int(users)))
+        if stages[-1][0] <= 0 or stages[-1][1] < 0:
+            raise ValueError(f"段階が不正です: {part}")
+    return stages
+
+
+class RampProfile:
+    """
+    負荷の段階クラス
+    
+    各段階の間、仮想ユーザー数を前の段階の終わりの人数から線形に増減させる（最初の段階は0人から）。
+    """
+    
+    def __init__(self, stages: List[Tuple[float, int]]):
+        """
+        初期化
+        
+        Args:
+            stages: (秒数, 段階の終わりの仮想ユーザー数)リスト
+        """
+        # 段階リスト
+        self.stages = stages
+        # 全体の秒数
+        self.duration = sum(seconds for seconds, _ in stages)
+        # 最大の仮想ユーザー数
+        self.max_users = max(users for _, users in stages)
+    
+    @classmethod
+    def constant(cls, users: int, duration: float) -> "RampProfile":
+        """
+        一定の仮想ユーザー数の負荷を作成する
+        
+        Args:
+            users: 仮想ユーザー数
+            duration: 秒数
+        
+        Returns:
+            RampProfile: 負荷の段階
+        """
+        return cls([(0.001, users), (duration, users)])
+    
+    def users_at(self, elapsed: float) -> int:
+        """
+        経過時間での仮想ユーザー数を算出する
+        
+        Args:
+            elapsed: 開始からの経過秒数
+        
+        Returns:
+            int: 仮想ユーザー数（全段階の終了後は最後の段階の人数）
+        """
+        start_users = 0
+        for seconds, users in self.stages:
+            if elapsed < seconds:
+                return round(start_users + (users - start_users) * elapsed / seconds)
+            elapsed -= seconds
+            start_users = users
+        return start_users
+
+
+class LoadStats:
+    """
+    負荷試験の計測結果クラス
+    
+    ルートごとのレイテンシと、1秒ごとのリクエスト数・仮想ユーザー数を記録する。
+    """
+    
+    def __init__(self):
+        """計測結果の初期化"""
+        # ルート → レイテンシ（ミリ秒）リスト
+        self.latencies: Dict[str, List[float]] = {}
+        # ルート → エラー件数（ステータスコード別）
+        self.errors: Dict[str, Dict[int, int]] = {}
+        # 経過秒 → [リクエスト数, エラー数, 仮想ユーザー数]
+        self.timeline: Dict[int, List[int]] = {}
+    
+    def record(self, route: str, elapsed: float, duration_ms: float, status_code: int, ok: bool, users: int) -> None:
+        """
+        リクエストの結果を記録する
+        
+        Args:
+            route: ルート（例: GET /posts/{post_id}）
+            elapsed: 開始からの経過秒数
+            duration_ms: レイテンシ（ミリ秒）
+            status_code: ステータスコード（接続エラーの場合は0）
+            ok: 成功したかどうか
+            users: 記録時点の仮想ユーザー数
+        """
+        self.latencies.setdefault(route, []).append(duration_ms)
+        second = self.timeline.setdefault(int(elapsed), [0, 0, 0])
+        second[0] += 1
+        second[2] = max(second[2], users)
+        if not ok:
+            route_errors = self.errors.setdefault(route, {})
+            route_errors[status_code] = route_errors.get(status_code, 0) + 1
+            second[1] += 1
+    
+    def report(self, duration: float) -> dict:
+        """
+        計測結果を集計する
+        
+        Args:
+            duration: 計測した秒数
+        
+        Returns:
+            dict: 集計結果
+        """
+        routes = {}
+        for route, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            errors = self.errors.get(route, {})
+            routes[route] = {
+                "count": len(latencies),
+                "errors": sum(errors.values()),
+                "error_status": {str(code): count for code, count in sorted(errors.items())},
+                "throughput_rps": round(len(latencies) / duration, 2),
+                "p50_ms": round(percentile(latencies, 50), 3),
+                "p95_ms": round(percentile(latencies, 95), 3),
+                "p99_ms": round(percentile(latencies, 99), 3),
+                "max_ms": round(latencies[-1], 3),
+            }
+        total = sum(route["count"] for route in routes.values())
+        return {
+            "duration_s": round(duration, 3),
+            "requests": total,
+            "errors": sum(route["errors"] for route in routes.values()),
+            "throughput_rps": round(total / duration, 2) if duration else 0.0,
+            "routes": routes,
+            "timeline": [
+                {"second": second, "requests": values[0], "errors": values[1], "users": values[2]}
+                for second, values in sorted(self.timeline.items())
+            ],
+        }
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """
+    パーセンタイルを算出する（最近傍順位法）
+    
+    Args:
+        sorted_values: 昇順にソート済みの値リスト
+        percent: パーセント（0〜100）
+    
+    Returns:
+        float: パーセンタイル値（値が無い場合は0）
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class VirtualUser:
+    """
+    仮想ユーザークラス
+    
+    ログインして取得したトークンで操作を繰り返す。
+    自分が作成した投稿を編集・削除し、一覧で見た投稿と自分の投稿の詳細を読み取る。
+    """
+    
+    def __init__(self, index: int, client: httpx.AsyncClient, account: str, mix: Dict[str, int], seed: int, stats: LoadStats):
+        """
+        仮想ユーザーの初期化
+        
+        Args:
+            index: 仮想ユーザーの番号（負荷の段階で起動する順番）
+            client: HTTPクライアント
+            account: ログインするユーザー名
+            mix: 操作 → 比率
+            seed: 乱数のシード
+            stats: 計測結果
+        """
+        self.index = index
+        self.client = client
+        self.account = account
+        self.stats = stats
+        # 操作を選択する乱数（仮想ユーザーごとに再現可能にする）
+        self.random = random.Random(seed * 100003 + index)
+        # 操作名リストと比率リスト
+        self.actions = list(mix)
+        self.weights = [mix[action] for action in self.actions]
+        # 認証ヘッダー
+        self.headers: Dict[str, str] = {}
+        # 自分が作成した投稿ID → ETag
+        self.own_posts: Dict[str, str] = {}
+        # 一覧で見た投稿IDリスト
+        self.known_posts: List[str] = []
+    
+    async def request(self, route: str, method: str, path: str, expected: Tuple[int, ...], **kwargs) -> Optional[httpx.Response]:
+        """
+        リクエストを送信して結果を記録する
+        
+        Args:
+            route: 記録するルート
+            method: HTTPメソッド
+            path: パス
+            expected: 成功とするステータスコード
+            **kwargs: httpxのリクエスト引数
+        
+        Returns:
+            httpx.Response: レスポンス（失敗・接続エラーの場合はNone）
+        """
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, headers={**self.headers, **kwargs.pop("headers", {})}, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        duration_ms = (time.perf_counter() - start) * 1000
+        status_code = response.status_code if response is not None else 0
+        elapsed = time.perf_counter() - self.started_at
+        ok = status_code in expected
+        self.stats.record(route, elapsed, duration_ms, status_code, ok, self.active_users(elapsed))
+        return response if ok else None
+    
+    async def login(self) -> bool:
+        """
+        ログインしてトークンを取得する
+        
+        Returns:
+            bool: 成功した場合True
+        """
+        response = await self.request(
+            "POST /auth/login", "POST", "/auth/login", (200,),
+            json={"username": self.account, "password": ACCOUNT_PASSWORD},
+        )
+        if response is None:
+            self.headers = {}
+            return False
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return True
+    
+    async def feed(self) -> None:
+        """投稿一覧を取得し、詳細を読み取る投稿IDを記憶する"""
+        response = await self.request("GET /posts/", "GET", "/posts/", (200,), params={"limit": 20})
+        if response is not None:
+            self.known_posts = [post["post_id"] for post in response.json()][:KNOWN_POSTS_LIMIT]
+    
+    async def read(self) -> None:
+        """投稿の詳細を取得する（読み取る投稿が無い場合は一覧を取得する）"""
+        candidates = self.known_posts or list(self.own_posts)
+        if not candidates:
+            await self.feed()
+            return
+        post_id = self.random.choice(candidates)
+        # 他の仮想ユーザーが削除した投稿は404になるため、404も正常として扱う
+        response = await self.request("GET /posts/{post_id}", "GET", f"/posts/{post_id}", (200, 404))
+        if response is not None and response.status_code == 404 and post_id in self.known_posts:
+            self.known_posts.remove(post_id)
+    
+    async def create(self) -> None:
+        """投稿を作成する"""
+        length = self.random.randint(20, 400)
+        response = await self.request(
+            "POST /posts/", "POST", "/posts/", (201,),
+            json={"title": f"負荷試験 {self.index}", "message": "あ" * length},
+        )
+        if response is not None:
+            self.own_posts[response.json()["post_id"]] = response.headers.get("etag", "")
+    
+    async def edit(self) -> None:
+        """自分の投稿を編集する（投稿が無い場合は作成する）"""
+        if not self.own_posts:
+            await self.create()
+            return
+        post_id = self.random.choice(list(self.own_posts))
+        response = await self.request(
+            "PUT /posts/{post_id}", "PUT", f"/posts/{post_id}", (200,),
+            json={"message": "編集済み " + "い" * self.random.randint(20, 400)},
+            headers={"If-Match": self.own_posts[post_id]} if self.own_posts[post_id] else {},
+        )
+        if response is not None:
+            self.own_posts[post_id] = response.headers.get("etag", "")
+        else:
+            self.own_posts.pop(post_id, None)
+    
+    async def delete(self) -> None:
+        """自分の投稿を削除する（投稿が無い場合は作成する）"""
+        if not self.own_posts:
+            await self.create()
+            return
+        post_id = self.random.choice(list(self.own_posts))
+        self.own_posts.pop(post_id)
+        await self.request("DELETE /posts/{post_id}", "DELETE", f"/posts/{post_id}", (204,))
+    
+    async def run(self, profile: RampProfile, started_at: float, think_time: float) -> None:
+        """
+        負荷の段階に従って操作を繰り返す
+        
+        自分の番号が現在の仮想ユーザー数未満の間だけ操作し、それ以外の間は待機する。
+        
+        Args:
+            profile: 負荷の段階
+            started_at: 負荷試験の開始時刻（perf_counter）
+            think_time: 操作の間に待機する秒数
+        """
+        self.started_at = started_at
+        self.active_users = profile.users_at
+        while True:
+            elapsed = time.perf_counter() - started_at
+            if elapsed >= profile.duration:
+                return
+            if self.index >= profile.users_at(elapsed):
+                await asyncio.sleep(0.05)
+                continue
+            if not self.headers:
+                await self.login()
+                continue
+            
+            action = self.random.choices(self.actions, self.weights)[0]
+            await getattr(self, action)()
+            await asyncio.sleep(think_time)
+
+
+def create_accounts_in_process(count: int) -> List[str]:
+    """
+    計測用アカウントをユーザーサービスで直接作成する（プロセス内のASGIアプリケーションの場合）
+    
+    パスワードのハッシュ化はGILを解放するため、スレッドで並列に作成する。
+    
+    Args:
+        count: アカウント数
+    
+    Returns:
+        List[str]: ユーザー名リスト
+    """
+    from app.models.user import UserCreate
+    from app.services.user_service import user_service
+    
+    usernames = [f"{ACCOUNT_PREFIX}{index}" for index in range(count)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(
+            lambda username: user_service.create_user(UserCreate(username=username, password=ACCOUNT_PASSWORD)),
+            usernames,
+        ))
+    return usernames
+
+
+async def create_accounts_via_api(client: httpx.AsyncClient, count: int, admin_username: str, admin_password: str) -> List[str]:
+    """
+    計測用アカウントを管理者アカウントでAPIから作成する（起動済みのサーバーの場合）
+    
+    既に存在するアカウントはそのまま使用する。
+    
+    Args:
+        client: HTTPクライアント
+        count: アカウント数
+        admin_username: 管理者のユーザー名
+        admin_password: 管理者のパスワード
+    
+    Returns:
+        List[str]: ユーザー名リスト
+    """
+    response = await client.post("/auth/login", json={"username": admin_username, "password": admin_password})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    usernames = [f"{ACCOUNT_PREFIX}{index}" for index in range(count)]
+    for username in usernames:
+        response = await client.post("/users/", json={"username": username, "password": ACCOUNT_PASSWORD}, headers=headers)
+        if response.status_code not in (201, 400):
+            response.raise_for_status()
+    return usernames
+
+
+async def login_accounts(client: httpx.AsyncClient, accounts: List[str]) -> Dict[str, Dict[str, str]]:
+    """
+    計測用アカウントでログインし、認証ヘッダーを取得する（計測には含めない）
+    
+    ログインはパスワードの検証で重いため、仮想ユーザーの起動ごとにログインすると
+    ランプアップ中の計測がログイン待ちに支配される。ログインの負荷は操作の比率（login）で与える。
+    
+    Args:
+        client: HTTPクライアント
+        accounts: ユーザー名リスト
+    
+    Returns:
+        Dict[str, Dict[str, str]]: ユーザー名 → 認証ヘッダー
+    """
+    headers = {}
+    for username in accounts:
+        response = await client.post("/auth/login", json={"username": username, "password": ACCOUNT_PASSWORD})
+        response.raise_for_status()
+        headers[username] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return headers
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    accounts: List[str],
+    profile: RampProfile,
+    mix: Dict[str, int],
+    seed: int = 0,
+    think_time: float = 0.0,
+) -> dict:
+    """
+    負荷試験を実行する
+    
+    Args:
+        client: HTTPクライアント
+        accounts: ログインするユーザー名リスト（仮想ユーザーに順番に割り当てる）
+        profile: 負荷の段階
+        mix: 操作 → 比率
+        seed: 乱数のシード
+        think_time: 操作の間に待機する秒数
+    
+    Returns:
+        dict: 集計結果
+    """
+    stats = LoadStats()
+    headers = await login_accounts(client, accounts)
+    users = [
+        VirtualUser(index, client, accounts[index % len(accounts)], mix, seed, stats)
+        for index in range(profile.max_users)
+    ]
+    for user in users:
+        user.headers = dict(headers[user.account])
+    started_at = time.perf_counter()
+    await asyncio.gather(*(user.run(profile, started_at, think_time) for user in users))
+    return stats.report(time.perf_counter() - started_at)
+
+
+def run(
+    profile: RampProfile,
+    mix: Dict[str, int],
+    accounts: int,
+    storage: str = "moto",
+    url: Optional[str] = None,
+    admin_username: Optional[str] = None,
+    admin_password: Optional[str] = None,
+    seed: int = 0,
+    think_time: float = 0.0,
+) -> dict:
+    """
+    計測用アカウントを準備して負荷試験を実行する
+    
+    Args:
+        profile: 負荷の段階
+        mix: 操作 → 比率
+        accounts: 計測用アカウント数
+        storage: 計測環境のストレージ（プロセス内のASGIアプリケーションの場合）
+        url: 起動済みのサーバーのURL（Noneの場合はプロセス内のASGIアプリケーション）
+        admin_username: 管理者のユーザー名（起動済みのサーバーの場合）
+        admin_password: 管理者のパスワード（起動済みのサーバーの場合）
+        seed: 乱数のシード
+        think_time: 操作の間に待機する秒数
+    
+    Returns:
+        dict: 集計結果と負荷試験の条件
+    """
+    limits = httpx.Limits(max_connections=max(10, profile.max_users), max_keepalive_connections=max(10, profile.max_users))
+    conditions = {
+        "target": url or f"asgi ({storage})",
+        "max_users": profile.max_users,
+        "stages": profile.stages,
+        "mix": mix,
+        "accounts": accounts,
+        "seed": seed,
+        "think_time_s": think_time,
+    }
+    
+    if url is not None:
+        async def run_remote():
+            async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+                names = await create_accounts_via_api(client, accounts, admin_username, admin_password)
+                return await run_load(client, names, profile, mix, seed, think_time)
+        
+        return {"conditions": conditions, **asyncio.run(run_remote())}
+    
+    from app.main import app
+    
+    async def run_in_process(names):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadgen", timeout=30.0) as client:
+            return await run_load(client, names, profile, mix, seed, think_time)
+    
+    with storage_environment(storage):
+        names = create_accounts_in_process(accounts)
+        return {"conditions": conditions, **asyncio.run(run_in_process(names))}
+
+
+def format_report(result: dict) -> str:
+    """
+    集計結果を表形式の文字列にする
+    
+    Args:
+        result: 集計結果
+    
+    Returns:
+        str: 表形式の文字列
+    """
+    lines = [
+        f"target={result['conditions']['target']} users={result['conditions']['max_users']} "
+        f"duration={result['duration_s']}s requests={result['requests']} errors={result['errors']} "
+        f"throughput={result['throughput_rps']} req/s",
+        f"{'route':<24} {'count':>7} {'errors':>7} {'req/s':>8} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9} {'max_ms':>9}",
+    ]
+    for route, values in result["routes"].items():
+        lines.append(
+            f"{route:<24} {values['count']:>7} {values['errors']:>7} {values['throughput_rps']:>8.1f} "
+            f"{values['p50_ms']:>9.2f} {values['p95_ms']:>9.2f} {values['p99_ms']:>9.2f} {values['max_ms']:>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    負荷試験を実行し、結果を表示・保存する
+    
+    Args:
+        argv: コマンドライン引数（Noneの場合はsys.argv）
+    
+    Returns:
+        int: 終了コード
+    """
+    parser = argparse.ArgumentParser(prog="python -m perf.loadgen", description="掲示板APIの負荷試験を実行する")
+    parser.add_argument("--users", type=int, default=20, help="仮想ユーザー数（--stagesを指定しない場合）")
+    parser.add_argument("--duration", type=float, default=30.0, help="秒数（--stagesを指定しない場合）")
+    parser.add_argument("--stages", type=parse_stages, help="負荷の段階（秒数:仮想ユーザー数をカンマ区切り、例: 30:10,60:50）")
+    parser.add_argument(
+        "--mix", type=parse_mix, default=DEFAULT_MIX,
+        help="操作の比率（例: login=2,feed=55,read=25,create=10,edit=5,delete=3）",
+    )
+    parser.add_argument("--accounts", type=int, default=10, help="計測用アカウント数（仮想ユーザーに順番に割り当てる）")
+    parser.add_argument("--think-time", type=float, default=0.0, help="操作の間に待機する秒数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数のシード")
+    parser.add_argument("--storage", choices=STORAGES, default="moto", help="計測環境のストレージ（--urlを指定しない場合）")
+    parser.add_argument("--url", help="起動済みのサーバーのURL（指定しない場合はプロセス内のASGIアプリケーション）")
+    parser.add_argument("--admin-username", help="計測用アカウントを作成する管理者のユーザー名（--urlを指定した場合）")
+    parser.add_argument("--admin-password", help="管理者のパスワード（--urlを指定した場合）")
+    parser.add_argument("--output", help="集計結果を保存するJSONファイル")
+    args = parser.parse_args(argv)
+    
+    if args.url and not (args.admin_username and args.admin_password):
+        parser.error("--urlを指定した場合は--admin-usernameと--admin-passwordが必要です")
+    
+    profile = RampProfile(args.stages) if args.stages else RampProfile.constant(args.users, args.duration)
+    result = run(
+        profile, args.mix, args.accounts, args.storage, args.url,
+        args.admin_username, args.admin_password, args.seed, args.think_time,
+    )
+    print(format_report(result))
+    
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,417 @@
+"""
+合成データの投入
+
+ユーザーテーブル・投稿テーブルに、実運用に近い分布の大量のアイテムを投入する。
+ページング・スキャン・シャーディングなどの検証に使用する。
+
+    python -m perf.seed --users 10000 --posts 1000000 --workers 8
+    STORAGE_BACKEND=sqlite SQLITE_PATH=large.db python -m perf.seed --posts 3000000
+
+投入先は設定（STORAGE_BACKEND・DYNAMODB_ENDPOINT・テーブル名）のストレージ。
+
+- 投稿数はユーザーごとにべき乗則（少数のユーザーが大半の投稿をする）
+- 投稿日時は日中に多い背景の投稿と、短時間に集中するバーストの組み合わせ
+- 本文の長さは対数正規分布（短い投稿が多く、長い投稿が少数）
+- アイテムの形はUserService.build_user_item・PostService.build_post_itemで作成する
+- 同じシード・引数では、ワーカー数に関わらず同じデータになる（チャンクごとに乱数を初期化する）
+
+全ユーザーのパスワードは--passwordの値（ハッシュ化は1度だけ行う）。
+"""
+
+import argparse
+import itertools
+import math
+import random
+import sys
+import threading
+import time
+import uuid
+from bisect import bisect
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+# 1チャンク（1回のまとめた書き込み）の投稿件数
+DEFAULT_CHUNK_SIZE = 5000
+
+# スロットリング（SQLiteのロック待ちの超過を含む）時の最大リトライ回数
+MAX_RETRIES = 8
+
+# 投稿日時の範囲の終わりの既定値（実行日に依存しない再現可能なデータにするため固定）
+DEFAULT_END = "2025-01-01T00:00:00"
+
+# 時刻 → 投稿の多さの重み（深夜に少なく、昼休み・夜に多い）
+HOURLY_WEIGHTS = [3, 2, 1, 1, 1, 2, 4, 6, 8, 8, 8, 9, 12, 10, 8, 8, 8, 9, 11, 13, 14, 14, 11, 6]
+
+# ユーザー名に使用する音節
+SYLLABLES = ["ka", "ki", "ku", "ke", "ko", "sa", "shi", "su", "ta", "to", "na", "no", "ha", "mi", "mu", "ya", "yu", "ri", "ro", "wa"]
+
+# 本文・タイトルに使用する語
+WORDS = [
+    "今日", "明日", "掲示板", "投稿", "お知らせ", "質問", "回答", "ありがとう", "よろしく", "確認",
+    "更新", "予定", "会議", "資料", "共有", "報告", "対応", "完了", "検討", "連絡",
+    "です", "ます", "した", "ください", "について", "ですが", "、", "。", "！", "？",
+]
+
+
+class Timeline:
+    """
+    投稿日時の分布クラス
+    
+    投稿のburst_ratioの割合をバーストの中心付近（指数分布）に、残りを日中に多い背景の分布に配置する。
+    バーストの大きさもべき乗則に従う（少数のバーストに投稿が集中する）。
+    """
+    
+    def __init__(self, end: datetime, days: int, burst_ratio: float, seed: int):
+        """
+        分布の初期化
+        
+        Args:
+            end: 範囲の終わり
+            days: 範囲の日数
+            burst_ratio: バーストに含まれる投稿の割合
+            seed: 乱数のシード
+        """
+        rng = random.Random(f"{seed}:bursts")
+        # 範囲の始まり
+        self.start = end - timedelta(days=days)
+        # 範囲の日数
+        self.days = days
+        # バーストに含まれる投稿の割合
+        self.burst_ratio = burst_ratio
+        # バーストの中心（範囲の始まりからの秒数）
+        self.bursts = [rng.uniform(0, days * 86400) for _ in range(max(1, days * 2))]
+        # バーストの大きさの累積重み
+        self.burst_weights = list(itertools.accumulate(rng.paretovariate(1.5) for _ in self.bursts))
+        # 時刻の累積重み
+        self.hour_weights = list(itertools.accumulate(HOURLY_WEIGHTS))
+    
+    def sample(self, rng: random.Random) -> datetime:
+        """
+        投稿日時を1つ生成する
+        
+        Args:
+            rng: 乱数
+        
+        Returns:
+            datetime: 投稿日時
+        """
+        if rng.random() < self.burst_ratio:
+            center = self.bursts[bisect(self.burst_weights, rng.random() * self.burst_weights[-1])]
+            offset = min(max(center + rng.expovariate(1 / 1200), 0), self.days * 86400 - 1)
+        else:
+            hour = bisect(self.hour_weights, rng.random() * self.hour_weights[-1])
+            offset = rng.randrange(self.days) * 86400 + hour * 3600 + rng.random() * 3600
+        return self.start + timedelta(seconds=offset)
+
+
+def _uuid(rng: random.Random) -> str:
+    """
+    乱数から再現可能なUUID（バージョン4の形式）を生成する
+    
+    Args:
+        rng: 乱数
+    
+    Returns:
+        str: UUID
+    """
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _text(rng: random.Random, length: int) -> str:
+    """
+    指定した長さの文章を生成する
+    
+    Args:
+        rng: 乱数
+        length: 文字数
+    
+    Returns:
+        str: 文章
+    """
+    parts = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        parts.append(word)
+        size += len(word)
+    return "".join(parts)[:length]
+
+
+def generate_users(count: int, hashed_password: str, timeline: Timeline, seed: int) -> List[dict]:
+    """
+    ユーザーアイテムを生成する
+    
+    最初のユーザーは管理者とする。
+    
+    Args:
+        count: ユーザー数
+        hashed_password: ハッシュ化済みのパスワード
+        timeline: 投稿日時の分布（登録日時を範囲の始まり以前にする）
+        seed: 乱数のシード
+    
+    Returns:
+        List[dict]: ユーザーアイテムリスト
+    """
+    from app.models.user import UserRole
+    from app.services.user_service import user_service
+    
+    rng = random.Random(f"{seed}:users")
+    users = []
+    for index in range(count):
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        created_at = timeline.start - timedelta(seconds=rng.uniform(0, 365 * 86400))
+        users.append(user_service.build_user_item(
+            f"{name}{index}",
+            hashed_password,
+            UserRole.ADMIN if index == 0 else UserRole.USER,
+            created_at=created_at.isoformat(),
+            user_id=_uuid(rng),
+        ))
+    return users
+
+
+def author_weights(user_count: int, alpha: float, seed: int) -> List[float]:
+    """
+    投稿者を選択するための累積重みを作成する（べき乗則）
+    
+    ユーザーにランダムな順位を付け、順位rのユーザーの重みを1 / r^alphaとする。
+    
+    Args:
+        user_count: ユーザー数
+        alpha: べき乗則の指数（大きいほど少数のユーザーに投稿が集中する）
+        seed: 乱数のシード
+    
+    Returns:
+        List[float]: ユーザーの並び順の累積重み
+    """
+    ranks = list(range(1, user_count + 1))
+    random.Random(f"{seed}:authors").shuffle(ranks)
+    return list(itertools.accumulate(1 / rank ** alpha for rank in ranks))
+
+
+def generate_post_chunk(
+    chunk_index: int,
+    size: int,
+    users: List[dict],
+    weights: List[float],
+    timeline: Timeline,
+    seed: int,
+    edited_ratio: float = 0.1,
+) -> List[dict]:
+    """
+    1チャンク分の投稿アイテムを生成する
+    
+    チャンクごとに乱数を初期化するため、チャンクを生成する順番・スレッドに関わらず同じ結果になる。
+    アイテムはサービスと同じ変換（POST_ENCODINGの形式・本文の圧縮）を通した形で返す。
+    
+    Args:
+        chunk_index: チャンクの番号
+        size: 投稿件数
+        users: ユーザーアイテムリスト
+        weights: 投稿者を選択するための累積重み
+        timeline: 投稿日時の分布
+        seed: 乱数のシード
+        edited_ratio: 編集済み（version 2）にする投稿の割合
+    
+    Returns:
+        List[dict]: 投稿アイテムリスト（保存する形式）
+    """
+    from app.models.post import PostCreate
+    from app.services.post_service import post_service
+    
+    rng = random.Random(f"{seed}:posts:{chunk_index}")
+    codec = post_service._get_codec()
+    total_weight = weights[-1]
+    items = []
+    for _ in range(size):
+        author = users[bisect(weights, rng.random() * total_weight)]
+        created_at = timeline.sample(rng)
+        length = min(2000, max(1, int(rng.lognormvariate(math.log(120), 0.9))))
+        post_data = PostCreate.model_construct(title=_text(rng, rng.randint(5, 40)), message=_text(rng, length))
+        item = post_service.build_post_item(
+            post_data,
+            author["user_id"],
+            author["username"],
+            created_at=created_at.isoformat(timespec="microseconds"),
+            post_id=_uuid(rng),
+        )
+        if rng.random() < edited_ratio:
+            item["updated_at"] = (created_at + timedelta(seconds=rng.expovariate(1 / 3600))).isoformat(timespec="microseconds")
+            item["version"] = 2
+        # サービスの書き込みと同じ形式（POST_ENCODING）で保存する
+        items.append(codec.encode(item))
+    return items
+
+
+def _chunks(total: int, chunk_size: int) -> List[Tuple[int, int]]:
+    """
+    件数をチャンクに分割する
+    
+    Args:
+        total: 件数
+        chunk_size: 1チャンクの件数
+    
+    Returns:
+        List[Tuple[int, int]]: (チャンクの番号, 件数)リスト
+    """
+    return [(index, min(chunk_size, total - start)) for index, start in enumerate(range(0, total, chunk_size))]
+
+
+def put_with_retry(repository, items: List[dict]) -> int:
+    """
+    アイテムをまとめて書き込む（スロットリング時は指数バックオフでリトライする）
+    
+    Args:
+        repository: リポジトリ
+        items: アイテムリスト
+    
+    Returns:
+        int: 書き込んだ件数
+    
+    Raises:
+        ThrottledError: リトライしても書き込めなかった場合
+    """
+    from app.services.repository import ThrottledError
+    
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return repository.put_many(items)
+        except ThrottledError:
+            if attempt == MAX_RETRIES:
+                raise
+            time.sleep(random.uniform(0, 0.1 * (2 ** attempt)))
+    return 0
+
+
+def seed_dataset(
+    users: int,
+    posts: int,
+    seed: int = 0,
+    workers: int = 8,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    days: int = 365,
+    end: str = DEFAULT_END,
+    alpha: float = 1.2,
+    burst_ratio: float = 0.3,
+    password: str = "password123",
+    progress: Optional[Callable[[str, int, int], None]] = None,
+) -> dict:
+    """
+    ユーザー・投稿を生成し、設定のストレージに並列に書き込む
+    
+    書き込み後、フロントページスナップショットを破棄して次回の一覧の取得で作り直させる。
+    集計が有効な場合は、投入したアイテムは集計に加算されないため、書き込み後に集計を作り直す。
+    
+    Args:
+        users: ユーザー数
+        posts: 投稿数
+        seed: 乱数のシード
+        workers: 書き込みの並列スレッド数
+        chunk_size: 1チャンクの件数
+        days: 投稿日時の範囲の日数
+        end: 投稿日時の範囲の終わり（ISO 8601）
+        alpha: 投稿者の分布のべき乗則の指数
+        burst_ratio: バーストに含まれる投稿の割合
+        password: 全ユーザーのパスワード
+        progress: 進捗を受け取る関数（種類, 書き込み済み件数, 全件数）
+    
+    Returns:
+        dict: 投入結果（件数・処理時間・1秒あたりの件数）
+    """
+    from app.config import get_settings
+    from app.services.auth import get_password_hash
+    from app.services.post_service import FRONT_PAGE_ID, post_service
+    from app.services.repository import get_posts_repository, get_users_repository
+    
+    started = time.perf_counter()
+    timeline = Timeline(datetime.fromisoformat(end), days, burst_ratio, seed)
+    user_items = generate_users(users, get_password_hash(password), timeline, seed)
+    weights = author_weights(users, alpha, seed)
+    
+    users_repository = get_users_repository()
+    posts_repository = get_posts_repository()
+    lock = threading.Lock()
+    written = {"users": 0, "posts": 0}
+    
+    def report(kind: str, count: int, total: int) -> None:
+        with lock:
+            written[kind] += count
+            if progress is not None:
+                progress(kind, written[kind], total)
+    
+    def write_users(chunk: Tuple[int, int]) -> None:
+        index, size = chunk
+        start = index * chunk_size
+        report("users", put_with_retry(users_repository, user_items[start:start + size]), users)
+    
+    def write_posts(chunk: Tuple[int, int]) -> None:
+        index, size = chunk
+        items = generate_post_chunk(index, size, user_items, weights, timeline, seed)
+        report("posts", put_with_retry(posts_repository, items), posts)
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        list(executor.map(write_users, _chunks(users, chunk_size)))
+        list(executor.map(write_posts, _chunks(posts, chunk_size)))
+    
+    posts_repository.delete(FRONT_PAGE_ID)
+    # 一覧の総件数（X-Total-Count）・管理APIの集計に投入したアイテムを反映する
+    if get_settings().STATS_ENABLED:
+        post_service.rebuild_stats()
+    
+    elapsed = time.perf_counter() - started
+    return {
+        "users": written["users"],
+        "posts": written["posts"],
+        "elapsed_s": round(elapsed, 3),
+        "items_per_second": round((written["users"] + written["posts"]) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    合成データを投入する
+    
+    Args:
+        argv: コマンドライン引数（Noneの場合はsys.argv）
+    
+    Returns:
+        int: 終了コード
+    """
+    from app.config import get_settings
+    
+    parser = argparse.ArgumentParser(prog="python -m perf.seed", description="ユーザー・投稿の合成データを投入する")
+    parser.add_argument("--users", type=int, default=10000, help="ユーザー数")
+    parser.add_argument("--posts", type=int, default=1000000, help="投稿数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数のシード")
+    parser.add_argument("--workers", type=int, default=8, help="書き込みの並列スレッド数")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="1回にまとめて書き込む件数")
+    parser.add_argument("--days", type=int, default=365, help="投稿日時の範囲の日数")
+    parser.add_argument("--end", default=DEFAULT_END, help="投稿日時の範囲の終わり（ISO 8601）")
+    parser.add_argument("--alpha", type=float, default=1.2, help="ユーザーごとの投稿数のべき乗則の指数")
+    parser.add_argument("--burst-ratio", type=float, default=0.3, help="短時間に集中して投稿される割合")
+    parser.add_argument("--password", default="password123", help="全ユーザーのパスワード")
+    args = parser.parse_args(argv)
+    
+    if args.users < 1:
+        parser.error("--usersは1以上にしてください")
+    
+    settings = get_settings()
+    print(f"投入先: {settings.STORAGE_BACKEND}（{settings.USERS_TABLE}・{settings.POSTS_TABLE}）", file=sys.stderr)
+    
+    def progress(kind: str, written: int, total: int) -> None:
+        print(f"\r{kind}: {written}/{total}", end="" if written < total else "\n", file=sys.stderr)
+    
+    result = seed_dataset(
+        args.users, args.posts, args.seed, args.workers, args.chunk_size,
+        args.days, args.end, args.alpha, args.burst_ratio, args.password, progress,
+    )
+    print(
+        f"ユーザー {result['users']}件・投稿 {result['posts']}件を{result['elapsed_s']}秒で投入しました"
+        f"（{result['items_per_second']}件/秒）"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
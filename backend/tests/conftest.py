@@ -14,11 +14,19 @@ os.environ["SECRET_KEY"] = "test-secret-key"
 os.environ["AWS_REGION"] = "ap-northeast-1"
 os.environ["USERS_TABLE"] = "test-users"
 os.environ["POSTS_TABLE"] = "test-posts"
+os.environ["ARCHIVE_TABLE"] = "test-posts-archive"
+os.environ["SEARCH_TABLE"] = "test-search"
+os.environ["STATS_TABLE"] = "test-stats"
+os.environ["RATE_LIMIT_TABLE"] = "test-rate-limits"
 os.environ["AWS_ACCESS_KEY_ID"] = "testing"
 os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
 os.environ["AWS_SECURITY_TOKEN"] = "testing"
 os.environ["AWS_SESSION_TOKEN"] = "testing"
 
+# 設定はアプリケーションの読み込み時に環境変数から作成されるため、環境変数の設定後に読み込む
+from app.config import get_settings  # noqa: E402
+from app.services.repository import reset_repositories  # noqa: E402
+
 
 @pytest.fixture(scope="function")
 def aws_credentials():
@@ -34,7 +42,7 @@ def dynamodb_tables(aws_credentials):
     """
     DynamoDBテーブルをモック化するフィクスチャ
     
-    テスト用にユーザーテーブルと投稿テーブルを作成する。
+    テスト用にユーザーテーブル・投稿テーブル・投稿アーカイブテーブル・検索インデックステーブル・集計テーブルを作成する。
     """
     with mock_dynamodb():
         # DynamoDBリソースを作成
@@ -79,7 +87,8 @@ def dynamodb_tables(aws_credentials):
                 {"AttributeName": "post_id", "AttributeType": "S"},
                 {"AttributeName": "user_id", "AttributeType": "S"},
                 {"AttributeName": "pk", "AttributeType": "S"},
-                {"AttributeName": "created_at", "AttributeType": "S"}
+                {"AttributeName": "created_at", "AttributeType": "S"},
+                {"AttributeName": "title_key", "AttributeType": "S"}
             ],
             GlobalSecondaryIndexes=[
                 {
@@ -104,6 +113,111 @@ def dynamodb_tables(aws_credentials):
                         "ReadCapacityUnits": 5,
                         "WriteCapacityUnits": 5
                     }
+                },
+                {
+                    "IndexName": "pk-title_key-index",
+                    "KeySchema": [
+                        {"AttributeName": "pk", "KeyType": "HASH"},
+                        {"AttributeName": "title_key", "KeyType": "RANGE"}
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                    "ProvisionedThroughput": {
+                        "ReadCapacityUnits": 5,
+                        "WriteCapacityUnits": 5
+                    }
+                }
+            ],
+            ProvisionedThroughput={
+                "ReadCapacityUnits": 5,
+                "WriteCapacityUnits": 5
+            }
+        )
+        
+        # 投稿アーカイブテーブルを作成
+        dynamodb.create_table(
+            TableName="test-posts-archive",
+            KeySchema=[
+                {"AttributeName": "post_id", "KeyType": "HASH"}
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "post_id", "AttributeType": "S"},
+                {"AttributeName": "pk", "AttributeType": "S"},
+                {"AttributeName": "created_at", "AttributeType": "S"}
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": "pk-created_at-index",
+                    "KeySchema": [
+                        {"AttributeName": "pk", "KeyType": "HASH"},
+                        {"AttributeName": "created_at", "KeyType": "RANGE"}
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                    "ProvisionedThroughput": {
+                        "ReadCapacityUnits": 5,
+                        "WriteCapacityUnits": 5
+                    }
+                }
+            ],
+            ProvisionedThroughput={
+                "ReadCapacityUnits": 5,
+                "WriteCapacityUnits": 5
+            }
+        )
+        
+        # 検索インデックステーブルを作成
+        dynamodb.create_table(
+            TableName="test-search",
+            KeySchema=[
+                {"AttributeName": "entry_id", "KeyType": "HASH"}
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "entry_id", "AttributeType": "S"},
+                {"AttributeName": "term", "AttributeType": "S"},
+                {"AttributeName": "rank", "AttributeType": "S"}
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": "term-rank-index",
+                    "KeySchema": [
+                        {"AttributeName": "term", "KeyType": "HASH"},
+                        {"AttributeName": "rank", "KeyType": "RANGE"}
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                    "ProvisionedThroughput": {
+                        "ReadCapacityUnits": 5,
+                        "WriteCapacityUnits": 5
+                    }
+                }
+            ],
+            ProvisionedThroughput={
+                "ReadCapacityUnits": 5,
+                "WriteCapacityUnits": 5
+            }
+        )
+        
+        # 集計テーブルを作成
+        dynamodb.create_table(
+            TableName="test-stats",
+            KeySchema=[
+                {"AttributeName": "stat_id", "KeyType": "HASH"}
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "stat_id", "AttributeType": "S"},
+                {"AttributeName": "kind", "AttributeType": "S"},
+                {"AttributeName": "sort_key", "AttributeType": "S"}
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": "kind-sort_key-index",
+                    "KeySchema": [
+                        {"AttributeName": "kind", "KeyType": "HASH"},
+                        {"AttributeName": "sort_key", "KeyType": "RANGE"}
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                    "ProvisionedThroughput": {
+                        "ReadCapacityUnits": 5,
+                        "WriteCapacityUnits": 5
+                    }
                 }
             ],
             ProvisionedThroughput={
@@ -112,4 +226,44 @@ def dynamodb_tables(aws_credentials):
             }
         )
         
+        # レート制限のカウンターのテーブルを作成
+        dynamodb.create_table(
+            TableName="test-rate-limits",
+            KeySchema=[
+                {"AttributeName": "limit_id", "KeyType": "HASH"}
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "limit_id", "AttributeType": "S"}
+            ],
+            ProvisionedThroughput={
+                "ReadCapacityUnits": 5,
+                "WriteCapacityUnits": 5
+            }
+        )
+        
         yield dynamodb
+
+
+@pytest.fixture
+def use_backend(monkeypatch, tmp_path):
+    """STORAGE_BACKENDを切り替え、テスト後にリポジトリを作り直させる"""
+    def switch(backend):
+        monkeypatch.setattr(get_settings(), "STORAGE_BACKEND", backend)
+        monkeypatch.setattr(get_settings(), "SQLITE_PATH", str(tmp_path / "board.db"))
+        reset_repositories()
+    
+    yield switch
+    reset_repositories()
+
+
+@pytest.fixture(params=["dynamodb", "memory", "sqlite"])
+def backend(request, use_backend):
+    """
+    各ストレージ（DynamoDBはmoto）に切り替えるフィクスチャ
+    
+    テストはストレージごとに実行される。値はストレージ名。
+    """
+    if request.param == "dynamodb":
+        request.getfixturevalue("dynamodb_tables")
+    use_backend(request.param)
+    return request.param
@@ -0,0 +1,162 @@
+"""
+投稿のアーカイブのテスト
+
+古い投稿のアーカイブのテーブルへの移動と、移動した投稿の読み取り・更新・削除のテスト。
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import get_settings
+from app.main import run_archive
+from app.models.post import PostCreate, PostUpdate
+from app.services.post_service import PostService
+from app.services.repository import get_archive_repository, get_posts_repository
+
+
+@pytest.fixture
+def service(backend, monkeypatch):
+    """各ストレージでアーカイブを有効にした投稿サービス"""
+    monkeypatch.setattr(get_settings(), "ARCHIVE_ENABLED", True)
+    monkeypatch.setattr(get_settings(), "ARCHIVE_AFTER_DAYS", 0)
+    return PostService()
+
+
+def create_posts(service, count):
+    """投稿を作成順に作成する"""
+    return [
+        service.create_post(PostCreate(title=f"タイトル{index}", message="本文" * 100), "user-1", "taro")
+        for index in range(count)
+    ]
+
+
+def truncated(post):
+    """アーカイブ（コンパクト形式）で保存される精度に更新日時をミリ秒単位に切り捨てる"""
+    updated_at = post.updated_at.replace(microsecond=post.updated_at.microsecond // 1000 * 1000)
+    return post.model_copy(update={"updated_at": updated_at})
+
+
+def run(coroutine):
+    """コルーチンを専用のイベントループで実行する（現在のイベントループの設定を変更しない）"""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def read_feed(service, limit):
+    """続きのカーソルをたどって全ページの投稿IDを取得する"""
+    post_ids = []
+    cursor = None
+    while True:
+        posts, cursor = run(service.aiter_all_posts(limit, cursor))
+        post_ids.extend(post.post_id for post in posts)
+        if cursor is None:
+            return post_ids
+
+
+class TestArchive:
+    """投稿のアーカイブのテストクラス"""
+    
+    def test_archive_moves_old_posts(self, service):
+        """基準日時より前の投稿のみをコンパクト形式でアーカイブに移動することを確認"""
+        created = create_posts(service, 5)
+        
+        result = service.archive_old_posts(now=created[3].created_at)
+        
+        assert (result["archived"], result["skipped"], result["failed"], result["has_more"]) == (3, 0, 0, False)
+        posts = get_posts_repository()
+        archive = get_archive_repository()
+        assert [posts.get(post.post_id) is None for post in created] == [True, True, True, False, False]
+        assert "m" in archive.get(created[0].post_id)
+        assert service.archive_old_posts(now=created[3].created_at)["archived"] == 0
+    
+    def test_read_falls_back_to_archive(self, service):
+        """アーカイブした投稿もIDで取得できることを確認"""
+        created = create_posts(service, 2)
+        service.archive_old_posts(now=datetime.utcnow() + timedelta(days=1))
+        
+        assert service.get_post_by_id(created[0].post_id) == truncated(created[0])
+        assert run(service.aget_post_by_id(created[1].post_id)) == truncated(created[1])
+    
+    def test_feed_pages_cross_into_archive(self, service):
+        """一覧のページがアーカイブの投稿に重複・欠落なく続くことを確認"""
+        created = create_posts(service, 7)
+        service.archive_old_posts(now=created[4].created_at)
+        
+        assert read_feed(service, 3) == [post.post_id for post in reversed(created)]
+        assert [post.post_id for post in service.get_all_posts(limit=10)] == [post.post_id for post in reversed(created)]
+    
+    def test_feed_pages_keep_posts_with_same_created_at(self, service):
+        """作成日時が同じ投稿がページの境界をまたいでも、重複・欠落なく続くことを確認"""
+        created_at = ["2025-01-03T00:00:00"] * 2 + ["2025-01-02T00:00:00"] * 4 + ["2025-01-01T00:00:00"] * 3
+        for index, value in enumerate(created_at):
+            item = service.build_post_item(
+                PostCreate(title="タイトル", message="本文"), "user-1", "taro", created_at=value, post_id=f"p{index}",
+            )
+            get_posts_repository().put(item)
+        service.archive_old_posts(now=datetime(2025, 1, 2))
+        
+        for limit in (1, 2, 3, 4, 10):
+            post_ids = read_feed(service, limit)
+            assert sorted(post_ids) == [f"p{index}" for index in range(9)], limit
+            assert [created_at[int(post_id[1:])] for post_id in post_ids] == created_at, limit
+    
+    def test_update_restores_archived_post(self, service):
+        """アーカイブした投稿を更新すると投稿のテーブルに戻ることを確認"""
+        created = create_posts(service, 1)[0]
+        service.archive_old_posts(now=datetime.utcnow() + timedelta(days=1))
+        
+        updated = service.update_post(created.post_id, PostUpdate(title="更新"), expected_version=1, owner_id="user-1")
+        
+        assert (updated.title, updated.message, updated.version) == ("更新", created.message, 2)
+        assert get_posts_repository().get(created.post_id)["version"] == 2
+        assert get_archive_repository().get(created.post_id) is None
+    
+    def test_delete_removes_archived_post(self, service):
+        """アーカイブした投稿を削除できることを確認"""
+        created = create_posts(service, 1)[0]
+        service.archive_old_posts(now=datetime.utcnow() + timedelta(days=1))
+        
+        assert service.delete_post(created.post_id)
+        assert service.get_post_by_id(created.post_id) is None
+        assert get_archive_repository().get(created.post_id) is None
+    
+    def test_concurrently_updated_post_is_skipped(self, service, monkeypatch):
+        """読み取り後に更新された投稿は移動せずにスキップすることを確認"""
+        created = create_posts(service, 1)[0]
+        posts = get_posts_repository()
+        query = posts.query
+        
+        def query_then_update(*args, **kwargs):
+            items = query(*args, **kwargs)
+            posts.update(created.post_id, {"title": "同時更新"})
+            return items
+        
+        monkeypatch.setattr(posts, "query", query_then_update)
+        result = service.archive_old_posts(now=datetime.utcnow() + timedelta(days=1))
+        
+        assert (result["archived"], result["skipped"]) == (0, 1)
+        assert posts.get(created.post_id)["title"] == "同時更新"
+    
+    def test_scheduled_run_archives_all_batches(self, service, monkeypatch):
+        """スケジュール呼び出しでバッチを繰り返し、対象の投稿を全て移動することを確認"""
+        monkeypatch.setattr(get_settings(), "ARCHIVE_BATCH_SIZE", 2)
+        create_posts(service, 5)
+        monkeypatch.setattr(get_settings(), "ARCHIVE_AFTER_DAYS", -1)
+        
+        result = run_archive(None)
+        
+        assert (result["archived"], result["has_more"]) == (5, False)
+        assert get_posts_repository().query("pk-created_at-index", "POST") == []
+    
+    def test_disabled(self, service, monkeypatch):
+        """アーカイブが無効な場合は移動しないことを確認"""
+        monkeypatch.setattr(get_settings(), "ARCHIVE_ENABLED", False)
+        
+        with pytest.raises(ValueError):
+            service.archive_old_posts()
+        assert run_archive(None)["archived"] == 0
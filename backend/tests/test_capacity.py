@@ -0,0 +1,82 @@
+"""
+消費キャパシティ集計のテスト
+
+ConsumedCapacityの解析とルート別・インデックス別の集計のテスト。
+"""
+
+from app.services.capacity import (
+    CapacityAccounting,
+    RequestCapacity,
+    _current_request,
+    capacity_accounting,
+    parse_consumed_capacity,
+    record_consumed_capacity,
+)
+
+
+class FakeRoute:
+    """ルーティング後のスコープに設定されるルートの代わり"""
+    
+    path = "/posts/{post_id}"
+
+
+class TestConsumedCapacity:
+    """消費キャパシティ集計のテストクラス"""
+    
+    def test_parse_query_with_index_breakdown(self):
+        """インデックス別の内訳を含むクエリの消費量を解析できることを確認"""
+        consumed = {
+            "TableName": "posts",
+            "CapacityUnits": 2.5,
+            "Table": {"CapacityUnits": 0.0},
+            "GlobalSecondaryIndexes": {"pk-created_at-index": {"CapacityUnits": 2.5}},
+        }
+        
+        usages = parse_consumed_capacity("Query", consumed)
+        
+        assert usages == [("posts", 0.0, 0.0), ("posts/pk-created_at-index", 2.5, 0.0)]
+    
+    def test_parse_write_without_breakdown(self):
+        """内訳の無い書き込みの消費量をテーブルに計上することを確認"""
+        usages = parse_consumed_capacity("PutItem", {"TableName": "posts", "CapacityUnits": 3.0})
+        
+        assert usages == [("posts", 0.0, 3.0)]
+    
+    def test_parse_batch_response(self):
+        """バッチ操作のリスト形式の消費量を解析できることを確認"""
+        consumed = [
+            {"TableName": "posts", "CapacityUnits": 1.0},
+            {"TableName": "users", "CapacityUnits": 2.0},
+        ]
+        
+        usages = parse_consumed_capacity("BatchWriteItem", consumed)
+        
+        assert usages == [("posts", 0.0, 1.0), ("users", 0.0, 2.0)]
+        assert parse_consumed_capacity("GetItem", None) == []
+    
+    def test_accounting_by_route_and_index(self):
+        """ルート別・インデックス別に累計されることを確認"""
+        accounting = CapacityAccounting()
+        
+        accounting.record("GET /posts/", [("posts", 0.0, 0.0), ("posts/pk-created_at-index", 2.0, 0.0)])
+        accounting.record("GET /posts/", [("posts/pk-created_at-index", 1.0, 0.0)])
+        accounting.record("POST /posts/", [("posts", 0.0, 1.0)])
+        
+        snapshot = accounting.snapshot()
+        assert snapshot["routes"]["GET /posts/"] == {"rcu": 3.0, "wcu": 0.0, "calls": 2}
+        assert snapshot["routes"]["POST /posts/"] == {"rcu": 0.0, "wcu": 1.0, "calls": 1}
+        assert snapshot["indexes"]["posts/pk-created_at-index"] == {"rcu": 3.0, "wcu": 0.0, "calls": 2}
+    
+    def test_record_uses_route_template(self):
+        """リクエスト中の記録がパスパラメータを含まないルート名で集計されることを確認"""
+        capacity_accounting.reset()
+        request = RequestCapacity({"method": "GET", "path": "/posts/abc", "route": FakeRoute()})
+        token = _current_request.set(request)
+        try:
+            record_consumed_capacity("GetItem", {"TableName": "posts", "CapacityUnits": 0.5})
+        finally:
+            _current_request.reset(token)
+        
+        assert capacity_accounting.snapshot()["routes"] == {"GET /posts/{post_id}": {"rcu": 0.5, "wcu": 0.0, "calls": 1}}
+        assert request.usage.rcu == 0.5
+        capacity_accounting.reset()
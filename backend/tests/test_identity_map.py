@@ -0,0 +1,91 @@
+"""
+アイデンティティマップのテスト
+
+リクエスト内の重複読み取りの排除と書き込み時の破棄のテスト。
+"""
+
+import pytest
+
+from app.models.post import PostCreate, PostUpdate
+from app.services.identity_map import identity_map_scope, get_identity_map
+from app.services.post_service import PostService
+from app.services.repository import get_posts_repository
+
+
+class CountingRepository:
+    """投稿アイテムの読み取り回数を数えるリポジトリのラッパー"""
+    
+    def __init__(self, repository):
+        self._repository = repository
+        self.get_item_calls = 0
+    
+    def get(self, key, consistent=False):
+        # フロントページスナップショットなどの予約済みアイテムは数えない
+        if not key.startswith("#"):
+            self.get_item_calls += 1
+        return self._repository.get(key, consistent=consistent)
+    
+    def __getattr__(self, name):
+        return getattr(self._repository, name)
+
+
+@pytest.fixture
+def counting_service(dynamodb_tables):
+    """読み取り回数を数える投稿サービス"""
+    repository = CountingRepository(get_posts_repository())
+    service = PostService()
+    service._get_repository = lambda: repository
+    return service, repository
+
+
+class TestIdentityMap:
+    """アイデンティティマップのテストクラス"""
+    
+    def test_no_map_outside_scope(self):
+        """リクエスト外ではアイデンティティマップが存在しないことを確認"""
+        assert get_identity_map() is None
+        with identity_map_scope() as identity_map:
+            assert get_identity_map() is identity_map
+        assert get_identity_map() is None
+    
+    def test_repeated_reads_are_deduplicated(self, counting_service):
+        """同一スコープ内の繰り返し読み取りが1回のGetItemになることを確認"""
+        service, table = counting_service
+        post = service.create_post(PostCreate(title="タイトル", message="メッセージ"), "user-1", "user1")
+        
+        with identity_map_scope() as identity_map:
+            for _ in range(3):
+                assert service.get_post_by_id(post.post_id).title == "タイトル"
+            # 存在しない投稿も重複排除される
+            assert service.get_post_by_id("nonexistent-id") is None
+            assert service.get_post_by_id("nonexistent-id") is None
+        
+        assert table.get_item_calls == 2
+        assert identity_map.hits == 3
+    
+    def test_reads_outside_scope_are_not_cached(self, counting_service):
+        """スコープ外の読み取りは毎回GetItemを発行することを確認"""
+        service, table = counting_service
+        post = service.create_post(PostCreate(title="タイトル", message="メッセージ"), "user-1", "user1")
+        
+        service.get_post_by_id(post.post_id)
+        service.get_post_by_id(post.post_id)
+        
+        assert table.get_item_calls == 2
+    
+    def test_write_invalidates_cached_item(self, counting_service):
+        """更新・削除後の読み取りが最新の内容を返すことを確認"""
+        service, table = counting_service
+        post = service.create_post(PostCreate(title="更新前", message="メッセージ"), "user-1", "user1")
+        
+        with identity_map_scope():
+            # 読み取り → 更新（内部の存在確認はキャッシュから）→ 再読み取り
+            assert service.get_post_by_id(post.post_id).title == "更新前"
+            service.update_post(post.post_id, PostUpdate(title="更新後"))
+            assert service.get_post_by_id(post.post_id).title == "更新後"
+            
+            service.delete_post(post.post_id)
+            assert service.get_post_by_id(post.post_id) is None
+        
+        # 初回・更新後・削除後の3回のみGetItemが発行される
+        assert table.get_item_calls == 3
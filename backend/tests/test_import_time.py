@@ -0,0 +1,79 @@
+"""
+インポート時間のテスト
+
+python -X importtimeの出力を解析し、app.mainの読み込み時間が予算内であることと、
+重い依存パッケージが初回の使用まで読み込まれないことを確認する。
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, Tuple
+
+# バックエンドのルートディレクトリ
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# app.mainの読み込み時間の予算（ミリ秒、遅いCI環境では環境変数で緩める）
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "2000"))
+
+# app.mainの読み込み時には読み込まない（初回の使用時に読み込む）パッケージ
+LAZY_MODULES = ("boto3", "botocore.session", "jose", "passlib", "bcrypt")
+
+
+def measure_import_time(module: str) -> Dict[str, Tuple[int, int]]:
+    """
+    新しいインタープリターでモジュールを読み込み、インポート時間を計測する
+    
+    Args:
+        module: 読み込むモジュール名
+    
+    Returns:
+        Dict[str, Tuple[int, int]]: モジュール名 → (自身の時間, 累積時間)（マイクロ秒）
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    
+    report = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        report[name.strip()] = (int(self_us), int(cumulative_us))
+    return report
+
+
+def format_report(report: Dict[str, Tuple[int, int]], top: int = 15) -> str:
+    """
+    累積時間の大きいモジュールの一覧を作成する
+    
+    Args:
+        report: インポート時間の計測結果
+        top: 表示するモジュール数
+    
+    Returns:
+        str: 「累積時間(ms) モジュール名」の一覧
+    """
+    entries = sorted(report.items(), key=lambda entry: entry[1][1], reverse=True)[:top]
+    return "\n".join(f"{cumulative / 1000:9.1f}ms  {name}" for name, (_, cumulative) in entries)
+
+
+class TestImportTime:
+    """インポート時間のテストクラス"""
+    
+    def test_app_main_import_time(self):
+        """app.mainの読み込みが予算内で、重い依存パッケージを読み込まないことを確認"""
+        report = measure_import_time("app.main")
+        
+        eager = [module for module in LAZY_MODULES if module in report]
+        assert eager == [], f"初回の使用時に読み込むべきパッケージが読み込まれています: {eager}\n{format_report(report)}"
+        
+        total_ms = report["app.main"][1] / 1000
+        assert total_ms <= IMPORT_TIME_BUDGET_MS, (
+            f"app.mainの読み込みに{total_ms:.1f}msかかりました（予算{IMPORT_TIME_BUDGET_MS:.0f}ms）\n{format_report(report)}"
+        )
@@ -0,0 +1,112 @@
+"""
+一覧APIのメモリ使用量のテスト
+
+tracemallocで1リクエストあたりのメモリ使用量のピークを計測し、
+一覧APIが件数の上限と予算内のメモリで応答することのテスト。
+"""
+
+import json
+import tracemalloc
+from datetime import datetime
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import app
+from app.services.auth import create_access_token
+from app.services.post_service import PostService
+from app.services.repository import get_posts_repository, get_users_repository, reset_repositories
+from app.services.responses import ModelListResponse
+from perf.seed import Timeline, author_weights, generate_post_chunk, generate_users
+
+# 投入するユーザー数
+USERS = 250
+
+# 投入する投稿数
+POSTS = 5000
+
+# 1リクエストあたりのメモリ使用量のピークの予算（バイト）
+REQUEST_MEMORY_BUDGET = 2 * 1024 * 1024
+
+
+@pytest.fixture
+def dataset(monkeypatch):
+    """メモリのストレージにユーザー・投稿を投入するフィクスチャ"""
+    monkeypatch.setattr(get_settings(), "STORAGE_BACKEND", "memory")
+    monkeypatch.setattr(get_settings(), "TIMING_SAMPLE_RATE", 0.0)
+    reset_repositories()
+    timeline = Timeline(datetime(2025, 1, 1), 30, 0.3, 0)
+    users = generate_users(USERS, "hashed", timeline, 0)
+    get_users_repository().put_many(users)
+    get_posts_repository().put_many(generate_post_chunk(0, POSTS, users, author_weights(USERS, 1.2, 0), timeline, 0))
+    yield
+    reset_repositories()
+
+
+@pytest.fixture
+def client():
+    """管理者のAuthorizationヘッダー付きのテストクライアント"""
+    token = create_access_token({"user_id": "admin-1", "username": "admin", "role": "admin"})
+    return TestClient(app, headers={"Authorization": f"Bearer {token}"})
+
+
+def peak_memory(request):
+    """
+    リクエストを実行し、レスポンスとtracemallocで計測したメモリ使用量のピーク（バイト）を返す
+    """
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        response = request()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return response, peak
+
+
+class TestListMemory:
+    """一覧APIのメモリ使用量のテストクラス"""
+    
+    def test_posts_limit_is_capped(self, dataset, client):
+        """limitが大きくてもMAX_PAGE_SIZE件までしか返さず、予算内のメモリで応答することを確認"""
+        client.get("/posts/")
+        
+        response, peak = peak_memory(lambda: client.get("/posts/", params={"limit": POSTS}))
+        
+        assert response.status_code == 200
+        assert len(response.json()) == get_settings().MAX_PAGE_SIZE
+        assert peak < REQUEST_MEMORY_BUDGET
+    
+    def test_posts_limit_must_be_positive(self, dataset, client):
+        """limitが0以下の場合は422を返すことを確認"""
+        assert client.get("/posts/", params={"limit": 0}).status_code == 422
+    
+    def test_users_cursor_pagination(self, dataset, client):
+        """カーソルで全ユーザーを重複なく取得でき、各ページが予算内のメモリで応答することを確認"""
+        user_ids = []
+        cursor = None
+        while True:
+            params = {"limit": 1000} if cursor is None else {"limit": 1000, "cursor": cursor}
+            response, peak = peak_memory(lambda: client.get("/users/", params=params))
+            assert response.status_code == 200
+            assert peak < REQUEST_MEMORY_BUDGET
+            page = response.json()
+            assert len(page) <= get_settings().MAX_PAGE_SIZE
+            user_ids.extend(user["user_id"] for user in page)
+            cursor = response.headers.get("x-next-cursor")
+            if cursor is None:
+                break
+        
+        assert len(user_ids) == USERS
+        assert len(set(user_ids)) == USERS
+    
+    def test_model_list_response_matches_json_response(self, dataset):
+        """モデル一覧のJSONがjsonable_encoderによるJSONと同じになることを確認"""
+        posts = PostService().get_all_posts(limit=10)
+        
+        body = ModelListResponse(iter(posts)).body
+        
+        assert json.loads(body) == jsonable_encoder(posts)
+        assert ModelListResponse([]).body == b"[]"
@@ -0,0 +1,112 @@
+"""
+メトリクスサービスのテスト
+
+メトリクスの集計と、Embedded Metric Format（EMF）での書き出しのテスト。
+"""
+
+import json
+import logging
+
+from app.services import metrics as metrics_module
+from app.services.metrics import MAX_VALUES_PER_METRIC, Histogram, MetricsRegistry
+
+
+def read_documents(capsys) -> list:
+    """標準出力に書き出されたEMFドキュメントを読み取る"""
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+class TestMetrics:
+    """メトリクスサービスのテストクラス"""
+    
+    def test_histogram_buckets(self):
+        """観測値がバケットの上限に丸められることを確認"""
+        histogram = Histogram((10, 100))
+        for value in (3, 10, 50, 500):
+            histogram.observe(value)
+        
+        assert histogram.counts == [2, 1, 1]
+        assert histogram.values() == [10, 10, 100, 500]
+        assert histogram.count == 4
+    
+    def test_flush_writes_emf(self, capsys):
+        """カウンターとヒストグラムがEMFとして書き出されることを確認"""
+        registry = MetricsRegistry("TestNamespace", "test-service")
+        registry.increment("IdentityMapHits", 2)
+        registry.increment("IdentityMapHits")
+        registry.observe("RequestLatency", 12.0, dimensions={"Route": "GET /posts/"})
+        registry.observe("RequestLatency", 40.0, dimensions={"Route": "GET /posts/"})
+        
+        assert registry.flush() == 2
+        documents = read_documents(capsys)
+        
+        plain, by_route = documents
+        assert plain["_aws"]["CloudWatchMetrics"][0]["Namespace"] == "TestNamespace"
+        assert plain["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["Service"]]
+        assert plain["_aws"]["CloudWatchMetrics"][0]["Metrics"] == [{"Name": "IdentityMapHits", "Unit": "Count"}]
+        assert plain["Service"] == "test-service"
+        assert plain["IdentityMapHits"] == 3
+        assert by_route["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["Service", "Route"]]
+        assert by_route["Route"] == "GET /posts/"
+        assert by_route["RequestLatency"] == [25, 50]
+        
+        # 書き出し後は集計がリセットされる
+        assert registry.flush() == 0
+        assert capsys.readouterr().out == ""
+    
+    def test_flush_splits_large_histograms(self, capsys):
+        """値の数がEMFの上限を超える場合に複数のドキュメントに分割されることを確認"""
+        registry = MetricsRegistry("TestNamespace", "test-service")
+        for _ in range(MAX_VALUES_PER_METRIC + 1):
+            registry.observe("RequestLatency", 1.0)
+        registry.increment("Requests")
+        
+        registry.flush()
+        documents = read_documents(capsys)
+        
+        assert len(documents) == 2
+        assert len(documents[0]["RequestLatency"]) == MAX_VALUES_PER_METRIC
+        assert documents[0]["Requests"] == 1
+        assert documents[1]["RequestLatency"] == 5
+        assert "Requests" not in documents[1]
+        assert [m["Name"] for m in documents[1]["_aws"]["CloudWatchMetrics"][0]["Metrics"]] == ["RequestLatency"]
+    
+    def test_lambda_handler_flushes_once_per_invocation(self, capsys, caplog, monkeypatch):
+        """Lambdaハンドラーが呼び出しごとにメトリクスを書き出し、初回のみコールドスタートとなることを確認"""
+        from app import main
+        from app.main import handler
+        
+        caplog.set_level(logging.INFO, logger="app.lambda")
+        monkeypatch.setattr(main, "_cold_start", True)
+        metrics_module.metrics.reset()
+        event = {
+            "version": "2.0",
+            "routeKey": "$default",
+            "rawPath": "/",
+            "rawQueryString": "",
+            "headers": {"host": "localhost"},
+            "requestContext": {
+                "http": {"method": "GET", "path": "/", "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1"},
+                "stage": "$default",
+            },
+            "isBase64Encoded": False,
+        }
+        
+        for _ in range(2):
+            response = handler(event, None)
+            assert response["statusCode"] == 200
+        
+        documents = read_documents(capsys)
+        plain = [document for document in documents if "Invocations" in document]
+        assert len(plain) == 2
+        assert plain[0]["cold_start"] is True
+        assert plain[0]["ColdStart"] == 1
+        assert plain[1]["cold_start"] is False
+        assert "ColdStart" not in [m["Name"] for m in plain[1]["_aws"]["CloudWatchMetrics"][0]["Metrics"]]
+        latencies = [document for document in documents if document.get("Route") == "GET /"]
+        assert len(latencies) == 2
+        
+        invocations = [json.loads(record.getMessage()) for record in caplog.records if record.name == "app.lambda"]
+        assert [invocation["cold_start"] for invocation in invocations] == [True, False]
+        assert "init_ms" in invocations[0]
+        assert "init_ms" not in invocations[1]
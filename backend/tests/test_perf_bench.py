@@ -0,0 +1,61 @@
+"""
+ベンチマークのテスト
+
+計測・ベースラインとの比較・結果の保存のテスト。
+"""
+
+import json
+
+from perf.bench import compare, main, measure, run_benchmarks
+
+
+class TestBenchmark:
+    """ベンチマークのテストクラス"""
+    
+    def test_measure(self):
+        """計測回数と統計値が記録されることを確認"""
+        calls = []
+        
+        result = measure(lambda: calls.append(1), iterations=10, warmup=2)
+        
+        assert len(calls) == 12
+        assert result["iterations"] == 10
+        assert result["min_ms"] <= result["median_ms"] <= result["p95_ms"] <= result["max_ms"]
+    
+    def test_compare(self):
+        """閾値を超えた増加は回帰、減少は改善、ベースラインに無い項目は新規になることを確認"""
+        baseline = {"results": {"a": {"median_ms": 1.0}, "b": {"median_ms": 1.0}, "c": {"median_ms": 1.0}}}
+        current = {"results": {
+            "a": {"median_ms": 1.5},
+            "b": {"median_ms": 1.1},
+            "c": {"median_ms": 0.5},
+            "d": {"median_ms": 1.0},
+        }}
+        
+        rows = {row["name"]: row for row in compare(current, baseline, threshold=0.25)}
+        
+        assert rows["a"]["status"] == "regression"
+        assert rows["b"]["status"] == "ok"
+        assert rows["c"]["status"] == "improved"
+        assert rows["d"]["status"] == "new"
+    
+    def test_run_benchmarks_with_filter(self):
+        """指定したベンチマークのみを計測用ストレージで実行することを確認"""
+        current = run_benchmarks("memory", filters=["jwt", "api.get_posts"], scale=0.01)
+        
+        assert set(current["results"]) == {"jwt.create", "jwt.decode", "api.get_posts"}
+        assert current["environment"]["storage"] == "memory"
+    
+    def test_main_detects_regression(self, tmp_path):
+        """結果を保存し、ベースラインより遅い場合は終了コード1になることを確認"""
+        output = tmp_path / "bench.json"
+        baseline = tmp_path / "baseline.json"
+        baseline.write_text(json.dumps({"results": {"jwt.decode": {"median_ms": 0.000001}}}))
+        
+        code = main([
+            "--storage", "memory", "--filter", "jwt.decode", "--scale", "0.01",
+            "--output", str(output), "--baseline", str(baseline),
+        ])
+        
+        assert code == 1
+        assert "jwt.decode" in json.loads(output.read_text())["results"]
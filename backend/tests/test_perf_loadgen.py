@@ -0,0 +1,59 @@
+"""
+負荷生成のテスト
+
+操作の比率・負荷の段階の解析と、プロセス内のASGIアプリケーションへの負荷試験のテスト。
+"""
+
+import pytest
+
+from app.models.post import PostCreate
+from app.services.post_service import PostService
+from app.services.stats_service import stats_service
+from perf.environment import storage_environment
+from perf.loadgen import DEFAULT_MIX, RampProfile, parse_mix, parse_stages, percentile, run
+
+
+class TestLoadgen:
+    """負荷生成のテストクラス"""
+    
+    def test_parse_mix(self):
+        """操作の比率を解析し、不正な操作名はエラーになることを確認"""
+        assert parse_mix("feed=3, read=1") == {"feed": 3, "read": 1}
+        with pytest.raises(ValueError):
+            parse_mix("unknown=1")
+        with pytest.raises(ValueError):
+            parse_mix("feed=0")
+    
+    def test_ramp_profile(self):
+        """段階ごとに仮想ユーザー数が線形に増減することを確認"""
+        profile = RampProfile(parse_stages("10:10,10:30,10:0"))
+        
+        assert profile.duration == 30
+        assert profile.max_users == 30
+        assert [profile.users_at(t) for t in (0, 5, 10, 15, 25)] == [0, 5, 10, 20, 15]
+        assert RampProfile.constant(5, 10).users_at(0.5) == 5
+    
+    def test_percentile(self):
+        """最近傍順位法でパーセンタイルを算出することを確認"""
+        values = [float(v) for v in range(1, 101)]
+        
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 99) == 99.0
+        assert percentile([], 50) == 0.0
+    
+    def test_run_in_process(self):
+        """メモリのストレージで全操作を実行し、ルートごとの結果を集計することを確認"""
+        result = run(RampProfile.constant(4, 1.0), DEFAULT_MIX, accounts=1, storage="memory", seed=1)
+        
+        assert result["requests"] > 0
+        assert result["errors"] == 0
+        assert "GET /posts/" in result["routes"]
+        assert {"p50_ms", "p95_ms", "p99_ms"} <= set(result["routes"]["GET /posts/"])
+        assert result["timeline"][0]["users"] == 4
+    
+    def test_moto_environment_creates_all_tables(self):
+        """motoの計測環境では集計のテーブルも作成され、投稿の作成が集計に加算されることを確認"""
+        with storage_environment("moto"):
+            PostService().create_post(PostCreate(title="タイトル", message="本文"), "user-1", "taro")
+            
+            assert stats_service.get_total("posts") == 1
@@ -0,0 +1,98 @@
+"""
+合成データの投入のテスト
+
+データの再現性・分布と、ストレージへの投入のテスト。
+"""
+
+from collections import Counter
+from datetime import datetime
+
+import pytest
+
+from app.config import get_settings
+from app.services.post_service import PostService
+from app.services.repository import get_posts_repository, get_users_repository, reset_repositories
+from app.services.stats_service import stats_service
+from perf.seed import Timeline, author_weights, generate_post_chunk, generate_users, seed_dataset
+
+
+@pytest.fixture
+def memory_backend(monkeypatch):
+    """メモリのストレージを使用し、テスト後にリポジトリを作り直させる"""
+    monkeypatch.setattr(get_settings(), "STORAGE_BACKEND", "memory")
+    reset_repositories()
+    yield
+    reset_repositories()
+
+
+def make_dataset(seed=0, users=50, size=2000, alpha=1.2):
+    """テスト用のユーザー・投稿の1チャンクを生成する"""
+    timeline = Timeline(datetime(2025, 1, 1), 30, 0.3, seed)
+    user_items = generate_users(users, "hashed", timeline, seed)
+    weights = author_weights(users, alpha, seed)
+    return user_items, generate_post_chunk(0, size, user_items, weights, timeline, seed)
+
+
+class TestSeed:
+    """合成データの投入のテストクラス"""
+    
+    def test_same_seed_same_data(self):
+        """同じシードでは同じデータ、異なるシードでは異なるデータになることを確認"""
+        assert make_dataset(seed=1) == make_dataset(seed=1)
+        assert make_dataset(seed=1)[1] != make_dataset(seed=2)[1]
+    
+    def test_item_shape(self):
+        """アイテムがサービスと同じ形で、投稿日時が範囲内であることを確認"""
+        users, posts = make_dataset()
+        
+        assert users[0]["role"] == "admin"
+        assert set(users[1]) == {
+            "user_id", "username", "hashed_password", "role", "created_at", "updated_at", "version",
+        }
+        assert set(posts[0]) == {
+            "post_id", "pk", "user_id", "username", "title", "title_key", "message", "created_at", "updated_at", "version",
+        }
+        assert all("2024-12-02" <= post["created_at"] < "2025-01-01" for post in posts)
+        assert len({post["post_id"] for post in posts}) == len(posts)
+    
+    def test_compact_encoding(self, monkeypatch):
+        """POST_ENCODINGがcompactの場合、サービスと同じコンパクト形式のアイテムを生成することを確認"""
+        monkeypatch.setattr(get_settings(), "POST_ENCODING", "compact")
+        
+        _, posts = make_dataset(size=100)
+        
+        assert {"un", "t", "m", "ua"} <= set(posts[0])
+        assert not {"username", "title", "message", "updated_at"} & set(posts[0])
+    
+    def test_compact_seed_dataset(self, memory_backend, monkeypatch):
+        """コンパクト形式で投入した投稿を、サービスで読み取れることを確認"""
+        monkeypatch.setattr(get_settings(), "POST_ENCODING", "compact")
+        
+        seed_dataset(5, 30, seed=3, workers=2, chunk_size=10)
+        
+        posts = PostService().get_all_posts()
+        assert len(posts) == 30
+        assert all(post.username and post.title and post.message for post in posts)
+    
+    def test_author_distribution_is_skewed(self):
+        """少数のユーザーに投稿が集中することを確認"""
+        _, posts = make_dataset(users=100, size=5000)
+        
+        counts = sorted(Counter(post["user_id"] for post in posts).values(), reverse=True)
+        
+        assert sum(counts[:10]) > len(posts) / 2
+    
+    def test_seed_dataset(self, memory_backend):
+        """ワーカー数に関わらず同じデータが投入され、新しい順に一覧を取得できることを確認"""
+        def seed(workers):
+            reset_repositories()
+            result = seed_dataset(20, 250, seed=3, workers=workers, chunk_size=40)
+            assert (result["users"], result["posts"]) == (20, 250)
+            return sorted(get_posts_repository().scan(), key=lambda item: item["post_id"])
+        
+        assert seed(1) == seed(4)
+        assert len(get_users_repository().scan()) == 20
+        assert stats_service.get_totals() == {"posts": 250, "users": 20}
+        assert sum(poster["posts"] for poster in stats_service.get_top_posters(20)) == 250
+        timeline = [post.created_at for post in PostService().get_all_posts()]
+        assert timeline == sorted(timeline, reverse=True)
@@ -0,0 +1,161 @@
+"""
+投稿アイテムのエンコードのテスト
+
+標準・コンパクト形式の変換と、コンパクト形式でのサービスの動作・移行のテスト。
+"""
+
+import math
+from datetime import datetime
+
+import pytest
+
+from app.config import get_settings
+from app.models.post import PostCreate, PostUpdate
+from app.services.post_codec import PostCodec, estimate_item_size, from_epoch_millis, to_epoch_millis
+from app.services.post_service import FRONT_PAGE_ID, PostService
+from app.services.repository import get_posts_repository
+from perf.seed import Timeline, author_weights, generate_post_chunk, generate_users
+
+
+def use_encoding(monkeypatch, encoding):
+    """POST_ENCODINGを切り替える"""
+    monkeypatch.setattr(get_settings(), "POST_ENCODING", encoding)
+
+
+def make_item(message="本文", updated_at="2024-01-02T03:04:05.678000"):
+    """テスト用の投稿アイテム（標準の形式）を作成する"""
+    return {
+        "post_id": "p1",
+        "pk": "POST",
+        "user_id": "user-1",
+        "username": "taro",
+        "title": "タイトル",
+        "message": message,
+        "created_at": "2024-01-01T00:00:00",
+        "updated_at": updated_at,
+        "version": 1,
+    }
+
+
+class TestPostCodec:
+    """投稿アイテムの変換のテストクラス"""
+    
+    def test_compact_round_trip(self):
+        """コンパクト形式に変換して戻すと元のアイテムになることを確認"""
+        codec = PostCodec(True, 64)
+        item = make_item(message="長い本文です。" * 50)
+        
+        encoded = codec.encode(item)
+        
+        assert set(encoded) == {"post_id", "pk", "user_id", "un", "t", "m", "created_at", "ua", "version"}
+        assert isinstance(encoded["m"], bytes)
+        assert encoded["ua"] == to_epoch_millis(item["updated_at"])
+        assert codec.decode(encoded) == item
+    
+    def test_short_message_is_not_compressed(self):
+        """しきい値未満の本文は圧縮せずに文字列のまま保存することを確認"""
+        codec = PostCodec(True, 64)
+        
+        assert codec.encode(make_item(message="短い"))["m"] == "短い"
+    
+    def test_standard_encoding_is_unchanged(self):
+        """標準の形式ではアイテムを変換しないことを確認"""
+        codec = PostCodec(False, 64)
+        item = make_item()
+        
+        assert codec.encode(item) is item
+        assert codec.decode(item) is item
+        assert codec.encode_changes({"username": "jiro"}) == ({"username": "jiro"}, ["un"])
+    
+    def test_epoch_millis(self):
+        """更新日時はミリ秒単位で保存し、時差付きの日時はUTCに変換することを確認"""
+        assert from_epoch_millis(to_epoch_millis("2024-01-02T03:04:05.678999")) == "2024-01-02T03:04:05.678000"
+        assert to_epoch_millis("2024-01-02T12:00:00+09:00") == to_epoch_millis("2024-01-02T03:00:00")
+    
+    def test_encode_changes_removes_other_encoding(self):
+        """更新する属性のもう一方の形式の属性を削除し、移行の要否を判定できることを確認"""
+        codec = PostCodec(True, 64)
+        
+        changes, remove = codec.encode_changes({"username": "jiro"})
+        
+        assert (changes, remove) == ({"un": "jiro"}, ["username"])
+        assert not codec.is_encoded(make_item())
+        assert codec.is_encoded(codec.encode(make_item()))
+    
+    def test_compact_items_are_smaller(self):
+        """合成データの投稿のサイズ・書き込みキャパシティユニットが減ることを確認"""
+        timeline = Timeline(datetime(2025, 1, 1), 30, 0.3, 0)
+        users = generate_users(50, "hashed", timeline, 0)
+        posts = generate_post_chunk(0, 1000, users, author_weights(50, 1.2, 0), timeline, 0)
+        codec = PostCodec(True, 256)
+        
+        standard = [estimate_item_size(post) for post in posts]
+        compact = [estimate_item_size(codec.encode(post)) for post in posts]
+        
+        assert sum(compact) < sum(standard) * 0.8
+        assert sum(math.ceil(size / 1024) for size in compact) < sum(math.ceil(size / 1024) for size in standard)
+
+
+class TestCompactPostService:
+    """コンパクト形式での投稿サービスのテストクラス"""
+    
+    def test_post_flow(self, backend, monkeypatch):
+        """コンパクト形式で作成・取得・更新・ユーザー名の反映・一覧取得ができることを確認"""
+        use_encoding(monkeypatch, "compact")
+        monkeypatch.setattr(get_settings(), "POST_COMPRESS_MIN_BYTES", 16)
+        service = PostService()
+        message = "圧縮される長い本文です。" * 20
+        
+        created = service.create_post(PostCreate(title="タイトル", message=message), "user-1", "taro")
+        service.get_all_posts()
+        updated = service.update_post(created.post_id, PostUpdate(title="更新"), expected_version=1)
+        progress = service.propagate_username("user-1", "jiro")
+        
+        raw = get_posts_repository().get(created.post_id)
+        assert {"un", "t", "m", "ua"} <= set(raw) and not {"username", "title", "message", "updated_at"} & set(raw)
+        assert service.get_post_by_id(created.post_id) == updated.model_copy(update={"username": "jiro"})
+        assert progress.updated == 1
+        assert [(p.title, p.message, p.username) for p in service.get_all_posts()] == [("更新", message, "jiro")]
+        assert "m" in get_posts_repository().get(FRONT_PAGE_ID)["entries"][0]
+    
+    def test_online_migration(self, backend, monkeypatch):
+        """標準の形式の投稿を読み取りながらコンパクト形式に移行し、標準の形式に戻せることを確認"""
+        service = PostService()
+        created = [
+            service.create_post(PostCreate(title=f"タイトル{index}", message="本文" * 200), "user-1", "taro")
+            for index in range(5)
+        ]
+        service.get_all_posts()
+        
+        use_encoding(monkeypatch, "compact")
+        # 移行前の形式の投稿も読み取れる
+        assert service.get_post_by_id(created[0].post_id) == created[0]
+        
+        result = service.migrate_encoding(limit=2)
+        migrated = result["migrated"]
+        while result["next_cursor"]:
+            result = service.migrate_encoding(limit=2, cursor=result["next_cursor"])
+            migrated += result["migrated"]
+        
+        repository = get_posts_repository()
+        assert migrated == 5
+        assert all("m" in repository.get(post.post_id) for post in created)
+        assert repository.get(FRONT_PAGE_ID) is None
+        # 更新日時はミリ秒単位になる
+        expected = [
+            post.model_copy(update={"updated_at": post.updated_at.replace(microsecond=post.updated_at.microsecond // 1000 * 1000)})
+            for post in created
+        ]
+        assert sorted(service.get_all_posts(), key=lambda p: p.post_id) == sorted(expected, key=lambda p: p.post_id)
+        assert service.migrate_encoding(limit=10)["migrated"] == 0
+        
+        use_encoding(monkeypatch, "standard")
+        assert service.migrate_encoding(limit=10)["migrated"] == 5
+        assert all("message" in repository.get(post.post_id) for post in created)
+    
+    def test_invalid_encoding(self, backend, monkeypatch):
+        """不正なPOST_ENCODINGの場合はエラーになることを確認"""
+        use_encoding(monkeypatch, "unknown")
+        
+        with pytest.raises(ValueError):
+            PostService().create_post(PostCreate(title="タイトル", message="本文"), "user-1", "taro")
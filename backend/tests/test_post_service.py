@@ -7,9 +7,18 @@
 import pytest
 from moto import mock_dynamodb
 import boto3
+from fastapi.testclient import TestClient
 
+from app.config import get_settings
+from app.main import app
 from app.models.post import PostCreate, PostUpdate
-from app.services.post_service import PostService
+from app.models.user import UserCreate, UserUpdate
+from app.services.auth import create_access_token
+from app.services.stats_service import stats_service
+from app.services.post_service import PostService, FRONT_PAGE_ID, get_propagation_progress
+from app.services.repository import get_posts_repository
+from app.services.user_service import UserService
+from app.services.versioning import VersionConflictError, PermissionDeniedError
 
 
 def create_test_tables():
@@ -58,6 +67,21 @@ def create_test_tables():
             "WriteCapacityUnits": 5
         }
     )
+    
+    # ユーザーテーブルを作成（ユーザー名の伝播で現在のユーザー名を確認する）
+    dynamodb.create_table(
+        TableName="test-users",
+        KeySchema=[
+            {"AttributeName": "user_id", "KeyType": "HASH"}
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "user_id", "AttributeType": "S"}
+        ],
+        ProvisionedThroughput={
+            "ReadCapacityUnits": 5,
+            "WriteCapacityUnits": 5
+        }
+    )
     return dynamodb
 
 
@@ -295,3 +319,265 @@ class TestPostService:
         assert len(posts) == 3
         for post in posts:
             assert post.user_id == "user-1"
+    
+    @mock_dynamodb
+    def test_propagate_username(self):
+        """ユーザー名の変更が対象ユーザーの投稿のみに反映されることを確認"""
+        create_test_tables()
+        service = PostService()
+        
+        # ユーザー1の投稿
+        for i in range(30):
+            service.create_post(
+                post_data=PostCreate(title=f"投稿{i}", message=f"メッセージ{i}"),
+                user_id="user-1",
+                username="oldname"
+            )
+        
+        # ユーザー2の投稿
+        other_post = service.create_post(
+            post_data=PostCreate(title="他ユーザーの投稿", message="メッセージ"),
+            user_id="user-2",
+            username="user2"
+        )
+        
+        # フロントページスナップショットを作成しておく
+        service.get_all_posts()
+        
+        # ユーザー名を伝播
+        progress = service.propagate_username("user-1", "newname")
+        
+        assert progress.done is True
+        assert progress.total == 30
+        assert progress.updated == 30
+        assert progress.failed == 0
+        for post in service.get_posts_by_user("user-1"):
+            assert post.username == "newname"
+        assert service.get_post_by_id(other_post.post_id).username == "user2"
+        for post in service.get_all_posts():
+            assert post.username == ("user2" if post.user_id == "user-2" else "newname")
+        
+        # 再実行しても書き換え対象はない
+        progress = service.propagate_username("user-1", "newname")
+        assert progress.total == 0
+    
+    @mock_dynamodb
+    def test_front_page_snapshot_follows_writes(self):
+        """フロントページスナップショットが作成・更新・削除に追従することを確認"""
+        dynamodb = create_test_tables()
+        table = dynamodb.Table("test-posts")
+        service = PostService()
+        
+        posts = [
+            service.create_post(PostCreate(title=f"投稿{i}", message=f"メッセージ{i}"), "user-1", "user1")
+            for i in range(3)
+        ]
+        
+        # 初回の読み取りでスナップショットが作成される
+        assert [post.post_id for post in service.get_all_posts()] == [post.post_id for post in reversed(posts)]
+        snapshot = table.get_item(Key={"post_id": FRONT_PAGE_ID})["Item"]
+        assert len(snapshot["entries"]) == 3
+        
+        # 作成・更新・削除がスナップショットに反映される
+        new_post = service.create_post(PostCreate(title="新しい投稿", message="メッセージ"), "user-2", "user2")
+        service.update_post(posts[0].post_id, PostUpdate(title="更新後"))
+        service.delete_post(posts[1].post_id)
+        
+        snapshot = table.get_item(Key={"post_id": FRONT_PAGE_ID})["Item"]
+        assert snapshot["version"] == 4
+        assert [entry["post_id"] for entry in snapshot["entries"]] == [new_post.post_id, posts[2].post_id, posts[0].post_id]
+        assert snapshot["entries"][2]["title"] == "更新後"
+        
+        feed = service.get_all_posts()
+        assert [post.post_id for post in feed] == [new_post.post_id, posts[2].post_id, posts[0].post_id]
+        
+        # スナップショットのアイテムは投稿として取得できない
+        assert service.get_post_by_id(FRONT_PAGE_ID) is None
+    
+    @mock_dynamodb
+    def test_front_page_rebuilt_when_corrupt(self):
+        """壊れたフロントページスナップショットがインデックスから再構築されることを確認"""
+        dynamodb = create_test_tables()
+        table = dynamodb.Table("test-posts")
+        service = PostService()
+        
+        for i in range(2):
+            service.create_post(PostCreate(title=f"投稿{i}", message=f"メッセージ{i}"), "user-1", "user1")
+        table.put_item(Item={"post_id": FRONT_PAGE_ID, "entries": [{"post_id": "broken"}], "exhaustive": True, "version": 1})
+        
+        posts = service.get_all_posts()
+        
+        assert len(posts) == 2
+        snapshot = table.get_item(Key={"post_id": FRONT_PAGE_ID})["Item"]
+        assert len(snapshot["entries"]) == 2
+    
+    @mock_dynamodb
+    def test_front_page_kept_within_size_limit(self, monkeypatch):
+        """スナップショットがサイズ上限を超えないよう切り詰められることを確認"""
+        dynamodb = create_test_tables()
+        table = dynamodb.Table("test-posts")
+        service = PostService()
+        monkeypatch.setattr(get_settings(), "FRONT_PAGE_MAX_BYTES", 3000)
+        
+        for i in range(5):
+            service.create_post(PostCreate(title=f"投稿{i}", message="あ" * 300), "user-1", "user1")
+        
+        posts = service.get_all_posts(limit=5)
+        
+        # 上限を超える分はインデックスから取得される
+        assert len(posts) == 5
+        snapshot = table.get_item(Key={"post_id": FRONT_PAGE_ID})["Item"]
+        assert 0 < len(snapshot["entries"]) < 5
+        assert snapshot["exhaustive"] is False
+    
+    @mock_dynamodb
+    def test_update_post_with_version(self):
+        """バージョンを指定した更新が競合を検出することを確認"""
+        create_test_tables()
+        service = PostService()
+        
+        created_post = service.create_post(PostCreate(title="元のタイトル", message="メッセージ"), "user-1", "user1")
+        assert created_post.version == 1
+        
+        # 一致するバージョンでの更新は成功し、バージョンが進む
+        updated_post = service.update_post(created_post.post_id, PostUpdate(title="更新1"), expected_version=1)
+        assert updated_post.version == 2
+        
+        # 古いバージョンでの更新は競合になる
+        with pytest.raises(VersionConflictError) as exc_info:
+            service.update_post(created_post.post_id, PostUpdate(title="更新2"), expected_version=1)
+        assert exc_info.value.current_version == 2
+        assert service.get_post_by_id(created_post.post_id).title == "更新1"
+    
+    @mock_dynamodb
+    def test_update_post_requires_owner(self):
+        """所有者を指定した更新が他のユーザーを拒否することを確認"""
+        create_test_tables()
+        service = PostService()
+        
+        created_post = service.create_post(PostCreate(title="元のタイトル", message="メッセージ"), "user-1", "user1")
+        
+        with pytest.raises(PermissionDeniedError):
+            service.update_post(created_post.post_id, PostUpdate(title="更新"), owner_id="user-2")
+        assert service.update_post(created_post.post_id, PostUpdate(title="更新"), owner_id="user-1").title == "更新"
+        
+        # 存在しない投稿はNoneを返す
+        assert service.update_post("nonexistent-id", PostUpdate(title="更新"), owner_id="user-1") is None
+
+
+class TestPostAPI:
+    """投稿APIのテストクラス"""
+    
+    def test_create_uses_current_username(self, use_backend):
+        """ユーザー名の変更前に発行されたトークンで投稿しても、現在のユーザー名で作成されることを確認"""
+        use_backend("memory")
+        users = UserService()
+        user = users.create_user(UserCreate(username="oldname", password="password123"))
+        token = create_access_token({"user_id": user.user_id, "username": "oldname", "role": "user"})
+        users.update_user(user.user_id, UserUpdate(username="newname"))
+        client = TestClient(app, headers={"Authorization": f"Bearer {token}"})
+        
+        response = client.post("/posts/", json={"title": "タイトル", "message": "本文"})
+        
+        assert response.status_code == 201
+        assert response.json()["username"] == "newname"
+        assert PostService().get_post_by_id(response.json()["post_id"]).username == "newname"
+    
+    def test_deleted_user_cannot_post(self, use_backend):
+        """削除されたユーザーのトークンでは投稿できないことを確認"""
+        use_backend("memory")
+        users = UserService()
+        user = users.create_user(UserCreate(username="taro", password="password123"))
+        token = create_access_token({"user_id": user.user_id, "username": "taro", "role": "user"})
+        users.delete_user(user.user_id)
+        client = TestClient(app, headers={"Authorization": f"Bearer {token}"})
+        
+        assert client.post("/posts/", json={"title": "タイトル", "message": "本文"}).status_code == 401
+        assert PostService().get_all_posts() == []
+
+
+class TestPropagationProgress:
+    """ユーザー名伝播の進捗の保存のテストクラス"""
+    
+    def test_progress_is_stored(self, backend):
+        """進捗を集計のテーブルに保存し、集計の再構築でも削除しないことを確認"""
+        service = PostService()
+        for index in range(3):
+            service.create_post(PostCreate(title=f"投稿{index}", message="本文"), "user-1", "oldname")
+        
+        assert get_propagation_progress("user-1", "newname") is None
+        
+        service.propagate_username("user-1", "newname")
+        stats_service.rebuild(service._get_stats_sources(), UserService()._get_repository())
+        
+        progress = get_propagation_progress("user-1", "newname")
+        assert progress.to_dict() == {
+            "user_id": "user-1", "username": "newname", "total": 3, "updated": 3,
+            "skipped": 0, "failed": 0, "throttled": 0, "done": True,
+        }
+    
+    def test_late_propagation_does_not_overwrite_newer_username(self, backend):
+        """続けて名前を変更した場合に、遅れて実行された前の変更の処理が新しいユーザー名を上書きしないことを確認"""
+        users, service = UserService(), PostService()
+        user = users.create_user(UserCreate(username="name-a", password="password123"))
+        for index in range(3):
+            service.create_post(PostCreate(title=f"投稿{index}", message="本文"), user.user_id, "name-a")
+        users.update_user(user.user_id, UserUpdate(username="name-b"))
+        users.update_user(user.user_id, UserUpdate(username="name-c"))
+        query_user_post_keys = service._query_user_post_keys
+        
+        def query_then_propagate_newer(user_id):
+            # Bの処理が対象を読み取った後に、Cの処理が先に完了する
+            items = query_user_post_keys(user_id)
+            PostService().propagate_username(user_id, "name-c")
+            return items
+        
+        service._query_user_post_keys = query_then_propagate_newer
+        late = service.propagate_username(user.user_id, "name-b")
+        
+        assert (late.updated, late.skipped) == (0, 3)
+        assert [post.username for post in service.get_posts_by_user(user.user_id)] == ["name-c"] * 3
+        assert get_propagation_progress(user.user_id, "name-c").updated == 3
+        assert get_propagation_progress(user.user_id, "name-b").skipped == 3
+    
+    def test_condition_rechecks_rewritten_post(self, backend):
+        """読み取った後に他の処理が書き換えた投稿は、現在のユーザー名の処理であれば書き換え直すことを確認"""
+        users, service = UserService(), PostService()
+        user = users.create_user(UserCreate(username="name-a", password="password123"))
+        post = service.create_post(PostCreate(title="投稿", message="本文"), user.user_id, "name-a")
+        users.update_user(user.user_id, UserUpdate(username="name-c"))
+        query_user_post_keys = service._query_user_post_keys
+        
+        def query_then_rewrite(user_id):
+            # Cの処理が対象を読み取った後に、古い変更の処理がBに書き換える
+            items = query_user_post_keys(user_id)
+            get_posts_repository().update(post.post_id, {"username": "name-b"}, increment_version=False)
+            return items
+        
+        service._query_user_post_keys = query_then_rewrite
+        progress = service.propagate_username(user.user_id, "name-c")
+        
+        assert (progress.updated, progress.skipped) == (1, 0)
+        assert service.get_post_by_id(post.post_id).username == "name-c"
+    
+    def test_progress_endpoint(self, use_backend):
+        """ユーザー名の変更後に、伝播の進捗をAPIで取得できることを確認"""
+        use_backend("memory")
+        user = UserService().create_user(UserCreate(username="oldname", password="password123"))
+        PostService().create_post(PostCreate(title="タイトル", message="本文"), user.user_id, user.username)
+        admin = create_access_token({"user_id": "admin-1", "username": "admin", "role": "admin"})
+        client = TestClient(app, headers={"Authorization": f"Bearer {admin}"})
+        
+        assert client.get(f"/users/{user.user_id}/username-propagation").status_code == 404
+        assert client.put(f"/users/{user.user_id}", json={"username": "newname"}).status_code == 200
+        
+        response = client.get(f"/users/{user.user_id}/username-propagation")
+        assert response.status_code == 200
+        assert (response.json()["updated"], response.json()["done"]) == (1, True)
+        
+        # ユーザー名が変わらない更新では伝播処理を実行しない
+        get_posts_repository().update(
+            PostService().get_posts_by_user(user.user_id)[0].post_id, {"username": "stale"}, increment_version=False,
+        )
+        assert client.put(f"/users/{user.user_id}", json={"username": "newname"}).status_code == 200
+        assert PostService().get_posts_by_user(user.user_id)[0].username == "stale"
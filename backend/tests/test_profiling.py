@@ -0,0 +1,109 @@
+"""
+リクエストプロファイリングのテスト
+
+サンプリングプロファイラー・回数制限・管理者によるプロファイリングのテスト。
+"""
+
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import app
+from app.services import profiling
+from app.services.auth import create_access_token
+from app.services.profiling import ProfileResult, ProfileStore, SamplingProfiler
+
+
+def busy_loop(stop: threading.Event) -> None:
+    """停止要求までCPUを使用し続ける"""
+    while not stop.is_set():
+        sum(range(1000))
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """テストごとに新しいプロファイル結果の保持領域を使用するフィクスチャ"""
+    store = ProfileStore()
+    monkeypatch.setattr(profiling, "profile_store", store)
+    monkeypatch.setattr("app.routers.admin.profile_store", store)
+    return store
+
+
+def auth_header(role: str) -> dict:
+    """指定したロールのトークンを持つAuthorizationヘッダーを作成する"""
+    token = create_access_token({"user_id": "user-1", "username": "profiler", "role": role})
+    return {"Authorization": f"Bearer {token}"}
+
+
+class TestProfiling:
+    """リクエストプロファイリングのテストクラス"""
+    
+    def test_sampling_profiler_collects_collapsed_stacks(self):
+        """実行中のスレッドのスタックが折りたたみスタック形式で得られることを確認"""
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(stop,))
+        worker.start()
+        profiler = SamplingProfiler(0.001)
+        try:
+            profiler.start()
+            time.sleep(0.05)
+        finally:
+            profiler.stop()
+            stop.set()
+            worker.join()
+        
+        assert profiler.samples > 0
+        assert "tests.test_profiling:busy_loop" in profiler.collapsed()
+        first_line = profiler.collapsed().splitlines()[0]
+        assert int(first_line.rsplit(" ", 1)[1]) >= 1
+    
+    def test_rate_limit(self):
+        """同時実行と最小間隔内の再実行が拒否されることを確認"""
+        store = ProfileStore()
+        
+        assert store.try_acquire(60) is True
+        assert store.try_acquire(0) is False
+        store.release(ProfileResult("p1", "GET", "/"))
+        assert store.try_acquire(60) is False
+        assert store.try_acquire(0) is True
+    
+    def test_admin_request_is_profiled(self, store, monkeypatch):
+        """管理者のプロファイリング要求が計測され、管理APIから取得できることを確認"""
+        monkeypatch.setattr(get_settings(), "PROFILING_MIN_INTERVAL_SECONDS", 60.0)
+        client = TestClient(app)
+        headers = {**auth_header("admin"), "X-Profile": "1"}
+        
+        response = client.get("/", headers=headers)
+        
+        assert response.status_code == 200
+        assert response.headers["x-profile-status"] == "captured"
+        profile_id = response.headers["x-profile-id"]
+        
+        # 最小間隔内の要求は計測されない
+        response = client.get("/?profile=1", headers=auth_header("admin"))
+        assert response.status_code == 200
+        assert response.headers["x-profile-status"] == "rate-limited"
+        assert "x-profile-id" not in response.headers
+        
+        profiles = client.get("/admin/profiles", headers=auth_header("admin")).json()
+        assert [profile["profile_id"] for profile in profiles] == [profile_id]
+        assert profiles[0]["status_code"] == 200
+        response = client.get(f"/admin/profiles/{profile_id}", headers=auth_header("admin"))
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert client.get("/admin/profiles/unknown", headers=auth_header("admin")).status_code == 404
+    
+    def test_non_admin_request_is_not_profiled(self, store):
+        """一般ユーザー・未認証のプロファイリング要求が無視されることを確認"""
+        client = TestClient(app)
+        
+        for headers in ({**auth_header("user"), "X-Profile": "1"}, {"X-Profile": "1"}):
+            response = client.get("/", headers=headers)
+            assert response.status_code == 200
+            assert "x-profile-status" not in response.headers
+        
+        assert store.summaries() == []
+        assert store.try_acquire(60) is True
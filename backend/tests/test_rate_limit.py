@@ -0,0 +1,172 @@
+"""
+投稿のレート制限のテスト
+
+トークンバケット・共有するカウンターによるユーザー・IPアドレスごとの投稿の回数の制限と、
+投稿作成APIの429レスポンスのテスト。
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import app
+from app.models.user import UserCreate
+from app.services.auth import create_access_token
+from app.services.rate_limit import RateLimiter, RateLimitExceededError, TokenBucket, rate_limiter
+from app.services.repository import StorageError, get_rate_limit_repository
+from app.services.user_service import UserService
+
+# 制限の期間の開始時刻（UNIX時間、60の倍数）
+START = 1_700_000_040.0
+
+
+@pytest.fixture
+def limiter(backend, monkeypatch):
+    """各ストレージで、ユーザーごとに1分あたり3回（管理者は5回）、IPアドレスごとに4回に制限したレート制限"""
+    monkeypatch.setattr(get_settings(), "RATE_LIMIT_POSTS_PER_MINUTE", {"user": 3, "admin": 5})
+    monkeypatch.setattr(get_settings(), "RATE_LIMIT_IP_POSTS_PER_MINUTE", 4)
+    return RateLimiter()
+
+
+def allowed(limiter, user_id, role="user", client_ip=None, now=START):
+    """投稿の回数の制限を超えていない場合Trueを返す"""
+    try:
+        limiter.check_post(user_id, role, client_ip, now=now)
+        return True
+    except RateLimitExceededError:
+        return False
+
+
+class TestTokenBucket:
+    """トークンバケットのテストクラス"""
+    
+    def test_refill(self):
+        """1分で上限まで一定の速さで補充され、足りない間は待つ秒数を返すことを確認"""
+        bucket = TokenBucket(6, START)
+        bucket.tokens = 0
+        
+        assert bucket.wait_time(START) == pytest.approx(10.0)
+        assert bucket.wait_time(START + 10) == 0
+        assert bucket.wait_time(START + 600) == 0 and bucket.tokens == 6
+
+
+class TestRateLimiter:
+    """投稿のレート制限のテストクラス"""
+    
+    def test_user_limit_by_role(self, limiter):
+        """権限ごとの上限まで投稿でき、次の期間に再度投稿できることを確認"""
+        assert [allowed(limiter, "user-1") for _ in range(4)] == [True, True, True, False]
+        assert [allowed(limiter, "admin-1", role="admin") for _ in range(6)] == [True] * 5 + [False]
+        assert allowed(limiter, "user-2")
+        assert allowed(limiter, "user-1", now=START + 60)
+    
+    def test_retry_after(self, limiter):
+        """上限を超えた場合に、再度投稿できるまでの秒数を返すことを確認"""
+        for _ in range(3):
+            limiter.check_post("user-1", "user", None, now=START)
+        
+        with pytest.raises(RateLimitExceededError) as error:
+            limiter.check_post("user-1", "user", None, now=START + 0.5)
+        
+        assert 1 <= error.value.retry_after <= 20
+    
+    def test_ip_limit_across_users(self, limiter):
+        """同じIPアドレスからの投稿をユーザーに関わらず制限し、拒否した投稿はユーザーのトークンを使用しないことを確認"""
+        results = [allowed(limiter, f"user-{index}", client_ip="192.0.2.1") for index in range(5)]
+        
+        assert results == [True, True, True, True, False]
+        assert allowed(limiter, "user-4", client_ip="192.0.2.2")
+    
+    def test_local_rejection_skips_shared_counter(self, limiter):
+        """コンテナ内のトークンバケットで拒否した投稿は、共有するカウンターに加算しないことを確認"""
+        for _ in range(5):
+            allowed(limiter, "user-1")
+        
+        counters = get_rate_limit_repository().scan()
+        
+        assert [int(item["count"]) for item in counters] == [3]
+        assert counters[0]["expires_at"] > START
+    
+    def test_shared_counter_across_containers(self, limiter):
+        """共有するカウンターで、複数のコンテナの合計の回数を制限することを確認"""
+        other = RateLimiter()
+        
+        assert [allowed(limiter, "user-1") for _ in range(2)] == [True, True]
+        assert [allowed(other, "user-1") for _ in range(2)] == [True, False]
+    
+    def test_shared_rejection_returns_local_token(self, limiter):
+        """共有するカウンターで拒否した投稿は、コンテナ内のトークンを使用しないことを確認"""
+        other = RateLimiter()
+        assert allowed(limiter, "user-1")
+        assert [allowed(other, "user-1") for _ in range(2)] == [True, True]
+        
+        assert not allowed(limiter, "user-1")
+        
+        bucket = limiter._buckets["USER#user-1"]
+        assert bucket.tokens == bucket.capacity - 1
+    
+    def test_rejection_rolls_back_other_counters(self, limiter):
+        """IPアドレスの共有するカウンターで拒否した投稿は、ユーザーのカウンターに含めないことを確認"""
+        other = RateLimiter()
+        assert all(allowed(limiter, f"user-{index}", client_ip="192.0.2.1") for index in range(4))
+        
+        assert not allowed(other, "user-9", client_ip="192.0.2.1")
+        
+        counters = {item["limit_id"].rsplit("#", 1)[0]: int(item["count"]) for item in get_rate_limit_repository().scan()}
+        assert counters["USER#user-9"] == 0
+        assert counters["IP#192.0.2.1"] == 4
+    
+    def test_storage_error_still_checks_other_limits(self, limiter, monkeypatch):
+        """ユーザーのカウンターの読み書きに失敗した場合も、IPアドレスのカウンターで制限することを確認"""
+        repository = get_rate_limit_repository()
+        increment = repository.increment
+        
+        def fail_user(key, *args, **kwargs):
+            if key.startswith("USER#"):
+                raise StorageError("接続に失敗しました")
+            return increment(key, *args, **kwargs)
+        
+        monkeypatch.setattr(repository, "increment", fail_user)
+        other = RateLimiter()
+        assert all(allowed(limiter, f"user-{index}", client_ip="192.0.2.1") for index in range(4))
+        
+        assert not allowed(other, "user-9", client_ip="192.0.2.1")
+    
+    def test_storage_error_allows_post(self, limiter, monkeypatch):
+        """共有するカウンターの読み書きに失敗した場合は、コンテナ内の制限のみを行うことを確認"""
+        def fail(*args, **kwargs):
+            raise StorageError("接続に失敗しました")
+        
+        monkeypatch.setattr(get_rate_limit_repository(), "increment", fail)
+        
+        assert [allowed(limiter, "user-1") for _ in range(4)] == [True, True, True, False]
+    
+    def test_disabled(self, limiter, monkeypatch):
+        """レート制限が無効な場合、上限が0の場合は制限しないことを確認"""
+        monkeypatch.setattr(get_settings(), "RATE_LIMIT_ENABLED", False)
+        assert all(allowed(limiter, "user-1") for _ in range(10))
+        
+        monkeypatch.setattr(get_settings(), "RATE_LIMIT_ENABLED", True)
+        monkeypatch.setattr(get_settings(), "RATE_LIMIT_POSTS_PER_MINUTE", {"user": 0})
+        assert all(allowed(limiter, "user-2") for _ in range(4))
+        assert get_rate_limit_repository().scan() == []
+
+
+class TestRateLimitAPI:
+    """投稿作成APIのレート制限のテストクラス"""
+    
+    def test_too_many_requests(self, use_backend, monkeypatch):
+        """上限を超えた投稿に429とRetry-Afterヘッダーを返し、投稿を作成しないことを確認"""
+        use_backend("memory")
+        monkeypatch.setattr(get_settings(), "RATE_LIMIT_POSTS_PER_MINUTE", {"user": 2})
+        rate_limiter.reset()
+        user = UserService().create_user(UserCreate(username="taro", password="password123"))
+        token = create_access_token({"user_id": user.user_id, "username": user.username, "role": "user"})
+        client = TestClient(app, headers={"Authorization": f"Bearer {token}"})
+        
+        responses = [client.post("/posts/", json={"title": "タイトル", "message": "本文"}) for _ in range(3)]
+        
+        assert [response.status_code for response in responses] == [201, 201, 429]
+        assert int(responses[2].headers["Retry-After"]) >= 1
+        assert len(client.get("/posts/").json()) == 2
+        rate_limiter.reset()
@@ -0,0 +1,374 @@
+"""
+リポジトリのテスト
+
+DynamoDB・メモリ・SQLiteの各ストレージが同じ動作をすることと、
+DynamoDB以外のストレージでサービスが動作することのテスト。
+"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from app.models.post import PostCreate, PostUpdate
+from app.models.user import UserCreate, UserUpdate
+from app.services.post_service import PostService
+from app.services.repository import (
+    ConditionFailedError,
+    Repository,
+    get_posts_repository,
+    get_users_repository,
+    reset_repositories,
+)
+from app.services.user_service import UserService
+from app.services.versioning import VersionConflictError
+
+
+@pytest.fixture
+def posts(backend):
+    """各ストレージの投稿のリポジトリ"""
+    return get_posts_repository()
+
+
+def make_post(post_id, user_id="user-1", created_at="2024-01-01T00:00:00", **extra):
+    """テスト用の投稿アイテムを作成する"""
+    return {
+        "post_id": post_id,
+        "pk": "POST",
+        "user_id": user_id,
+        "username": "taro",
+        "created_at": created_at,
+        "version": 1,
+        **extra,
+    }
+
+
+class TestRepositoryContract:
+    """ストレージ共通の動作のテストクラス"""
+    
+    def test_put_and_get(self, posts):
+        """書き込んだアイテムをキーで取得できることを確認"""
+        posts.put(make_post("p1"))
+        
+        assert posts.get("p1")["username"] == "taro"
+        assert posts.get("p1", consistent=True)["version"] == 1
+        assert posts.get("missing") is None
+    
+    def test_put_if_not_exists(self, posts):
+        """同じキーのアイテムが存在する場合は書き込まないことを確認"""
+        posts.put(make_post("p1"), if_not_exists=True)
+        
+        with pytest.raises(ConditionFailedError):
+            posts.put(make_post("p1", username="jiro"), if_not_exists=True)
+        assert posts.get("p1")["username"] == "taro"
+    
+    def test_put_expected_version(self, posts):
+        """既存アイテムのバージョンが一致する場合のみ書き込むことを確認"""
+        posts.put(make_post("p1"))
+        
+        posts.put(make_post("p1", version=2), expected_version=1)
+        with pytest.raises(ConditionFailedError):
+            posts.put(make_post("p1", version=3), expected_version=1)
+        assert posts.get("p1")["version"] == 2
+    
+    def test_update_increments_version(self, posts):
+        """更新で属性が変わり、バージョンが進むことを確認"""
+        posts.put(make_post("p1"))
+        
+        item = posts.update("p1", {"username": "jiro"}, expected={"user_id": "user-1"}, expected_version=1)
+        
+        assert item["username"] == "jiro"
+        assert item["version"] == 2
+        assert posts.get("p1") == item
+    
+    def test_update_without_version_increment(self, posts):
+        """increment_version=Falseの場合はバージョンが進まないことを確認"""
+        posts.put(make_post("p1"))
+        
+        item = posts.update("p1", {"username": "jiro"}, increment_version=False)
+        
+        assert item["version"] == 1
+    
+    def test_update_conditions(self, posts):
+        """存在しない・条件不一致・バージョン不一致の場合は更新しないことを確認"""
+        posts.put(make_post("p1"))
+        
+        with pytest.raises(ConditionFailedError):
+            posts.update("missing", {"username": "jiro"})
+        with pytest.raises(ConditionFailedError):
+            posts.update("p1", {"username": "jiro"}, expected={"user_id": "user-2"})
+        with pytest.raises(ConditionFailedError):
+            posts.update("p1", {"username": "jiro"}, expected_version=5)
+        
+        assert posts.get("missing") is None
+        assert posts.get("p1")["username"] == "taro"
+    
+    def test_update_item_without_version(self, posts):
+        """version属性を持たないアイテムはバージョン0として扱うことを確認"""
+        item = make_post("p1")
+        del item["version"]
+        posts.put(item)
+        
+        assert posts.update("p1", {"username": "jiro"}, expected_version=0)["version"] == 1
+    
+    def test_increment(self, posts):
+        """存在しないアイテム・属性は0から加算し、同時の加算を取りこぼさないことを確認"""
+        item = posts.increment("p1", {"count": 2}, {"user_id": "user-1"})
+        
+        assert (int(item["count"]), item["user_id"]) == (2, "user-1")
+        threads = [threading.Thread(target=lambda: posts.increment("p1", {"count": 1, "other": -1})) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        item = posts.get("p1")
+        assert (int(item["count"]), int(item["other"])) == (12, -10)
+        assert "version" not in item
+    
+    def test_scan_segment(self, posts):
+        """全ての区分を合わせると全アイテムを重複なく取得できることを確認"""
+        if type(posts).__name__ == "DynamoDBRepository":
+            pytest.skip("motoのScanはSegment・TotalSegmentsに対応していない")
+        posts.put_many([make_post(f"p{index:02d}") for index in range(20)])
+        
+        keys = [item["post_id"] for segment in range(3) for item in posts.scan_segment(segment, 3)]
+        
+        assert sorted(keys) == [f"p{index:02d}" for index in range(20)]
+    
+    def test_scan_segment_attributes(self, posts, monkeypatch):
+        """区分のスキャンがページを続けて読み取り、指定した属性のみを返すことを確認"""
+        monkeypatch.setattr("app.services.repository.SCAN_SEGMENT_PAGE_SIZE", 3)
+        posts.put_many([make_post(f"p{index:02d}") for index in range(10)])
+        
+        items = list(posts.scan_segment(0, 1, ["post_id", "user_id"]))
+        
+        assert sorted(item["post_id"] for item in items) == [f"p{index:02d}" for index in range(10)]
+        assert all(set(item) == {"post_id", "user_id"} for item in items)
+    
+    def test_count_segment(self, posts):
+        """区分のアイテム数を、除外する接頭辞のキーを除いて数えることを確認"""
+        posts.put_many([make_post(f"p{index:02d}") for index in range(7)] + [make_post("#FRONT_PAGE")])
+        
+        assert posts.count_segment(0, 1) == 8
+        assert posts.count_segment(0, 1, "#") == 7
+    
+    def test_delete_many(self, posts):
+        """複数のアイテムをまとめて削除し、存在しないキーは無視することを確認"""
+        posts.put_many([make_post(f"p{index}") for index in range(5)])
+        
+        assert posts.delete_many(f"p{index}" for index in (0, 2, 4, 9)) == 4
+        
+        assert sorted(item["post_id"] for item in posts.scan()) == ["p1", "p3"]
+    
+    def test_query_timeline_order(self, posts):
+        """ソートキーを持つインデックスはソートキー順に返すことを確認"""
+        for index in range(5):
+            posts.put(make_post(f"p{index}", created_at=f"2024-01-0{index + 1}T00:00:00"))
+        
+        items = posts.query("pk-created_at-index", "POST", descending=True, limit=3)
+        
+        assert [item["post_id"] for item in items] == ["p4", "p3", "p2"]
+        ascending = posts.query("pk-created_at-index", "POST")
+        assert [item["post_id"] for item in ascending] == ["p0", "p1", "p2", "p3", "p4"]
+    
+    def test_query_before(self, posts):
+        """ソートキーが指定した値より前のアイテムのみを返すことを確認"""
+        for index in range(5):
+            posts.put(make_post(f"p{index}", created_at=f"2024-01-0{index + 1}T00:00:00"))
+        
+        items = posts.query("pk-created_at-index", "POST", descending=True, limit=2, before="2024-01-04T00:00:00")
+        
+        assert [item["post_id"] for item in items] == ["p2", "p1"]
+        ascending = posts.query("pk-created_at-index", "POST", before="2024-01-03T00:00:00")
+        assert [item["post_id"] for item in ascending] == ["p0", "p1"]
+    
+    def test_query_prefix(self, posts):
+        """ソートキーが指定した文字列で始まるアイテムのみをソートキー順に返すことを確認"""
+        for post_id, key in [("p1", "会議室"), ("p2", "会議"), ("p3", "会話"), ("p4", "会議録")]:
+            posts.put(make_post(post_id, title_key=key))
+        posts.put(make_post("p5"))
+        
+        items = posts.query("pk-title_key-index", "POST", limit=2, prefix="会議")
+        
+        assert [item["title_key"] for item in items] == ["会議", "会議室"]
+        assert len(posts.query("pk-title_key-index", "POST", prefix="会")) == 4
+        assert posts.query("pk-title_key-index", "POST", prefix="議") == []
+    
+    def test_query_sparse_index_and_projection(self, posts):
+        """インデックスのキーを持たないアイテムを含めず、指定した属性のみを返すことを確認"""
+        posts.put(make_post("p1", user_id="user-1"))
+        posts.put(make_post("p2", user_id="user-2"))
+        posts.put({"post_id": "#FRONT_PAGE", "entries": [], "version": 1})
+        
+        items = posts.query("user_id-index", "user-1", attributes=["post_id", "username"])
+        
+        assert items == [{"post_id": "p1", "username": "taro"}]
+        assert len(posts.query("pk-created_at-index", "POST")) == 2
+    
+    def test_delete_and_scan(self, posts):
+        """削除したアイテムが取得・全件取得に含まれないことを確認"""
+        posts.put(make_post("p1"))
+        posts.put(make_post("p2"))
+        
+        posts.delete("p1")
+        posts.delete("missing")
+        
+        assert posts.get("p1") is None
+        assert [item["post_id"] for item in posts.scan()] == ["p2"]
+    
+    def test_delete_expected_version(self, posts):
+        """バージョンが一致しない・存在しないアイテムの条件付き削除が失敗することを確認"""
+        posts.put(make_post("p1"))
+        
+        with pytest.raises(ConditionFailedError):
+            posts.delete("p1", expected_version=2)
+        with pytest.raises(ConditionFailedError):
+            posts.delete("missing", expected_version=1)
+        
+        assert posts.get("p1") is not None
+        posts.delete("p1", expected_version=1)
+        assert posts.get("p1") is None
+    
+    def test_put_many(self, posts):
+        """まとめて書き込んだアイテムを取得でき、同じキーは上書きされることを確認"""
+        posts.put(make_post("p0", username="old"))
+        
+        count = posts.put_many([make_post(f"p{index}") for index in range(30)])
+        
+        assert count == 30
+        assert len(posts.scan()) == 30
+        assert posts.get("p0")["username"] == "taro"
+        assert posts.put_many([]) == 0
+    
+    def test_scan_page(self, posts):
+        """続きのキーで全アイテムを重複なく取得できることを確認"""
+        posts.put_many([make_post(f"p{index:02d}") for index in range(7)])
+        
+        keys = []
+        start_key = None
+        for _ in range(4):
+            items, start_key = posts.scan_page(3, start_key)
+            keys.extend(item["post_id"] for item in items)
+            if start_key is None:
+                break
+        
+        assert start_key is None
+        assert sorted(keys) == [f"p{index:02d}" for index in range(7)]
+    
+    def test_returned_items_are_copies(self, posts):
+        """取得したアイテムを変更してもストレージに影響しないことを確認"""
+        item = make_post("p1")
+        posts.put(item)
+        item["username"] = "changed"
+        
+        fetched = posts.get("p1")
+        fetched["username"] = "changed"
+        
+        assert posts.get("p1")["username"] == "taro"
+
+
+class TestRepositorySelection:
+    """ストレージの選択のテストクラス"""
+    
+    def test_invalid_backend(self, use_backend):
+        """不正なSTORAGE_BACKENDの場合はエラーになることを確認"""
+        use_backend("unknown")
+        
+        with pytest.raises(ValueError):
+            get_users_repository()
+    
+    def test_repository_is_singleton(self, use_backend):
+        """同じ種類のリポジトリは同じインスタンスを返すことを確認"""
+        use_backend("memory")
+        
+        assert get_posts_repository() is get_posts_repository()
+        assert get_users_repository() is not get_posts_repository()
+    
+    def test_base_class_is_abstract(self):
+        """読み書きの操作を実装していないリポジトリは作成できないことを確認"""
+        class PartialRepository(Repository):
+            def get(self, key, consistent=False):
+                return None
+        
+        with pytest.raises(TypeError):
+            Repository("test", "post_id", {})
+        with pytest.raises(TypeError):
+            PartialRepository("test", "post_id", {})
+
+
+class TestSQLiteRepository:
+    """SQLiteリポジトリのテストクラス"""
+    
+    def test_wal_mode_and_persistence(self, use_backend, tmp_path):
+        """WALモードで書き込み、リポジトリを作り直してもアイテムが残ることを確認"""
+        use_backend("sqlite")
+        get_posts_repository().put(make_post("p1"))
+        
+        reset_repositories()
+        
+        assert get_posts_repository().get("p1")["username"] == "taro"
+        connection = sqlite3.connect(tmp_path / "board.db")
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        connection.close()
+    
+    def test_missing_index_column_is_added(self, use_backend, tmp_path):
+        """インデックスのキーの列が無い既存のデータベースファイルに列を追加し、値を設定することを確認"""
+        connection = sqlite3.connect(tmp_path / "board.db")
+        connection.execute('CREATE TABLE "test-posts" ("post_id" TEXT PRIMARY KEY, "user_id" TEXT, "pk" TEXT, "created_at" TEXT, item TEXT NOT NULL)')
+        connection.execute(
+            'INSERT INTO "test-posts" VALUES (?, ?, ?, ?, ?)',
+            ("p1", "user-1", "POST", "2024-01-01T00:00:00", '{"post_id": "p1", "user_id": "user-1", "pk": "POST", "created_at": "2024-01-01T00:00:00", "title_key": "会議"}'),
+        )
+        connection.commit()
+        connection.close()
+        use_backend("sqlite")
+        
+        items = get_posts_repository().query("pk-title_key-index", "POST", prefix="会")
+        
+        assert [item["post_id"] for item in items] == ["p1"]
+    
+    def test_connection_per_thread(self, use_backend):
+        """スレッドごとに別の接続を使用し、他のスレッドの書き込みを読み取れることを確認"""
+        use_backend("sqlite")
+        posts = get_posts_repository()
+        connections = []
+        
+        def write():
+            posts.put(make_post("p1"))
+            connections.append(posts._connection())
+        
+        thread = threading.Thread(target=write)
+        thread.start()
+        thread.join()
+        
+        assert posts.get("p1") is not None
+        assert connections[0] is not posts._connection()
+
+
+class TestServicesWithoutDynamoDB:
+    """DynamoDB以外のストレージでのサービスのテストクラス"""
+    
+    @pytest.mark.parametrize("storage", ["memory", "sqlite"])
+    def test_user_and_post_flow(self, use_backend, storage):
+        """DynamoDBなしでユーザー・投稿の操作が動作することを確認"""
+        use_backend(storage)
+        user_service = UserService()
+        post_service = PostService()
+        
+        user = user_service.create_user(UserCreate(username="taro", password="password123"))
+        assert user_service.get_user_by_username("taro").user_id == user.user_id
+        
+        post = post_service.create_post(PostCreate(title="タイトル", message="本文"), user.user_id, user.username)
+        updated = post_service.update_post(post.post_id, PostUpdate(message="更新"), expected_version=1)
+        assert updated.version == 2
+        with pytest.raises(VersionConflictError):
+            post_service.update_post(post.post_id, PostUpdate(message="再更新"), expected_version=1)
+        
+        user_service.update_user(user.user_id, UserUpdate(username="jiro"))
+        progress = post_service.propagate_username(user.user_id, "jiro")
+        assert progress.updated == 1
+        
+        assert [p.username for p in post_service.get_all_posts()] == ["jiro"]
+        assert post_service.delete_post(post.post_id)
+        assert post_service.get_posts_by_user(user.user_id) == []
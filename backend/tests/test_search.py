@@ -0,0 +1,259 @@
+"""
+投稿検索のテスト
+
+N-gramへの分割と、投稿の作成・更新・削除に伴う検索インデックスの更新・検索API、
+タイトルの前方一致による候補のテスト。
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import app
+from app.models.post import PostCreate, PostUpdate
+from app.services.auth import create_access_token
+from app.services.post_service import PostService
+from app.services.repository import get_posts_repository, get_search_repository, reset_repositories
+from app.services.search_index import DOCUMENT_PREFIX, query_terms, score_terms, title_key, tokenize
+
+
+@pytest.fixture
+def service(backend, monkeypatch):
+    """各ストレージで検索を有効にした投稿サービス"""
+    monkeypatch.setattr(get_settings(), "SEARCH_ENABLED", True)
+    return PostService()
+
+
+def create(service, title, message):
+    """投稿を作成する"""
+    return service.create_post(PostCreate(title=title, message=message), "user-1", "taro")
+
+
+def search_ids(service, query, limit=20, cursor=None):
+    """検索結果の投稿IDリストを取得する"""
+    posts, _ = service.search_posts(query, limit, cursor)
+    return [post.post_id for post in posts]
+
+
+class TestTokenize:
+    """検索語への分割のテストクラス"""
+    
+    def test_japanese_bigrams(self):
+        """日本語の文字列を2文字ずつ1文字ずらして分割し、各文字も検索語にすることを確認"""
+        assert tokenize("掲示板です") == ["掲示", "示板", "板で", "です", "掲", "示", "板", "で", "す"]
+    
+    def test_normalization_and_separators(self):
+        """全角英数字・大文字を統一し、記号・空白で区切ることを確認"""
+        assert tokenize("ＡＷＳの、 Go!") == ["aw", "ws", "sの", "a", "w", "s", "の", "go", "g", "o"]
+        assert tokenize("a") == ["a"]
+        assert tokenize("!?　") == []
+    
+    def test_query_terms(self):
+        """2文字以上の語はN-gramに、1文字の語はその文字に分割することを確認"""
+        assert query_terms("会議 予 定例") == ["会議", "予", "定例"]
+        assert query_terms("猫") == ["猫"]
+        assert query_terms("!!") == []
+    
+    def test_title_weight(self):
+        """タイトルの検索語のスコアが本文より大きいことを確認"""
+        scores = score_terms("会議", "会議の予定")
+        
+        assert scores["会議"] == 4
+        assert scores["予定"] == 1
+
+
+class TestSearch:
+    """投稿検索のテストクラス"""
+    
+    def test_search_ranks_matches(self, service):
+        """全ての検索語を含む投稿のみを、スコアの降順で返すことを確認"""
+        body = create(service, "お知らせ", "明日は定例会議があります")
+        title = create(service, "定例会議の議事録", "議事録を共有します")
+        create(service, "雑談", "会議室の予約について")
+        
+        assert search_ids(service, "定例会議") == [title.post_id, body.post_id]
+        assert search_ids(service, "会議　予約") == search_ids(service, "予約") != []
+        assert search_ids(service, "存在しない語") == []
+        assert search_ids(service, "!!") == []
+    
+    def test_pagination(self, service):
+        """同じスコアの投稿を新しい順に、続きのカーソルで重複なく返すことを確認"""
+        created = [create(service, f"タイトル{index}", "共通の本文") for index in range(5)]
+        
+        first, cursor = service.search_posts("共通", 2)
+        second, cursor = service.search_posts("共通", 2, cursor)
+        third, cursor = service.search_posts("共通", 2, cursor)
+        
+        assert [post.post_id for post in first + second + third] == [post.post_id for post in reversed(created)]
+        assert cursor is None
+        with pytest.raises(ValueError):
+            service.search_posts("共通", 2, "invalid")
+    
+    def test_single_character_query(self, service):
+        """1文字の語で、長い語の中にその文字を含む投稿も検索できることを確認"""
+        cat = create(service, "猫舌", "熱いものが苦手")
+        meeting = create(service, "お知らせ", "定例会議の予定")
+        
+        assert search_ids(service, "猫") == [cat.post_id]
+        assert search_ids(service, "会議 予") == [meeting.post_id]
+        assert search_ids(service, "予 猫") == []
+    
+    def test_max_postings_per_term(self, service, monkeypatch):
+        """検索語ごとにスコアの高い順にSEARCH_MAX_POSTINGS件までのポスティングのみを読み取ることを確認"""
+        monkeypatch.setattr(get_settings(), "SEARCH_MAX_POSTINGS", 2)
+        low = create(service, "雑談", "会議")
+        high = create(service, "会議", "会議の議事録")
+        middle = create(service, "会議", "予定")
+        repository = get_search_repository()
+        query = repository.query
+        limits = []
+        
+        def recording_query(*args, **kwargs):
+            limits.append(kwargs.get("limit"))
+            return query(*args, **kwargs)
+        
+        monkeypatch.setattr(repository, "query", recording_query)
+        
+        assert search_ids(service, "会議") == [high.post_id, middle.post_id]
+        assert search_ids(service, "議事録 会議") == [high.post_id]
+        assert set(limits) == {2}
+    
+    def test_update_and_delete_maintain_index(self, service):
+        """更新で含まれなくなった検索語・削除した投稿を検索しないことを確認"""
+        post = create(service, "旧タイトル", "古い本文")
+        service.update_post(post.post_id, PostUpdate(title="新タイトル", message="新しい本文"))
+        
+        assert search_ids(service, "古い") == []
+        assert search_ids(service, "新しい") == [post.post_id]
+        assert search_ids(service, "タイトル") == [post.post_id]
+        
+        service.delete_post(post.post_id)
+        
+        assert search_ids(service, "タイトル") == []
+        assert get_search_repository().scan() == []
+    
+    def test_archived_posts_are_found(self, service, monkeypatch):
+        """アーカイブした投稿も検索結果に含まれることを確認"""
+        monkeypatch.setattr(get_settings(), "ARCHIVE_ENABLED", True)
+        monkeypatch.setattr(get_settings(), "ARCHIVE_AFTER_DAYS", 0)
+        post = create(service, "古い投稿", "アーカイブされる本文")
+        service.archive_old_posts(now=datetime.utcnow() + timedelta(days=1))
+        
+        assert search_ids(service, "アーカイブ") == [post.post_id]
+    
+    def test_rebuild_indexes_existing_posts(self, service, monkeypatch):
+        """検索を有効にする前の投稿を再構築で索引することを確認"""
+        monkeypatch.setattr(get_settings(), "SEARCH_ENABLED", False)
+        created = [create(service, f"既存{index}", "索引されていない本文") for index in range(3)]
+        monkeypatch.setattr(get_settings(), "SEARCH_ENABLED", True)
+        
+        assert search_ids(service, "索引") == []
+        
+        indexed = 0
+        result = service.rebuild_search_index(limit=2)
+        indexed += result["indexed"]
+        while result["next_cursor"]:
+            result = service.rebuild_search_index(limit=2, cursor=result["next_cursor"])
+            indexed += result["indexed"]
+        
+        assert indexed == 3
+        assert sorted(search_ids(service, "索引")) == sorted(post.post_id for post in created)
+        assert get_search_repository().get(DOCUMENT_PREFIX + created[0].post_id) is not None
+    
+    def test_disabled(self, service, monkeypatch):
+        """検索が無効な場合は索引せず、検索がエラーになることを確認"""
+        monkeypatch.setattr(get_settings(), "SEARCH_ENABLED", False)
+        create(service, "タイトル", "本文")
+        
+        assert get_search_repository().scan() == []
+        with pytest.raises(ValueError):
+            service.search_posts("本文")
+
+
+class TestSearchAPI:
+    """投稿検索APIのテストクラス"""
+    
+    def test_search_endpoint(self, monkeypatch):
+        """検索結果と続きのカーソルをX-Next-Cursorヘッダーで返すことを確認"""
+        monkeypatch.setattr(get_settings(), "STORAGE_BACKEND", "memory")
+        monkeypatch.setattr(get_settings(), "SEARCH_ENABLED", True)
+        reset_repositories()
+        service = PostService()
+        created = [create(service, f"検索{index}", "本文") for index in range(3)]
+        token = create_access_token({"user_id": "user-1", "username": "taro", "role": "user"})
+        client = TestClient(app, headers={"Authorization": f"Bearer {token}"})
+        
+        first = client.get("/posts/search", params={"q": "検索", "limit": 2})
+        second = client.get("/posts/search", params={"q": "検索", "limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+        
+        assert first.status_code == 200
+        assert [post["post_id"] for post in first.json() + second.json()] == [post.post_id for post in reversed(created)]
+        assert "X-Next-Cursor" not in second.headers
+        assert client.get("/posts/search", params={"q": ""}).status_code == 422
+        assert len(client.get("/posts/search", params={"q": "検"}).json()) == 3
+        
+        monkeypatch.setattr(get_settings(), "SEARCH_ENABLED", False)
+        assert client.get("/posts/search", params={"q": "検索"}).status_code == 400
+        reset_repositories()
+
+
+class TestSuggest:
+    """投稿タイトル候補のテストクラス"""
+    
+    def test_title_key(self):
+        """タイトルの正規化で全角・半角、大文字・小文字、空白の連続を統一することを確認"""
+        assert title_key("  ＡＷＳ　　入門 ") == title_key("aws 入門") == "aws 入門"
+    
+    def test_suggest_by_prefix(self, service):
+        """タイトルが接頭辞で始まる投稿のみを、正規化したタイトルの昇順で返すことを確認"""
+        first = create(service, "AWS入門", "本文")
+        second = create(service, "ＡＷＳの料金", "本文")
+        create(service, "Azure入門", "本文")
+        
+        suggestions = service.suggest_posts("aws")
+        
+        assert [(suggestion.post_id, suggestion.title) for suggestion in suggestions] == [
+            (second.post_id, "ＡＷＳの料金"),
+            (first.post_id, "AWS入門"),
+        ]
+        assert len(service.suggest_posts("a", limit=2)) == 2
+        assert service.suggest_posts("　") == []
+    
+    def test_update_and_delete(self, service, monkeypatch):
+        """タイトルの更新・投稿の削除が候補に反映され、コンパクト形式でも取得できることを確認"""
+        monkeypatch.setattr(get_settings(), "POST_ENCODING", "compact")
+        post = create(service, "旧タイトル", "本文")
+        service.update_post(post.post_id, PostUpdate(title="新タイトル"))
+        
+        assert service.suggest_posts("旧") == []
+        assert [suggestion.title for suggestion in service.suggest_posts("新")] == ["新タイトル"]
+        
+        service.delete_post(post.post_id)
+        
+        assert service.suggest_posts("新") == []
+    
+    def test_migration_adds_title_key(self, service):
+        """タイトルのソートキーを持たない既存の投稿に、移行で追加することを確認"""
+        post = create(service, "既存の投稿", "本文")
+        get_posts_repository().update(post.post_id, {}, increment_version=False, remove=["title_key"])
+        
+        assert service.suggest_posts("既存") == []
+        assert service.migrate_encoding(limit=10)["migrated"] == 1
+        assert [suggestion.post_id for suggestion in service.suggest_posts("既存")] == [post.post_id]
+        assert service.get_post_by_id(post.post_id).version == 1
+    
+    def test_suggest_endpoint(self, monkeypatch):
+        """候補APIが投稿ID・タイトルを返すことを確認"""
+        monkeypatch.setattr(get_settings(), "STORAGE_BACKEND", "memory")
+        reset_repositories()
+        post = create(PostService(), "掲示板の使い方", "本文")
+        token = create_access_token({"user_id": "user-1", "username": "taro", "role": "user"})
+        client = TestClient(app, headers={"Authorization": f"Bearer {token}"})
+        
+        response = client.get("/posts/suggest", params={"prefix": "掲示"})
+        
+        assert response.status_code == 200
+        assert response.json() == [{"post_id": post.post_id, "title": "掲示板の使い方"}]
+        reset_repositories()
@@ -0,0 +1,42 @@
+"""
+サーバー起動モジュールのテスト
+
+コマンドライン引数の解析とサーバー設定の作成のテスト。
+"""
+
+from app import server
+from app.server import build_gunicorn_options, default_workers, parse_args, select_server
+
+
+class TestServer:
+    """サーバー起動モジュールのテストクラス"""
+    
+    def test_default_workers_from_cpu_count(self):
+        """ワーカー数を指定しない場合にCPU数から決定されることを確認"""
+        args = parse_args([])
+        
+        assert args.workers == default_workers()
+        assert args.workers >= 1
+        assert args.port == 8000
+    
+    def test_explicit_arguments(self):
+        """コマンドライン引数の指定が反映されることを確認"""
+        args = parse_args(["--host", "127.0.0.1", "--port", "9000", "--workers", "3", "--graceful-timeout", "10"])
+        
+        options = build_gunicorn_options(args)
+        
+        assert options["bind"] == "127.0.0.1:9000"
+        assert options["workers"] == 3
+        assert options["worker_class"] == "uvicorn.workers.UvicornWorker"
+        assert options["preload_app"] is True
+        assert options["graceful_timeout"] == 10
+        assert options["post_fork"] is server.post_fork
+    
+    def test_select_server(self, monkeypatch):
+        """gunicornの有無で使用するサーバーが決定されることを確認"""
+        monkeypatch.setattr(server.importlib.util, "find_spec", lambda name: None)
+        assert select_server("auto") == "uvicorn"
+        assert select_server("gunicorn") == "gunicorn"
+        
+        monkeypatch.setattr(server.importlib.util, "find_spec", lambda name: object())
+        assert select_server("auto") == "gunicorn"
@@ -0,0 +1,129 @@
+"""
+シングルフライトのテスト
+
+同時実行中の同一キーの呼び出しが合流することのテスト。
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """シングルフライトのテストクラス"""
+    
+    def test_concurrent_threads_share_one_call(self):
+        """複数スレッドからの同時呼び出しが1回の実行を共有することを確認"""
+        group = SingleFlight("test")
+        started = threading.Event()
+        release = threading.Event()
+        executions = []
+        
+        def fetch():
+            executions.append(1)
+            started.set()
+            release.wait()
+            return "result"
+        
+        results = []
+        leader = threading.Thread(target=lambda: results.append(group.do("key", fetch)))
+        leader.start()
+        started.wait()
+        
+        followers = [threading.Thread(target=lambda: results.append(group.do("key", fetch))) for _ in range(5)]
+        for thread in followers:
+            thread.start()
+        # 後続のスレッドが待機に入るまで待つ
+        while group.stats()["calls"] < 6:
+            time.sleep(0.001)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+        
+        assert results == ["result"] * 6
+        assert len(executions) == 1
+        stats = group.stats()
+        assert stats["executions"] == 1
+        assert stats["shared"] == 5
+        assert stats["coalescing_ratio"] == pytest.approx(5 / 6)
+    
+    def test_sequential_calls_are_not_shared(self):
+        """完了後の呼び出しは再実行されることを確認"""
+        group = SingleFlight("test")
+        
+        assert group.do("key", lambda: 1) == 1
+        assert group.do("key", lambda: 2) == 2
+        assert group.stats()["executions"] == 2
+    
+    def test_error_is_propagated_to_all_callers(self):
+        """例外が呼び出し元に伝播し、以降の呼び出しに影響しないことを確認"""
+        group = SingleFlight("test")
+        
+        def fail():
+            raise RuntimeError("boom")
+        
+        with pytest.raises(RuntimeError):
+            group.do("key", fail)
+        assert group.do("key", lambda: "ok") == "ok"
+    
+    def test_concurrent_coroutines_share_one_call(self):
+        """複数のコルーチンからの同時呼び出しが1回の実行を共有することを確認"""
+        group = SingleFlight("test")
+        executions = []
+        
+        def fetch():
+            executions.append(1)
+            time.sleep(0.05)
+            return "result"
+        
+        async def run():
+            return await asyncio.gather(*[group.do_async("key", fetch) for _ in range(10)])
+        
+        results = asyncio.run(run())
+        
+        assert results == ["result"] * 10
+        assert len(executions) == 1
+        assert group.stats()["shared"] == 9
+    
+    def test_async_error_is_propagated(self):
+        """非同期呼び出しで例外が全ての呼び出し元に伝播することを確認"""
+        group = SingleFlight("test")
+        
+        def fail():
+            time.sleep(0.01)
+            raise RuntimeError("boom")
+        
+        async def run():
+            return await asyncio.gather(*[group.do_async("key", fail) for _ in range(3)], return_exceptions=True)
+        
+        results = asyncio.run(run())
+        
+        assert all(isinstance(result, RuntimeError) for result in results)
+    
+    def test_cancelled_leader_hands_off_to_followers(self):
+        """先頭の呼び出し元がキャンセルされても実行を続け、後続の呼び出し元に結果を渡すことを確認"""
+        group = SingleFlight("test")
+        executions = []
+        
+        def fetch():
+            executions.append(1)
+            time.sleep(0.05)
+            return "result"
+        
+        async def run():
+            leader = asyncio.ensure_future(group.do_async("key", fetch))
+            await asyncio.sleep(0.01)
+            followers = [asyncio.ensure_future(group.do_async("key", fetch)) for _ in range(3)]
+            await asyncio.sleep(0)
+            leader.cancel()
+            return leader, await asyncio.gather(*followers)
+        
+        leader, results = asyncio.run(run())
+        
+        assert leader.cancelled()
+        assert results == ["result"] * 3
+        assert len(executions) == 1
@@ -0,0 +1,340 @@
+"""
+投稿数の集計のテスト
+
+投稿・ユーザーの作成・削除に伴う集計の加算・減算と、集計の参照・再構築・総件数の修正・管理API・一覧の総件数のテスト。
+"""
+
+from datetime import date, datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import app, handler
+from app.models.post import PostCreate
+from app.models.user import UserCreate
+from app.services.auth import create_access_token
+from app.services import maintenance
+from app.services.metrics import metrics
+from app.services.post_codec import PostCodec
+from app.services.post_service import PostService
+from app.services.repository import get_posts_repository, get_stats_repository, reset_repositories
+from app.services.stats_service import TOTAL_ID, stats_service
+from app.services.user_service import UserService
+
+
+@pytest.fixture
+def service(backend, monkeypatch):
+    """各ストレージの投稿サービス"""
+    if backend == "dynamodb":
+        # motoのScanはSegment・TotalSegmentsに対応していないため1区分で読み取る
+        monkeypatch.setattr(get_settings(), "STATS_REBUILD_SEGMENTS", 1)
+    return PostService()
+
+
+def put_post(post_id, user_id, username, created_at):
+    """作成日時を指定して投稿を書き込む（集計は更新しない）"""
+    item = PostService().build_post_item(
+        PostCreate(title="タイトル", message="本文"), user_id, username, created_at=created_at, post_id=post_id,
+    )
+    get_posts_repository().put(item)
+
+
+def record(post_id, user_id, username, created_at):
+    """作成日時を指定して投稿を書き込み、集計に加算する"""
+    put_post(post_id, user_id, username, created_at)
+    stats_service.record_post_created(user_id, username, created_at)
+
+
+class TestStats:
+    """投稿数の集計のテストクラス"""
+    
+    def test_daily_activity(self, service):
+        """日別の投稿数・投稿ユーザー数を、投稿の無い日を0として返すことを確認"""
+        record("p1", "user-1", "taro", "2025-01-01T09:00:00")
+        record("p2", "user-1", "taro", "2025-01-01T10:00:00")
+        record("p3", "user-2", "hanako", "2025-01-01T11:00:00")
+        record("p4", "user-2", "hanako", "2025-01-03T00:00:00")
+        record("p5", "user-2", "hanako", "2025-01-05T00:00:00")
+        
+        activity = stats_service.get_daily_activity(3, until=date(2025, 1, 3))
+        
+        assert activity == [
+            {"date": "2025-01-01", "posts": 3, "active_users": 2},
+            {"date": "2025-01-02", "posts": 0, "active_users": 0},
+            {"date": "2025-01-03", "posts": 1, "active_users": 1},
+        ]
+        assert stats_service.get_totals() == {"posts": 5, "users": 0}
+    
+    def test_create_and_delete_posts(self, service):
+        """投稿の作成・削除で集計が加算・減算され、最後の投稿の削除で投稿ユーザー数が減ることを確認"""
+        first = service.create_post(PostCreate(title="タイトル", message="本文"), "user-1", "taro")
+        second = service.create_post(PostCreate(title="タイトル", message="本文"), "user-1", "taro")
+        today = first.created_at.date()
+        
+        service.delete_post(first.post_id)
+        
+        assert stats_service.get_daily_activity(1, until=today) == [
+            {"date": today.isoformat(), "posts": 1, "active_users": 1},
+        ]
+        
+        service.delete_post(second.post_id)
+        
+        assert stats_service.get_daily_activity(1, until=today)[0]["active_users"] == 0
+        assert stats_service.get_totals() == {"posts": 0, "users": 0}
+        assert stats_service.get_top_posters(10) == []
+    
+    def test_concurrent_delete_decrements_once(self, service, monkeypatch):
+        """同じ投稿・ユーザーを同時に削除した場合に、削除した1回のみ集計を減算することを確認"""
+        users = UserService()
+        user = users.create_user(UserCreate(username="taro", password="password123"))
+        post = service.create_post(PostCreate(title="タイトル", message="本文"), user.user_id, "taro")
+        service.create_post(PostCreate(title="タイトル", message="本文"), user.user_id, "taro")
+        # 削除前に読み込んだ投稿・ユーザー（同時のリクエストが既存確認を通過した状態）
+        monkeypatch.setattr(service, "get_post_by_id", lambda post_id: post)
+        monkeypatch.setattr(users, "get_user_by_id", lambda user_id: user)
+        
+        assert [service.delete_post(post.post_id) for _ in range(2)] == [True, False]
+        assert [users.delete_user(user.user_id) for _ in range(2)] == [True, False]
+        
+        assert get_stats_repository().get(TOTAL_ID, consistent=True)["posts"] == 1
+        assert get_stats_repository().get(TOTAL_ID, consistent=True)["users"] == 0
+        assert stats_service.get_daily_activity(1, until=post.created_at.date())[0]["posts"] == 1
+    
+    def test_top_posters_follow_username_changes(self, service):
+        """投稿数の多い順にユーザーを返し、ユーザー名の変更を反映することを確認"""
+        for index in range(3):
+            record(f"a{index}", "user-1", "taro", "2025-01-01T00:00:00")
+        record("b0", "user-2", "hanako", "2025-01-01T00:00:00")
+        
+        service.propagate_username("user-1", "jiro")
+        
+        assert stats_service.get_top_posters(1) == [{"user_id": "user-1", "username": "jiro", "posts": 3}]
+        assert [poster["user_id"] for poster in stats_service.get_top_posters(10)] == ["user-1", "user-2"]
+    
+    def test_rebuild(self, service, monkeypatch):
+        """投稿・アーカイブした投稿から集計を作り直し、古い集計を削除することを確認"""
+        monkeypatch.setattr(get_settings(), "ARCHIVE_ENABLED", True)
+        put_post("p1", "user-1", "taro", "2025-01-01T09:00:00")
+        put_post("p2", "user-2", "hanako", "2025-01-01T10:00:00")
+        put_post("p3", "user-1", "taro", "2025-01-02T00:00:00")
+        stats_service.record_post_created("user-3", "ghost", "2024-12-31T00:00:00")
+        service.archive_old_posts(now=datetime(2026, 1, 2))
+        
+        UserService().create_user(UserCreate(username="taro", password="password123"))
+        
+        result = service.rebuild_stats()
+        
+        assert result["scanned"] == 3
+        assert stats_service.get_totals() == {"posts": 3, "users": 1}
+        assert stats_service.get_daily_activity(3, until=date(2025, 1, 2)) == [
+            {"date": "2024-12-31", "posts": 0, "active_users": 0},
+            {"date": "2025-01-01", "posts": 2, "active_users": 2},
+            {"date": "2025-01-02", "posts": 1, "active_users": 1},
+        ]
+        assert [poster["posts"] for poster in stats_service.get_top_posters(10)] == [2, 1]
+        # 再構築後も加算を続けられる
+        stats_service.record_post_created("user-2", "hanako", "2025-01-02T01:00:00")
+        assert stats_service.get_daily_activity(1, until=date(2025, 1, 2))[0] == {
+            "date": "2025-01-02", "posts": 2, "active_users": 2,
+        }
+    
+    def test_rebuild_reads_aggregate_attributes(self, service, monkeypatch):
+        """再構築が集計に必要な属性のみを読み取り、コンパクト形式の投稿のユーザー名も集計することを確認"""
+        put_post("p1", "user-1", "taro", "2025-01-01T00:00:00")
+        item = PostService().build_post_item(
+            PostCreate(title="タイトル", message="本文"), "user-2", "hanako", created_at="2025-01-01T01:00:00", post_id="p2",
+        )
+        get_posts_repository().put(PostCodec(True, 0).encode(item))
+        get_stats_repository().increment("DAY#2024-01-01", {"posts": 1}, {"kind": "day", "sort_key": "2024-01-01"})
+        projections = []
+        repository = get_posts_repository()
+        scan_segment = repository.scan_segment
+        
+        def record_projection(segment, total_segments, attributes=None):
+            projections.append(attributes)
+            return scan_segment(segment, total_segments, attributes)
+        
+        monkeypatch.setattr(repository, "scan_segment", record_projection)
+        
+        result = service.rebuild_stats()
+        
+        assert projections and all("message" not in attributes and "m" not in attributes for attributes in projections)
+        assert sorted(poster["username"] for poster in stats_service.get_top_posters(10)) == ["hanako", "taro"]
+        assert result["deleted"] == 1
+        assert get_stats_repository().get("DAY#2024-01-01") is None
+    
+    def test_create_and_delete_users(self, service):
+        """ユーザーの作成・削除で全体のユーザー数が加算・減算されることを確認"""
+        users = UserService()
+        first = users.create_user(UserCreate(username="taro", password="password123"))
+        users.create_user(UserCreate(username="hanako", password="password123"))
+        
+        assert stats_service.get_total("users") == 2
+        
+        users.delete_user(first.user_id)
+        users.delete_user(first.user_id)
+        
+        assert stats_service.get_total("users") == 1
+    
+    def test_reconcile_corrects_drift(self, service, monkeypatch):
+        """投稿・ユーザーを数え、全体の集計のずれのみを修正することを確認"""
+        monkeypatch.setattr(get_settings(), "ARCHIVE_ENABLED", True)
+        record("p1", "user-1", "taro", "2025-01-01T00:00:00")
+        record("p2", "user-1", "taro", "2025-01-02T00:00:00")
+        service.archive_old_posts(now=datetime(2025, 1, 2))
+        UserService().create_user(UserCreate(username="taro", password="password123"))
+        get_stats_repository().increment(TOTAL_ID, {"posts": 5, "users": -3})
+        
+        result = service.reconcile_counts()
+        
+        assert result == {"posts": {"counted": 2, "drift": -5}, "users": {"counted": 1, "drift": 3}}
+        assert stats_service.get_totals() == {"posts": 2, "users": 1}
+        assert stats_service.get_daily_activity(1, until=date(2025, 1, 2))[0]["posts"] == 1
+        assert service.reconcile_counts()["posts"]["drift"] == 0
+    
+    def test_reconcile_keeps_writes_during_scan(self, service, monkeypatch):
+        """スキャン中に作成された投稿の加算を、修正で打ち消さないことを確認"""
+        record("p1", "user-1", "taro", "2025-01-01T00:00:00")
+        count = stats_service._count
+        
+        def count_then_create(repository):
+            # スキャンの後（数えられない）に投稿を作成する
+            counted = count(repository)
+            if repository is get_posts_repository():
+                record("p2", "user-1", "taro", "2025-01-02T00:00:00")
+            return counted
+        
+        monkeypatch.setattr(stats_service, "_count", count_then_create)
+        
+        assert service.reconcile_counts()["posts"] == {"counted": 1, "drift": 0}
+        assert stats_service.get_totals() == {"posts": 2, "users": 0}
+    
+    def test_negative_total_is_reported(self, service, monkeypatch):
+        """集計が負の値の場合は、0に丸めずにメトリクスに記録してNoneを返すことを確認"""
+        recorded = []
+        monkeypatch.setattr(metrics, "increment", lambda name, *args, **kwargs: recorded.append(name))
+        get_stats_repository().increment(TOTAL_ID, {"posts": -1})
+        
+        assert stats_service.get_total("posts") is None
+        assert recorded == ["StatsDrift"]
+    
+    def test_disabled(self, service, monkeypatch):
+        """集計が無効な場合は加算せず、再構築・総件数の修正がエラーになることを確認"""
+        monkeypatch.setattr(get_settings(), "STATS_ENABLED", False)
+        service.create_post(PostCreate(title="タイトル", message="本文"), "user-1", "taro")
+        UserService().create_user(UserCreate(username="taro", password="password123"))
+        
+        assert get_stats_repository().scan() == []
+        assert stats_service.get_total("posts") is None
+        with pytest.raises(ValueError):
+            service.rebuild_stats()
+        with pytest.raises(ValueError):
+            service.reconcile_counts()
+
+
+class TestStatsAPI:
+    """集計の管理APIのテストクラス"""
+    
+    def test_admin_endpoints(self, monkeypatch):
+        """集計・投稿数の多いユーザーを管理者のみが取得できることを確認"""
+        monkeypatch.setattr(get_settings(), "STORAGE_BACKEND", "memory")
+        reset_repositories()
+        PostService().create_post(PostCreate(title="タイトル", message="本文"), "user-1", "taro")
+        admin = create_access_token({"user_id": "admin-1", "username": "admin", "role": "admin"})
+        user = create_access_token({"user_id": "user-1", "username": "taro", "role": "user"})
+        client = TestClient(app)
+        
+        activity = client.get("/admin/stats/activity", params={"days": 7}, headers={"Authorization": f"Bearer {admin}"})
+        posters = client.get("/admin/stats/top-posters", headers={"Authorization": f"Bearer {admin}"})
+        rebuilt = client.post("/admin/stats/rebuild", headers={"Authorization": f"Bearer {admin}"})
+        
+        assert activity.json()["totals"] == {"posts": 1, "users": 0}
+        assert len(activity.json()["days"]) == 7 and activity.json()["days"][-1]["posts"] == 1
+        assert posters.json() == [{"user_id": "user-1", "username": "taro", "posts": 1}]
+        assert rebuilt.json()["scanned"] == 1
+        assert client.get("/admin/stats/activity", headers={"Authorization": f"Bearer {user}"}).status_code == 403
+        reset_repositories()
+    
+    def test_list_total_count(self, monkeypatch):
+        """投稿・ユーザーの一覧が総件数をX-Total-Countヘッダーで返し、集計が無効な場合は返さないことを確認"""
+        monkeypatch.setattr(get_settings(), "STORAGE_BACKEND", "memory")
+        reset_repositories()
+        for index in range(3):
+            PostService().create_post(PostCreate(title=f"タイトル{index}", message="本文"), "user-1", "taro")
+        UserService().create_user(UserCreate(username="taro", password="password123"))
+        admin = create_access_token({"user_id": "admin-1", "username": "admin", "role": "admin"})
+        client = TestClient(app, headers={"Authorization": f"Bearer {admin}"})
+        
+        posts = client.get("/posts/", params={"limit": 2})
+        users = client.get("/users/")
+        
+        assert (len(posts.json()), posts.headers["X-Total-Count"]) == (2, "3")
+        assert "X-Next-Cursor" in posts.headers
+        assert users.headers["X-Total-Count"] == "1"
+        # 続きのページでは集計を読み取らない
+        assert "X-Total-Count" not in client.get("/posts/", params={"cursor": posts.headers["X-Next-Cursor"]}).headers
+        
+        monkeypatch.setattr(get_settings(), "STATS_ENABLED", False)
+        assert "X-Total-Count" not in client.get("/posts/").headers
+        reset_repositories()
+    
+    def test_reconcile_dispatched_to_maintenance_function(self, monkeypatch):
+        """保守用の関数が設定されている場合は、総件数の修正を非同期に依頼して202を返すことを確認"""
+        monkeypatch.setattr(get_settings(), "STORAGE_BACKEND", "memory")
+        monkeypatch.setattr(get_settings(), "MAINTENANCE_FUNCTION", "board-maintenance")
+        reset_repositories()
+        invocations = []
+        
+        class LambdaClient:
+            def invoke(self, **params):
+                invocations.append(params)
+        
+        monkeypatch.setattr(maintenance, "_create_lambda_client", LambdaClient)
+        put_post("p1", "user-1", "taro", "2025-01-01T00:00:00")
+        admin = create_access_token({"user_id": "admin-1", "username": "admin", "role": "admin"})
+        
+        response = TestClient(app).post("/admin/stats/reconcile", headers={"Authorization": f"Bearer {admin}"})
+        
+        assert (response.status_code, response.json()) == (202, {"accepted": "reconcile"})
+        assert invocations == [{"FunctionName": "board-maintenance", "InvocationType": "Event", "Payload": b'{"reconcile": true}'}]
+        # 依頼のみで、リクエスト内では数えない
+        assert stats_service.get_total("posts") == 0
+        reset_repositories()
+    
+    def test_rebuild_dispatched_to_maintenance_function(self, monkeypatch):
+        """保守用の関数が設定されている場合は、集計の再構築を非同期に依頼し、依頼された関数で作り直すことを確認"""
+        monkeypatch.setattr(get_settings(), "STORAGE_BACKEND", "memory")
+        monkeypatch.setattr(get_settings(), "MAINTENANCE_FUNCTION", "board-maintenance")
+        reset_repositories()
+        invocations = []
+        
+        class LambdaClient:
+            def invoke(self, **params):
+                invocations.append(params)
+        
+        monkeypatch.setattr(maintenance, "_create_lambda_client", LambdaClient)
+        put_post("p1", "user-1", "taro", "2025-01-01T00:00:00")
+        admin = create_access_token({"user_id": "admin-1", "username": "admin", "role": "admin"})
+        
+        response = TestClient(app).post("/admin/stats/rebuild", headers={"Authorization": f"Bearer {admin}"})
+        
+        assert (response.status_code, response.json()) == (202, {"accepted": "rebuild_stats"})
+        assert invocations[0]["Payload"] == b'{"rebuild_stats": true}'
+        assert handler({"rebuild_stats": True}, None)["scanned"] == 1
+        assert stats_service.get_total("posts") == 1
+        reset_repositories()
+    
+    def test_scheduled_reconcile(self, monkeypatch):
+        """スケジュール呼び出しで総件数のずれを修正することを確認"""
+        monkeypatch.setattr(get_settings(), "STORAGE_BACKEND", "memory")
+        reset_repositories()
+        put_post("p1", "user-1", "taro", "2025-01-01T00:00:00")
+        
+        result = handler({"reconcile": True}, None)
+        
+        assert result["posts"] == {"counted": 1, "drift": 1}
+        assert stats_service.get_total("posts") == 1
+        monkeypatch.setattr(get_settings(), "STATS_ENABLED", False)
+        assert handler({"reconcile": True}, None) == {}
+        reset_repositories()
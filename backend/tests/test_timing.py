@@ -0,0 +1,51 @@
+"""
+リクエスト計測のテスト
+
+Server-Timingヘッダーの出力とサンプリングのテスト。
+"""
+
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import app
+from app.services.auth import get_password_hash
+from app.services.timing import RequestTimings, format_server_timing, timed
+
+
+class TestRequestTiming:
+    """リクエスト計測のテストクラス"""
+    
+    def test_format_server_timing(self):
+        """計測結果がServer-Timingヘッダーの形式になることを確認"""
+        timings = RequestTimings()
+        timings.record("db", 0.002)
+        timings.record("db", 0.003)
+        
+        header = format_server_timing(0.0125, timings)
+        
+        assert header == 'total;dur=12.5, db;dur=5.0;desc="DynamoDB x2"'
+    
+    def test_timed_outside_request_is_noop(self):
+        """リクエスト外の計測が例外にならないことを確認"""
+        with timed("hash"):
+            get_password_hash("password")
+    
+    def test_response_has_server_timing_header(self):
+        """レスポンスにServer-Timingヘッダーが付与されることを確認"""
+        client = TestClient(app)
+        
+        response = client.get("/")
+        
+        assert response.status_code == 200
+        assert response.headers["server-timing"].startswith("total;dur=")
+        assert "serialize;dur=" in response.headers["server-timing"]
+    
+    def test_sampling_disabled(self, monkeypatch):
+        """サンプリング率0の場合は計測しないことを確認"""
+        monkeypatch.setattr(get_settings(), "TIMING_SAMPLE_RATE", 0.0)
+        client = TestClient(app)
+        
+        response = client.get("/")
+        
+        assert response.status_code == 200
+        assert "server-timing" not in response.headers
@@ -10,6 +10,7 @@ import boto3
 
 from app.models.user import UserCreate, UserUpdate, UserRole
 from app.services.user_service import UserService
+from app.services.versioning import VersionConflictError
 
 
 def create_test_tables():
@@ -177,6 +178,23 @@ class TestUserService:
         assert updated_user.username == "updateduser"
         assert updated_user.role == UserRole.ADMIN
     
+    @mock_dynamodb
+    def test_update_user_with_version(self):
+        """バージョンを指定した更新が競合を検出することを確認"""
+        create_test_tables()
+        service = UserService()
+        
+        created_user = service.create_user(UserCreate(username="versionuser", password="password123"))
+        
+        updated_user = service.update_user(created_user.user_id, UserUpdate(role=UserRole.ADMIN), expected_version=1)
+        assert updated_user.version == 2
+        
+        with pytest.raises(VersionConflictError):
+            service.update_user(created_user.user_id, UserUpdate(role=UserRole.USER), expected_version=1)
+        
+        # 存在しないユーザーはNoneを返す
+        assert service.update_user("nonexistent-id", UserUpdate(role=UserRole.USER)) is None
+    
     @mock_dynamodb
     def test_delete_user(self):
         """ユーザーの削除が正しく動作することを確認"""
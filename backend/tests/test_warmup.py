@@ -0,0 +1,101 @@
+"""
+ウォームアップのテスト
+
+ウォームアップ呼び出しの判定・事前初期化・Lambdaハンドラーでの短絡のテスト。
+"""
+
+import asyncio
+import json
+import threading
+
+import anyio
+import pytest
+
+from app import main
+from app.main import app, handler
+from app.server import preload_app
+from app.services import warmup
+from app.services.metrics import metrics
+from app.services.warmup import is_warmup_event, warm_up
+
+
+@pytest.fixture
+def fresh_container(monkeypatch):
+    """事前初期化していないコンテナの状態にするフィクスチャ"""
+    monkeypatch.setattr(warmup, "_completed_steps", set())
+    monkeypatch.setattr(app, "openapi_schema", None)
+
+
+class TestWarmup:
+    """ウォームアップのテストクラス"""
+    
+    def test_is_warmup_event(self):
+        """ウォームアップ呼び出しのイベントを判定できることを確認"""
+        assert is_warmup_event({"warmup": True}) is True
+        assert is_warmup_event({"source": "serverless-plugin-warmup"}) is True
+        assert is_warmup_event({"source": "aws.events", "detail-type": "Scheduled Event"}) is True
+        assert is_warmup_event({"version": "2.0", "rawPath": "/", "requestContext": {}}) is False
+        assert is_warmup_event({"source": "aws.events", "detail-type": "EC2 Instance State-change"}) is False
+        assert is_warmup_event(None) is False
+    
+    def test_warm_up_runs_each_step_once(self, fresh_container):
+        """事前初期化の各手順がコンテナ内で1度だけ実行されることを確認"""
+        durations = warm_up(app)
+        
+        assert set(durations) == {"storage", "threadpool", "bcrypt", "jwt", "openapi"}
+        assert app.openapi_schema is not None
+        assert warm_up(app) == {}
+    
+    def test_failed_step_is_retried(self, fresh_container, monkeypatch):
+        """失敗した手順が次回のウォームアップで再試行されることを確認"""
+        def fail():
+            raise RuntimeError("DynamoDBに接続できません")
+        
+        monkeypatch.setattr(warmup, "_warm_storage", fail)
+        assert not {"storage", "threadpool"} & set(warm_up(app))
+        
+        monkeypatch.setattr(warmup, "_warm_storage", lambda: None)
+        assert set(warm_up(app)) == {"storage", "threadpool"}
+    
+    def test_threadpool_worker_is_warmed(self, fresh_container, monkeypatch):
+        """次のリクエストを処理するスレッドプールのワーカースレッドで、ストレージを事前に初期化することを確認"""
+        warmed = []
+        monkeypatch.setattr(warmup, "_warm_storage", lambda: warmed.append(threading.get_ident()))
+        
+        warm_up(app)
+        # Mangumと同じイベントループで、シングルフライトの読み取りと同じようにワーカースレッドで実行する
+        worker = asyncio.get_event_loop().run_until_complete(anyio.to_thread.run_sync(threading.get_ident))
+        
+        assert threading.get_ident() in warmed
+        assert worker in warmed
+    
+    def test_server_preload_skips_threadpool(self, fresh_container, monkeypatch):
+        """サーバーの事前読み込み（gunicornのマスタープロセス）ではスレッドプールを初期化しないことを確認"""
+        def fail():
+            raise AssertionError("fork前のマスタープロセスでワーカースレッドが作成されました")
+        
+        monkeypatch.setattr(warmup, "_warm_threadpool", fail)
+        
+        assert preload_app() is app
+        assert warmup._completed_steps == {"storage", "bcrypt", "jwt", "openapi"}
+    
+    def test_handler_short_circuits_warmup_event(self, fresh_container, monkeypatch):
+        """ウォームアップ呼び出しがASGIアプリケーションを経由せずに戻ることを確認"""
+        def fail(event, context):
+            raise AssertionError("ウォームアップ呼び出しがASGIアプリケーションに渡されました")
+        
+        monkeypatch.setattr(main, "mangum_handler", fail)
+        monkeypatch.setattr(main, "_cold_start", True)
+        
+        assert handler({"warmup": True}, None) == {"warmup": True, "cold_start": True}
+        assert handler({"warmup": True}, None) == {"warmup": True, "cold_start": False}
+    
+    def test_handler_flushes_metrics_on_warmup(self, fresh_container, monkeypatch, capsys):
+        """ウォームアップ呼び出しでも集計したメトリクスを書き出すことを確認"""
+        monkeypatch.setattr(main, "_cold_start", True)
+        metrics.reset()
+        
+        handler({"warmup": True}, None)
+        
+        documents = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert [document["ColdStart"] for document in documents if "Invocations" in document] == [1]
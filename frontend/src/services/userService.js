@@ -13,11 +13,20 @@ const userService = {
   /**
    * 全ユーザーを取得する
    * 
+   * 一覧APIは1ページずつ返すため、X-Next-Cursorヘッダーが無くなるまで続きを取得する。
+   * 
    * @returns {Promise<Array>} ユーザーリスト
    */
   async getUsers() {
-    const response = await api.get('/users/')
-    return response.data
+    const users = []
+    let cursor = null
+    do {
+      const params = cursor ? { cursor } : {}
+      const response = await api.get('/users/', { params })
+      users.push(...response.data)
+      cursor = response.headers['x-next-cursor']
+    } while (cursor)
+    return users
   },
 
   /**